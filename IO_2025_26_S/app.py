@@ -1,41 +1,79 @@
 from flask import Flask
 from dotenv import load_dotenv
-from pathlib import Path
-from openai import OpenAI
-import os
+import logging
 
+# Plik .env musi być wczytany przed importem konfiguracji i serwisów,
+# które czytają zmienne środowiskowe przy imporcie
+load_dotenv()
+
+from config import DevelopmentConfig, get_config
+from services.logging_config import configure_logging
+from services.openai_clients import create_openai_clients
 from controllers.web_controller import create_web_blueprint
 from controllers.api_controller import create_api_blueprint
+from controllers.metrics_controller import create_metrics_blueprint
+from controllers.health_controller import create_health_blueprint
+from controllers.identity import issue_user_cookie
+from services.reference_foods import load_reference_foods
+from services.composite_dishes import load_recipes
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def create_app(config=None) -> Flask:
+    """
+    Tworzy i konfiguruje aplikację Flask.
+
+    Args:
+        config: Klasa konfiguracji (config.DevelopmentConfig itd.);
+            domyślnie wybierana przez SMARTDIET_ENV (production)
+
+    Returns:
+        Skonfigurowana aplikacja z zarejestrowanymi kontrolerami
+    """
+    app = Flask(__name__)
+    app.config.from_object(config or get_config())
+
+    configure_logging(app.config["LOG_LEVEL"], app.config["LOG_FORMAT"])
+
+    # Klienci OpenAI powstają przy pierwszej analizie (SDK ładuje się ok. 0,7 s)
+    client, async_client = create_openai_clients(
+        app.config["OPENAI_API_KEY"],
+        base_url=app.config["OPENAI_BASE_URL"],
+        use_async=app.config["OPENAI_ASYNC"],
+        preload=app.config["OPENAI_PRELOAD"]
+    )
+    app.extensions["openai_client"] = client
+    app.extensions["openai_async_client"] = async_client
+
+    # Tabela popularnych potraw i składy potraw złożonych - odpowiadają bez zapytania do API
+    load_reference_foods()
+    load_recipes()
+
+    # Rejestracja kontrolerów
+    app.register_blueprint(create_web_blueprint(client, async_client))
+    app.register_blueprint(create_api_blueprint(client, async_client), url_prefix="/api")
+    app.register_blueprint(create_metrics_blueprint())
+    app.register_blueprint(create_health_blueprint(client, async_client))
 
-app = Flask(__name__)
+    # Podpisane ciasteczko z identyfikatorem dla nowych odwiedzających (bez proxy)
+    app.after_request(issue_user_cookie)
 
-try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    print("Połączono z OpenAI API")
-except Exception as e:
-    print(f"Błąd połączenia z OpenAI API: {e}")
-    client = None
+    return app
 
-# Rejestracja kontrolerów
-app.register_blueprint(create_web_blueprint(client))
-app.register_blueprint(create_api_blueprint(client), url_prefix="/api")
 
 if __name__ == "__main__":
-    print("\n" + "=" * 50)
-    print("Uruchamianie aplikacji SmartDiet")
-    print("=" * 50)
+    # Serwer deweloperski - w produkcji: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_app(DevelopmentConfig)
+    logger.info("Uruchamianie aplikacji SmartDiet (serwer deweloperski)")
 
-    if client:
-        print("   Status OpenAI API: POŁĄCZONO")
+    if app.extensions["openai_client"]:
+        logger.info("Status OpenAI API: SKONFIGUROWANO, tryb analiz: %s",
+                    "asynchroniczny" if app.extensions["openai_async_client"] else "synchroniczny")
     else:
-        print("   Status OpenAI API: BRAK POŁĄCZENIA")
-        print("   Sprawdź plik .env i klucz OPENAI_API_KEY")
+        logger.warning("Status OpenAI API: BRAK KLUCZA - sprawdź plik .env i klucz OPENAI_API_KEY")
 
-    print("\n   Dostępne endpointy:")
-    print("   - Interfejs WWW: http://127.0.0.1:5000/")
-    print("   - API (Postman): http://127.0.0.1:5000/api/analyze")
-    print("=" * 50 + "\n")
+    logger.info("Interfejs WWW: http://127.0.0.1:5000/, API: /api/analyze, /api/analyze/batch, "
+                "/api/analyze/stream, metryki: /metrics, gotowość: /health/ready")
 
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, debug=app.config["DEBUG"], threaded=True)
@@ -0,0 +1,90 @@
+"""
+Narzut serwisu analiz na jedno zapytanie (atrapa OpenAI bez opóźnień).
+
+Dla analyze_dish (pełna odpowiedź) i analyze_dish_stream (streaming)
+mierzy czas analizy różnych potraw (bez trafień w cache) przy coraz
+większym udziale błędnych odpowiedzi modelu. Błędna treść uruchamia
+ponowienie w pętli prób, więc widać koszt walidacji i backoffu:
+liczbę zapytań do atrapy na analizę, odsetek udanych analiz i czasy.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_analyze --analyses 200 --malformed 0,0.2,0.5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import start_fake_server
+from benchmarks.load_analyze import _percentile
+from services import resilience
+from services.logging_config import configure_logging
+from services.openai_service import analyze_dish, analyze_dish_stream
+
+
+def _analyze_stream(client, dish, amount):
+    for event, payload in analyze_dish_stream(client, dish, amount):
+        if event == "done":
+            return payload["micronutrients"]
+    return None
+
+
+def run_case(path, client, server, analyses, malformed):
+    """
+    Wykonuje analizy jedną ścieżką przy zadanym udziale błędnych odpowiedzi.
+
+    Returns:
+        Słownik z czasami, liczbą zapytań na analizę i odsetkiem sukcesów
+    """
+    analyze = analyze_dish if path == "analyze_dish" else lambda c, d, a: _analyze_stream(c, d, a)
+    server.rate_malformed = malformed
+    requests_before = server.request_count
+
+    latencies, successes = [], 0
+    for i in range(analyses):
+        start = time.perf_counter()
+        result = analyze(client, f"potrawa-{path}-{malformed}-{i}-{time.time_ns()}", 250)
+        latencies.append(time.perf_counter() - start)
+        successes += result is not None
+
+    return {
+        "path": path,
+        "malformed_rate": malformed,
+        "analyses": analyses,
+        "success_rate": round(successes / analyses, 3),
+        "upstream_per_analysis": round((server.request_count - requests_before) / analyses, 2),
+        "mean_ms": round(sum(latencies) / analyses * 1000, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Narzut serwisu analiz")
+    parser.add_argument("--analyses", type=int, default=200)
+    parser.add_argument("--malformed", default="0,0.2", help="Udziały błędnych odpowiedzi, oddzielone przecinkami")
+    parser.add_argument("--backoff", type=float, default=0.0,
+                        help="OPENAI_BACKOFF_BASE na czas pomiaru (0 - ponowienia bez czekania)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    resilience.OPENAI_BACKOFF_BASE = args.backoff
+    # Cache trafia do katalogu tymczasowego
+    os.chdir(tempfile.mkdtemp(prefix="smartdiet-analyze-"))
+
+    server, base_url = start_fake_server(0.0, seed=args.seed)
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+
+    for malformed in (float(value) for value in args.malformed.split(",")):
+        for path in ("analyze_dish", "analyze_dish_stream"):
+            print(json.dumps(run_case(path, client, server, args.analyses, malformed)))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
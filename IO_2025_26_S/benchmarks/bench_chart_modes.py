@@ -0,0 +1,95 @@
+"""
+Porównanie trybów wykresu: PNG (matplotlib na serwerze) vs client (SVG w przeglądarce).
+
+Dla każdego trybu mierzy na jedno żądanie:
+- czas CPU serwera (przygotowanie wykresu + render result.html),
+- liczbę bajtów wysłanych do przeglądarki (HTML + ewentualnie PNG),
+oraz jednorazowy koszt importu matplotlib.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_chart_modes --renders 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from flask import Flask, render_template
+
+from controllers.web_controller import create_web_blueprint
+from services.chart_service import _render_chart, create_chart_payload
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NUTRIENTS = ["Magnez", "Żelazo", "Witamina D", "Wapń", "Cynk", "Potas"]
+
+
+def _sample(i):
+    return {name: round(10 + (i * 7 + j * 13) % 250, 1) for j, name in enumerate(NUTRIENTS)}
+
+
+def _render_page(app, **chart_kwargs):
+    with app.test_request_context("/"):
+        return render_template(
+            "result.html",
+            dish="jajecznica",
+            amount=250,
+            date="2025-11-10",
+            data=_sample(0),
+            error_msg=None,
+            chart_error=False,
+            submitted=True,
+            **chart_kwargs
+        )
+
+
+def _matplotlib_import_seconds():
+    code = "import time; t = time.perf_counter(); from matplotlib.figure import Figure; print(time.perf_counter() - t)"
+    return float(subprocess.check_output([sys.executable, "-c", code]).decode().strip())
+
+
+def run(renders):
+    app = Flask("app", root_path=APP_DIR)
+    app.register_blueprint(create_web_blueprint(None))
+    workdir = tempfile.mkdtemp(prefix="smartdiet-charts-")
+
+    # Rozgrzewka: import matplotlib i kompilacja szablonu nie wchodzą do pomiaru
+    _render_chart(os.path.join(workdir, "warmup.png"), "rozgrzewka", _sample(0), 100)
+    _render_page(app, chart_path=None, chart_payload=None)
+
+    png_cpu, png_bytes = 0.0, 0
+    for i in range(renders):
+        path = os.path.join(workdir, f"chart-{i}.png")
+        start = time.process_time()
+        _render_chart(path, "jajecznica", _sample(i), 250)
+        html = _render_page(app, chart_path=f"/static/charts/chart-{i}.png", chart_payload=None)
+        png_cpu += time.process_time() - start
+        png_bytes += len(html.encode("utf-8")) + os.path.getsize(path)
+
+    client_cpu, client_bytes = 0.0, 0
+    for i in range(renders):
+        start = time.process_time()
+        payload = create_chart_payload("jajecznica", _sample(i), 250)
+        html = _render_page(app, chart_path=None, chart_payload=payload)
+        client_cpu += time.process_time() - start
+        client_bytes += len(html.encode("utf-8"))
+
+    return [
+        {"mode": "png", "cpu_ms_per_request": round(png_cpu / renders * 1000, 2),
+         "bytes_per_request": png_bytes // renders,
+         "matplotlib_import_s": round(_matplotlib_import_seconds(), 3)},
+        {"mode": "client", "cpu_ms_per_request": round(client_cpu / renders * 1000, 2),
+         "bytes_per_request": client_bytes // renders,
+         "matplotlib_import_s": 0.0}
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Porównanie trybów wykresu")
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+
+    for result in run(args.renders):
+        print(json.dumps(result))
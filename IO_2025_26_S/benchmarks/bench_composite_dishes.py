@@ -0,0 +1,58 @@
+"""
+Czas liczenia wartości potraw złożonych ze składu.
+
+Porównuje (w mikrosekundach na potrawę) liczenie potraw pojedynczo
+(compose_dish, jak w analyze_dish) z jednym iloczynem macierzy dla całej
+paczki (compose_dishes, jak w analyze_dishes) dla paczek różnej wielkości.
+Wszystkie wartości są lokalne - benchmark nie wysyła zapytań do API.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_composite_dishes --repeat 200
+"""
+import argparse
+import json
+import time
+
+from services.composite_dishes import compose_dish, compose_dishes, load_recipes
+from services.logging_config import configure_logging
+from services.reference_foods import load_reference_foods
+
+DISHES = [
+    "makaron carbonara", "spaghetti bolognese", "jajecznica z szynką", "kanapka z serem",
+    "owsianka z bananem", "ryż z kurczakiem", "łosoś z ryżem", "sałatka grecka",
+    "naleśniki z serem", "ziemniaki ze śmietaną"
+]
+
+
+def _per_dish_us(func, names, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(names)
+    return (time.perf_counter() - start) / (repeat * len(names)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark potraw złożonych")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--sizes", default="1,5,10", help="Wielkości paczek (do 10 różnych potraw), oddzielone przecinkami")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    load_reference_foods()
+    book = load_recipes()
+
+    for size in (int(value) for value in args.sizes.split(",")):
+        names = DISHES[:size]
+        single = _per_dish_us(lambda batch: [compose_dish(name) for name in batch], names, args.repeat)
+        batched = _per_dish_us(compose_dishes, names, args.repeat)
+        print(json.dumps({
+            "recipes": len(book),
+            "batch": size,
+            "single_us_per_dish": round(single, 2),
+            "batched_us_per_dish": round(batched, 2),
+            "speedup": round(single / batched, 2)
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Czas powtórnego wyświetlenia niezmienionego dziennika.
+
+Porównuje pełną odpowiedź (odczyt magazynu + renderowanie szablonu)
+z odpowiedzią 304 na zapytanie z If-None-Match dla /diary, /diary/<data>
+i /api/meals. Dziennik jest wypełniany posiłkami w katalogu tymczasowym.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_conditional_get --meals 2000 --repeat 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from services.logging_config import configure_logging
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _mean_ms(client, url, repeat, headers=None):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers or {})
+        response.close()
+    return (time.perf_counter() - start) / repeat * 1000, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zapytań warunkowych dziennika")
+    parser.add_argument("--meals", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    # Dane (dziennik, wersja) trafiają do katalogu tymczasowego
+    os.chdir(tempfile.mkdtemp(prefix="smartdiet-conditional-"))
+    sys.path.insert(0, APP_DIR)
+    os.environ.setdefault("LOG_LEVEL", "OFF")
+
+    from app import create_app
+    from config import TestingConfig
+    from controllers.identity import USER_ID_COOKIE, sign_user_id
+    from services.meal_service import add_meal
+    from services.user_partition import DEFAULT_USER
+
+    app = create_app(TestingConfig)
+    for i in range(args.meals):
+        add_meal(f"potrawa {i % 50}", 100 + i % 200, f"2026-01-{1 + i % 28:02d}", {"Magnez": 20.0, "Cynk": 1.5})
+    client = app.test_client()
+    # Dziennik wypełniony powyżej należy do DEFAULT_USER
+    with app.app_context():
+        client.set_cookie(USER_ID_COOKIE, sign_user_id(DEFAULT_USER))
+
+    for url in ("/diary", "/diary/2026-01-15", "/api/meals?limit=50"):
+        etag = client.get(url).headers["ETag"]
+        full_ms, full_status = _mean_ms(client, url, args.repeat)
+        cached_ms, cached_status = _mean_ms(client, url, args.repeat, {"If-None-Match": etag})
+        print(json.dumps({
+            "url": url,
+            "meals": args.meals,
+            "full_ms": round(full_ms, 3),
+            "full_status": full_status,
+            "not_modified_ms": round(cached_ms, 3),
+            "not_modified_status": cached_status,
+            "speedup": round(full_ms / cached_ms, 1)
+        }))
+
+
+if __name__ == "__main__":
+    main()
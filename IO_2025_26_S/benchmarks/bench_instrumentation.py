@@ -0,0 +1,70 @@
+"""
+Koszt instrumentacji na ścieżce zapytania.
+
+Mierzy średni czas (w mikrosekundach) pojedynczego pomiaru histogramu,
+inkrementacji licznika, wpisu logu (pominiętego przez poziom, zapisanego
+do /dev/null jako tekst i jako JSON) oraz analizy potrawy z tabeli
+referencyjnej (bez sieci) przy LOG_LEVEL=DEBUG, INFO i OFF.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_instrumentation --repeat 50000
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+from services.logging_config import configure_logging
+from services.metrics import counter, histogram
+from services.openai_service import analyze_dish
+
+logger = logging.getLogger("benchmarks.instrumentation")
+
+
+def _per_call_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _log_to_devnull(level, fmt):
+    """Konfiguruje logowanie z zapisem do /dev/null zamiast na stderr."""
+    configure_logging(level, fmt)
+    devnull = open(os.devnull, "w")
+    for handler in logging.getLogger().handlers:
+        handler.setStream(devnull)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kosztu metryk i logowania")
+    parser.add_argument("--repeat", type=int, default=50000)
+    args = parser.parse_args()
+
+    bench_histogram = histogram("bench_seconds", "Histogram benchmarku", ("stage",))
+    bench_counter = counter("bench_total", "Licznik benchmarku", ("reason",))
+    result = {
+        "histogram_observe_us": _per_call_us(lambda: bench_histogram.observe(0.003, stage="parse"), args.repeat),
+        "counter_inc_us": _per_call_us(lambda: bench_counter.inc(reason="json"), args.repeat)
+    }
+
+    _log_to_devnull("INFO", "text")
+    result["log_skipped_us"] = _per_call_us(lambda: logger.debug("[BENCH] %s %d", "ryż", 100), args.repeat)
+    result["log_text_us"] = _per_call_us(lambda: logger.info("[BENCH] %s %d", "ryż", 100), args.repeat)
+    _log_to_devnull("INFO", "json")
+    result["log_json_us"] = _per_call_us(
+        lambda: logger.info("[BENCH] %s %d", "ryż", 100, extra={"dish": "ryż"}), args.repeat
+    )
+
+    for level in ("DEBUG", "INFO", "OFF"):
+        _log_to_devnull(level, "text")
+        result[f"analyze_reference_{level.lower()}_us"] = _per_call_us(
+            lambda: analyze_dish(None, "ryż", 150), args.repeat
+        )
+
+    print(json.dumps({key: round(value, 2) for key, value in result.items()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Pamięć zajmowana przez posiłki trzymane w procesie.
+
+Dla każdego rozmiaru:
+- dict - posiłki jako słowniki z json.loads (jak wcześniej w magazynie
+  dziennika zdarzeń i w get_all_meals): każdy ma własny słownik
+  nutrition_data z własnymi kopiami nazw mikroskładników,
+- record - te same posiłki jako MealRecord (__slots__, wspólne nazwy
+  mikroskładników, wartości float64 w jednym obiekcie bytes),
+- journal - cały magazyn dziennika zdarzeń wczytany z migawki (rekordy
+  razem z indeksami i sumami dziennymi), czyli pamięć jednego workera.
+
+Mierzone: bajty na posiłek (tracemalloc, po zbudowaniu), czas budowania
+i czas zamiany na JSON (json.dumps słownika / MealRecord.to_dict).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_meal_memory --meals 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_storage import _synthetic_meals
+from services.logging_config import configure_logging
+from services.meal_record import MealRecord
+from services.meal_storage import JournalMealStorage
+
+
+def _build_dicts(lines):
+    return [json.loads(line) for line in lines]
+
+
+def _build_records(lines):
+    return [MealRecord.from_dict(json.loads(line)) for line in lines]
+
+
+def _measure(build, lines):
+    """Zwraca (bajty zajęte przez wynik build, czas budowania w s, wynik)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        built = build(lines)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del built
+
+    # Czas osobno - śledzenie alokacji spowalnia budowanie
+    gc.collect()
+    start = time.perf_counter()
+    built = build(lines)
+    return size, time.perf_counter() - start, built
+
+
+def _json_seconds(meals, to_json, sample):
+    start = time.perf_counter()
+    for meal in meals[:sample]:
+        json.dumps(to_json(meal), ensure_ascii=False)
+    return time.perf_counter() - start
+
+
+def run(count, sample, workdir):
+    lines = [json.dumps(meal, ensure_ascii=False) for meal in _synthetic_meals(count)]
+    sample = min(sample, count)
+    rows = []
+
+    dict_size, dict_s, meals = _measure(_build_dicts, lines)
+    rows.append({
+        "representation": "dict",
+        "meals": count,
+        "bytes_per_meal": round(dict_size / count, 1),
+        "total_mb": round(dict_size / 2 ** 20, 1),
+        "build_us_per_meal": round(dict_s / count * 1e6, 2),
+        "json_us_per_meal": round(_json_seconds(meals, lambda meal: meal, sample) / sample * 1e6, 2)
+    })
+    del meals
+
+    record_size, record_s, meals = _measure(_build_records, lines)
+    rows.append({
+        "representation": "record",
+        "meals": count,
+        "bytes_per_meal": round(record_size / count, 1),
+        "total_mb": round(record_size / 2 ** 20, 1),
+        "build_us_per_meal": round(record_s / count * 1e6, 2),
+        "json_us_per_meal": round(_json_seconds(meals, MealRecord.to_dict, sample) / sample * 1e6, 2),
+        "reduction_vs_dict": round(dict_size / record_size, 2)
+    })
+    del meals
+
+    # Migawka w formacie kompakcji (jeden posiłek w linii)
+    path = os.path.join(workdir, f"meals-{count}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n" + ",\n".join(lines) + "\n]\n")
+    del lines
+
+    storage_size, storage_s, storage = _measure(lambda p: JournalMealStorage(p, p + "l"), path)
+    storage.close()
+    rows.append({
+        "representation": "journal",
+        "meals": count,
+        "bytes_per_meal": round(storage_size / count, 1),
+        "total_mb": round(storage_size / 2 ** 20, 1),
+        "load_s": round(storage_s, 2)
+    })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pamięci posiłków (słowniki a MealRecord)")
+    parser.add_argument("--meals", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--json-sample", type=int, default=100000,
+                        help="Na ilu posiłkach mierzyć czas zamiany na JSON")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    workdir = tempfile.mkdtemp(prefix="smartdiet-memory-")
+    for count in args.meals:
+        for row in run(count, args.json_sample, workdir):
+            print(json.dumps(row), flush=True)
+
+
+if __name__ == "__main__":
+    main()
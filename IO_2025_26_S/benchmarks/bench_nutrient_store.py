@@ -0,0 +1,112 @@
+"""
+Czas zapytań analitycznych kolumnowego magazynu mikroskładników (NumPy).
+
+Ładuje syntetyczną historię posiłków (domyślnie milion posiłków z 10 lat)
+do NutrientColumnStore i mierzy średni czas:
+- statystyk zakresu (sumy, średnie, percentyle) dla 30 dni, roku i całej historii,
+- kroczących średnich 7- i 30-dniowych dla roku,
+- dni poniżej normy dla całej historii,
+oraz, dla porównania, tych samych statystyk liczonych w czystym Pythonie
+po słownikach posiłków (python_range_*).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_nutrient_store --meals 1000000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks.bench_storage import DAYS, _synthetic_meals
+from services.nutrient_store import NutrientColumnStore
+
+START = date(2016, 1, 1)
+
+
+def _timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _python_range_statistics(meals, start_date, end_date):
+    """Ta sama statystyka co range_statistics, liczona po słownikach posiłków."""
+    days = {}
+    for meal in meals:
+        if start_date <= meal["date"] <= end_date:
+            day = days.setdefault(meal["date"], {})
+            for name, value in meal["nutrition_data"].items():
+                day[name] = day.get(name, 0.0) + value
+
+    names = {name for day in days.values() for name in day}
+    result = {}
+    for name in names:
+        values = [day.get(name, 0.0) for day in days.values()]
+        result[name] = {
+            "sum": sum(values),
+            "mean": statistics.fmean(values),
+            "p50": statistics.median(values),
+            "p90": statistics.quantiles(values, n=10)[-1] if len(values) > 1 else values[0]
+        }
+    return result
+
+
+def run(count, repeat, python_baseline):
+    meals = list(_synthetic_meals(count))
+    store = NutrientColumnStore()
+
+    ingest_start = time.perf_counter()
+    for meal in meals:
+        store.record_meal(meal)
+    ingest_s = time.perf_counter() - ingest_start
+
+    end = START + timedelta(days=DAYS - 1)
+    year_start = end - timedelta(days=364)
+    month_start = end - timedelta(days=29)
+    ranges = {
+        "30d": (month_start.isoformat(), end.isoformat()),
+        "1y": (year_start.isoformat(), end.isoformat()),
+        "all": (START.isoformat(), end.isoformat())
+    }
+
+    result = {
+        "meals": count,
+        "days": DAYS,
+        "ingest_s": round(ingest_s, 2),
+        "ingest_us_per_meal": round(ingest_s / count * 1e6, 2)
+    }
+    for label, (first, last) in ranges.items():
+        result[f"range_{label}_ms"] = round(_timed(lambda: store.range_statistics(first, last), repeat), 3)
+
+    first, last = ranges["1y"]
+    result["rolling_7_1y_ms"] = round(_timed(lambda: store.rolling_averages(first, last, 7), repeat), 3)
+    result["rolling_30_1y_ms"] = round(_timed(lambda: store.rolling_averages(first, last, 30), repeat), 3)
+
+    first, last = ranges["all"]
+    result["below_target_all_ms"] = round(_timed(lambda: store.days_below_target(first, last), repeat), 3)
+
+    if python_baseline:
+        for label, (first, last) in ranges.items():
+            result[f"python_range_{label}_ms"] = round(
+                _timed(lambda: _python_range_statistics(meals, first, last), 1), 1
+            )
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kolumnowego magazynu mikroskładników")
+    parser.add_argument("--meals", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-python-baseline", action="store_true",
+                        help="pomija porównanie z obliczeniami w czystym Pythonie")
+    args = parser.parse_args()
+
+    for count in args.meals:
+        print(json.dumps(run(count, args.repeat, not args.no_python_baseline)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Czas parsowania i walidacji odpowiedzi modelu (bez sieci).
+
+Mierzy w mikrosekundach na wywołanie:
+- _clean_json_response + _validate_and_parse_json dla odpowiedzi dawnego
+  szablonu (JSON w bloku markdown),
+- _parse_completion dla odpowiedzi ze schematem (czysty JSON),
+- te same ścieżki dla błędnych treści (ucięty JSON, tekst, złe typy),
+- _parse_batch_completion dla paczki potraw,
+- _parse_partial_nutrients dla odpowiedzi przychodzącej fragmentami
+  (cały strumień jednej potrawy).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_parsing --repeat 20000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fake_openai import MALFORMED_CONTENTS, NUTRIENTS, STREAM_CHUNK_CHARS
+from services.logging_config import configure_logging
+from services.openai_service import (
+    _clean_json_response, _parse_batch_completion, _parse_completion,
+    _parse_partial_nutrients, _validate_and_parse_json
+)
+from services.prompts import get_prompt_template
+
+
+def _per_call_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def _stream_parse(content):
+    """Parsowanie przyrostowe jak w analyze_dish_stream."""
+    emitted = {}
+    received = ""
+    for start in range(0, len(content), STREAM_CHUNK_CHARS):
+        received += content[start:start + STREAM_CHUNK_CHARS]
+        for nutrient, value in _parse_partial_nutrients(received, emitted):
+            emitted[nutrient] = value
+    return emitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsowania odpowiedzi modelu")
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=10, help="Liczba potraw w odpowiedzi paczki")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    plain = json.dumps(NUTRIENTS, ensure_ascii=False)
+    fenced = "```json\n" + json.dumps(NUTRIENTS, ensure_ascii=False, indent=4) + "\n```"
+    legacy, structured = get_prompt_template("v1"), get_prompt_template("v2")
+    names = [f"potrawa {i}" for i in range(args.batch)]
+    batch = json.dumps({"results": [NUTRIENTS] * args.batch}, ensure_ascii=False)
+
+    cases = [
+        ("clean_and_validate_fenced", lambda: _validate_and_parse_json(_clean_json_response(fenced), "zupa", 100)),
+        ("parse_completion_legacy", lambda: _parse_completion(fenced, "zupa", 100, legacy)),
+        ("parse_completion_schema", lambda: _parse_completion(plain, "zupa", 100, structured)),
+        ("parse_batch_schema", lambda: _parse_batch_completion(batch, names, structured)),
+        ("stream_partial_parse", lambda: _stream_parse(fenced)),
+    ]
+    cases += [
+        (f"parse_completion_malformed_{kind}", lambda content=malform(plain): _parse_completion(content, "zupa", 100, structured))
+        for kind, malform in MALFORMED_CONTENTS
+    ]
+
+    for name, func in cases:
+        print(json.dumps({
+            "case": name,
+            "repeat": args.repeat,
+            "us_per_call": round(_per_call_us(func, args.repeat), 3),
+            "valid": bool(func())
+        }))
+
+
+if __name__ == "__main__":
+    main()
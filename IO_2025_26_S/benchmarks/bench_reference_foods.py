@@ -0,0 +1,57 @@
+"""
+Czas wyszukiwania w tabeli potraw referencyjnych.
+
+Mierzy średni czas (w mikrosekundach) dopasowania nazwy:
+- dokładnego ("ryż"), po odmianie i bez polskich znaków ("ryzu", "Jajka"),
+- przybliżonego (literówka, "jajecznika"),
+- nazwy spoza tabeli (pełny przegląd kluczy przed zapytaniem do API),
+oraz trafienie z wyczyszczonym cache kluczy (pierwsze wystąpienie nazwy).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_reference_foods --repeat 20000
+"""
+import argparse
+import json
+import time
+
+from services.logging_config import configure_logging
+from services.reference_foods import load_reference_foods, match_key
+
+CASES = {
+    "exact": "ryż",
+    "inflected": "Jajka",
+    "folded": "ryzu bialego",
+    "fuzzy": "jajecznika",
+    "miss": "spaghetti bolognese"
+}
+
+
+def _per_call_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tabeli potraw referencyjnych")
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    table = load_reference_foods()
+
+    result = {"foods": len(table)}
+    for label, name in CASES.items():
+        result[f"{label}_us"] = round(_per_call_us(lambda: table.lookup(name), args.repeat), 2)
+
+    def cold_lookup():
+        match_key.cache_clear()
+        table.lookup(CASES["inflected"])
+
+    result["inflected_cold_us"] = round(_per_call_us(cold_lookup, args.repeat), 2)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
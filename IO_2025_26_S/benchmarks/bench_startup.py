@@ -0,0 +1,122 @@
+"""
+Czas zimnego startu workera.
+
+Każdy pomiar to nowy proces Pythona, który importuje aplikację, wywołuje
+create_app(), a potem obsługuje pierwsze zapytanie do dziennika i pierwszą
+analizę (na lokalnej atrapie OpenAI). Dla każdego etapu zapisujemy czas
+i to, czy SDK openai i matplotlib są już załadowane.
+
+Tryby:
+    lazy    - domyślny: SDK openai ładuje się przy pierwszej analizie
+    preload - OPENAI_PRELOAD=1: SDK ładuje się w create_app (jak przy
+              gunicorn --preload, gdzie ten koszt ponosi raz proces główny)
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_openai import start_fake_server
+from services.logging_config import configure_logging
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Kod procesu potomnego - wypisuje jedną linię JSON z pomiarami
+_CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+
+def loaded():
+    return {{"openai": "openai" in sys.modules, "matplotlib": "matplotlib" in sys.modules}}
+
+from app import create_app
+from config import TestingConfig
+imported = time.perf_counter()
+app = create_app(TestingConfig)
+created = time.perf_counter()
+result = {{"import_ms": (imported - start) * 1000, "create_app_ms": (created - imported) * 1000,
+           "after_start": loaded()}}
+
+client = app.test_client()
+t = time.perf_counter()
+status = client.get("/diary").status_code
+result["first_diary_ms"] = (time.perf_counter() - t) * 1000
+result["diary_status"] = status
+result["after_diary"] = loaded()
+
+t = time.perf_counter()
+status = client.post("/api/analyze", json={{"dish": f"potrawa startu {{time.time_ns()}}", "amount": 100}}).status_code
+result["first_analyze_ms"] = (time.perf_counter() - t) * 1000
+result["analyze_status"] = status
+result["after_analyze"] = loaded()
+print(json.dumps(result))
+"""
+
+
+def _run_child(mode, base_url, workdir):
+    env = dict(os.environ,
+               OPENAI_API_KEY="fake", OPENAI_BASE_URL=base_url, LOG_LEVEL="OFF",
+               OPENAI_PRELOAD="1" if mode == "preload" else "0")
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(app_dir=APP_DIR)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def run_mode(mode, runs, base_url):
+    """
+    Mierzy start aplikacji w danym trybie (mediana z kilku procesów).
+
+    Returns:
+        Słownik z medianami czasów i załadowanymi modułami po każdym etapie
+    """
+    # Każdy proces dostaje pusty katalog danych (dziennik, cache) - jak świeży worker
+    results = [_run_child(mode, base_url, tempfile.mkdtemp(prefix="smartdiet-startup-")) for _ in range(runs)]
+
+    def median_ms(key):
+        return round(statistics.median(result[key] for result in results), 1)
+
+    last = results[-1]
+    return {
+        "mode": mode,
+        "runs": runs,
+        "import_ms": median_ms("import_ms"),
+        "create_app_ms": median_ms("create_app_ms"),
+        "first_diary_ms": median_ms("first_diary_ms"),
+        "first_analyze_ms": median_ms("first_analyze_ms"),
+        "process_ms": median_ms("process_ms"),
+        "statuses": {"diary": last["diary_status"], "analyze": last["analyze_status"]},
+        "loaded_after_start": last["after_start"],
+        "loaded_after_diary": last["after_diary"],
+        "loaded_after_analyze": last["after_analyze"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zimnego startu aplikacji")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", choices=["lazy", "preload", "both"], default="both")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    fake_server, base_url = start_fake_server(0.0)
+    modes = ["lazy", "preload"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        print(json.dumps(run_mode(mode, args.runs, base_url)))
+    fake_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Porównanie magazynów posiłków (JSON, dziennik JSONL, SQLite) przy rosnącej historii.
+
+Dla każdego rozmiaru dziennika mierzy średni czas:
+- zapisu jednego posiłku (add_meal),
+- odczytu jednego dnia (get_meals_by_date),
+- odczytu całej historii (get_all_meals),
+oraz czas startu magazynu na istniejących danych (load_s).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_storage --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from services.meal_storage import JsonMealStorage, JournalMealStorage, SqliteMealStorage
+
+NUTRIENTS = ["Magnez", "Żelazo", "Witamina D", "Wapń", "Cynk", "Potas"]
+DAYS = 3650
+
+
+def _synthetic_meals(count, seed=42):
+    """Generuje posiłki rozłożone na DAYS dni."""
+    rng = random.Random(seed)
+    start = date(2016, 1, 1)
+    for meal_id in range(1, count + 1):
+        day = start + timedelta(days=meal_id * DAYS // count)
+        yield {
+            "id": meal_id,
+            "dish_name": f"potrawa {rng.randint(1, 500)}",
+            "amount": rng.randint(50, 600),
+            "date": day.isoformat(),
+            "nutrition_data": {name: round(rng.uniform(0, 300), 1) for name in NUTRIENTS},
+            "created_at": f"{day.isoformat()} 12:{meal_id % 60:02d}:00"
+        }
+
+
+def _seed_json(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(list(_synthetic_meals(count)), f, ensure_ascii=False, indent=4)
+    return JsonMealStorage(path)
+
+
+def _seed_journal(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for meal in _synthetic_meals(count):
+            f.write(json.dumps(meal, ensure_ascii=False) + (",\n" if meal["id"] < count else "\n"))
+        f.write("]\n")
+    return JournalMealStorage(path, path + "l")
+
+
+def _seed_sqlite(path, count):
+    storage = SqliteMealStorage(path)
+    with storage._connection() as conn, conn:
+        conn.executemany(
+            "INSERT INTO meals (id, dish_name, amount, date, nutrition_data, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (m["id"], m["dish_name"], m["amount"], m["date"],
+                 json.dumps(m["nutrition_data"], ensure_ascii=False), m["created_at"])
+                for m in _synthetic_meals(count)
+            )
+        )
+    return storage
+
+
+def _timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(backend, size, workdir):
+    seed = {"json": _seed_json, "journal": _seed_journal, "sqlite": _seed_sqlite}[backend]
+    path = os.path.join(workdir, f"meals-{size}.{'db' if backend == 'sqlite' else 'json'}")
+
+    seed_start = time.perf_counter()
+    storage = seed(path, size)
+    seed_s = time.perf_counter() - seed_start
+
+    load_start = time.perf_counter()
+    storage = type(storage)(*([path, path + "l"] if backend == "journal" else [path]))
+    load_s = time.perf_counter() - load_start
+
+    # Przy pełnym przepisywaniu pliku ograniczamy liczbę powtórzeń
+    repeat = 3 if backend == "json" and size > 10000 else 20
+    query_day = (date(2016, 1, 1) + timedelta(days=DAYS // 2)).isoformat()
+    new_meal = {
+        "dish_name": "jajecznica",
+        "amount": 250,
+        "date": query_day,
+        "nutrition_data": {"Magnez": 10.0, "Żelazo": 1.2},
+        "created_at": "2030-01-01 08:00:00"
+    }
+
+    result = {
+        "backend": backend,
+        "meals": size,
+        "seed_s": round(seed_s, 2),
+        "load_s": round(load_s, 3),
+        "insert_ms": round(_timed(lambda: storage.add_meal(dict(new_meal)), repeat), 3),
+        "query_day_ms": round(_timed(lambda: storage.get_meals_by_date(query_day), repeat), 3),
+        "query_all_ms": round(_timed(storage.get_all_meals, min(repeat, 3)), 1)
+    }
+    for leftover in (path, path + "l", path + "l.lock"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark magazynów posiłków")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--backends", nargs="+", choices=["json", "journal", "sqlite"],
+                        default=["json", "journal", "sqlite"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smartdiet-storage-")
+    for size in args.sizes:
+        for backend in args.backends:
+            print(json.dumps(run(backend, size, workdir)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
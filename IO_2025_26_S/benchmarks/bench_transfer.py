@@ -0,0 +1,139 @@
+"""
+Eksport i import dziennika przy rosnącej liczbie posiłków.
+
+Dla każdego rozmiaru:
+- import - plik NDJSON z posiłkami wczytywany przez import_meals
+  (paczki w jednej transakcji), czas na posiłek i szczytowa pamięć,
+- import_one_by_one_us - dla porównania: add_meal wywoływany osobno dla
+  każdego posiłku (na próbce --single-sample posiłków),
+- eksport NDJSON i CSV całego dziennika (iter_meals + export_chunks),
+  przepustowość i szczytowa pamięć.
+
+Pamięć (tracemalloc) jest mierzona osobnym przebiegiem, bo śledzenie
+alokacji spowalnia pomiar czasu. Przy magazynie SQLite i dzienniku
+zdarzeń szczytowa pamięć eksportu nie powinna rosnąć z rozmiarem.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_transfer --sizes 10000 100000 1000000
+    MEAL_STORAGE=journal python -m benchmarks.bench_transfer --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from services.logging_config import configure_logging
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NUTRIENTS = ["Magnez", "Żelazo", "Witamina D", "Wapń", "Cynk", "Potas"]
+DAYS = 3650
+
+
+def _write_import_file(path, count, seed=42):
+    """Plik NDJSON z posiłkami rozłożonymi na DAYS dni."""
+    rng = random.Random(seed)
+    start = date(2016, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(count):
+            day = (start + timedelta(days=index * DAYS // count)).isoformat()
+            f.write(json.dumps({
+                "dish_name": f"potrawa {rng.randint(1, 500)}",
+                "amount": rng.randint(50, 600),
+                "date": day,
+                "nutrition_data": {name: round(rng.uniform(0, 300), 1) for name in NUTRIENTS},
+                "created_at": f"{day} 12:{index % 60:02d}:00"
+            }, ensure_ascii=False) + "\n")
+
+
+def _traced_peak(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark eksportu i importu dziennika")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--single-sample", type=int, default=500,
+                        help="Liczba posiłków zapisywanych pojedynczo (add_meal) dla porównania")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    # Dziennik i pliki importu trafiają do katalogu tymczasowego
+    workdir = tempfile.mkdtemp(prefix="smartdiet-transfer-")
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+
+    from services import meal_service
+    from services.meal_storage import STORAGE_BACKEND, use_storage
+    from services.meal_transfer import export_chunks, read_records
+
+    def import_file(path, user_id):
+        with open(path, "r", encoding="utf-8") as f:
+            return meal_service.import_meals(read_records(f, "ndjson"), user_id)
+
+    def export_all(user_id, fmt):
+        size = 0
+        for chunk in export_chunks(meal_service.iter_meals(user_id=user_id), fmt):
+            size += len(chunk)
+        return size
+
+    for count in args.sizes:
+        path = os.path.join(workdir, f"import-{count}.ndjson")
+        _write_import_file(path, count)
+
+        start = time.perf_counter()
+        result = import_file(path, f"timed-{count}")
+        import_s = time.perf_counter() - start
+        import_peak = _traced_peak(lambda: import_file(path, f"traced-{count}"))
+
+        # Dziennik zdarzeń: kompakcja teraz, a nie w tle w trakcie pomiarów eksportu
+        for user_id in (f"timed-{count}", f"traced-{count}"):
+            with use_storage(user_id) as storage:
+                compact = getattr(storage, "compact", None)
+                if compact:
+                    compact()
+
+        # Pojedyncze add_meal - jak import przez formularz
+        sample = []
+        with open(path, "r", encoding="utf-8") as f:
+            for _, line in zip(range(args.single_sample), f):
+                sample.append(json.loads(line))
+        start = time.perf_counter()
+        for meal in sample:
+            meal_service.add_meal(meal["dish_name"], meal["amount"], meal["date"], meal["nutrition_data"],
+                                  user_id=f"single-{count}")
+        single_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        row = {
+            "backend": STORAGE_BACKEND,
+            "meals": count,
+            "imported": result["imported"],
+            "import_s": round(import_s, 2),
+            "import_us_per_meal": round(import_s / count * 1e6, 1),
+            "import_one_by_one_us": round(single_us, 1),
+            "import_peak_mb": round(import_peak / 2 ** 20, 2)
+        }
+        for fmt in ("ndjson", "csv"):
+            start = time.perf_counter()
+            size = export_all(f"timed-{count}", fmt)
+            elapsed = time.perf_counter() - start
+            row[f"export_{fmt}_s"] = round(elapsed, 2)
+            row[f"export_{fmt}_throughput_meals_per_s"] = round(count / elapsed)
+            row[f"export_{fmt}_mb"] = round(size / 2 ** 20, 1)
+            row[f"export_{fmt}_peak_mb"] = round(_traced_peak(lambda: export_all(f"timed-{count}", fmt)) / 2 ** 20, 2)
+
+        print(json.dumps(row), flush=True)
+
+
+if __name__ == "__main__":
+    main()
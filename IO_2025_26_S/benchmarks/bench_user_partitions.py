@@ -0,0 +1,98 @@
+"""
+Czas zapytań jednego użytkownika przy rosnącej liczbie użytkowników.
+
+Dziennik jest partycjonowany per użytkownik (services.user_partition),
+więc czas odczytu strony dziennika i sum dziennych jednego użytkownika
+nie powinien zależeć od tego, ilu użytkowników jest w systemie.
+
+Benchmark dokłada kolejnych użytkowników (każdy z kilkoma posiłkami)
+aż do kolejnych progów i na każdym progu mierzy zapytania losowych
+użytkowników:
+    cold - pierwsze zapytanie (z otwarciem partycji, gdy wypadła z cache)
+    warm - kolejne zapytanie tego samego użytkownika
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.bench_user_partitions --stages 10,100,1000,10000,100000
+    MEAL_STORAGE=json python -m benchmarks.bench_user_partitions --stages 10,1000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from services.logging_config import configure_logging
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _query(storage):
+    """Typowe zapytania widoku dziennika: pierwsza strona i sumy tygodnia."""
+    storage.get_meals_page(20)
+    storage.get_daily_totals("2026-01-01", "2026-01-07")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark partycji dzienników użytkowników")
+    parser.add_argument("--stages", default="10,100,1000,10000,100000", help="Progi liczby użytkowników")
+    parser.add_argument("--meals-per-user", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=200, help="Liczba mierzonych użytkowników na progu")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    # Partycje trafiają do katalogu tymczasowego
+    os.chdir(tempfile.mkdtemp(prefix="smartdiet-users-"))
+    sys.path.insert(0, APP_DIR)
+
+    from services.meal_storage import STORAGE_BACKEND, USER_STORAGE_CACHE, use_storage
+
+    users = 0
+    for stage in (int(value) for value in args.stages.split(",")):
+        start = time.perf_counter()
+        while users < stage:
+            with use_storage(f"user-{users}") as storage:
+                for i in range(args.meals_per_user):
+                    storage.add_meal({
+                        "dish_name": f"potrawa {i}",
+                        "amount": 100 + i,
+                        "date": f"2026-01-{1 + i % 7:02d}",
+                        "nutrition_data": {"Magnez": 20.0 + i, "Cynk": 1.5},
+                        "created_at": f"2026-01-{1 + i % 7:02d} 12:00:{i % 60:02d}"
+                    })
+            users += 1
+        populate_s = time.perf_counter() - start
+
+        cold, warm = [], []
+        for user in random.sample(range(users), min(args.samples, users)):
+            t = time.perf_counter()
+            with use_storage(f"user-{user}") as storage:
+                _query(storage)
+            cold.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            with use_storage(f"user-{user}") as storage:
+                _query(storage)
+            warm.append(time.perf_counter() - t)
+
+        print(json.dumps({
+            "backend": STORAGE_BACKEND,
+            "users": users,
+            "meals": users * args.meals_per_user,
+            "open_partitions_max": USER_STORAGE_CACHE,
+            "populate_s": round(populate_s, 2),
+            "cold_p50_us": round(_percentile(cold, 50) * 1e6, 1),
+            "cold_p95_us": round(_percentile(cold, 95) * 1e6, 1),
+            "warm_p50_us": round(_percentile(warm, 50) * 1e6, 1),
+            "warm_p95_us": round(_percentile(warm, 95) * 1e6, 1)
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
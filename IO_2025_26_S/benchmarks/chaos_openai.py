@@ -0,0 +1,103 @@
+"""
+Odporność analiz na awarie OpenAI API (atrapa z wstrzykiwanymi błędami).
+
+Dwie fazy na serwisie analiz (analyze_dish):
+- "flaky": analizy różnych potraw, gdy część zapytań kończy się 429, 500
+  albo zawieszeniem odpowiedzi (timeout),
+- "outage": API zwraca wyłącznie 500, a wpisy cache z fazy "flaky" są
+  przeterminowane - analizy powinny dostać dane zastępcze z cache,
+  a bezpiecznik po kilku błędach przestaje wysyłać zapytania.
+
+Dla każdej fazy wypisuje linię JSON z odsetkiem udanych analiz, liczbą
+zapytań do atrapy, opóźnieniami p50/p95 i stanem bezpiecznika.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.chaos_openai --dishes 40 --rate-429 0.2 --rate-500 0.1 --rate-timeout 0.05
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import start_fake_server
+from benchmarks.load_analyze import _percentile
+from services import nutrient_cache, resilience
+from services.logging_config import configure_logging
+from services.openai_service import analyze_dish
+
+
+def _run_phase(name, client, server, dishes, concurrency):
+    requests_before = server.request_count
+    faults_before = dict(server.faults)
+    stale_before = nutrient_cache.get_cache_stats()["stale_served"]
+    breaker_before = resilience.breaker.get_stats()
+
+    def analyze(dish):
+        start = time.perf_counter()
+        result = analyze_dish(client, dish, 250)
+        return result is not None, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(analyze, dishes))
+    elapsed = time.perf_counter() - start
+
+    latencies = [duration for _, duration in results]
+    breaker = resilience.breaker.get_stats()
+    return {
+        "phase": name,
+        "analyses": len(dishes),
+        "success_rate": round(sum(ok for ok, _ in results) / len(dishes), 3),
+        "upstream_requests": server.request_count - requests_before,
+        "faults": {fault: count - faults_before[fault] for fault, count in server.faults.items()},
+        "stale_served": nutrient_cache.get_cache_stats()["stale_served"] - stale_before,
+        "elapsed_s": round(elapsed, 3),
+        "p50_s": round(_percentile(latencies, 50), 3),
+        "p95_s": round(_percentile(latencies, 95), 3),
+        "breaker_state": breaker["state"],
+        "breaker_opened": breaker["opened"] - breaker_before["opened"],
+        "breaker_rejected": breaker["rejected"] - breaker_before["rejected"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Odporność analiz na awarie OpenAI API")
+    parser.add_argument("--dishes", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-429", type=float, default=0.2)
+    parser.add_argument("--rate-500", type=float, default=0.1)
+    parser.add_argument("--rate-timeout", type=float, default=0.05)
+    parser.add_argument("--hang", type=float, default=3.0, help="czas zawieszenia odpowiedzi atrapy")
+    parser.add_argument("--attempt-timeout", type=float, default=1.0,
+                        help="limit czasu jednej próby (OPENAI_ATTEMPT_TIMEOUT), krótszy niż --hang")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    resilience.OPENAI_ATTEMPT_TIMEOUT = args.attempt_timeout
+    # Cache trafia do katalogu tymczasowego
+    os.chdir(tempfile.mkdtemp(prefix="smartdiet-chaos-"))
+
+    server, base_url = start_fake_server(
+        args.latency, rate_429=args.rate_429, rate_500=args.rate_500,
+        rate_timeout=args.rate_timeout, hang=args.hang, seed=args.seed
+    )
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    dishes = [f"potrawa-chaos-{i}" for i in range(args.dishes)]
+
+    print(json.dumps(_run_phase("flaky", client, server, dishes, args.concurrency)))
+
+    server.rate_429, server.rate_500, server.rate_timeout = 0.0, 1.0, 0.0
+    nutrient_cache.CACHE_TTL_SECONDS = -1
+    print(json.dumps(_run_phase("outage", client, server, dishes, args.concurrency)))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
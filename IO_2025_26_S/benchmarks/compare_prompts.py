@@ -0,0 +1,113 @@
+"""
+Porównanie szablonów promptów: zużycie tokenów i czas odpowiedzi.
+
+Dla każdej wersji szablonu (services.prompts.TEMPLATES) wysyła --dishes
+analiz pojedynczych potraw i --batches paczek po BATCH_CHUNK_SIZE potraw
+przez ten sam kod co serwis analiz, a następnie wypisuje linię JSON
+z liczbą tokenów (z response.usage), szacowanym kosztem i opóźnieniami.
+Ostatnia linia porównuje wersje względem pierwszej.
+
+Domyślnie działa na lokalnej atrapie (tokeny szacowane, opóźnienie
+rośnie z długością odpowiedzi - --token-latency); z --live korzysta
+z prawdziwego API (OPENAI_API_KEY, opcjonalnie OPENAI_BASE_URL).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.compare_prompts --dishes 20 --batches 2
+"""
+import argparse
+import json
+import time
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import start_fake_server
+from benchmarks.load_analyze import _percentile
+from services import prompts
+from services.logging_config import configure_logging
+from services.openai_service import BASE_AMOUNT, BATCH_CHUNK_SIZE, _fetch_nutrients, _fetch_nutrients_batch
+from services.token_usage import get_token_stats, reset_token_stats
+
+
+def _timed_calls(func, args_list):
+    latencies, successes = [], 0
+    for args in args_list:
+        start = time.perf_counter()
+        if func(*args):
+            successes += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, successes
+
+
+def run_version(client, version, dishes, batches):
+    prompts.PROMPT_VERSION = version
+    reset_token_stats()
+    names = [f"potrawa testowa {i}" for i in range(dishes)]
+    batch_names = [[f"potrawa paczki {b}-{i}" for i in range(BATCH_CHUNK_SIZE)] for b in range(batches)]
+
+    dish_latencies, dish_ok = _timed_calls(
+        lambda name: _fetch_nutrients(client, name, BASE_AMOUNT), [(name,) for name in names]
+    )
+    batch_latencies, batch_ok = _timed_calls(
+        lambda chunk: _fetch_nutrients_batch(client, chunk), [(chunk,) for chunk in batch_names]
+    )
+
+    stats = get_token_stats()
+    dish = stats["by_prompt"].get(f"{version}/dish", {})
+    batch = stats["by_prompt"].get(f"{version}/batch", {})
+    return {
+        "version": version,
+        "dish_requests": dish.get("requests", 0),
+        "dish_success": dish_ok,
+        "dish_avg_prompt_tokens": dish.get("avg_prompt_tokens", 0),
+        "dish_avg_completion_tokens": dish.get("avg_completion_tokens", 0),
+        "dish_p50_s": round(_percentile(dish_latencies, 50), 3),
+        "dish_p95_s": round(_percentile(dish_latencies, 95), 3),
+        "batch_requests": batch.get("requests", 0),
+        "batch_success": batch_ok,
+        "batch_avg_prompt_tokens": batch.get("avg_prompt_tokens", 0),
+        "batch_avg_completion_tokens": batch.get("avg_completion_tokens", 0),
+        "batch_p50_s": round(_percentile(batch_latencies, 50), 3),
+        "truncated": dish.get("truncated", 0) + batch.get("truncated", 0),
+        "cost_usd_per_1000_dishes": round(dish.get("cost_usd", 0) / max(dish.get("requests", 1), 1) * 1000, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie szablonów promptów")
+    parser.add_argument("--versions", nargs="+", default=list(prompts.TEMPLATES))
+    parser.add_argument("--dishes", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=2)
+    parser.add_argument("--live", action="store_true", help="użyj prawdziwego OpenAI API")
+    parser.add_argument("--latency", type=float, default=0.3, help="stałe opóźnienie atrapy w sekundach")
+    parser.add_argument("--token-latency", type=float, default=0.0125,
+                        help="opóźnienie atrapy za każdy token odpowiedzi (ok. 80 tokenów/s)")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    server = None
+    if args.live:
+        client = OpenAI(max_retries=0)
+    else:
+        server, base_url = start_fake_server(args.latency, token_latency=args.token_latency)
+        client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+
+    results = [run_version(client, version, args.dishes, args.batches) for version in args.versions]
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+    baseline = results[0]
+    comparison = {"baseline": baseline["version"]}
+    for result in results[1:]:
+        comparison[result["version"]] = {
+            key: round(result[key] / baseline[key], 3) if baseline[key] else None
+            for key in ("dish_avg_prompt_tokens", "dish_avg_completion_tokens", "dish_p50_s",
+                        "batch_avg_prompt_tokens", "batch_avg_completion_tokens", "cost_usd_per_1000_dishes")
+        }
+    print(json.dumps(comparison, ensure_ascii=False))
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
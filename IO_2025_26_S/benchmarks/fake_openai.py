@@ -0,0 +1,300 @@
+"""
+Lokalna atrapa endpointu OpenAI /v1/chat/completions do testów obciążeniowych.
+
+Uruchomienie samodzielne:
+    python -m benchmarks.fake_openai --port 8089 --latency 1.0
+
+Atrapa może wstrzykiwać awarie (ułamek zapytań):
+    python -m benchmarks.fake_openai --rate-429 0.2 --rate-500 0.1 --rate-timeout 0.05
+- 429 z nagłówkami retry-after-ms i x-ratelimit-reset-requests,
+- 500 z błędem serwera,
+- zawieszenie odpowiedzi na --hang sekund (klient powinien przerwać je timeoutem),
+- --rate-malformed: poprawna odpowiedź HTTP z błędną treścią (ucięty JSON,
+  tekst zamiast JSON, wartości nieliczbowe lub ujemne, pusta treść).
+
+Atrapa odpowiada zgodnie z response_format (schemat JSON) albo, bez niego,
+jak dawny prompt - sformatowanym JSON-em w bloku markdown. Pole usage
+szacuje tokeny (ok. 4 znaki na token), odpowiedź dłuższa niż
+max_completion_tokens jest ucinana (finish_reason "length"), a
+--token-latency dodaje opóźnienie za każdy token odpowiedzi.
+
+Zapytania ze stream=True dostają odpowiedź text/event-stream: treść
+w fragmentach (chat.completion.chunk), finish_reason w ostatnim
+fragmencie, a przy stream_options.include_usage - dodatkowy fragment
+z polem usage; opóźnienie tokenów rozkłada się na kolejne fragmenty.
+
+Aplikację kierujemy na atrapę zmiennymi środowiskowymi:
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NUTRIENTS = {
+    "Magnez": 24.0,
+    "Żelazo": 1.3,
+    "Witamina D": 0.9,
+    "Wapń": 48.0,
+    "Cynk": 1.1,
+    "Potas": 210.0
+}
+
+# Skład zwracany na pytanie o rozkład potrawy: składnik z tabeli referencyjnej
+# i składnik spoza niej (aplikacja musi dopytać o jego wartości)
+RECIPE = {"ingredients": [{"name": "makaron", "grams": 70}, {"name": "sos śmietanowy", "grams": 30}]}
+
+# Błędne treści odpowiedzi (--rate-malformed), wybierane po kolei
+MALFORMED_CONTENTS = (
+    ("truncated", lambda content: content[:max(1, len(content) // 2)]),
+    ("prose", lambda content: "Niestety nie potrafię podać wartości odżywczych tej potrawy."),
+    ("wrong_types", lambda content: json.dumps({name: "dużo" for name in NUTRIENTS}, ensure_ascii=False)),
+    ("negative", lambda content: json.dumps({name: -value for name, value in NUTRIENTS.items()}, ensure_ascii=False)),
+    ("empty", lambda content: ""),
+)
+
+# Liczba znaków treści w jednym fragmencie strumienia (ok. 2 tokeny)
+STREAM_CHUNK_CHARS = 8
+
+
+def _completion_content(prompt, response_format):
+    """Buduje treść odpowiedzi modelu - pojedynczą lub dla paczki potraw."""
+    count = len(re.findall(r"^\d+\. ", prompt, flags=re.MULTILINE))
+
+    if (response_format or {}).get("type") == "json_schema":
+        if response_format["json_schema"].get("name") == "recipe":
+            return json.dumps(RECIPE, ensure_ascii=False)
+        if response_format["json_schema"].get("name") == "nutrients_batch":
+            return json.dumps({"results": [NUTRIENTS] * count}, ensure_ascii=False)
+        return json.dumps(NUTRIENTS, ensure_ascii=False)
+
+    if "Potrawy:" in prompt:
+        return json.dumps({str(i): NUTRIENTS for i in range(1, count + 1)}, ensure_ascii=False)
+    return "```json\n" + json.dumps(NUTRIENTS, ensure_ascii=False, indent=4) + "\n```"
+
+
+def _estimate_tokens(text):
+    """Przybliżona liczba tokenów (ok. 4 znaki na token)."""
+    return max(1, round(len(text) / 4))
+
+
+def _pick_fault(server):
+    """Losuje awarię dla zapytania: "429", "500", "timeout", "malformed" albo None."""
+    with server.fault_lock:
+        roll = server.rng.random()
+        for fault, rate in (("429", server.rate_429), ("500", server.rate_500),
+                            ("timeout", server.rate_timeout), ("malformed", server.rate_malformed)):
+            if roll < rate:
+                server.faults[fault] += 1
+                return fault
+            roll -= rate
+    return None
+
+
+def _malform(server, content):
+    """Zamienia treść odpowiedzi na kolejny rodzaj błędnej treści."""
+    with server.fault_lock:
+        kind, malform = MALFORMED_CONTENTS[server.malformed_count % len(MALFORMED_CONTENTS)]
+        server.malformed_count += 1
+        server.malformed_kinds[kind] = server.malformed_kinds.get(kind, 0) + 1
+    return malform(content)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Obsługuje POST /v1/chat/completions z opóźnieniem server.latency."""
+
+    protocol_version = "HTTP/1.1"
+
+    # Nagłówki i treść idą osobnymi zapisami - bez tego algorytm Nagle'a
+    # z opóźnionym ACK klienta dokłada ok. 40 ms do każdej odpowiedzi
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        self.server.request_count += 1
+        fault = _pick_fault(self.server)
+
+        if fault == "timeout":
+            time.sleep(self.server.hang)
+            return
+
+        messages = body.get("messages", [{}])
+        prompt = messages[-1].get("content", "")
+        content = _completion_content(prompt, body.get("response_format"))
+        if fault == "malformed":
+            content = _malform(self.server, content)
+        prompt_tokens = sum(_estimate_tokens(m.get("content", "")) + 4 for m in messages)
+        completion_tokens = _estimate_tokens(content)
+        finish_reason = "stop"
+
+        limit = body.get("max_completion_tokens") or body.get("max_tokens")
+        if limit and completion_tokens > limit:
+            content, completion_tokens, finish_reason = content[:limit * 4], limit, "length"
+
+        if body.get("stream"):
+            time.sleep(self.server.latency)
+        else:
+            time.sleep(self.server.latency + completion_tokens * self.server.token_latency)
+
+        if fault == "429":
+            self._send_json(429, {
+                "error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+            }, {
+                "retry-after-ms": str(int(self.server.retry_after * 1000)),
+                "x-ratelimit-reset-requests": f"{self.server.retry_after}s"
+            })
+            return
+        if fault == "500":
+            self._send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+            return
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self._send_stream(body, content, finish_reason, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        })
+
+    def _send_stream(self, body, content, finish_reason, usage):
+        """Wysyła odpowiedź strumieniową (Server-Sent Events jak w API OpenAI)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        base = {
+            "id": f"chatcmpl-fake-{self.server.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o")
+        }
+
+        def send(chunk):
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            send({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+            for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                piece = content[start:start + STREAM_CHUNK_CHARS]
+                time.sleep(_estimate_tokens(piece) * self.server.token_latency)
+                send({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            send({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+            if usage is not None:
+                send({**base, "choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient przerwał strumień (timeout albo rozłączenie)
+            pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(latency=0.5, host="127.0.0.1", port=0, rate_429=0.0, rate_500=0.0,
+                      rate_timeout=0.0, retry_after=0.2, hang=30.0, seed=0, token_latency=0.0,
+                      rate_malformed=0.0):
+    """
+    Uruchamia atrapę w wątku w tle.
+
+    Args:
+        latency: Opóźnienie każdej odpowiedzi w sekundach
+        host: Adres nasłuchu
+        port: Port (0 = dowolny wolny)
+        rate_429: Ułamek zapytań kończonych odpowiedzią 429
+        rate_500: Ułamek zapytań kończonych odpowiedzią 500
+        rate_timeout: Ułamek zapytań, na które atrapa nie odpowiada przez hang sekund
+        retry_after: Czas oczekiwania podawany w nagłówkach odpowiedzi 429
+        hang: Czas zawieszenia odpowiedzi przy awarii "timeout"
+        seed: Ziarno generatora awarii (powtarzalne przebiegi)
+        token_latency: Dodatkowe opóźnienie za każdy token odpowiedzi w sekundach
+        rate_malformed: Ułamek zapytań z odpowiedzią 200 o błędnej treści
+
+    Returns:
+        tuple: (serwer, base_url do przekazania klientowi OpenAI)
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_latency = token_latency
+    server.request_count = 0
+    server.rate_429 = rate_429
+    server.rate_500 = rate_500
+    server.rate_timeout = rate_timeout
+    server.rate_malformed = rate_malformed
+    server.malformed_count = 0
+    server.malformed_kinds = {}
+    server.retry_after = retry_after
+    server.hang = hang
+    server.rng = random.Random(seed)
+    server.fault_lock = threading.Lock()
+    server.faults = {"429": 0, "500": 0, "timeout": 0, "malformed": 0}
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atrapa OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    parser.add_argument("--rate-timeout", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--hang", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(
+        args.latency, args.host, args.port,
+        rate_429=args.rate_429, rate_500=args.rate_500, rate_timeout=args.rate_timeout,
+        retry_after=args.retry_after, hang=args.hang, seed=args.seed,
+        token_latency=args.token_latency, rate_malformed=args.rate_malformed
+    )
+    print(f"Atrapa OpenAI nasłuchuje na {base_url} (opóźnienie {args.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
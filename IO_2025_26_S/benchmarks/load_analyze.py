@@ -0,0 +1,243 @@
+"""
+Test obciążeniowy analiz na lokalnej atrapie OpenAI.
+
+Wysyła N równoległych analiz (każda dla innej potrawy, więc bez trafień
+w cache) i w tym samym czasie co 50 ms odpytuje /diary, żeby sprawdzić,
+czy dziennik odpowiada, gdy analizy są w toku. Analizy idą przez
+blueprint API (POST /api/analyze, JSON), WWW (POST / z formularza -
+z wykresem i zapisem do dziennika) albo jako zadania w tle (api-job:
+POST /api/analyze z "async": true i odpytywanie /api/jobs/<id>; osobno
+mierzony jest czas przyjęcia zgłoszenia).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.load_analyze --requests 64 --concurrency 32 --latency 1.0
+    python -m benchmarks.load_analyze --blueprint web --mode async --rate-malformed 0.1
+    python -m benchmarks.load_analyze --blueprint all --latency 0.5
+
+Limity ścieżki asynchronicznej ustawia się zmiennymi OPENAI_MAX_CONCURRENCY
+i OPENAI_MAX_PENDING (odrzucone analizy widać jako status 503).
+
+Serwer ma stałą pulę --server-threads wątków (domyślnie 8, jak worker
+gthread w gunicorn.conf.py), więc widać, czy analizy czekające na OpenAI
+nie zajmują wszystkich wątków; --server-threads 0 uruchamia serwer
+werkzeug z wątkiem na każde połączenie.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from openai import OpenAI, AsyncOpenAI
+from werkzeug.serving import BaseWSGIServer, make_server
+
+from benchmarks.fake_openai import start_fake_server
+from controllers.api_controller import create_api_blueprint
+from controllers.web_controller import create_web_blueprint
+from services.logging_config import configure_logging
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serwer WSGI obsługujący połączenia w puli o stałej liczbie wątków (jak gthread)."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        # Połączenia ponad pulę czekają w kolejce, tak jak w gunicornie
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _build_app(base_url, mode):
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    async_client = AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0) if mode == "async" else None
+
+    app = Flask("app", root_path=APP_DIR)
+    app.register_blueprint(create_web_blueprint(client, async_client))
+    app.register_blueprint(create_api_blueprint(client, async_client), url_prefix="/api")
+    return app
+
+
+def _post_analyze(app_url, blueprint, dish):
+    if blueprint == "web":
+        body = urllib.parse.urlencode({"dish_name": dish, "amount": "250", "date": "2026-01-01"}).encode("utf-8")
+        req = urllib.request.Request(f"{app_url}/", data=body,
+                                     headers={"Content-Type": "application/x-www-form-urlencoded"})
+    else:
+        body = json.dumps({"dish": dish, "amount": 250}).encode("utf-8")
+        req = urllib.request.Request(f"{app_url}/api/analyze", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    duration = time.perf_counter() - start
+    return status, duration, duration
+
+
+def _submit_job(app_url, dish):
+    """Zgłoszenie zadania i odpytywanie o wynik; zwraca (status, czas do wyniku, czas przyjęcia)."""
+    body = json.dumps({"dish": dish, "amount": 250, "date": "2026-01-01", "async": True}).encode("utf-8")
+    req = urllib.request.Request(f"{app_url}/api/analyze", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            location = resp.headers["Location"]
+            resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start, time.perf_counter() - start
+    accepted = time.perf_counter() - start
+
+    while True:
+        with urllib.request.urlopen(f"{app_url}{location}", timeout=60) as resp:
+            state = json.loads(resp.read())["job"]["state"]
+        if state in ("succeeded", "failed"):
+            return 200 if state == "succeeded" else 500, time.perf_counter() - start, accepted
+        time.sleep(0.2)
+
+
+def run_scenario(mode, requests, concurrency, latency, blueprint="api", rate_malformed=0.0, server_threads=8):
+    """
+    Uruchamia jeden scenariusz obciążeniowy.
+
+    Args:
+        mode: "sync" albo "async" (ścieżka klienta OpenAI)
+        requests: Liczba analiz
+        concurrency: Liczba równoległych klientów
+        latency: Opóźnienie atrapy OpenAI w sekundach
+        blueprint: "api" (POST /api/analyze), "web" (formularz POST /)
+            albo "api-job" (zadanie w tle i odpytywanie o wynik)
+        rate_malformed: Udział błędnych odpowiedzi atrapy
+        server_threads: Wątki serwera aplikacji (0 - wątek na połączenie)
+
+    Returns:
+        Słownik z przepustowością i opóźnieniami analiz oraz /diary
+    """
+    fake_server, base_url = start_fake_server(latency, rate_malformed=rate_malformed)
+    app = _build_app(base_url, mode)
+    if server_threads:
+        server = PooledWSGIServer("127.0.0.1", 0, app, server_threads)
+    else:
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app_url = f"http://127.0.0.1:{server.server_port}"
+
+    diary_latencies = []
+    stop = threading.Event()
+
+    def poll_diary():
+        while not stop.is_set():
+            start = time.perf_counter()
+            with urllib.request.urlopen(f"{app_url}/diary", timeout=60) as resp:
+                resp.read()
+            diary_latencies.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    poller = threading.Thread(target=poll_diary, daemon=True)
+
+    poller.start()
+    start = time.perf_counter()
+    def analyze(i):
+        dish = f"potrawa-{mode}-{i}-{time.time_ns()}"
+        if blueprint == "api-job":
+            return _submit_job(app_url, dish)
+        return _post_analyze(app_url, blueprint, dish)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(analyze, range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+
+    server.shutdown()
+    server.server_close()
+    fake_server.shutdown()
+
+    latencies = [duration for status, duration, _ in results if status == 200]
+    accepted = [duration for _, _, duration in results]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    return {
+        "mode": mode,
+        "blueprint": blueprint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "server_threads": server_threads,
+        "upstream_latency_s": latency,
+        "upstream_requests": fake_server.request_count,
+        "rate_malformed": rate_malformed,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "statuses": statuses,
+        "analyze_p50_s": round(_percentile(latencies, 50), 3),
+        "analyze_p95_s": round(_percentile(latencies, 95), 3),
+        "accept_p50_ms": round(_percentile(accepted, 50) * 1000, 1),
+        "accept_p95_ms": round(_percentile(accepted, 95) * 1000, 1),
+        "diary_samples": len(diary_latencies),
+        "diary_p50_ms": round(_percentile(diary_latencies, 50) * 1000, 1),
+        "diary_p95_ms": round(_percentile(diary_latencies, 95) * 1000, 1),
+        "diary_mean_ms": round(statistics.mean(diary_latencies) * 1000, 1) if diary_latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy /api/analyze")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=1.0, help="Opóźnienie atrapy OpenAI w sekundach")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--blueprint", choices=["api", "web", "api-job", "both", "all"], default="api",
+                        help="both: api i web, all: także api-job")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="Udział błędnych odpowiedzi atrapy")
+    parser.add_argument("--server-threads", type=int, default=int(os.getenv("GUNICORN_THREADS", "8")),
+                        help="Stała pula wątków serwera (0 - wątek na połączenie)")
+    args = parser.parse_args()
+    configure_logging("OFF")
+
+    # Dane (dziennik, cache) trafiają do katalogu tymczasowego
+    os.chdir(tempfile.mkdtemp(prefix="smartdiet-load-"))
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    blueprints = {"both": ["api", "web"], "all": ["api", "web", "api-job"]}.get(args.blueprint, [args.blueprint])
+    for blueprint in blueprints:
+        for mode in modes:
+            print(json.dumps(run_scenario(mode, args.requests, args.concurrency, args.latency,
+                                          blueprint, args.rate_malformed, args.server_threads),
+                             ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
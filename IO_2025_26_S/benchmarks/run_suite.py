@@ -0,0 +1,220 @@
+"""
+Zestaw benchmarków z wynikami do porównywania między uruchomieniami.
+
+Uruchamia benchmarki z tego katalogu jako osobne procesy (każdy
+z atrapą OpenAI i własnym katalogiem danych tam, gdzie ich potrzebuje),
+zbiera wypisywane przez nie wiersze JSON i zapisuje całość do
+benchmarks/results/<czas UTC>.json razem z metadanymi (commit, Python,
+platforma, liczba rdzeni).
+
+Z --compare wynik jest porównywany z wcześniejszym plikiem: metryki
+czasu i pamięci (z jednostką ms, us, s, mb albo bytes w nazwie) nie powinny
+rosnąć, a przepustowość i odsetek sukcesów (throughput, speedup,
+success w nazwie) maleć o więcej niż --threshold.
+Regresje kończą proces kodem 1.
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.run_suite
+    python -m benchmarks.run_suite --only bench_parsing bench_analyze
+    python -m benchmarks.run_suite --compare benchmarks/results/base.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(APP_DIR, "benchmarks", "results")
+
+# Benchmarki zestawu z krótkimi parametrami (całość w kilka minut)
+SUITE = [
+    ("bench_parsing", ["--repeat", "5000"]),
+    ("bench_analyze", ["--analyses", "100", "--malformed", "0,0.3"]),
+    ("bench_reference_foods", ["--repeat", "5000"]),
+    ("bench_composite_dishes", ["--repeat", "100"]),
+    ("bench_instrumentation", ["--repeat", "20000"]),
+    ("bench_nutrient_store", ["--meals", "100000", "--repeat", "5"]),
+    ("bench_storage", ["--sizes", "1000", "20000"]),
+    ("bench_user_partitions", ["--stages", "10,1000", "--samples", "100"]),
+    ("bench_transfer", ["--sizes", "10000", "50000"]),
+    ("bench_meal_memory", ["--meals", "100000"]),
+    ("bench_conditional_get", ["--meals", "500", "--repeat", "100"]),
+    ("bench_chart_modes", ["--renders", "5"]),
+    ("bench_startup", ["--runs", "2"]),
+    ("chaos_openai", ["--dishes", "20"]),
+    ("load_analyze", ["--requests", "16", "--concurrency", "8", "--latency", "0.2", "--blueprint", "all"]),
+]
+
+# Jednostki czasu i pamięci w nazwach metryk (mniejsza wartość jest lepsza),
+# np. p95_ms, cold_p50_us, us_per_call, elapsed_s, export_csv_peak_mb, bytes_per_meal
+LOWER_IS_BETTER = {"ms", "us", "s", "mb", "bytes"}
+
+# Człony nazw metryk, dla których większa wartość jest lepsza (mają
+# pierwszeństwo, np. export_csv_throughput_meals_per_s)
+HIGHER_IS_BETTER = {"throughput", "speedup", "success"}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _json_lines(output):
+    results = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            results.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return results
+
+
+def run_benchmark(name, args, timeout):
+    """
+    Uruchamia jeden benchmark w osobnym procesie.
+
+    Returns:
+        Słownik z czasem wykonania, statusem i wierszami wyników
+    """
+    env = dict(os.environ, LOG_LEVEL="OFF", PYTHONUNBUFFERED="1")
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run([sys.executable, "-m", f"benchmarks.{name}", *args], cwd=APP_DIR, env=env,
+                              capture_output=True, text=True, timeout=timeout)
+        ok, output, error = proc.returncode == 0, proc.stdout, proc.stderr
+    except subprocess.TimeoutExpired as e:
+        ok, output, error = False, e.stdout or "", f"timeout po {timeout}s"
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+    result = {
+        "args": args,
+        "ok": ok,
+        "seconds": round(time.perf_counter() - start, 2),
+        "results": _json_lines(output)
+    }
+    if not ok:
+        result["error"] = error[-2000:]
+    return result
+
+
+def _label(row):
+    """Pola tekstowe wiersza (przypadek, tryb, ścieżka) - do opisu regresji."""
+    return {key: value for key, value in row.items() if isinstance(value, str)}
+
+
+def _direction(key):
+    parts = key.split("_")
+    if HIGHER_IS_BETTER.intersection(parts):
+        return 1
+    if LOWER_IS_BETTER.intersection(parts):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """
+    Porównuje metryki dwóch uruchomień zestawu.
+
+    Args:
+        baseline: Wcześniejszy wynik (zawartość pliku results/*.json)
+        current: Bieżący wynik
+        threshold: Dopuszczalne pogorszenie (0.2 = 20%)
+
+    Returns:
+        Lista regresji (benchmark, wiersz, metryka, przed, po, zmiana);
+        benchmarki uruchomione z innymi parametrami są pomijane
+    """
+    regressions = []
+    for name, bench in current["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if not before or not before.get("ok") or not bench.get("ok"):
+            continue
+        # Wiersze są dopasowywane po kolejności - przy tych samych parametrach
+        # benchmarki wypisują je zawsze w tym samym porządku
+        if before.get("args") != bench.get("args"):
+            continue
+        for old, row in zip(before["results"], bench["results"]):
+            if _label(old) != _label(row):
+                continue
+            for key, value in row.items():
+                direction = _direction(key)
+                old_value = old.get(key)
+                if not direction or not isinstance(value, (int, float)) or not isinstance(old_value, (int, float)):
+                    continue
+                if old_value <= 0:
+                    continue
+                change = (value - old_value) / old_value
+                if -direction * change > threshold:
+                    regressions.append({
+                        "benchmark": name,
+                        "row": _label(row),
+                        "metric": key,
+                        "before": old_value,
+                        "after": value,
+                        "change": round(change, 3)
+                    })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zestaw benchmarków SmartDiet")
+    parser.add_argument("--only", nargs="+", help="Uruchom tylko wybrane benchmarki")
+    parser.add_argument("--timeout", type=float, default=600, help="Limit czasu jednego benchmarku w sekundach")
+    parser.add_argument("--output", help="Plik wyników (domyślnie benchmarks/results/<czas UTC>.json)")
+    parser.add_argument("--compare", help="Plik wyników wcześniejszego uruchomienia")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Dopuszczalne pogorszenie metryk (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    known = dict(SUITE)
+    if args.only:
+        unknown = sorted(set(args.only) - set(known))
+        if unknown:
+            parser.error(f"nieznane benchmarki: {', '.join(unknown)}")
+    selected = [(name, bench_args) for name, bench_args in SUITE if not args.only or name in args.only]
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "meta": {
+            "started_at": started.isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "benchmarks": {}
+    }
+    for name, bench_args in selected:
+        result = run_benchmark(name, bench_args, args.timeout)
+        report["benchmarks"][name] = result
+        print(json.dumps({"benchmark": name, "ok": result["ok"], "seconds": result["seconds"],
+                          "rows": len(result["results"])}), flush=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps({"results_file": output}))
+
+    failed = [name for name, result in report["benchmarks"].items() if not result["ok"]]
+    regressions = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for regression in regressions:
+            print(json.dumps({"regression": regression}, ensure_ascii=False))
+
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Test obciążeniowy ścieżki zapisu dziennika.
+
+Kilka procesów po kilka wątków jednocześnie dodaje i usuwa posiłki
+w tym samym magazynie. Na końcu sprawdzamy, że:
+- żaden posiłek nie zginął ani nie został zdublowany,
+- usunięte posiłki zniknęły,
+- każde nadane id jest unikalne (także po usunięciach).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    python -m benchmarks.stress_meal_writes --backend json --processes 4 --threads 4 --meals 25
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.meal_storage import JsonMealStorage, JournalMealStorage, SqliteMealStorage
+
+BACKENDS = {"json": JsonMealStorage, "journal": JournalMealStorage, "sqlite": SqliteMealStorage}
+
+
+def _open_storage(backend, path):
+    if backend == "journal":
+        return JournalMealStorage(path, path + "l")
+    return BACKENDS[backend](path)
+
+
+def _thread_worker(storage, worker_name, meals):
+    """Dodaje posiłki; co trzeci od razu usuwa."""
+    kept, deleted, ids = [], [], []
+    for i in range(meals):
+        dish_name = f"{worker_name}-{i}"
+        meal = storage.add_meal({
+            "dish_name": dish_name,
+            "amount": 100,
+            "date": "2025-11-10",
+            "nutrition_data": {"Magnez": float(i)},
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+        ids.append(meal["id"])
+
+        if i % 3 == 2:
+            if not storage.delete_meal(meal["id"]):
+                raise RuntimeError(f"Nie udało się usunąć {dish_name}")
+            deleted.append(dish_name)
+        else:
+            kept.append(dish_name)
+    return kept, deleted, ids
+
+
+def _process_worker(args):
+    backend, path, process_index, threads, meals = args
+    storage = _open_storage(backend, path)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(
+            lambda t: _thread_worker(storage, f"p{process_index}-t{t}", meals),
+            range(threads)
+        ))
+
+    kept, deleted, ids = [], [], []
+    for k, d, i in results:
+        kept += k
+        deleted += d
+        ids += i
+    return kept, deleted, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test równoległych zapisów dziennika")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="json")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--meals", type=int, default=25, help="Posiłków na wątek")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="smartdiet-stress-"),
+                        "meals.db" if args.backend == "sqlite" else "meals.json")
+    _open_storage(args.backend, path)
+
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.processes) as pool:
+        results = pool.map(
+            _process_worker,
+            [(args.backend, path, p, args.threads, args.meals) for p in range(args.processes)]
+        )
+    elapsed = time.perf_counter() - start
+
+    expected, deleted, ids = set(), set(), []
+    for k, d, i in results:
+        expected.update(k)
+        deleted.update(d)
+        ids += i
+
+    stored = _open_storage(args.backend, path).get_all_meals()
+    stored_names = [meal["dish_name"] for meal in stored]
+    stored_ids = [meal["id"] for meal in stored]
+
+    errors = []
+    if len(ids) != len(set(ids)):
+        errors.append(f"zdublowane id nadane przy zapisie: {len(ids) - len(set(ids))}")
+    if len(stored_ids) != len(set(stored_ids)):
+        errors.append("zdublowane id w magazynie")
+    if len(stored_names) != len(set(stored_names)):
+        errors.append("zdublowane posiłki w magazynie")
+    if expected - set(stored_names):
+        errors.append(f"zgubione posiłki: {len(expected - set(stored_names))}")
+    if deleted & set(stored_names):
+        errors.append(f"nieusunięte posiłki: {len(deleted & set(stored_names))}")
+
+    operations = len(ids) + len(deleted)
+    print(f"Backend: {args.backend}, procesy: {args.processes}, wątki: {args.threads}")
+    print(f"Operacji: {operations} w {elapsed:.2f}s ({operations / elapsed:.0f} op/s)")
+    print(f"Zapisanych: {len(stored)}, oczekiwanych: {len(expected)}")
+
+    if errors:
+        print("BŁĘDY: " + "; ".join(errors))
+        sys.exit(1)
+    print("OK - brak zgubionych i zdublowanych posiłków")
+
+
+if __name__ == "__main__":
+    main()
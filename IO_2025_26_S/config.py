@@ -0,0 +1,86 @@
+import os
+
+
+class Config:
+    """
+    Ustawienia wspólne dla wszystkich środowisk.
+
+    Wartości domyślne pochodzą ze zmiennych środowiskowych (i pliku .env),
+    odczytywanych przy imporcie modułu.
+    """
+
+    DEBUG = False
+    TESTING = False
+
+    # Klucz OpenAI i opcjonalny adres API (np. serwer testowy benchmarków)
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+    # Klient asynchroniczny - analizy z obu blueprintów idą przez wspólną pętlę asyncio
+    # (OPENAI_ASYNC=0 wyłącza tę ścieżkę i przywraca wywołania synchroniczne)
+    OPENAI_ASYNC = os.getenv("OPENAI_ASYNC", "1") != "0"
+
+    # OPENAI_PRELOAD=1 importuje SDK openai przy tworzeniu aplikacji zamiast
+    # przy pierwszej analizie (z gunicorn --preload: raz, przed forkiem workerów)
+    OPENAI_PRELOAD = os.getenv("OPENAI_PRELOAD", "0") == "1"
+
+    # Klucz podpisu ciasteczka z identyfikatorem użytkownika: z nim każdy
+    # nowy odwiedzający dostaje własny dziennik; bez niego ciasteczko jest
+    # ignorowane, a wszyscy (poza użytkownikami z nagłówka proxy) dzielą
+    # dziennik DEFAULT_USER
+    SECRET_KEY = os.getenv("SECRET_KEY") or None
+
+    # TRUSTED_PROXY=1: przed aplikacją stoi proxy uwierzytelniające, które
+    # ustawia nagłówek USER_ID_HEADER (i usuwa go z zapytań klientów);
+    # bez tego nagłówek jest ignorowany
+    TRUSTED_PROXY = os.getenv("TRUSTED_PROXY", "0") == "1"
+
+    # LOG_LEVEL (DEBUG/INFO/WARNING/ERROR/OFF) i LOG_FORMAT (text/json);
+    # None oznacza wartości z services.logging_config
+    LOG_LEVEL = os.getenv("LOG_LEVEL")
+    LOG_FORMAT = os.getenv("LOG_FORMAT")
+
+
+class DevelopmentConfig(Config):
+    """Serwer deweloperski Flaska (python app.py): przeładowanie kodu i debugger."""
+
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    """Serwer WSGI (gunicorn/uvicorn, wsgi.py): bez debuggera i śladów stosu w odpowiedziach."""
+
+
+class TestingConfig(Config):
+    """Benchmarki i testy: wyjątki widoków przechodzą do wywołującego."""
+
+    TESTING = True
+    SECRET_KEY = os.getenv("SECRET_KEY") or "smartdiet-testing"
+
+
+_CONFIGS = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "testing": TestingConfig,
+}
+
+
+def get_config(name: str = None):
+    """
+    Zwraca klasę konfiguracji dla środowiska.
+
+    Args:
+        name: "development", "production" albo "testing"
+            (domyślnie zmienna SMARTDIET_ENV, a bez niej "production")
+
+    Returns:
+        Klasa konfiguracji (do app.config.from_object)
+
+    Raises:
+        ValueError: Gdy środowisko jest nieznane
+    """
+    name = (name or os.getenv("SMARTDIET_ENV", "production")).lower()
+    try:
+        return _CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"Nieznane środowisko: {name} (dostępne: {', '.join(_CONFIGS)})") from None
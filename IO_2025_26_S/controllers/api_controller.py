@@ -1,9 +1,155 @@
-from flask import Blueprint, jsonify, request
-from services.openai_service import analyze_dish
+import io
+import logging
 
-def create_api_blueprint(client):
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context, url_for
+from services.openai_service import analyze_dish, analyze_dishes, analyze_dish_stream, get_coalescing_stats
+from services.async_openai_service import analyze_dish_async, analyze_dishes_async, run_async, AnalysisBusyError, get_async_stats
+from services.nutrient_cache import get_cache_stats
+from services.reference_foods import get_reference_stats
+from services.composite_dishes import get_composition_stats
+from services.resilience import get_resilience_stats
+from services.token_usage import get_token_stats
+from services.analysis_jobs import (
+    submit_analysis, get_job, get_job_stats, JobQueueFullError, IdempotencyConflictError, JOB_RETRY_AFTER
+)
+from services.meal_service import (
+    get_daily_totals, get_meals_page, get_nutrient_analytics, import_meals, iter_meals, DIARY_PAGE_SIZE, DIARY_MAX_PAGE_SIZE
+)
+from services.meal_transfer import TRANSFER_FORMATS, detect_format, export_chunks, read_records
+from controllers.sse import sse_response
+from controllers.http_cache import diary_conditional
+from controllers.identity import load_user_id
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Maksymalna liczba potraw w jednym zapytaniu /api/analyze/batch
+BATCH_MAX_ITEMS = 50
+
+# Maksymalna długość zakresu w /api/diary/daily i /api/diary/analytics (w dniach)
+DAILY_TOTALS_MAX_DAYS = 366
+
+
+def _parse_amount(amount):
+    """
+    Waliduje gramaturę przesłaną w zapytaniu.
+
+    Args:
+        amount: Wartość parametru 'amount' z JSON-a
+
+    Returns:
+        tuple: (gramatura jako int, None) lub (None, komunikat błędu)
+    """
+    try:
+        amount = int(amount)
+    except (ValueError, TypeError):
+        return None, "Parametr 'amount' musi być liczbą całkowitą"
+
+    if amount <= 0:
+        return None, "Parametr 'amount' musi być liczbą większą od 0"
+    if amount > 10000:
+        return None, "Parametr 'amount' nie może przekraczać 10000g"
+
+    return amount, None
+
+
+def _parse_date_range(args):
+    """
+    Waliduje zakres dat z parametrów ?from=...&to=... (domyślnie to = from).
+
+    Returns:
+        tuple: (from, to, None) lub (None, None, komunikat błędu)
+    """
+    start = args.get("from", "")
+    end = args.get("to", start)
+
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d")
+        end_date = datetime.strptime(end, "%Y-%m-%d")
+    except ValueError:
+        return None, None, "Parametry 'from' i 'to' muszą być datami w formacie YYYY-MM-DD"
+
+    if end_date < start_date:
+        return None, None, "Parametr 'to' nie może być wcześniejszy niż 'from'"
+
+    if (end_date - start_date).days + 1 > DAILY_TOTALS_MAX_DAYS:
+        return None, None, f"Zakres nie może przekraczać {DAILY_TOTALS_MAX_DAYS} dni"
+
+    return start, end, None
+
+
+def _parse_optional_dates(args):
+    """
+    Waliduje opcjonalny zakres dat eksportu (?from=...&to=..., bez limitu długości).
+
+    Returns:
+        tuple: (from lub None, to lub None, None) lub (None, None, komunikat błędu)
+    """
+    start, end = args.get("from") or None, args.get("to") or None
+    try:
+        for value in (start, end):
+            if value is not None:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return None, None, "Parametry 'from' i 'to' muszą być datami w formacie YYYY-MM-DD"
+
+    if start and end and end < start:
+        return None, None, "Parametr 'to' nie może być wcześniejszy niż 'from'"
+
+    return start, end, None
+
+
+def _wants_job(data):
+    """Czy klient prosi o zadanie w tle (pole "async": true albo nagłówek Prefer: respond-async)."""
+    return data.get("async") is True or "respond-async" in request.headers.get("Prefer", "")
+
+
+def _job_view(job):
+    """Zadanie w odpowiedzi API - zamiast nazwy pliku wykresu jego adres URL."""
+    job = dict(job)
+    result = job.get("result")
+    if result:
+        chart_file = result.get("chart_file")
+        job["result"] = {
+            "micronutrients": result["micronutrients"],
+            "chart_url": url_for("web_bp.chart", filename=chart_file) if chart_file else None,
+            "chart_payload": result.get("chart_payload")
+        }
+    return job
+
+
+def create_api_blueprint(client, async_client=None):
     api_bp = Blueprint("api_bp", __name__)
 
+    @api_bp.before_request
+    def identify_user():
+        # Użytkownik (nagłówek proxy albo ciasteczko) - dziennik jest partycjonowany per użytkownik
+        try:
+            load_user_id()
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
+
+    def _analyze(dish_name, amount):
+        """Analiza jednej potrawy - asynchronicznie, jeśli dostępny jest AsyncOpenAI."""
+        if async_client:
+            return run_async(analyze_dish_async(async_client, dish_name, amount))
+        return analyze_dish(client, dish_name, amount)
+
+    def _analyze_in_job(dish_name, amount):
+        """Analiza w wątku zadania w tle - nie zajmuje wątku HTTP, więc nie liczy się do limitu oczekujących."""
+        if async_client:
+            return run_async(analyze_dish_async(async_client, dish_name, amount), limit_pending=False)
+        return analyze_dish(client, dish_name, amount)
+
+    def _analyze_batch(items):
+        """Analiza paczki potraw - asynchronicznie, jeśli dostępny jest AsyncOpenAI."""
+        if async_client:
+            return run_async(analyze_dishes_async(async_client, items))
+        return analyze_dishes(client, items)
+
     @api_bp.route("/analyze", methods=["POST"])
     def api_analyze():
         """
@@ -36,6 +182,12 @@ def create_api_blueprint(client):
             "status": "error",
             "message": "Opis błędu"
         }
+
+        Z "async": true w body (albo nagłówkiem Prefer: respond-async) analiza,
+        wykres i zapis do dziennika (pole "date", domyślnie dziś) wykonują się
+        w tle - odpowiedź 202 zawiera identyfikator zadania do odpytywania
+        przez GET /api/jobs/<id>. Opcjonalny nagłówek Idempotency-Key chroni
+        przed podwójnym zapisem posiłku przy ponowieniu zgłoszenia.
         """
         try:
             data = request.get_json()
@@ -53,43 +205,28 @@ def create_api_blueprint(client):
             amount = data.get('amount', 100)
 
             # Walidacja amount
-            try:
-                amount = int(amount)
-                if amount <= 0:
-                    return jsonify({
-                        "status": "error",
-                        "message": "Parametr 'amount' musi być liczbą większą od 0"
-                    }), 400
-                if amount > 10000:
-                    return jsonify({
-                        "status": "error",
-                        "message": "Parametr 'amount' nie może przekraczać 10000g"
-                    }), 400
-            except (ValueError, TypeError):
+            amount, amount_error = _parse_amount(amount)
+            if amount_error:
                 return jsonify({
                     "status": "error",
-                    "message": "Parametr 'amount' musi być liczbą całkowitą"
+                    "message": amount_error
                 }), 400
 
-            print(f"\n{'='*60}")
-            print(f"📡 [API] Odebrano zapytanie:")
-            print(f"   • Potrawa: {dish_name}")
-            print(f"   • Ilość: {amount}g")
+            if _wants_job(data):
+                return _submit_job(dish_name, amount, data)
+
+            logger.info("[API] Analiza: %s (%sg)", dish_name, amount, extra={"dish": dish_name, "amount": amount})
 
             # Analiza potrawy z uwzględnieniem gramatury
-            micronutrients = analyze_dish(client, dish_name, amount)
+            micronutrients = _analyze(dish_name, amount)
 
             if micronutrients is None:
-                print(f"❌ [API] Błąd analizy potrawy")
-                print(f"{'='*60}\n")
+                logger.error("[API] Błąd analizy potrawy \"%s\"", dish_name, extra={"dish": dish_name})
                 return jsonify({
                     "status": "error",
                     "message": "Nie udało się przeanalizować potrawy. Sprawdź połączenie z OpenAI API lub spróbuj ponownie."
                 }), 500
 
-            print(f"✅ [API] Odpowiedź wysłana pomyślnie")
-            print(f"{'='*60}\n")
-
             return jsonify({
                 "status": "success",
                 "dish": dish_name,
@@ -97,12 +234,414 @@ def create_api_blueprint(client):
                 "micronutrients": micronutrients
             }), 200
 
+        except AnalysisBusyError as e:
+            logger.warning("[API] Odrzucono zapytanie: %s", e)
+            return jsonify({
+                "status": "error",
+                "message": "Serwer analizuje zbyt wiele potraw. Spróbuj ponownie za chwilę."
+            }), 503
         except Exception as e:
-            print(f"❌ [API] Nieoczekiwany błąd: {e}")
-            print(f"{'='*60}\n")
+            logger.exception("[API] Nieoczekiwany błąd")
             return jsonify({
                 "status": "error",
                 "message": f"Błąd serwera: {str(e)}"
             }), 500
 
+    def _submit_job(dish_name, amount, data):
+        """
+        Zgłasza analizę jako zadanie w tle (analiza, wykres, zapis do dziennika).
+
+        Odpowiedź 202 z identyfikatorem zadania i nagłówkiem Location
+        (/api/jobs/<id>). Nagłówek Idempotency-Key sprawia, że ponowione
+        zgłoszenie zwraca to samo zadanie zamiast zapisywać posiłek drugi raz.
+        """
+        date = str(data.get("date") or datetime.today().strftime("%Y-%m-%d"))
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Parametr 'date' musi być datą w formacie YYYY-MM-DD"
+            }), 400
+
+        idempotency_key = request.headers.get("Idempotency-Key")
+        try:
+            job, created = submit_analysis(
+                _analyze_in_job, dish_name, amount, date,
+                user_id=g.user_id,
+                idempotency_key=idempotency_key.strip() if idempotency_key is not None else None
+            )
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
+        except IdempotencyConflictError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 409
+        except JobQueueFullError as e:
+            logger.warning("[API] Odrzucono zadanie: %s", e)
+            response = jsonify({
+                "status": "error",
+                "message": "Kolejka analiz jest pełna. Spróbuj ponownie za chwilę."
+            })
+            response.status_code = 503
+            response.headers["Retry-After"] = str(JOB_RETRY_AFTER)
+            return response
+
+        logger.info("[API] Zadanie %s: %s (%sg)%s", job["id"], dish_name, amount, "" if created else " - powtórzone zgłoszenie",
+                    extra={"dish": dish_name, "amount": amount})
+
+        response = jsonify({
+            "status": "accepted",
+            "deduplicated": not created,
+            "job": _job_view(job)
+        })
+        response.status_code = 202
+        response.headers["Location"] = url_for("api_bp.api_job", job_id=job["id"])
+        return response
+
+    @api_bp.route("/jobs/<job_id>", methods=["GET"])
+    def api_job(job_id):
+        """
+        Stan zadania analizy zgłoszonego przez POST /api/analyze z "async": true.
+
+        Zwraca:
+            {"status": "success", "job": {"id": ..., "state": "queued" | "running" | "succeeded" | "failed",
+             "dish": ..., "amount": ..., "date": ..., "result": {"micronutrients": {...}, "chart_url": ...},
+             "error": ...}}
+        """
+        job = get_job(job_id, g.user_id)
+        if job is None:
+            return jsonify({
+                "status": "error",
+                "message": "Nie znaleziono zadania"
+            }), 404
+
+        return jsonify({"status": "success", "job": _job_view(job)}), 200
+
+    @api_bp.route("/analyze/stream", methods=["POST"])
+    def api_analyze_stream():
+        """
+        Endpoint API zwracający wyniki analizy na bieżąco (Server-Sent Events).
+
+        Body jak w /api/analyze. Zdarzenia:
+            event: progress  data: {"stage": "request", "attempt": 1}
+            event: nutrient  data: {"name": "Magnez", "value": 120.5}
+            event: done      data: {"status": "success", "dish": ..., "amount": ..., "micronutrients": {...}}
+            event: error     data: {"status": "error", "message": "Opis błędu"}
+        """
+        data = request.get_json(silent=True)
+
+        if not data or 'dish' not in data:
+            return jsonify({
+                "status": "error",
+                "message": "Brak parametru 'dish' w requestcie"
+            }), 400
+
+        dish_name = data['dish']
+        amount, amount_error = _parse_amount(data.get('amount', 100))
+        if amount_error:
+            return jsonify({
+                "status": "error",
+                "message": amount_error
+            }), 400
+
+        logger.info("[API] Streaming analizy: %s (%sg)", dish_name, amount, extra={"dish": dish_name, "amount": amount})
+
+        def events():
+            for event, payload in analyze_dish_stream(client, dish_name, amount):
+                if event == "done":
+                    payload = {"status": "success", "dish": dish_name, "amount": amount, **payload}
+                elif event == "error":
+                    payload = {"status": "error", **payload}
+                yield event, payload
+
+        return sse_response(events())
+
+    @api_bp.route("/analyze/batch", methods=["POST"])
+    def api_analyze_batch():
+        """
+        Endpoint API do analizy wielu potraw w jednym zapytaniu.
+
+        Przykład użycia:
+        POST http://127.0.0.1:5000/api/analyze/batch
+        Content-Type: application/json
+
+        Body:
+        {
+            "items": [
+                {"dish": "Jajecznica", "amount": 250},
+                {"dish": "Ryż", "amount": 150}
+            ]
+        }
+
+        Odpowiedź:
+        {
+            "status": "success",
+            "succeeded": 1,
+            "failed": 1,
+            "results": [
+                {"dish": "Jajecznica", "amount": 250, "status": "success", "micronutrients": {...}},
+                {"dish": "Ryż", "amount": 150, "status": "error", "message": "Opis błędu"}
+            ]
+        }
+        """
+        try:
+            data = request.get_json(silent=True)
+            items = data.get("items") if isinstance(data, dict) else data
+
+            if not isinstance(items, list) or not items:
+                return jsonify({
+                    "status": "error",
+                    "message": "Brak listy 'items' w requestcie"
+                }), 400
+
+            if len(items) > BATCH_MAX_ITEMS:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Maksymalnie {BATCH_MAX_ITEMS} potraw w jednym zapytaniu"
+                }), 400
+
+            # Walidacja każdej pozycji osobno - błędne pozycje nie blokują reszty
+            results = [None] * len(items)
+            valid_items = []
+            valid_indexes = []
+
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or not str(item.get("dish", "")).strip():
+                    results[index] = {
+                        "status": "error",
+                        "message": "Brak parametru 'dish'"
+                    }
+                    continue
+
+                amount, amount_error = _parse_amount(item.get("amount", 100))
+                if amount_error:
+                    results[index] = {
+                        "dish": item["dish"],
+                        "status": "error",
+                        "message": amount_error
+                    }
+                    continue
+
+                valid_items.append({"dish": str(item["dish"]).strip(), "amount": amount})
+                valid_indexes.append(index)
+
+            logger.info("[API] Zapytanie batch: %d potraw", len(items))
+
+            analyzed = _analyze_batch(valid_items) if valid_items else []
+
+            for index, result in zip(valid_indexes, analyzed):
+                if "error" in result:
+                    results[index] = {
+                        "dish": result["dish"],
+                        "amount": result["amount"],
+                        "status": "error",
+                        "message": result["error"]
+                    }
+                else:
+                    results[index] = {**result, "status": "success"}
+
+            succeeded = sum(1 for result in results if result["status"] == "success")
+
+            logger.info("[API] Batch: %d/%d potraw przeanalizowanych", succeeded, len(results))
+
+            return jsonify({
+                "status": "success",
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results
+            }), 200
+
+        except AnalysisBusyError as e:
+            logger.warning("[API] Odrzucono zapytanie: %s", e)
+            return jsonify({
+                "status": "error",
+                "message": "Serwer analizuje zbyt wiele potraw. Spróbuj ponownie za chwilę."
+            }), 503
+        except Exception as e:
+            logger.exception("[API] Nieoczekiwany błąd")
+            return jsonify({
+                "status": "error",
+                "message": f"Błąd serwera: {str(e)}"
+            }), 500
+
+    @api_bp.route("/meals", methods=["GET"])
+    @diary_conditional
+    def api_meals_page():
+        """
+        Strona dziennika posiłków (od najnowszych).
+
+        Parametry: ?limit=20&cursor=<next_cursor z poprzedniej strony>
+
+        Zwraca:
+            {"status": "success", "meals": [...], "next_cursor": "..." lub null}
+        """
+        try:
+            limit = int(request.args.get("limit", DIARY_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= DIARY_MAX_PAGE_SIZE:
+            return jsonify({
+                "status": "error",
+                "message": f"Parametr 'limit' musi być liczbą od 1 do {DIARY_MAX_PAGE_SIZE}"
+            }), 400
+
+        try:
+            page = get_meals_page(limit, request.args.get("cursor") or None, g.user_id)
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
+
+        return jsonify({
+            "status": "success",
+            "meals": [meal.to_dict() for meal in page["meals"]],
+            "next_cursor": page["next_cursor"]
+        }), 200
+
+    @api_bp.route("/meals/export", methods=["GET"])
+    @diary_conditional
+    def api_meals_export():
+        """
+        Eksport dziennika jako plik NDJSON (jeden posiłek JSON w linii) albo CSV.
+
+        Parametry: ?format=ndjson|csv&from=YYYY-MM-DD&to=YYYY-MM-DD (zakres opcjonalny)
+
+        Odpowiedź jest wysyłana fragmentami w trakcie czytania magazynu, więc
+        pamięć serwera nie zależy od liczby eksportowanych posiłków.
+        """
+        fmt = request.args.get("format", "ndjson").lower()
+        if fmt not in TRANSFER_FORMATS:
+            return jsonify({
+                "status": "error",
+                "message": f"Parametr 'format' musi mieć wartość: {', '.join(TRANSFER_FORMATS)}"
+            }), 400
+
+        start, end, error = _parse_optional_dates(request.args)
+        if error:
+            return jsonify({
+                "status": "error",
+                "message": error
+            }), 400
+
+        logger.info("[API] Eksport dziennika (%s, %s - %s)", fmt, start or "początek", end or "koniec")
+
+        response = Response(
+            stream_with_context(export_chunks(iter_meals(start, end, g.user_id), fmt)),
+            mimetype=TRANSFER_FORMATS[fmt]
+        )
+        response.headers["Content-Disposition"] = f'attachment; filename="smartdiet-meals.{fmt}"'
+        return response
+
+    @api_bp.route("/meals/import", methods=["POST"])
+    def api_meals_import():
+        """
+        Import posiłków z pliku NDJSON albo CSV (format jak w /api/meals/export).
+
+        Treść: plik w body (Content-Type: application/x-ndjson lub text/csv)
+        albo pole 'file' formularza multipart; ?format=ndjson|csv ma
+        pierwszeństwo przed rozpoznaniem po typie i nazwie pliku.
+
+        Wiersze są czytane strumieniowo i zapisywane paczkami; błędne wiersze
+        są pomijane i opisane w odpowiedzi.
+
+        Zwraca:
+            {"status": "success", "imported": 120, "failed": 1,
+             "errors": [{"line": 7, "message": "Data musi być w formacie YYYY-MM-DD"}]}
+        """
+        upload = request.files.get("file") if request.mimetype == "multipart/form-data" else None
+        fmt = request.args.get("format", "").lower() or detect_format(
+            upload.mimetype if upload else request.content_type,
+            upload.filename if upload else None
+        )
+        if fmt not in TRANSFER_FORMATS:
+            return jsonify({
+                "status": "error",
+                "message": "Nieznany format pliku - użyj NDJSON albo CSV (parametr 'format' lub Content-Type)"
+            }), 400
+
+        stream = upload.stream if upload else request.stream
+        if not isinstance(stream, io.BufferedIOBase):
+            stream = io.BufferedReader(stream)
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="" if fmt == "csv" else None)
+
+        logger.info("[API] Import dziennika (%s)", fmt)
+        result = import_meals(read_records(text, fmt), g.user_id)
+
+        if not result.pop("completed"):
+            return jsonify({
+                "status": "error",
+                "message": "Import został przerwany przez błąd zapisu - część posiłków mogła zostać zapisana.",
+                **result
+            }), 500
+
+        return jsonify({"status": "success", **result}), 200
+
+    @api_bp.route("/diary/daily", methods=["GET"])
+    @diary_conditional
+    def api_daily_totals():
+        """
+        Sumy mikroskładników dla kolejnych dni.
+
+        Parametry: ?from=YYYY-MM-DD&to=YYYY-MM-DD (domyślnie to = from)
+
+        Zwraca:
+            {"status": "success", "days": [{"date": ..., "meal_count": ..., "totals": {...}}, ...]}
+        """
+        start, end, error = _parse_date_range(request.args)
+        if error:
+            return jsonify({
+                "status": "error",
+                "message": error
+            }), 400
+
+        return jsonify({
+            "status": "success",
+            "days": get_daily_totals(start, end, g.user_id)
+        }), 200
+
+    @api_bp.route("/diary/analytics", methods=["GET"])
+    @diary_conditional
+    def api_nutrient_analytics():
+        """
+        Analiza spożycia mikroskładników w zakresie dat.
+
+        Parametry: ?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+        Zwraca:
+            {"status": "success", "statistics": {...}, "rolling_7": {...},
+             "rolling_30": {...}, "below_target": {...}}
+        """
+        start, end, error = _parse_date_range(request.args)
+        if error:
+            return jsonify({
+                "status": "error",
+                "message": error
+            }), 400
+
+        return jsonify({"status": "success", **get_nutrient_analytics(start, end, user_id=g.user_id)}), 200
+
+    @api_bp.route("/stats", methods=["GET"])
+    def api_stats():
+        """
+        Liczniki pracy serwisu analiz: tabela potraw, składy potraw złożonych, cache, łączenie identycznych analiz,
+        obciążenie ścieżki asynchronicznej, stan bezpiecznika API i zużycie tokenów.
+        """
+        return jsonify({
+            "status": "success",
+            "reference": get_reference_stats(),
+            "composition": get_composition_stats(),
+            "cache": get_cache_stats(),
+            "coalescing": get_coalescing_stats(),
+            "async": get_async_stats(),
+            "resilience": get_resilience_stats(),
+            "tokens": get_token_stats(),
+            "jobs": get_job_stats()
+        }), 200
+
     return api_bp
\ No newline at end of file
@@ -0,0 +1,53 @@
+from flask import Blueprint, jsonify
+
+from services.composite_dishes import get_recipe_book
+from services.meal_storage import use_storage
+from services.reference_foods import get_reference_table
+from services.resilience import breaker
+
+
+def create_health_blueprint(client, async_client=None):
+    """
+    Endpointy dla load balancera i orkiestratora.
+
+    /health/live odpowiada zawsze, gdy proces obsługuje zapytania.
+    /health/ready sprawdza, czy worker może obsłużyć ruch: magazyn posiłków
+    odpowiada, a tabela potraw i składy są wczytane (503, gdy nie).
+    Brak klucza OpenAI albo otwarty bezpiecznik nie zdejmują workera
+    z ruchu - dziennik i potrawy z tabeli działają bez API - ale są
+    widoczne w odpowiedzi.
+    """
+    health_bp = Blueprint("health_bp", __name__)
+
+    @health_bp.route("/health/live", methods=["GET"])
+    def live():
+        return jsonify({"status": "ok"})
+
+    @health_bp.route("/health/ready", methods=["GET"])
+    def ready():
+        checks = {}
+
+        try:
+            with use_storage() as storage:
+                storage.get_summary()
+            checks["storage"] = "ok"
+        except Exception as e:
+            checks["storage"] = f"error: {type(e).__name__}"
+
+        try:
+            checks["reference_foods"] = len(get_reference_table())
+            checks["recipes"] = len(get_recipe_book())
+        except Exception as e:
+            checks["tables"] = f"error: {type(e).__name__}"
+
+        api_client = async_client or client
+        checks["openai"] = {
+            "configured": api_client is not None,
+            "sdk_loaded": api_client is not None and getattr(api_client, "loaded", True),
+            "breaker": breaker.state
+        }
+
+        is_ready = checks["storage"] == "ok" and "tables" not in checks and checks["reference_foods"] > 0
+        return jsonify({"status": "ready" if is_ready else "not_ready", "checks": checks}), 200 if is_ready else 503
+
+    return health_bp
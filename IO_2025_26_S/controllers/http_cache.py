@@ -0,0 +1,83 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, make_response, request
+from werkzeug.http import is_resource_modified
+
+from controllers.identity import USER_ID_HEADER, current_user_id
+from services.diary_version import get_diary_version
+from services.metrics import HTTP_CONDITIONAL
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# Czas przechowywania wykresów w przeglądarce (nazwa pliku to skrót treści)
+CHART_MAX_AGE = int(os.getenv("CHART_MAX_AGE", str(365 * 24 * 3600)))
+
+
+def _templates_tag() -> str:
+    """Skrót szablonów - nowe wdrożenie z innym HTML unieważnia stare ETagi."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        with open(os.path.join(TEMPLATES_DIR, name), "rb") as f:
+            digest.update(name.encode("utf-8"))
+            digest.update(f.read())
+    return digest.hexdigest()[:8]
+
+
+_TEMPLATES_TAG = _templates_tag()
+
+
+def diary_conditional(view):
+    """
+    Dekorator widoków dziennika: ETag i Last-Modified z wersji dziennika.
+
+    Wersję dziennika użytkownika zmienia każde dodanie i usunięcie posiłku
+    (services.diary_version), więc gdy przeglądarka przyśle If-None-Match / If-Modified-Since
+    z aktualną wersją, zwracamy 304 bez wywołania widoku - bez odczytu
+    magazynu i renderowania szablonu. Tylko odpowiedzi 200 dostają
+    walidatory; błędy (np. 400 dla złej daty) przechodzą bez zmian.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, last_modified = get_diary_version(current_user_id())
+        etag = f"diary-{version}-{_TEMPLATES_TAG}"
+        endpoint = request.url_rule.rule if request.url_rule else request.path
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            HTTP_CONDITIONAL.inc(endpoint=endpoint, result="not_modified")
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            HTTP_CONDITIONAL.inc(endpoint=endpoint, result="full")
+
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Dane użytkownika: tylko cache przeglądarki, zawsze z walidacją
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.update((USER_ID_HEADER, "Cookie"))
+        return response
+
+    return wrapper
+
+
+def immutable(response: Response, max_age: int = CHART_MAX_AGE) -> Response:
+    """
+    Oznacza odpowiedź jako niezmienną (adres zawiera skrót treści).
+
+    Args:
+        response: Odpowiedź do oznaczenia
+        max_age: Czas przechowywania w sekundach
+
+    Returns:
+        Ta sama odpowiedź z nagłówkiem Cache-Control: public, max-age, immutable
+    """
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,136 @@
+import logging
+import os
+import uuid
+
+from flask import Response, current_app, g, request
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from services.user_partition import DEFAULT_USER, normalize_user_id
+
+logger = logging.getLogger(__name__)
+
+# Nagłówek z identyfikatorem zalogowanego użytkownika - ustawia go proxy
+# uwierzytelniające przed aplikacją; brany pod uwagę tylko przy TRUSTED_PROXY
+USER_ID_HEADER = os.getenv("USER_ID_HEADER", "X-User-Id")
+
+# Ciasteczko z podpisanym identyfikatorem (gdy aplikacja działa bez proxy)
+USER_ID_COOKIE = os.getenv("USER_ID_COOKIE", "smartdiet_user")
+
+# Czas życia ciasteczka w sekundach (domyślnie rok)
+USER_ID_COOKIE_MAX_AGE = int(os.getenv("USER_ID_COOKIE_MAX_AGE", str(365 * 24 * 3600)))
+
+_COOKIE_SALT = "smartdiet-user-id"
+
+
+def _serializer():
+    """Podpisywanie ciasteczka kluczem SECRET_KEY; None, gdy klucza nie ustawiono."""
+    secret_key = current_app.config.get("SECRET_KEY")
+    return URLSafeSerializer(secret_key, salt=_COOKIE_SALT) if secret_key else None
+
+
+def sign_user_id(user_id: str) -> str:
+    """
+    Podpisuje identyfikator użytkownika (wartość ciasteczka USER_ID_COOKIE).
+
+    Args:
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Podpisany identyfikator
+
+    Raises:
+        ValueError: Gdy identyfikator jest nieprawidłowy
+        RuntimeError: Gdy nie ustawiono SECRET_KEY
+    """
+    serializer = _serializer()
+    if serializer is None:
+        raise RuntimeError("Brak SECRET_KEY - nie można podpisać ciasteczka użytkownika")
+    return serializer.dumps(normalize_user_id(user_id))
+
+
+def set_user_cookie(response: Response, user_id: str) -> Response:
+    """
+    Zapisuje w odpowiedzi podpisane ciasteczko z identyfikatorem użytkownika.
+
+    Args:
+        response: Odpowiedź Flask
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Ta sama odpowiedź
+
+    Raises:
+        ValueError: Gdy identyfikator jest nieprawidłowy
+        RuntimeError: Gdy nie ustawiono SECRET_KEY
+    """
+    response.set_cookie(USER_ID_COOKIE, sign_user_id(user_id),
+                        max_age=USER_ID_COOKIE_MAX_AGE, httponly=True, samesite="Lax",
+                        secure=request.is_secure)
+    return response
+
+
+def _user_id_from_cookie():
+    raw = request.cookies.get(USER_ID_COOKIE)
+    if not raw:
+        return None
+
+    serializer = _serializer()
+    if serializer is None:
+        logger.warning("[TOŻSAMOŚĆ] Brak SECRET_KEY - pomijam ciasteczko %s", USER_ID_COOKIE)
+        return None
+    try:
+        return serializer.loads(raw)
+    except BadSignature:
+        raise ValueError("Nieprawidłowy podpis identyfikatora użytkownika") from None
+
+
+def load_user_id() -> str:
+    """
+    Ustala użytkownika zapytania i zapisuje go w g.user_id.
+
+    Kolejność: nagłówek USER_ID_HEADER (tylko gdy TRUSTED_PROXY - inaczej
+    każdy klient mógłby go ustawić), podpisane ciasteczko USER_ID_COOKIE.
+    Nowy odwiedzający bez proxy dostaje losowy identyfikator, który
+    issue_user_cookie zapisuje w ciasteczku odpowiedzi; bez SECRET_KEY
+    (albo za proxy, które nie przysłało nagłówka) - DEFAULT_USER
+    (dotychczasowy wspólny dziennik).
+
+    Returns:
+        Identyfikator użytkownika
+
+    Raises:
+        ValueError: Gdy przesłany identyfikator jest nieprawidłowy albo
+            ciasteczko nie ma poprawnego podpisu
+    """
+    raw = None
+    if current_app.config.get("TRUSTED_PROXY"):
+        raw = request.headers.get(USER_ID_HEADER)
+    if not raw:
+        raw = _user_id_from_cookie()
+    if not raw and not current_app.config.get("TRUSTED_PROXY") and _serializer() is not None:
+        raw = uuid.uuid4().hex
+        g.issue_user_cookie = True
+        logger.debug("[TOŻSAMOŚĆ] Nowy użytkownik %s", raw)
+    g.user_id = normalize_user_id(raw) if raw else DEFAULT_USER
+    return g.user_id
+
+
+def issue_user_cookie(response: Response) -> Response:
+    """
+    Hook after_request: zapisuje ciasteczko identyfikatora nowego użytkownika.
+
+    Args:
+        response: Odpowiedź Flask
+
+    Returns:
+        Ta sama odpowiedź (z ciasteczkiem, jeśli load_user_id nadał identyfikator)
+    """
+    if g.get("issue_user_cookie"):
+        set_user_cookie(response, g.user_id)
+    return response
+
+
+def current_user_id() -> str:
+    """Użytkownik bieżącego zapytania (ustalany przy pierwszym użyciu)."""
+    user_id = g.get("user_id")
+    return user_id if user_id is not None else load_user_id()
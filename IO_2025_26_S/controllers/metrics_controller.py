@@ -0,0 +1,40 @@
+import time
+
+from flask import Blueprint, Response, g, request
+
+from services.metrics import REQUEST_SECONDS, render_metrics
+
+
+def create_metrics_blueprint():
+    """
+    Endpoint /metrics (format tekstowy Prometheusa) i pomiar czasu
+    obsługi każdego zapytania aplikacji.
+
+    Czas jest mierzony od wejścia do aplikacji do zwrócenia odpowiedzi
+    przez widok - dla strumieni SSE obejmuje tylko wysłanie nagłówków.
+    Etykietą endpointu jest reguła URL (np. /diary/<date>), a nie
+    konkretny adres, żeby liczba serii nie rosła z liczbą dni i id.
+    """
+    metrics_bp = Blueprint("metrics_bp", __name__)
+
+    @metrics_bp.before_app_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @metrics_bp.after_app_request
+    def observe_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=request.method,
+                endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+                status=str(response.status_code)
+            )
+        return response
+
+    @metrics_bp.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    return metrics_bp
@@ -0,0 +1,42 @@
+import json
+
+from flask import Response, stream_with_context
+
+
+def format_sse(event, data):
+    """
+    Formatuje zdarzenie Server-Sent Events.
+
+    Args:
+        event: Nazwa zdarzenia
+        data: Dane zdarzenia (serializowane do JSON)
+
+    Returns:
+        str: Zdarzenie gotowe do wysłania
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    """
+    Tworzy odpowiedź text/event-stream z generatora par (zdarzenie, dane).
+
+    Args:
+        events: Generator krotek (nazwa zdarzenia, dane)
+
+    Returns:
+        Response: Odpowiedź strumieniowa Flask
+    """
+    def generate():
+        for event, data in events:
+            yield format_sse(event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Wyłącza buforowanie odpowiedzi w nginx
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -1,19 +1,104 @@
-from flask import Blueprint, render_template, request, url_for, redirect, flash
-from services.openai_service import analyze_dish
-from services.chart_service import create_chart
-from services.meal_service import add_meal, get_all_meals, get_meals_by_date, delete_meal, get_meals_statistics
-from datetime import datetime
+from flask import Blueprint, render_template, request, url_for, redirect, flash, abort, make_response, send_from_directory, g
+from services.openai_service import analyze_dish, analyze_dish_stream
+from services.async_openai_service import analyze_dish_async, run_async, AnalysisBusyError
+from controllers.sse import sse_response
+from controllers.http_cache import diary_conditional, immutable, CHART_MAX_AGE
+from controllers.identity import load_user_id
+from services.chart_service import create_chart, create_chart_payload, restore_chart, CHART_MODE, CHARTS_DIR
+from services.meal_service import add_meal, get_meals_page, get_meals_by_date, delete_meal, get_meals_statistics, get_day_summary
+from datetime import datetime, timedelta
+import logging
+import os
 
+logger = logging.getLogger(__name__)
 
-def create_web_blueprint(client):
+# Strumieniowanie wyników analizy (SSE): strona wyników wyświetla się od razu,
+# a mikroskładniki pojawiają się w miarę odpowiadania modelu
+ANALYSIS_STREAMING = os.getenv("ANALYSIS_STREAMING", "0") == "1"
+
+
+def _validate_form(dish_name, amount, date):
+    """
+    Waliduje dane formularza analizy.
+
+    Args:
+        dish_name: Nazwa potrawy
+        amount: Gramatura (tekst z formularza)
+        date: Data w formacie RRRR-MM-DD
+
+    Returns:
+        str: Komunikat błędu
+        None: Gdy dane są poprawne
+    """
+    if not dish_name:
+        return "Podaj nazwę potrawy!"
+    if not amount.isdigit():
+        return "Ilość musi być liczbą!"
+    if int(amount) <= 0:
+        return "Ilość musi być większa od 0!"
+    if int(amount) > 10000:
+        return "Ilość nie może przekraczać 10000g!"
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return "Data musi być w formacie RRRR-MM-DD!"
+    return None
+
+
+def _adjacent_day(day, days):
+    """
+    Dzień obok wskazanego (do nawigacji w dzienniku).
+
+    Returns:
+        str: Data w formacie RRRR-MM-DD
+        None: Gdy wypada poza zakres dat (przed 0001-01-01 albo po 9999-12-31)
+    """
+    try:
+        return (day + timedelta(days=days)).date().isoformat()
+    except OverflowError:
+        return None
+
+
+def _build_chart(dish_name, data, amount):
+    """
+    Generuje wykres (PNG na serwerze albo dane dla przeglądarki).
+
+    Returns:
+        tuple: (adres URL wykresu PNG lub None, dane wykresu SVG lub None)
+    """
+    if CHART_MODE == "client":
+        return None, create_chart_payload(dish_name, data, amount)
+
+    chart_path = create_chart(dish_name, data, amount)
+    if chart_path is None:
+        return None, None
+    # Nazwa pliku to skrót treści wykresu - adres nigdy nie zmienia zawartości
+    return url_for("web_bp.chart", filename=os.path.basename(chart_path)), None
+
+
+def create_web_blueprint(client, async_client=None):
     web_bp = Blueprint("web_bp", __name__)
 
+    @web_bp.before_request
+    def identify_user():
+        # Użytkownik (nagłówek proxy albo ciasteczko) - dziennik jest partycjonowany per użytkownik
+        try:
+            load_user_id()
+        except ValueError:
+            return "Nieprawidłowy identyfikator użytkownika", 400
+
+    def _analyze(dish_name, amount):
+        """Analiza potrawy - asynchronicznie, jeśli dostępny jest AsyncOpenAI."""
+        if async_client:
+            return run_async(analyze_dish_async(async_client, dish_name, amount))
+        return analyze_dish(client, dish_name, amount)
+
     @web_bp.route("/", methods=["GET", "POST"])
     def home():
         submitted = False
         dish_name = None
         error_msg = None
-        api_connected = client is not None
+        api_connected = client is not None or async_client is not None
 
         today = datetime.today().strftime("%Y-%m-%d")
 
@@ -33,19 +118,7 @@ def create_web_blueprint(client):
                 )
 
             # Walidacja danych wejściowych
-            if not dish_name:
-                error_msg = "Podaj nazwę potrawy!"
-            elif not amount.isdigit():
-                error_msg = "Ilość musi być liczbą!"
-            elif int(amount) <= 0:
-                error_msg = "Ilość musi być większa od 0!"
-            elif int(amount) > 10000:
-                error_msg = "Ilość nie może przekraczać 10000g!"
-            else:
-                try:
-                    datetime.strptime(date, "%Y-%m-%d")
-                except ValueError:
-                    error_msg = "Data musi być w formacie RRRR-MM-DD!"
+            error_msg = _validate_form(dish_name, amount, date)
 
             if error_msg:
                 return render_template(
@@ -58,29 +131,46 @@ def create_web_blueprint(client):
 
             amount_int = int(amount)
 
-            print(f"\n{'=' * 60}")
-            print(f"📥 [FORMULARZ] Odebrano dane:")
-            print(f"   • Potrawa: {dish_name}")
-            print(f"   • Ilość: {amount_int}g")
-            print(f"   • Data: {date}")
-            print(f"{'=' * 60}")
+            logger.info("[FORMULARZ] Potrawa: %s, %sg, %s", dish_name, amount_int, date,
+                        extra={"dish": dish_name, "amount": amount_int, "date": date})
+
+            if ANALYSIS_STREAMING:
+                # Wyniki dociągnie przeglądarka z /analyze/stream
+                return render_template(
+                    "result.html",
+                    dish=dish_name,
+                    amount=amount,
+                    date=date,
+                    streaming=True,
+                    submitted=True
+                )
 
             # Analiza potrawy z uwzględnieniem gramatury
-            data = analyze_dish(client, dish_name, amount_int)
+            try:
+                data = _analyze(dish_name, amount_int)
+            except AnalysisBusyError:
+                return render_template(
+                    "prototyp.html",
+                    submitted=False,
+                    api_connected=api_connected,
+                    error_msg="Serwer analizuje teraz zbyt wiele potraw. Spróbuj ponownie za chwilę.",
+                    today=today
+                )
 
             chart_error = False
             chart_path = None
+            chart_payload = None
 
             if data is None:
-                print("❌ [BŁĄD] Nie udało się pobrać danych z API")
+                logger.error("[FORMULARZ] Nie udało się pobrać danych z API")
                 error_msg = "Nie udało się przeanalizować potrawy. Spróbuj ponownie."
                 chart_error = True
             else:
-                # Generowanie wykresu
-                chart_path = create_chart(dish_name, data, amount_int)
+                # Generowanie wykresu (PNG na serwerze albo dane dla przeglądarki)
+                chart_path, chart_payload = _build_chart(dish_name, data, amount_int)
 
-                if chart_path is None:
-                    print("⚠️  [OSTRZEŻENIE] Nie udało się wygenerować wykresu")
+                if chart_path is None and chart_payload is None:
+                    logger.warning("[FORMULARZ] Nie udało się wygenerować wykresu")
                     chart_error = True
 
                 # ZAPIS DO DZIENNIKA
@@ -88,13 +178,12 @@ def create_web_blueprint(client):
                     dish_name=dish_name,
                     amount=amount_int,
                     date=date,
-                    nutrition_data=data
+                    nutrition_data=data,
+                    user_id=g.user_id
                 )
 
-                if save_success:
-                    print(f"✅ [DZIENNIK] Posiłek zapisany pomyślnie!")
-                else:
-                    print(f"❌ [DZIENNIK] Nie udało się zapisać posiłku")
+                if not save_success:
+                    logger.error("[DZIENNIK] Nie udało się zapisać posiłku")
 
             submitted = True
 
@@ -103,7 +192,8 @@ def create_web_blueprint(client):
                 dish=dish_name,
                 amount=amount,
                 date=date,
-                chart_path=url_for('static', filename='chart.png') if chart_path else None,
+                chart_path=chart_path,
+                chart_payload=chart_payload,
                 data=data,
                 error_msg=error_msg,
                 chart_error=chart_error,
@@ -118,30 +208,99 @@ def create_web_blueprint(client):
             today=today
         )
 
+    # Strumieniowanie analizy (Server-Sent Events) dla strony wyników
+    @web_bp.route("/analyze/stream", methods=["POST"])
+    def analyze_stream():
+        dish_name = request.form.get("dish_name", "").strip()
+        amount = request.form.get("amount", "").strip()
+        date = request.form.get("date", datetime.today().strftime("%Y-%m-%d")).strip()
+
+        error_msg = _validate_form(dish_name, amount, date)
+        if error_msg:
+            return sse_response(iter([("error", {"message": error_msg})]))
+
+        amount_int = int(amount)
+        user_id = g.user_id
+
+        def events():
+            for event, payload in analyze_dish_stream(client, dish_name, amount_int):
+                if event != "done":
+                    yield event, payload
+                    continue
+
+                data = payload["micronutrients"]
+                chart_url, chart_payload = _build_chart(dish_name, data, amount_int)
+                yield "chart", {"url": chart_url, "payload": chart_payload}
+
+                saved = add_meal(
+                    dish_name=dish_name,
+                    amount=amount_int,
+                    date=date,
+                    nutrition_data=data,
+                    user_id=user_id
+                )
+                if not saved:
+                    logger.error("[DZIENNIK] Nie udało się zapisać posiłku")
+
+                yield "saved", {"saved": bool(saved)}
+                yield "done", payload
+
+        return sse_response(events())
+
+    # Wykresy PNG pod adresami ze skrótem treści - przeglądarka trzyma je przez rok,
+    # a plik usunięty z cache wykresów jest renderowany od nowa z zapisanego opisu
+    @web_bp.route("/charts/<filename>")
+    def chart(filename):
+        if restore_chart(filename) is None:
+            abort(404)
+        return immutable(send_from_directory(os.path.abspath(CHARTS_DIR), filename, max_age=CHART_MAX_AGE))
+
     # NOWY ENDPOINT: Dziennik wszystkich posiłków
     @web_bp.route("/diary")
+    @diary_conditional
     def diary():
-        meals = get_all_meals()
-        stats = get_meals_statistics()
+        # Tylko pierwsza strona - kolejne dociąga przeglądarka z /diary/page
+        page = get_meals_page(user_id=g.user_id)
+        stats = get_meals_statistics(g.user_id)
 
         return render_template(
             "diary.html",
-            meals=meals,
+            meals=page["meals"],
+            next_cursor=page["next_cursor"],
             stats=stats
         )
 
+    # Kolejna strona dziennika jako fragment HTML (przewijanie)
+    @web_bp.route("/diary/page")
+    @diary_conditional
+    def diary_page():
+        try:
+            page = get_meals_page(cursor=request.args.get("cursor") or None, user_id=g.user_id)
+        except ValueError:
+            abort(400)
+
+        response = make_response(render_template("_diary_meals.html", meals=page["meals"]))
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return response
+
     # NOWY ENDPOINT: Posiłki z konkretnego dnia
     @web_bp.route("/diary/<date>")
+    @diary_conditional
     def diary_by_date(date):
         try:
             # Walidacja daty
-            datetime.strptime(date, "%Y-%m-%d")
-            meals = get_meals_by_date(date)
+            day = datetime.strptime(date, "%Y-%m-%d")
+            meals = get_meals_by_date(date, g.user_id)
+            summary = get_day_summary(date, g.user_id)
 
             return render_template(
                 "diary_by_date.html",
                 meals=meals,
-                date=date
+                date=date,
+                summary=summary,
+                previous_date=_adjacent_day(day, -1),
+                next_date=_adjacent_day(day, 1)
             )
         except ValueError:
             return "Nieprawidłowy format daty. Użyj YYYY-MM-DD", 400
@@ -149,13 +308,17 @@ def create_web_blueprint(client):
     # NOWY ENDPOINT: Usuwanie posiłku
     @web_bp.route("/diary/delete/<int:meal_id>", methods=["POST"])
     def delete_meal_route(meal_id):
-        success = delete_meal(meal_id)
+        success = delete_meal(meal_id, g.user_id)
 
-        if success:
-            print(f"✅ Usunięto posiłek ID: {meal_id}")
-        else:
-            print(f"❌ Nie udało się usunąć posiłku ID: {meal_id}")
+        if not success:
+            logger.warning("Nie udało się usunąć posiłku ID: %s", meal_id)
 
-        return redirect(url_for("web_bp.diary"))
+        # Usunięcie ze strony dnia wraca na stronę tego dnia
+        return_date = request.form.get("return_date", "")
+        try:
+            datetime.strptime(return_date, "%Y-%m-%d")
+            return redirect(url_for("web_bp.diary_by_date", date=return_date))
+        except ValueError:
+            return redirect(url_for("web_bp.diary"))
 
     return web_bp
\ No newline at end of file
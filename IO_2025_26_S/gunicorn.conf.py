@@ -0,0 +1,38 @@
+"""
+Konfiguracja gunicorna: gunicorn -c gunicorn.conf.py wsgi:app
+
+Wszystkie wartości można nadpisać zmiennymi środowiskowymi GUNICORN_*.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Procesy workerów - każdy ma własną pulę wykresów i pętlę asyncio klienta OpenAI
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+
+# Wątki w workerze: strumienie SSE (/api/analyze/stream) trzymają wątek
+# przez całą analizę, więc worker synchroniczny obsługiwałby jedno zapytanie naraz
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Analiza z ponowieniami mieści się w OPENAI_DEADLINE (domyślnie 25 s)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Aplikacja (i SDK openai, tabela potraw, składy) ładuje się raz w procesie
+# głównym; workery dostają ją po forku bez ponownego importu
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+if preload_app:
+    os.environ.setdefault("OPENAI_PRELOAD", "1")
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """Po forku: procesy renderujące wykresy startują w tle, zanim przyjdzie pierwsze zapytanie."""
+    if os.getenv("CHART_PREWARM", "1") == "1":
+        from services.chart_service import warm_chart_pool
+        warm_chart_pool()
@@ -0,0 +1,362 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from services.chart_service import CHART_MODE, create_chart, create_chart_payload
+from services.data_service import atomic_write_json, file_lock
+from services.meal_service import add_meal
+from services.metrics import register_collector
+from services.user_partition import DEFAULT_USER, user_data_dir
+
+logger = logging.getLogger(__name__)
+
+# Liczba wątków wykonujących zadania analiz (analiza -> wykres -> zapis);
+# ogranicza liczbę jednoczesnych analiz niezależnie od liczby wątków serwera
+# (domyślnie tyle, ile jednoczesnych zapytań do OpenAI - OPENAI_MAX_CONCURRENCY)
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "8"))
+
+# Maksymalna liczba zadań czekających w kolejce; kolejne są odrzucane
+JOB_QUEUE_SIZE = int(os.getenv("ANALYSIS_JOB_QUEUE", "64"))
+
+# Po ilu sekundach od ostatniej zmiany pliki zadań są usuwane
+JOB_TTL = float(os.getenv("ANALYSIS_JOB_TTL", "86400"))
+
+# Zadanie bez zmiany stanu dłużej niż tyle sekund uznajemy za przerwane
+# (np. restart workera, który trzymał je w pamięci); stan failed jest
+# zapisywany w pliku, a wątek, który mimo to dokończy analizę, go respektuje
+JOB_STALE_AFTER = float(os.getenv("ANALYSIS_JOB_STALE_AFTER", "600"))
+
+# Podpowiedź dla klienta (nagłówek Retry-After) przy pełnej kolejce
+JOB_RETRY_AFTER = int(os.getenv("ANALYSIS_JOB_RETRY_AFTER", "5"))
+
+# Katalog zadań w katalogu użytkownika
+JOBS_DIR = "jobs"
+
+# Maksymalna długość klucza idempotencji (nagłówek Idempotency-Key)
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+
+# Co ile sekund (najczęściej) sprzątamy katalog zadań jednego użytkownika
+_PRUNE_INTERVAL = 60.0
+
+_JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+_queue = None
+_workers_lock = threading.Lock()
+_running = 0
+_stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+_stats_lock = threading.Lock()
+_last_prune = {}
+
+
+class JobQueueFullError(Exception):
+    """Kolejka zadań analiz jest pełna - zgłoszenie zostało odrzucone."""
+
+
+class IdempotencyConflictError(Exception):
+    """Klucz idempotencji był już użyty dla innej potrawy, gramatury lub daty."""
+
+
+def _count(event: str):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _jobs_dir(user_id: str) -> str:
+    return os.path.join(user_data_dir(user_id), JOBS_DIR)
+
+
+def _job_path(user_id: str, job_id: str) -> str:
+    return os.path.join(_jobs_dir(user_id), f"{job_id}.json")
+
+
+def _save_job(user_id: str, job: Dict):
+    os.makedirs(_jobs_dir(user_id), exist_ok=True)
+    atomic_write_json(_job_path(user_id, job["id"]), job)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _ensure_workers() -> queue.Queue:
+    """Tworzy (przy pierwszym zgłoszeniu) kolejkę i wątki wykonujące zadania."""
+    global _queue
+
+    with _workers_lock:
+        if _queue is None:
+            jobs = queue.Queue(maxsize=JOB_QUEUE_SIZE)
+            for index in range(JOB_WORKERS):
+                threading.Thread(target=_worker, args=(jobs,), name=f"analysis-job-{index}", daemon=True).start()
+            _queue = jobs
+            logger.info("[ZADANIA] Uruchomiono %d wątków zadań (kolejka do %d)", JOB_WORKERS, JOB_QUEUE_SIZE)
+
+    return _queue
+
+
+def _worker(jobs: queue.Queue):
+    global _running
+
+    while True:
+        analyze, user_id, job = jobs.get()
+        with _stats_lock:
+            _running += 1
+        try:
+            _run_job(analyze, user_id, job)
+        except Exception:
+            logger.exception("[ZADANIA] Nieoczekiwany błąd zadania %s", job["id"])
+        finally:
+            with _stats_lock:
+                _running -= 1
+            jobs.task_done()
+        _prune_jobs(user_id)
+
+
+def _fail(user_id: str, job: Dict, message: str):
+    job.update(state="failed", error=message, finished_at=_now())
+    _save_job(user_id, job)
+    _count("failed")
+
+
+def _abandoned(user_id: str, job: Dict) -> bool:
+    """
+    Czy zadanie zostało już uznane za przerwane (get_job zapisał failed).
+
+    Wywoływane pod file_lock pliku zadania - ponowione zgłoszenie z tym samym
+    kluczem idempotencji mogło już uruchomić nowe zadanie.
+    """
+    current = _read_json(_job_path(user_id, job["id"]))
+    if current is not None and current["state"] != "failed":
+        return False
+    logger.warning("[ZADANIA] Zadanie %s uznano za przerwane - nie kończę go", job["id"])
+    return True
+
+
+def _run_job(analyze: Callable, user_id: str, job: Dict):
+    """Analiza -> wykres -> zapis do dziennika; stan zadania jest zapisywany po każdym etapie."""
+    path = _job_path(user_id, job["id"])
+    with file_lock(path):
+        if _abandoned(user_id, job):
+            return
+        job.update(state="running", started_at=_now())
+        _save_job(user_id, job)
+
+    dish_name, amount, date = job["dish"], job["amount"], job["date"]
+    try:
+        data = analyze(dish_name, amount)
+    except Exception as e:
+        logger.warning("[ZADANIA] Analiza \"%s\" przerwana: %s", dish_name, e, extra={"dish": dish_name})
+        data = None
+
+    if data is None:
+        _fail(user_id, job, "Nie udało się przeanalizować potrawy. Spróbuj ponownie.")
+        return
+
+    result = {"micronutrients": data, "chart_file": None, "chart_payload": None}
+    if CHART_MODE == "client":
+        result["chart_payload"] = create_chart_payload(dish_name, data, amount)
+    else:
+        chart_path = create_chart(dish_name, data, amount)
+        result["chart_file"] = os.path.basename(chart_path) if chart_path else None
+    job["result"] = result
+
+    # Sprawdzenie stanu i zapis posiłku pod blokadą zadania - get_job nie
+    # uzna go w tym czasie za przerwane
+    with file_lock(path):
+        if _abandoned(user_id, job):
+            return
+        if not add_meal(dish_name=dish_name, amount=amount, date=date, nutrition_data=data, user_id=user_id):
+            _fail(user_id, job, "Nie udało się zapisać posiłku w dzienniku.")
+            return
+
+        job.update(state="succeeded", finished_at=_now())
+        _save_job(user_id, job)
+    _count("succeeded")
+    logger.info("[ZADANIA] Zadanie %s zakończone: %s (%sg)", job["id"], dish_name, amount,
+                extra={"dish": dish_name, "amount": amount})
+
+
+def _prune_jobs(user_id: str):
+    """Usuwa z katalogu użytkownika zadania i klucze idempotencji starsze niż JOB_TTL."""
+    now = time.time()
+    if now - _last_prune.get(user_id, 0) < _PRUNE_INTERVAL:
+        return
+    if len(_last_prune) >= 4096:
+        _last_prune.clear()
+    _last_prune[user_id] = now
+
+    try:
+        with os.scandir(_jobs_dir(user_id)) as entries:
+            for entry in entries:
+                if entry.stat().st_mtime < now - JOB_TTL:
+                    os.remove(entry.path)
+    except OSError as e:
+        logger.warning("[ZADANIA] Nie udało się posprzątać zadań: %s", e)
+
+
+def _enqueue(analyze: Callable, dish_name: str, amount: int, date: str, user_id: str) -> Dict:
+    jobs = _ensure_workers()
+    job = {
+        "id": uuid.uuid4().hex,
+        "state": "queued",
+        "dish": dish_name,
+        "amount": amount,
+        "date": date,
+        "submitted_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None
+    }
+    # Plik powstaje przed wstawieniem do kolejki - wątek zadania może go od razu nadpisać
+    _save_job(user_id, job)
+    try:
+        jobs.put_nowait((analyze, user_id, dict(job)))
+    except queue.Full:
+        os.remove(_job_path(user_id, job["id"]))
+        _count("rejected")
+        raise JobQueueFullError(f"W kolejce czeka już {jobs.qsize()} zadań") from None
+
+    _count("submitted")
+    return job
+
+
+def submit_analysis(analyze: Callable, dish_name: str, amount: int, date: str,
+                    user_id: str = DEFAULT_USER, idempotency_key: Optional[str] = None) -> Tuple[Dict, bool]:
+    """
+    Zgłasza analizę potrawy do wykonania w tle (analiza, wykres, zapis do dziennika).
+
+    Zgłoszenie z kluczem idempotencji, który był już użyty przez tego
+    użytkownika, zwraca istniejące zadanie zamiast tworzyć nowe - ponowione
+    zapytanie (np. po przekroczeniu czasu po stronie klienta) nie zapisze
+    posiłku drugi raz. Wyjątkiem jest zadanie zakończone błędem: posiłek
+    nie został wtedy zapisany, więc klucz uruchamia analizę ponownie.
+
+    Args:
+        analyze: Funkcja (nazwa potrawy, gramatura) -> słownik mikroskładników lub None
+        dish_name: Nazwa potrawy
+        amount: Gramatura w gramach
+        date: Data posiłku w formacie YYYY-MM-DD
+        user_id: Identyfikator użytkownika
+        idempotency_key: Klucz idempotencji (opcjonalny)
+
+    Returns:
+        Krotka (zadanie, True gdy utworzono nowe zadanie)
+
+    Raises:
+        ValueError: Gdy klucz idempotencji jest pusty lub za długi
+        IdempotencyConflictError: Gdy klucz był użyty dla innego zgłoszenia
+        JobQueueFullError: Gdy kolejka zadań jest pełna
+    """
+    if idempotency_key is None:
+        return _enqueue(analyze, dish_name, amount, date, user_id), True
+
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValueError(f"Klucz idempotencji musi mieć od 1 do {IDEMPOTENCY_KEY_MAX_LENGTH} znaków")
+
+    request = {"dish": dish_name, "amount": amount, "date": date}
+    digest = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()[:32]
+    key_path = os.path.join(_jobs_dir(user_id), f"key-{digest}.json")
+
+    # Blokada międzyprocesowa - równoległe ponowienia trafiające do różnych workerów
+    # widzą to samo zadanie
+    with file_lock(key_path):
+        existing = _read_json(key_path)
+        if existing is not None:
+            if existing.get("request") != request:
+                raise IdempotencyConflictError("Klucz idempotencji był już użyty dla innego zgłoszenia")
+            job = get_job(existing["job_id"], user_id)
+            if job is not None and job["state"] != "failed":
+                _count("deduplicated")
+                return job, False
+
+        job = _enqueue(analyze, dish_name, amount, date, user_id)
+        atomic_write_json(key_path, {"job_id": job["id"], "request": request})
+        return job, True
+
+
+def get_job(job_id: str, user_id: str = DEFAULT_USER) -> Optional[Dict]:
+    """
+    Zwraca stan zadania użytkownika.
+
+    Zadania są w plikach (katalog jobs/ w katalogu użytkownika), więc stan
+    jest widoczny we wszystkich workerach serwera, nie tylko w tym, który
+    wykonuje zadanie. Zadanie bez zmian dłużej niż JOB_STALE_AFTER jest
+    trwale oznaczane jako failed (wątek, który by je dokończył, tego nie zrobi).
+
+    Args:
+        job_id: Identyfikator zadania
+        user_id: Identyfikator użytkownika (zadania innych użytkowników są niewidoczne)
+
+    Returns:
+        Słownik zadania (state: queued, running, succeeded, failed) lub None
+    """
+    if not _JOB_ID_PATTERN.fullmatch(job_id or ""):
+        return None
+
+    path = _job_path(user_id, job_id)
+    job = _read_json(path)
+    if job is None:
+        return None
+
+    if job["state"] in ("queued", "running") and _idle_seconds(path) > JOB_STALE_AFTER:
+        with file_lock(path):
+            # Stan mógł się zmienić, zanim dostaliśmy blokadę
+            job = _read_json(path)
+            if job is None:
+                return None
+            if job["state"] in ("queued", "running") and _idle_seconds(path) > JOB_STALE_AFTER:
+                job.update(state="failed", error="Zadanie zostało przerwane. Zgłoś analizę ponownie.",
+                           finished_at=_now())
+                _save_job(user_id, job)
+                _count("failed")
+    return job
+
+
+def _idle_seconds(path: str) -> float:
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def get_job_stats() -> Dict:
+    """
+    Zwraca obciążenie kolejki zadań w bieżącym procesie.
+
+    Returns:
+        Słownik z liczbą zadań w kolejce i w toku, limitami oraz licznikami
+        submitted, deduplicated, rejected, succeeded, failed
+    """
+    return {
+        **_stats,
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "running": _running,
+        "workers": JOB_WORKERS,
+        "max_queued": JOB_QUEUE_SIZE
+    }
+
+
+register_collector(
+    "smartdiet_analysis_jobs_total", "Zadania analiz: zgłoszone, powtórzone (klucz idempotencji), odrzucone, zakończone",
+    "counter", ("event",), lambda: {(event,): count for event, count in _stats.items()}
+)
+register_collector(
+    "smartdiet_analysis_jobs_queued", "Zadania analiz czekające w kolejce", "gauge",
+    (), lambda: {(): _queue.qsize() if _queue is not None else 0}
+)
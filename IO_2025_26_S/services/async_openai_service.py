@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from services.nutrient_cache import get_cached_nutrients, normalize_dish_name
+from services.openai_service import (
+    BASE_AMOUNT,
+    BATCH_CHUNK_SIZE,
+    _assemble_batch_results,
+    _calculate_proportional_values,
+    _fill_from_stale,
+    _parse_batch_completion,
+    _parse_completion,
+    _parse_recipe_completion,
+    _split_cached,
+    decomposition_step,
+    decomposition_steps,
+    finish_flight,
+    get_known_nutrients,
+    join_flight,
+    remember_nutrients,
+    serve_stale,
+    should_decompose,
+)
+from services.metrics import register_collector
+from services.prompts import RECIPE_TEMPLATE, get_prompt_template
+from services.resilience import OPENAI_DEADLINE, call_with_retries_async
+from services.token_usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Maksymalna liczba jednoczesnych zapytań do OpenAI API
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+# Wątki HTTP jednego workera (gunicorn.conf.py: threads)
+SERVER_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Maksymalna liczba analiz czekających na wynik; kolejne dostają od razu błąd.
+# Czekająca analiza zajmuje wątek HTTP, więc limit musi być mniejszy niż
+# liczba wątków workera - domyślnie połowa zostaje dla /diary i reszty stron
+MAX_PENDING_ANALYSES = int(os.getenv("OPENAI_MAX_PENDING", str(max(1, SERVER_THREADS // 2))))
+
+# Maksymalny czas oczekiwania wątku HTTP na wynik analizy (w sekundach) -
+# analiza z ponowieniami i tak kończy się po OPENAI_DEADLINE
+ANALYSIS_TIMEOUT = float(os.getenv("OPENAI_ANALYSIS_TIMEOUT", str(OPENAI_DEADLINE + 5)))
+
+_loop = None
+_semaphore = None
+_loop_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class AnalysisBusyError(Exception):
+    """Zbyt wiele analiz w toku - zapytanie zostało odrzucone."""
+
+
+def _get_loop():
+    """Uruchamia (przy pierwszym użyciu) pętlę asyncio we wątku w tle."""
+    global _loop, _semaphore
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="openai-async-loop", daemon=True).start()
+            _semaphore = asyncio.run_coroutine_threadsafe(_create_semaphore(), loop).result()
+            _loop = loop
+
+    return _loop
+
+
+async def _create_semaphore():
+    """Tworzy semafor w kontekście pętli w tle."""
+    return asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+async def _blocking(func, *args):
+    """
+    Wykonuje funkcję z operacjami na plikach (cache, tabela potraw) w puli
+    wątków, żeby nie blokowała pętli obsługującej wszystkie analizy.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def run_async(coro, timeout=ANALYSIS_TIMEOUT, limit_pending=True):
+    """
+    Wykonuje korutynę na wspólnej pętli w tle i czeka na jej wynik.
+
+    Wszystkie zapytania do API z obu blueprintów trafiają do jednej pętli,
+    więc oczekiwanie na OpenAI (i przerwy między próbami) nie zajmuje
+    osobnego wątku na każde zapytanie, a liczba analiz w toku jest
+    ograniczona przez MAX_PENDING_ANALYSES.
+
+    Args:
+        coro: Korutyna do wykonania
+        timeout: Maksymalny czas oczekiwania w sekundach
+        limit_pending: Czy oczekiwanie wlicza się do MAX_PENDING_ANALYSES
+            (False dla wątków zadań w tle - te mają własny limit JOB_WORKERS
+            i nie zajmują wątków HTTP)
+
+    Returns:
+        Wynik korutyny
+
+    Raises:
+        AnalysisBusyError: Gdy w toku jest już MAX_PENDING_ANALYSES analiz
+    """
+    global _pending
+
+    if limit_pending:
+        with _pending_lock:
+            if _pending >= MAX_PENDING_ANALYSES:
+                coro.close()
+                raise AnalysisBusyError(f"W toku jest już {_pending} analiz")
+            _pending += 1
+
+    try:
+        future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error("[ASYNC] Przekroczono czas oczekiwania na analizę (%ss)", timeout)
+            return None
+    finally:
+        if limit_pending:
+            with _pending_lock:
+                _pending -= 1
+
+
+def get_async_stats():
+    """
+    Zwraca bieżące obciążenie ścieżki asynchronicznej.
+
+    Returns:
+        Słownik z liczbą analiz w toku i limitami
+    """
+    return {
+        "pending": _pending,
+        "max_pending": MAX_PENDING_ANALYSES,
+        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS
+    }
+
+
+register_collector(
+    "smartdiet_async_pending_analyses", "Analizy czekające na ścieżce asynchronicznej", "gauge",
+    (), lambda: {(): _pending}
+)
+
+
+async def analyze_dish_async(client, name, amount=100):
+    """
+    Asynchroniczny odpowiednik openai_service.analyze_dish.
+
+    Args:
+        client: Klient AsyncOpenAI
+        name: Nazwa potrawy
+        amount: Gramatura potrawy
+
+    Returns:
+        dict: Dane o mikroskładnikach przeliczone na podaną gramaturę
+        None: W przypadku błędu
+    """
+    cached = await _blocking(get_known_nutrients, name)
+    if cached:
+        logger.debug("[LOKALNIE] Znane wartości dla \"%s\" - przeliczam na %sg", name, amount)
+        return _calculate_proportional_values(cached, amount, BASE_AMOUNT)
+
+    if not client:
+        logger.error("Brak połączenia z OpenAI API")
+        return None
+
+    key = normalize_dish_name(name)
+    flight, leader = join_flight(key)
+    if not leader:
+        # Ta sama potrawa jest właśnie analizowana (w pętli albo w innym wątku)
+        logger.debug("[COALESCE] Dołączam do trwającej analizy \"%s\"", name)
+        # shield: anulowanie tego czekającego nie może anulować wspólnego wyniku
+        base_data = await asyncio.shield(asyncio.wrap_future(flight))
+    else:
+        base_data = None
+        try:
+            base_data = await _blocking(get_cached_nutrients, name)
+            if base_data is None and should_decompose(name):
+                base_data = await _decompose_dish_async(client, name)
+            if base_data is None:
+                base_data = await _fetch_nutrients_async(client, name, BASE_AMOUNT)
+                if base_data is not None:
+                    await _blocking(remember_nutrients, name, base_data)
+                else:
+                    base_data = await _blocking(serve_stale, name)
+        finally:
+            finish_flight(key, flight, base_data)
+
+    if base_data is None:
+        return None
+
+    return _calculate_proportional_values(base_data, amount, BASE_AMOUNT)
+
+
+async def _decompose_dish_async(client, name):
+    """
+    Asynchroniczny odpowiednik openai_service._decompose_dish: te same kroki
+    (decomposition_steps), zapytania przez AsyncOpenAI, a operacje na
+    plikach (składy, cache) w puli wątków.
+    """
+    steps = decomposition_steps(name)
+    request, result = await _blocking(decomposition_step, steps)
+    while request:
+        kind, argument = request
+        if kind == "recipe":
+            answer = await _fetch_recipe_async(client, argument)
+        else:
+            answer = await _fetch_nutrients_batch_async(client, argument)
+        request, result = await _blocking(decomposition_step, steps, answer)
+    return result
+
+
+async def _fetch_recipe_async(client, name):
+    """Prosi model o skład potrawy (z ponawianiem prób)."""
+    return await call_with_retries_async(
+        lambda timeout: _create_completion_async(client, RECIPE_TEMPLATE, "recipe", RECIPE_TEMPLATE.messages(name), timeout),
+        lambda response: _parse_recipe_completion(response.choices[0].message.content),
+        label="SKŁAD"
+    )
+
+
+async def _fetch_nutrients_async(client, name, amount):
+    """
+    Pobiera mikroskładniki potrawy z API (z ponawianiem prób).
+
+    Args:
+        client: Klient AsyncOpenAI
+        name: Nazwa potrawy
+        amount: Gramatura, dla której model ma podać wartości
+
+    Returns:
+        dict: Zwalidowane dane o mikroskładnikach
+        None: W przypadku błędu
+    """
+    logger.info("[ASYNC] Potrawa: %s", name, extra={"dish": name})
+    template = get_prompt_template()
+
+    data = await call_with_retries_async(
+        lambda timeout: _create_completion_async(client, template, "dish", template.messages(name, amount), timeout),
+        lambda response: _parse_completion(response.choices[0].message.content, name, amount, template),
+        label="ASYNC"
+    )
+
+    if data is None:
+        logger.error("[ASYNC] Nie udało się przeanalizować potrawy \"%s\"", name, extra={"dish": name})
+    return data
+
+
+async def _create_completion_async(client, template, kind, messages, timeout, batch_size=None):
+    """
+    Asynchroniczny odpowiednik openai_service.create_completion
+    (z ograniczeniem liczby jednoczesnych zapytań).
+    """
+    async with _semaphore:
+        start = time.perf_counter()
+        response = await client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            timeout=timeout,
+            **template.request_options(batch_size)
+        )
+    record_usage(kind, template.version, response.usage, time.perf_counter() - start,
+                 response.choices[0].finish_reason if response.choices else None)
+    return response
+
+
+async def analyze_dishes_async(client, items):
+    """
+    Asynchroniczny odpowiednik openai_service.analyze_dishes.
+
+    Args:
+        client: Klient AsyncOpenAI
+        items: Lista słowników {"dish": nazwa, "amount": gramatura}
+
+    Returns:
+        list: Wyniki w kolejności wejścia
+    """
+    base_values, missing = await _blocking(_split_cached, items)
+
+    if missing and client:
+        names = list(missing.values())
+        chunks = [names[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(names), BATCH_CHUNK_SIZE)]
+
+        chunk_results = await asyncio.gather(
+            *(_fetch_nutrients_batch_async(client, chunk) for chunk in chunks)
+        )
+        for chunk_result in chunk_results:
+            for name, data in chunk_result.items():
+                await _blocking(remember_nutrients, name, data)
+                base_values[normalize_dish_name(name)] = data
+    elif missing:
+        logger.error("Brak połączenia z OpenAI API")
+
+    await _blocking(_fill_from_stale, base_values, missing)
+    return _assemble_batch_results(items, base_values)
+
+
+async def _fetch_nutrients_batch_async(client, names):
+    """
+    Pobiera mikroskładniki kilku potraw jednym zapytaniem do API.
+
+    Args:
+        client: Klient AsyncOpenAI
+        names: Lista nazw potraw
+
+    Returns:
+        dict: Nazwa potrawy -> zwalidowane wartości na BASE_AMOUNT gramów
+    """
+    logger.info("[BATCH] Zapytanie o %d potraw", len(names))
+    template = get_prompt_template()
+
+    results = await call_with_retries_async(
+        lambda timeout: _create_completion_async(
+            client, template, "batch", template.batch_messages(names, BASE_AMOUNT), timeout, len(names)
+        ),
+        lambda response: _parse_batch_completion(response.choices[0].message.content, names, template),
+        label="BATCH"
+    )
+
+    if not results:
+        logger.error("[BATCH] Nie udało się przeanalizować paczki %d potraw", len(names))
+    return results or {}
\ No newline at end of file
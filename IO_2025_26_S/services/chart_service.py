@@ -1,86 +1,312 @@
-import matplotlib
-matplotlib.use('Agg')
-
-import matplotlib.pyplot as plt
+import hashlib
+import json
+import logging
+import multiprocessing
 import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from services.data_service import atomic_write_json
+from services.metrics import CHART_RENDER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CHARTS_DIR = os.path.join('static', 'charts')
+
+# Tryb wykresu: "png" (renderowanie matplotlib na serwerze) lub "client"
+# (serwer wysyła tylko dane, a wykres SVG rysuje przeglądarka)
+CHART_MODE = os.getenv("CHART_MODE", "png").lower()
+
+# Liczba procesów renderujących wykresy
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+
+# Ile wykresów trzymamy na dysku (najdawniej używane są usuwane)
+CHART_CACHE_MAX_FILES = int(os.getenv("CHART_CACHE_MAX_FILES", "200"))
+
+# Ile opisów wykresów (<skrót>.json - potrawa, gramatura, dane) trzymamy, żeby
+# odtworzyć usunięty PNG, gdy przeglądarka poprosi o jego adres (ok. 1 KB każdy)
+CHART_SPEC_MAX_FILES = int(os.getenv("CHART_SPEC_MAX_FILES", "10000"))
+
+# Maksymalny czas renderowania jednego wykresu (w sekundach)
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "30"))
+
+_CHART_FILE_PATTERN = re.compile(r"([0-9a-f]{32})\.png")
+
+_pool = None
+_pool_lock = threading.Lock()
+
 
 def create_chart(dish_name, data, amount=100):
     """
     Tworzy wykres słupkowy mikroskładników z informacją o gramaturze.
-    
+
+    Nazwa pliku to skrót z potrawy, gramatury i danych, więc równoczesne
+    analizy nie nadpisują sobie wykresów, a identyczny wykres jest
+    zwracany z dysku bez ponownego renderowania. Obok zapisywany jest
+    opis wykresu, z którego restore_chart odtwarza usunięty plik.
+
     Args:
         dish_name: Nazwa potrawy
         data: Słownik z danymi mikroskładników
         amount: Gramatura potrawy w gramach
-    
+
     Returns:
         str: Ścieżka do zapisanego wykresu
         None: W przypadku błędu
     """
+    start = time.perf_counter()
     try:
-        # Konfiguracja wykresu
-        plt.figure(figsize=(12, 7))
-        
-        # Tworzenie wykresu słupkowego
-        bars = plt.bar(
-            data.keys(), 
-            data.values(), 
-            color='lightgreen', 
-            edgecolor='black',
-            linewidth=1.5
-        )
-        
-        # Dodanie wartości nad słupkami
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(
-                bar.get_x() + bar.get_width()/2., 
-                height,
-                f'{height:.1f}',
-                ha='center', 
-                va='bottom',
-                fontsize=10,
-                fontweight='bold'
-            )
-        
-        # Tytuł z informacją o gramaturze
-        plt.title(
-            f"Zawartość mikroskładników: {dish_name} ({amount}g)", 
-            fontsize=16, 
-            fontweight='bold',
-            pad=20
-        )
-        
-        plt.xlabel("Mikroskładnik", fontsize=12, fontweight='bold')
-        plt.ylabel("Ilość (mg lub µg)", fontsize=12, fontweight='bold')
-        
-        # Siatka dla lepszej czytelności
-        plt.grid(axis='y', linestyle='--', alpha=0.7, linewidth=0.8)
-        
-        # Rotacja etykiet na osi X
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        plt.yticks(fontsize=10)
-        
-        # Dodanie informacji o gramaturze na dole wykresu
-        plt.figtext(
-            0.99, 0.01, 
-            f'Gramatura: {amount}g', 
-            ha='right', 
-            fontsize=9, 
-            style='italic',
-            color='gray'
-        )
-        
-        # Zapisanie wykresu
-        chart_path = os.path.join('static', 'chart.png')
-        plt.tight_layout()
-        plt.savefig(chart_path, dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close()
-        
-        print(f"✅ [WYKRES] Wygenerowano wykres: {chart_path}")
+        key = _chart_key(dish_name, data, amount)
+        chart_path = os.path.join(CHARTS_DIR, f"{key}.png")
+        spec_path = os.path.join(CHARTS_DIR, f"{key}.json")
+
+        if os.path.exists(chart_path):
+            # Odświeżamy czas modyfikacji - to on decyduje o kolejności usuwania
+            os.utime(chart_path)
+            if os.path.exists(spec_path):
+                os.utime(spec_path)
+            CHART_RENDER_SECONDS.observe(time.perf_counter() - start, result="cached")
+            logger.debug("[WYKRES] Wykres z cache: %s", chart_path)
+            return chart_path
+
+        os.makedirs(CHARTS_DIR, exist_ok=True)
+
+        try:
+            _get_pool().submit(_render_chart, chart_path, dish_name, data, amount).result(CHART_RENDER_TIMEOUT)
+        except BrokenProcessPool:
+            logger.warning("[WYKRES] Pula procesów niedostępna - renderuję w bieżącym procesie")
+            _reset_pool()
+            _render_chart(chart_path, dish_name, data, amount)
+
+        if not os.path.exists(spec_path):
+            atomic_write_json(spec_path, {"dish": dish_name, "amount": amount, "data": data})
+        _evict_old_charts()
+
+        CHART_RENDER_SECONDS.observe(time.perf_counter() - start, result="rendered")
+        logger.info("[WYKRES] Wygenerowano wykres: %s", chart_path)
+        return chart_path
+
+    except Exception:
+        logger.exception("[WYKRES] Błąd przy tworzeniu wykresu")
+        return None
+
+
+def restore_chart(filename):
+    """
+    Zwraca ścieżkę wykresu o podanej nazwie, renderując go od nowa, jeśli
+    plik został usunięty przy czyszczeniu cache.
+
+    Adresy wykresów są niezmienne (przeglądarka trzyma je przez rok), więc
+    strona wyrenderowana przed usunięciem pliku nadal musi go dostać.
+
+    Args:
+        filename: Nazwa pliku (<skrót treści>.png)
+
+    Returns:
+        str: Ścieżka do wykresu
+        None: Gdy nazwa jest nieprawidłowa albo nie ma już opisu wykresu
+    """
+    match = _CHART_FILE_PATTERN.fullmatch(filename)
+    if not match:
+        return None
+
+    chart_path = os.path.join(CHARTS_DIR, filename)
+    if os.path.exists(chart_path):
         return chart_path
 
+    try:
+        with open(os.path.join(CHARTS_DIR, f"{match.group(1)}.json"), "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    logger.debug("[WYKRES] Odtwarzanie usuniętego wykresu: %s", filename)
+    restored = create_chart(spec["dish"], spec["data"], spec["amount"])
+    # Ten sam opis daje ten sam skrót - inny oznacza uszkodzony plik opisu
+    return restored if restored == chart_path else None
+
+
+def create_chart_payload(dish_name, data, amount=100):
+    """
+    Przygotowuje dane wykresu do narysowania w przeglądarce (tryb "client").
+
+    Serwer nie rasteryzuje niczego, a matplotlib nie jest importowany.
+
+    Args:
+        dish_name: Nazwa potrawy
+        data: Słownik z danymi mikroskładników
+        amount: Gramatura potrawy w gramach
+
+    Returns:
+        dict: Tytuł, etykiety i wartości słupków
+        None: W przypadku błędu
+    """
+    try:
+        with CHART_RENDER_SECONDS.time(result="payload"):
+            return {
+                "title": f"Zawartość mikroskładników: {dish_name} ({amount}g)",
+                "amount": amount,
+                "labels": list(data.keys()),
+                "values": [float(value) for value in data.values()]
+            }
+    except Exception:
+        logger.exception("[WYKRES] Błąd przy przygotowaniu danych wykresu")
+        return None
+
+
+def _chart_key(dish_name, data, amount):
+    """Skrót treści wykresu - identyczne dane dają identyczną nazwę pliku."""
+    payload = json.dumps(
+        {"dish": dish_name, "amount": amount, "data": data},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _get_pool():
+    """Tworzy (przy pierwszym użyciu) pulę procesów renderujących."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CHART_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _warm_up_renderer():
+    """Importuje matplotlib w procesie puli (uruchamiane w procesie puli)."""
+    from matplotlib.figure import Figure  # noqa: F401
+    from matplotlib.backends import backend_agg  # noqa: F401
+    return os.getpid()
+
+
+def warm_chart_pool():
+    """
+    Uruchamia procesy renderujące i ładuje w nich matplotlib w tle.
+
+    Bez tego pierwszy wykres po starcie workera czeka na uruchomienie
+    procesu i import matplotlib (ok. 1 s). Nie blokuje wywołującego;
+    w trybie CHART_MODE=client nic nie robi. Wywoływać po forku workera
+    (gunicorn.conf.py: post_worker_init) - pula nie przeżywa forka.
+    """
+    if CHART_MODE != "png":
+        return
+    try:
+        pool = _get_pool()
+        for _ in range(CHART_WORKERS):
+            pool.submit(_warm_up_renderer)
+        logger.debug("[WYKRES] Rozgrzewanie %d procesów renderujących", CHART_WORKERS)
+    except Exception as e:
+        logger.warning("[WYKRES] Nie udało się rozgrzać puli wykresów: %s", e)
+
+
+def _reset_pool():
+    """Porzuca uszkodzoną pulę - kolejne wywołanie utworzy nową."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _evict_old_charts():
+    """
+    Usuwa najdawniej używane wykresy ponad limit CHART_CACHE_MAX_FILES
+    i najstarsze opisy wykresów ponad limit CHART_SPEC_MAX_FILES.
+    """
+    try:
+        charts, specs = [], []
+        for entry in os.scandir(CHARTS_DIR):
+            if entry.name.endswith(".png"):
+                charts.append(entry)
+            elif entry.name.endswith(".json"):
+                specs.append(entry)
+
+        for entries, limit in ((charts, CHART_CACHE_MAX_FILES), (specs, CHART_SPEC_MAX_FILES)):
+            if len(entries) <= limit:
+                continue
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - limit]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
     except Exception as e:
-        print(f"❌ [WYKRES] Błąd przy tworzeniu wykresu: {e}")
-        plt.close()  # Upewniamy się, że figura jest zamknięta
-        return None
\ No newline at end of file
+        logger.warning("[WYKRES] Błąd czyszczenia cache wykresów: %s", e)
+
+
+def _render_chart(chart_path, dish_name, data, amount):
+    """
+    Renderuje wykres do pliku (uruchamiane w procesie puli).
+
+    Używa obiektowego API (Figure) zamiast globalnego stanu pyplot,
+    więc równoległe renderowania nie wpływają na siebie.
+    """
+    from matplotlib.figure import Figure
+
+    # Konfiguracja wykresu
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+
+    # Tworzenie wykresu słupkowego
+    bars = ax.bar(
+        list(data.keys()),
+        list(data.values()),
+        color='lightgreen',
+        edgecolor='black',
+        linewidth=1.5
+    )
+
+    # Dodanie wartości nad słupkami
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width()/2.,
+            height,
+            f'{height:.1f}',
+            ha='center',
+            va='bottom',
+            fontsize=10,
+            fontweight='bold'
+        )
+
+    # Tytuł z informacją o gramaturze
+    ax.set_title(
+        f"Zawartość mikroskładników: {dish_name} ({amount}g)",
+        fontsize=16,
+        fontweight='bold',
+        pad=20
+    )
+
+    ax.set_xlabel("Mikroskładnik", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Ilość (mg lub µg)", fontsize=12, fontweight='bold')
+
+    # Siatka dla lepszej czytelności
+    ax.grid(axis='y', linestyle='--', alpha=0.7, linewidth=0.8)
+
+    # Rotacja etykiet na osi X
+    ax.tick_params(axis='x', labelrotation=45, labelsize=10)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.tick_params(axis='y', labelsize=10)
+
+    # Dodanie informacji o gramaturze na dole wykresu
+    fig.text(
+        0.99, 0.01,
+        f'Gramatura: {amount}g',
+        ha='right',
+        fontsize=9,
+        style='italic',
+        color='gray'
+    )
+
+    # Zapis do pliku tymczasowego i podmiana - nikt nie zobaczy połowy pliku
+    tmp_path = f"{chart_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    fig.savefig(tmp_path, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    os.replace(tmp_path, chart_path)
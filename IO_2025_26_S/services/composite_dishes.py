@@ -0,0 +1,285 @@
+import difflib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.data_service import _ensure_data_directory, atomic_write_json
+from services.metrics import register_collector
+from services.nutrient_cache import get_cached_nutrients
+from services.reference_foods import REFERENCE_FUZZY_CUTOFF, _words_match, get_reference_table, match_key
+
+logger = logging.getLogger(__name__)
+
+# Składy potraw złożonych (część aplikacji) i składy rozpisane przez model
+RECIPES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "recipes.json")
+LEARNED_RECIPES_FILE = os.path.join("data", "recipes.learned.json")
+
+# Tryb rozkładu potraw złożonych na składniki:
+# "off" - wyłączony, "recipes" - tylko tabela składów (bez sieci),
+# "llm" - dodatkowo model rozpisuje nieznane potrawy złożone na składniki
+DISH_DECOMPOSITION = os.getenv("DISH_DECOMPOSITION", "recipes")
+
+# Słowa, po których poznajemy potrawę złożoną ("ryż z kurczakiem", "chleb i masło")
+_COMPOSITE_MARKERS = {"z", "ze", "i", "oraz", "na", "w"}
+
+_stats = {"composed": 0, "missing_ingredients": 0, "learned": 0}
+
+
+class RecipeBook:
+    """
+    Składy potraw złożonych.
+
+    Każdy skład to krotka nazw składników i wektor ich udziałów masowych
+    (suma = 1), więc wartości na 100g potrawy są iloczynem wektora
+    udziałów i macierzy wartości składników na 100g.
+    """
+
+    def __init__(self):
+        self._recipes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len({id(recipe) for recipe in self._recipes.values()})
+
+    def add(self, name: str, ingredients: Dict[str, float], aliases: Iterable[str] = ()) -> bool:
+        """
+        Dodaje skład potrawy.
+
+        Args:
+            name: Nazwa potrawy
+            ingredients: Składnik -> udział (albo gramy) w potrawie; udziały
+                są normalizowane do sumy 1
+            aliases: Inne nazwy tej samej potrawy
+
+        Returns:
+            bool: False, gdy skład jest pusty albo potrawa już jest w tabeli
+        """
+        parts = {ingredient: float(weight) for ingredient, weight in ingredients.items() if float(weight) > 0}
+        total = sum(parts.values())
+        keys = [key for key in (match_key(alias) for alias in (name, *aliases)) if key]
+        if not parts or not keys:
+            return False
+
+        recipe = (name, tuple(parts), np.fromiter(parts.values(), dtype=float) / total)
+        with self._lock:
+            if keys[0] in self._recipes:
+                return False
+            for key in keys:
+                self._recipes.setdefault(key, recipe)
+        return True
+
+    def find(self, name: str) -> Optional[Tuple[str, Tuple[str, ...], np.ndarray]]:
+        """
+        Zwraca skład potrawy: (nazwa z tabeli, składniki, udziały) albo None.
+
+        Dopasowanie jak w tabeli potraw referencyjnych (odmiana, polskie
+        znaki, kolejność słów) z przybliżonym dopasowaniem literówek - każdy
+        wyraz musi mieć odpowiednik ("makaron z serem" to nie "makaron z sosem").
+        """
+        key = match_key(name)
+        with self._lock:
+            recipe = self._recipes.get(key)
+            if recipe is None and len(key) >= 5:
+                candidates = [candidate for candidate in self._recipes if _words_match(key, candidate)]
+                close = difflib.get_close_matches(key, candidates, n=1, cutoff=REFERENCE_FUZZY_CUTOFF)
+                if close:
+                    recipe = self._recipes[close[0]]
+        return recipe
+
+
+_book: Optional[RecipeBook] = None
+_book_lock = threading.Lock()
+_learned = {}
+
+
+def load_recipes() -> RecipeBook:
+    """
+    Wczytuje tabelę składów i składy rozpisane wcześniej przez model.
+
+    Returns:
+        RecipeBook: Wczytane składy (puste, gdy brak pliku)
+    """
+    global _book
+
+    with _book_lock:
+        book = RecipeBook()
+        try:
+            with open(RECIPES_FILE, "r", encoding="utf-8") as f:
+                for recipe in json.load(f)["recipes"]:
+                    book.add(recipe["name"], recipe["ingredients"], recipe.get("aliases", ()))
+        except FileNotFoundError:
+            logger.warning("[SKŁAD] Brak pliku %s - tabela składów jest pusta", RECIPES_FILE)
+        except Exception as e:
+            logger.warning("[SKŁAD] Nie udało się wczytać tabeli składów: %s", e)
+
+        _learned.clear()
+        if os.path.exists(LEARNED_RECIPES_FILE):
+            try:
+                with open(LEARNED_RECIPES_FILE, "r", encoding="utf-8") as f:
+                    _learned.update(json.load(f))
+                for name, ingredients in _learned.items():
+                    book.add(name, ingredients)
+            except Exception as e:
+                logger.warning("[SKŁAD] Nie udało się wczytać %s: %s", LEARNED_RECIPES_FILE, e)
+
+        _book = book
+        logger.info("[SKŁAD] Wczytano %d składów potraw złożonych", len(book))
+        return book
+
+
+def get_recipe_book() -> RecipeBook:
+    """Zwraca tabelę składów, wczytując ją przy pierwszym użyciu."""
+    return _book if _book is not None else load_recipes()
+
+
+def looks_composite(name: str) -> bool:
+    """Czy nazwa wygląda na potrawę złożoną (np. "makaron z sosem")."""
+    words = name.casefold().split()
+    return len(words) >= 3 or any(word in _COMPOSITE_MARKERS for word in words)
+
+
+def _ingredient_vector(name: str) -> Optional[Dict]:
+    """Wartości składnika na 100g: z tabeli potraw albo z cache odpowiedzi modelu."""
+    match = get_reference_table().lookup(name, fuzzy=False)
+    if match and match["per_100g"]:
+        return match["per_100g"]
+    return get_cached_nutrients(name)
+
+
+def _compose(recipes: List[Tuple[Tuple[str, ...], np.ndarray]]) -> List[Optional[Dict]]:
+    """
+    Liczy wartości na 100g dla wielu składów naraz.
+
+    Unikalne składniki wszystkich składów tworzą macierz S x M (składnik x
+    mikroskładnik), a udziały - macierz P x S (potrawa x składnik); wynik
+    to jeden iloczyn macierzy. Skład z nieznanym składnikiem daje None.
+    """
+    columns, vectors = {}, {}
+    for ingredients, _ in recipes:
+        for ingredient in ingredients:
+            if ingredient not in vectors:
+                vectors[ingredient] = _ingredient_vector(ingredient)
+                for nutrient in vectors[ingredient] or ():
+                    columns.setdefault(nutrient, len(columns))
+
+    rows = {ingredient: i for i, ingredient in enumerate(vectors)}
+    values = np.zeros((len(rows), len(columns)))
+    for ingredient, vector in vectors.items():
+        for nutrient, value in (vector or {}).items():
+            values[rows[ingredient], columns[nutrient]] = value
+
+    weights = np.zeros((len(recipes), len(rows)))
+    complete = np.ones(len(recipes), dtype=bool)
+    for i, (ingredients, shares) in enumerate(recipes):
+        weights[i, [rows[ingredient] for ingredient in ingredients]] = shares
+        complete[i] = all(vectors[ingredient] for ingredient in ingredients)
+
+    totals = np.round(weights @ values, 1)
+    names = list(columns)
+    return [
+        {names[j]: float(totals[i, j]) for j in range(len(names))} if complete[i] else None
+        for i in range(len(recipes))
+    ]
+
+
+def compose_dishes(names: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Wartości na 100g potraw złożonych ze znanych składników (bez sieci).
+
+    Args:
+        names: Nazwy potraw
+
+    Returns:
+        dict: Nazwa potrawy -> wartości na 100g; potrawy bez składu albo
+              z nieznanym składnikiem są pominięte
+    """
+    if DISH_DECOMPOSITION == "off":
+        return {}
+
+    book = get_recipe_book()
+    found = {name: book.find(name) for name in names}
+    found = {name: recipe for name, recipe in found.items() if recipe is not None}
+    if not found:
+        return {}
+
+    results = {}
+    composed = _compose([(ingredients, shares) for _, ingredients, shares in found.values()])
+    for (name, (recipe_name, _, _)), values in zip(found.items(), composed):
+        if values:
+            results[name] = values
+            logger.debug("[SKŁAD] \"%s\" -> skład \"%s\"", name, recipe_name)
+        else:
+            _stats["missing_ingredients"] += 1
+
+    _stats["composed"] += len(results)
+    return results
+
+
+def compose_dish(name: str) -> Optional[Dict]:
+    """Wartości na 100g jednej potrawy złożonej albo None (zob. compose_dishes)."""
+    return compose_dishes([name]).get(name)
+
+
+def missing_ingredients(name: str) -> Optional[List[str]]:
+    """
+    Składniki potrawy, których wartości jeszcze nie znamy.
+
+    Returns:
+        list: Nazwy brakujących składników (pusta, gdy znamy wszystkie)
+        None: Gdy potrawa nie ma składu
+    """
+    recipe = get_recipe_book().find(name)
+    if recipe is None:
+        return None
+    return [ingredient for ingredient in recipe[1] if not _ingredient_vector(ingredient)]
+
+
+def learn_recipe(name: str, ingredients: Dict[str, float]) -> bool:
+    """
+    Zapamiętuje skład rozpisany przez model (data/recipes.learned.json).
+
+    Args:
+        name: Nazwa potrawy
+        ingredients: Składnik -> gramy w 100g potrawy
+
+    Returns:
+        bool: True, gdy skład został dodany
+    """
+    if not get_recipe_book().add(name, ingredients):
+        return False
+
+    with _book_lock:
+        _learned[name] = ingredients
+        _stats["learned"] += 1
+        try:
+            _ensure_data_directory()
+            atomic_write_json(LEARNED_RECIPES_FILE, _learned, indent=2)
+        except Exception as e:
+            logger.warning("[SKŁAD] Nie udało się zapisać %s: %s", LEARNED_RECIPES_FILE, e)
+    logger.info("[SKŁAD] Zapamiętano skład \"%s\": %s", name, ", ".join(ingredients))
+    return True
+
+
+def get_composition_stats() -> Dict:
+    """
+    Zwraca liczniki rozkładu potraw złożonych.
+
+    Returns:
+        Słownik z trybem, liczbą składów i licznikami composed,
+        missing_ingredients, learned
+    """
+    return {
+        **_stats,
+        "mode": DISH_DECOMPOSITION,
+        "recipes": len(_book) if _book is not None else 0
+    }
+
+
+register_collector(
+    "smartdiet_composition_events_total", "Potrawy złożone policzone ze składu, braki składników i nowe składy",
+    "counter", ("event",), lambda: {(event,): count for event, count in _stats.items()}
+)
@@ -1,5 +1,117 @@
+import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Ścieżka -> [blokada wątków, liczba wątków, które jej używają lub na nią czekają];
+# wpis znika, gdy nikt go nie używa, więc słownik nie rośnie z liczbą plików
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
 
 def _ensure_data_directory():
     """Tworzy folder data/, jeśli nie istnieje."""
-    os.makedirs("data", exist_ok=True)
\ No newline at end of file
+    os.makedirs("data", exist_ok=True)
+
+
+@contextmanager
+def _thread_lock_for(path):
+    """Trzyma blokadę wątków przypisaną do danej ścieżki."""
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        entry = _thread_locks.get(key)
+        if entry is None:
+            entry = _thread_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _thread_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[key]
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Wyłączna blokada pliku - działa między wątkami i między procesami.
+
+    Blokowany jest osobny plik <path>.lock, dzięki czemu sam plik danych
+    można bezpiecznie podmieniać (os.replace) w trakcie trzymania blokady.
+
+    Args:
+        path: Ścieżka chronionego pliku
+    """
+    lock_path = path + ".lock"
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with _thread_lock_for(path):
+        with open(lock_path, "a+b") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Zapisuje JSON do pliku tymczasowego i podmienia nim plik docelowy.
+
+    Czytelnik zawsze widzi albo starą, albo nową wersję pliku - nigdy
+    częściowo zapisanej.
+
+    Args:
+        path: Ścieżka pliku docelowego
+        data: Dane do zapisania
+        **dump_kwargs: Dodatkowe argumenty dla json.dump
+    """
+    _atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, **dump_kwargs))
+
+
+def atomic_write_lines(path, lines):
+    """
+    Atomowo zapisuje plik tekstowy z kolejnych fragmentów (bez budowania
+    całej zawartości w pamięci).
+
+    Args:
+        path: Ścieżka pliku docelowego
+        lines: Iterowalna kolekcja napisów do zapisania
+    """
+    _atomic_write(path, lambda f: f.writelines(lines))
+
+
+def _atomic_write(path, write):
+    """Zapis do pliku tymczasowego + fsync + os.replace."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
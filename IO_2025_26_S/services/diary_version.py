@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from services.data_service import atomic_write_json, file_lock
+from services.user_partition import DEFAULT_USER, user_data_dir
+
+logger = logging.getLogger(__name__)
+
+# Licznik wersji dziennika (w katalogu użytkownika) - zwiększany przy
+# każdym dodaniu i usunięciu posiłku
+DIARY_VERSION_FILE = "diary.version"
+
+# Ostatnio odczytane wersje: user_id -> (klucz stat pliku, (etag, last_modified))
+_cached = {}
+_cached_lock = threading.Lock()
+
+# Górna granica liczby zapamiętanych wersji (po przekroczeniu pamięć jest czyszczona)
+_CACHED_MAX_USERS = 4096
+
+
+def _version_path(user_id: str) -> str:
+    return os.path.join(user_data_dir(user_id), DIARY_VERSION_FILE)
+
+
+def _stat_key(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _read(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": 0, "updated_ns": 0}
+
+
+def bump_diary_version(user_id: str = DEFAULT_USER) -> int:
+    """
+    Zwiększa wersję dziennika użytkownika (po zapisie albo usunięciu posiłku).
+
+    Licznik jest w pliku pod blokadą międzyprocesową, więc zmiana zrobiona
+    w jednym workerze unieważnia ETagi we wszystkich.
+
+    Args:
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Nowy numer wersji
+    """
+    path = _version_path(user_id)
+    try:
+        with file_lock(path):
+            state = _read(path)
+            # Czas zmiany odróżnia wersje także po utracie pliku (licznik od zera)
+            state = {"version": int(state.get("version", 0)) + 1, "updated_ns": time.time_ns()}
+            atomic_write_json(path, state)
+        return state["version"]
+    except Exception:
+        # Bez nowej wersji przeglądarki mogłyby dostać 304 dla nieaktualnego
+        # dziennika - usunięcie pliku wymusza nowy ETag przy następnej zmianie
+        logger.exception("[DZIENNIK] Nie udało się zapisać wersji dziennika")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return 0
+
+
+def get_diary_version(user_id: str = DEFAULT_USER) -> Tuple[str, Optional[datetime]]:
+    """
+    Zwraca bieżącą wersję dziennika użytkownika do nagłówków ETag i Last-Modified.
+
+    Odczyt to jedno os.stat - treść pliku jest czytana tylko wtedy, gdy
+    plik zmienił się od poprzedniego wywołania. Magazyn posiłków nie jest
+    dotykany.
+
+    Args:
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Krotka (znacznik wersji, czas ostatniej zmiany w UTC lub None,
+        gdy dziennik nie był jeszcze zmieniany)
+    """
+    path = _version_path(user_id)
+    key = _stat_key(path)
+    cached = _cached.get(user_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with _cached_lock:
+        state = _read(path) if key is not None else {"version": 0, "updated_ns": 0}
+        updated_ns = int(state.get("updated_ns", 0))
+        last_modified = datetime.fromtimestamp(updated_ns / 1e9, timezone.utc) if updated_ns else None
+        result = (f"{state.get('version', 0)}-{updated_ns:x}", last_modified)
+        if len(_cached) >= _CACHED_MAX_USERS:
+            _cached.clear()
+        _cached[user_id] = (key, result)
+        return result
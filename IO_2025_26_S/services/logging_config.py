@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+# Poziom logów: DEBUG, INFO, WARNING, ERROR albo OFF (wyłącza logowanie całkowicie)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Format logów: "text" (czytelny w konsoli) albo "json" (jeden obiekt JSON na linię)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Atrybuty, które ma każdy LogRecord - pozostałe pochodzą z extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Zapisuje rekord jako jedną linię JSON: czas, poziom, logger, komunikat
+    i pola przekazane w extra (np. dish, amount, latency).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    """
+    Konfiguruje logowanie aplikacji (wywoływane przy starcie).
+
+    Args:
+        level: Poziom logów (domyślnie LOG_LEVEL); "OFF" wyłącza logowanie
+        fmt: Format logów (domyślnie LOG_FORMAT)
+    """
+    level = (level or LOG_LEVEL).upper()
+    fmt = (fmt or LOG_FORMAT).lower()
+
+    if level == "OFF":
+        # Wywołania logger.* kończą się na porównaniu poziomu - bez formatowania i zapisu
+        logging.disable(logging.CRITICAL)
+        return
+    logging.disable(logging.NOTSET)
+
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+    # Każde zapytanie do OpenAI i tak ma własny wpis - bez duplikatów z klienta HTTP
+    logging.getLogger("httpx").setLevel(max(root.level, logging.WARNING))
@@ -0,0 +1,159 @@
+import logging
+import os
+import struct
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Tuple
+
+from services.prompts import NUTRIENT_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Pola posiłku w kolejności, w jakiej trafiają do JSON-a
+MEAL_FIELDS = ("id", "dish_name", "amount", "date", "nutrition_data", "created_at")
+
+# Ile różnych zestawów mikroskładników rejestr zapamiętuje; kolejne (np. z importu
+# z nietypowymi kolumnami) dostają własny, niewspółdzielony układ
+NUTRIENT_LAYOUT_CACHE = int(os.getenv("NUTRIENT_LAYOUT_CACHE", "1024"))
+
+
+class _Layout:
+    """Nazwy mikroskładników i format ich wartości, wspólne dla posiłków z tymi samymi kluczami."""
+
+    __slots__ = ("names", "codec")
+
+    def __init__(self, names: Tuple[str, ...]):
+        self.names = names
+        # Wartości jako liczby float64 (8 bajtów) jedna za drugą
+        self.codec = struct.Struct(f"<{len(names)}d")
+
+
+class NutrientRegistry:
+    """
+    Wspólny rejestr nazw mikroskładników posiłków.
+
+    Każdy zestaw nazw (w kolejności ze słownika) ma jeden układ, dzielony
+    przez wszystkie posiłki z tym zestawem - zwykle wszystkie, bo model
+    zwraca NUTRIENT_KEYS. Posiłek trzyma więc tylko wskaźnik na układ
+    i same wartości, a nazwy "Magnez", "Żelazo"... są w pamięci raz.
+    """
+
+    def __init__(self, names=()):
+        self._layouts = {}
+        self._lock = threading.Lock()
+        if names:
+            self.layout(tuple(names))
+
+    def layout(self, names: Tuple[str, ...]) -> _Layout:
+        """Zwraca wspólny układ dla mikroskładników w podanej kolejności."""
+        layout = self._layouts.get(names)
+        if layout is None:
+            with self._lock:
+                layout = self._layouts.get(names)
+                if layout is None:
+                    layout = _Layout(tuple(sys.intern(name) for name in names))
+                    if len(self._layouts) < NUTRIENT_LAYOUT_CACHE:
+                        self._layouts[layout.names] = layout
+        return layout
+
+    def __len__(self) -> int:
+        return len(self._layouts)
+
+    def encode(self, nutrition_data: Optional[Dict]) -> Tuple[_Layout, bytes]:
+        """
+        Zamienia słownik mikroskładników na (układ, wartości float64).
+
+        Rekord przechowuje tylko liczby - wartość nieliczbowa (np. ze starego
+        pliku dziennika; import i analiza dają same liczby) jest pomijana,
+        tak jak w sumach dziennych, z ostrzeżeniem w logu.
+        """
+        names, values = [], []
+        for key, value in (nutrition_data or {}).items():
+            try:
+                values.append(float(value))
+            except (TypeError, ValueError):
+                logger.warning("[POSIŁKI] Pominięto nieliczbową wartość mikroskładnika %s: %r", key, value)
+                continue
+            names.append(str(key))
+        layout = self.layout(tuple(names))
+        return layout, layout.codec.pack(*values)
+
+
+# Rejestr wspólny dla wszystkich posiłków procesu
+NUTRIENT_REGISTRY = NutrientRegistry(NUTRIENT_KEYS)
+
+
+class MealRecord(Mapping):
+    """
+    Zwarty, tylko do odczytu zapis posiłku zwracany przez magazyny.
+
+    Zamiast słownika z zagnieżdżonym słownikiem mikroskładników posiłek
+    ma stałe pola (__slots__) oraz wartości mikroskładników jako liczby
+    float64 w jednym obiekcie bytes, z nazwami (sys.intern) we wspólnym
+    NUTRIENT_REGISTRY. Słownik nutrition_data powstaje dopiero przy
+    odczycie - w szablonie (meal.nutrition_data) albo przy zamianie na
+    JSON (to_dict).
+
+    Rekord zachowuje się jak słownik tylko do odczytu (meal["id"],
+    meal.get("date"), dict(meal)), więc kod napisany dla słowników
+    posiłków działa bez zmian.
+    """
+
+    __slots__ = ("id", "dish_name", "amount", "date", "created_at", "_layout", "_values")
+
+    def __init__(self, id: int, dish_name: str, amount: int, date: str, created_at: str,
+                 nutrition_data: Optional[Dict] = None):
+        self.id = id
+        self.dish_name = dish_name
+        self.amount = amount
+        self.date = date
+        self.created_at = created_at
+        self._layout, self._values = NUTRIENT_REGISTRY.encode(nutrition_data)
+
+    @classmethod
+    def from_dict(cls, meal: Dict) -> "MealRecord":
+        """Tworzy rekord ze słownika posiłku (z nadanym id)."""
+        return cls(meal["id"], meal.get("dish_name"), meal.get("amount"), meal.get("date"),
+                   meal.get("created_at"), meal.get("nutrition_data"))
+
+    @property
+    def nutrition_data(self) -> Dict:
+        """Nowy słownik mikroskładnik -> wartość."""
+        layout = self._layout
+        return dict(zip(layout.names, layout.codec.unpack(self._values)))
+
+    def nutrient_items(self) -> Iterator[Tuple[str, float]]:
+        """Pary (mikroskładnik, wartość) bez budowania słownika - do sum i statystyk."""
+        layout = self._layout
+        return zip(layout.names, layout.codec.unpack(self._values))
+
+    def to_dict(self) -> Dict:
+        """Posiłek jako zwykły słownik (JSON, eksport, zapis do pliku)."""
+        return {
+            "id": self.id,
+            "dish_name": self.dish_name,
+            "amount": self.amount,
+            "date": self.date,
+            "nutrition_data": self.nutrition_data,
+            "created_at": self.created_at
+        }
+
+    def __getitem__(self, key):
+        if key not in MEAL_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(MEAL_FIELDS)
+
+    def __len__(self) -> int:
+        return len(MEAL_FIELDS)
+
+    def __reduce__(self):
+        # Układ wartości należy do rejestru procesu - przy kopiowaniu między
+        # procesami rekord jest odtwarzany ze słownika
+        return MealRecord.from_dict, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"MealRecord({self.to_dict()!r})"
@@ -1,44 +1,91 @@
+import base64
 import json
+import logging
 import os
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from services.data_service import _ensure_data_directory
+from services.diary_version import bump_diary_version
+from services.meal_record import MealRecord
+from services.meal_storage import use_storage
+from services.meal_transfer import meal_from_record
+from services.openai_service import BASE_AMOUNT, _calculate_proportional_values, get_known_nutrients
+from services import nutrient_store
+from services.user_partition import DEFAULT_USER
 
-MEALS_FILE = os.path.join("data", "meals.json")
+logger = logging.getLogger(__name__)
 
-def _ensure_meals_file():
-    """Tworzy plik meals.json, jeśli nie istnieje."""
-    _ensure_data_directory()
-    if not os.path.exists(MEALS_FILE):
-        with open(MEALS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=4)
-        print(f"Utworzono plik: {MEALS_FILE}")
+# Liczba posiłków na jednej stronie dziennika
+DIARY_PAGE_SIZE = int(os.getenv("DIARY_PAGE_SIZE", "20"))
 
+# Maksymalna liczba posiłków na stronę w API
+DIARY_MAX_PAGE_SIZE = 100
 
-def add_meal(dish_name: str, amount: int, date: str, nutrition_data: Dict) -> bool:
+# Import dziennika: tyle posiłków zapisujemy jedną transakcją magazynu
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# Import dziennika: tyle błędnych wierszy opisujemy w odpowiedzi (liczone są wszystkie)
+IMPORT_MAX_ERRORS = 20
+
+
+def encode_cursor(meal: MealRecord) -> str:
     """
-    Dodaje posiłek do dziennika.
+    Tworzy kursor strony wskazujący na posiłek (po created_at i id).
+
+    Args:
+        meal: Ostatni posiłek bieżącej strony
+
+    Returns:
+        Nieprzezroczysty kursor (base64 URL-safe)
+    """
+    raw = json.dumps([meal.created_at or "", meal.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Odczytuje kursor utworzony przez encode_cursor.
+
+    Raises:
+        ValueError: Gdy kursor jest nieprawidłowy
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, meal_id = json.loads(raw.decode("utf-8"))
+        if not isinstance(created_at, str) or not isinstance(meal_id, int):
+            raise ValueError
+        return created_at, meal_id
+    except (ValueError, TypeError) as e:
+        raise ValueError("Nieprawidłowy kursor strony") from e
+
+
+def add_meal(dish_name: str, amount: int, date: str, nutrition_data: Optional[Dict] = None,
+             user_id: str = DEFAULT_USER) -> bool:
+    """
+    Dodaje posiłek do dziennika użytkownika.
 
     Args:
         dish_name: Nazwa potrawy
         amount: Ilość w gramach
         date: Data w formacie YYYY-MM-DD
-        nutrition_data: Słownik z danymi żywieniowymi (mikroskładniki)
+        nutrition_data: Słownik z danymi żywieniowymi (mikroskładniki); gdy
+            brak, wartości są liczone lokalnie (tabela potraw, skład potrawy
+            złożonej, cache) bez zapytania do API
+        user_id: Identyfikator użytkownika
 
     Returns:
         True jeśli zapis się powiódł, False w przeciwnym razie
     """
-    try:
-        _ensure_meals_file()
-
-        # Wczytaj istniejące dane
-        with open(MEALS_FILE, "r", encoding="utf-8") as f:
-            meals = json.load(f)
+    if nutrition_data is None:
+        per_100g = get_known_nutrients(dish_name)
+        if not per_100g:
+            logger.warning("Brak znanych wartości dla potrawy: %s", dish_name)
+            return False
+        nutrition_data = _calculate_proportional_values(per_100g, amount, BASE_AMOUNT)
 
-        # Przygotuj nowy wpis
+    try:
+        # Przygotuj nowy wpis (id nadaje magazyn)
         new_meal = {
-            "id": len(meals) + 1,
             "dish_name": dish_name,
             "amount": amount,
             "date": date,
@@ -46,131 +93,341 @@ def add_meal(dish_name: str, amount: int, date: str, nutrition_data: Dict) -> bo
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        # Dodaj wpis
-        meals.append(new_meal)
-
-        # Zapisz do pliku
-        with open(MEALS_FILE, "w", encoding="utf-8") as f:
-            json.dump(meals, f, ensure_ascii=False, indent=4)
+        with nutrient_store.tracking_write(user_id):
+            with use_storage(user_id) as storage:
+                saved_meal = storage.add_meal(new_meal)
+            nutrient_store.record_meal(saved_meal, user_id=user_id)
+        bump_diary_version(user_id)
 
-        print(f"Zapisano posiłek: {dish_name} ({date})")
+        logger.info("Zapisano posiłek: %s (%s)", dish_name, date, extra={"dish": dish_name, "date": date})
         return True
 
-    except Exception as e:
-        print(f"Błąd zapisu posiłku: {e}")
+    except Exception:
+        logger.exception("Błąd zapisu posiłku")
         return False
 
 
-def get_meals_by_date(date: str) -> List[Dict]:
+def get_meals_by_date(date: str, user_id: str = DEFAULT_USER) -> List[MealRecord]:
     """
-    Pobiera wszystkie posiłki z danego dnia.
+    Pobiera wszystkie posiłki użytkownika z danego dnia.
 
     Args:
         date: Data w formacie YYYY-MM-DD
+        user_id: Identyfikator użytkownika
 
     Returns:
-        Lista słowników z posiłkami z danego dnia
+        Lista posiłków (MealRecord) z danego dnia
     """
     try:
-        _ensure_meals_file()
+        with use_storage(user_id) as storage:
+            filtered_meals = storage.get_meals_by_date(date)
+
+        logger.debug("Znaleziono %d posiłków na dzień %s", len(filtered_meals), date)
+        return filtered_meals
 
-        with open(MEALS_FILE, "r", encoding="utf-8") as f:
-            meals = json.load(f)
+    except Exception:
+        logger.exception("Błąd odczytu posiłków")
+        return []
 
-        # Filtruj po dacie
-        filtered_meals = [meal for meal in meals if meal.get("date") == date]
 
-        print(f"📅 Znaleziono {len(filtered_meals)} posiłków na dzień {date}")
-        return filtered_meals
+def get_all_meals(user_id: str = DEFAULT_USER) -> List[MealRecord]:
+    """
+    Pobiera wszystkie posiłki z dziennika użytkownika.
+
+    Posiłki są zwartymi rekordami (MealRecord, kilka razy mniejszymi od
+    słowników); słowniki do JSON-a daje MealRecord.to_dict.
+
+    Args:
+        user_id: Identyfikator użytkownika
 
-    except Exception as e:
-        print(f"Błąd odczytu posiłków: {e}")
+    Returns:
+        Lista wszystkich posiłków (MealRecord), posortowana od najnowszych
+    """
+    try:
+        with use_storage(user_id) as storage:
+            meals = storage.get_all_meals()
+
+        logger.debug("Pobrano %d posiłków z dziennika", len(meals))
+        return meals
+
+    except Exception:
+        logger.exception("Błąd odczytu wszystkich posiłków")
         return []
 
 
-def get_all_meals() -> List[Dict]:
+def iter_meals(start_date: Optional[str] = None, end_date: Optional[str] = None,
+               user_id: str = DEFAULT_USER) -> Iterator[MealRecord]:
     """
-    Pobiera wszystkie posiłki z dziennika.
+    Przegląda posiłki użytkownika z zakresu dat, według dnia (eksport dziennika).
+
+    Posiłki są czytane z magazynu partiami w trakcie przeglądania, więc
+    eksport wielu lat historii nie buduje listy wszystkich posiłków.
+
+    Args:
+        start_date: Pierwszy dzień (YYYY-MM-DD) lub None - od początku
+        end_date: Ostatni dzień (YYYY-MM-DD), włącznie, lub None - do końca
+        user_id: Identyfikator użytkownika
 
     Returns:
-        Lista wszystkich posiłków, posortowana od najnowszych
+        Generator posiłków (MealRecord)
+
+    Raises:
+        Exception: Błąd magazynu w trakcie przeglądania jest przekazywany dalej -
+            przerwany eksport nie może wyglądać na kompletny
     """
+    count = 0
     try:
-        _ensure_meals_file()
+        # Magazyn pozostaje wypożyczony, dopóki odbiorca przegląda posiłki
+        with use_storage(user_id) as storage:
+            for meal in storage.iter_meals(start_date, end_date):
+                count += 1
+                yield meal
+    except Exception:
+        logger.exception("Błąd eksportu dziennika po %d posiłkach", count)
+        raise
 
-        with open(MEALS_FILE, "r", encoding="utf-8") as f:
-            meals = json.load(f)
+    logger.info("Wyeksportowano %d posiłków", count)
 
-        # Sortuj od najnowszych
-        meals.sort(key=lambda x: x.get("created_at", ""), reverse=True)
 
-        print(f"Pobrano {len(meals)} posiłków z dziennika")
-        return meals
+def import_meals(records: Iterable[Tuple[int, Optional[Dict]]], user_id: str = DEFAULT_USER,
+                 batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """
+    Importuje posiłki do dziennika użytkownika.
 
-    except Exception as e:
-        print(f"Błąd odczytu wszystkich posiłków: {e}")
-        return []
+    Wiersze są sprawdzane po kolei, a poprawne posiłki zapisywane paczkami
+    po batch_size jedną transakcją magazynu (MealStorage.add_meals), więc
+    pamięć zależy od wielkości paczki, a nie pliku. Błędne wiersze są
+    pomijane. Posiłek bez wartości odżywczych dostaje wartości liczone
+    lokalnie (tabela potraw, skład potrawy złożonej, cache) - bez zapytań
+    do API.
+
+    Args:
+        records: Pary (numer linii, pola posiłku) z meal_transfer.read_records
+        user_id: Identyfikator użytkownika
+        batch_size: Liczba posiłków w jednej transakcji
 
+    Returns:
+        Słownik {"imported", "failed", "errors": [{"line", "message"}, ...],
+        "completed"}; completed=False oznacza przerwanie przez błąd zapisu
+        (zapisane wcześniej paczki zostają w dzienniku)
+    """
+    result = {"imported": 0, "failed": 0, "errors": [], "completed": True}
+    batch = []
+
+    def flush():
+        with nutrient_store.tracking_write(user_id):
+            with use_storage(user_id) as storage:
+                storage.add_meals(batch)
+            # Sumy dzienne paczki zmieniają się naraz - magazyn analiz zbuduje się od nowa
+            nutrient_store.invalidate_nutrient_store(user_id)
+        result["imported"] += len(batch)
+        batch.clear()
+        bump_diary_version(user_id)
 
-def delete_meal(meal_id: int) -> bool:
+    try:
+        for line, record in records:
+            try:
+                meal = meal_from_record(record)
+                if not meal["nutrition_data"]:
+                    per_100g = get_known_nutrients(meal["dish_name"])
+                    if not per_100g:
+                        raise ValueError("Brak wartości odżywczych, a potrawa nie jest znana")
+                    meal["nutrition_data"] = _calculate_proportional_values(per_100g, meal["amount"], BASE_AMOUNT)
+            except ValueError as e:
+                result["failed"] += 1
+                if len(result["errors"]) < IMPORT_MAX_ERRORS:
+                    result["errors"].append({"line": line, "message": str(e)})
+                continue
+
+            batch.append(meal)
+            if len(batch) >= batch_size:
+                flush()
+
+        if batch:
+            flush()
+
+    except Exception:
+        logger.exception("Błąd importu dziennika po %d posiłkach", result["imported"])
+        result["completed"] = False
+
+    logger.info("Zaimportowano %d posiłków (%d błędnych wierszy)", result["imported"], result["failed"])
+    return result
+
+
+def get_meals_page(limit: int = DIARY_PAGE_SIZE, cursor: Optional[str] = None,
+                   user_id: str = DEFAULT_USER) -> Dict:
     """
-    Usuwa posiłek z dziennika.
+    Pobiera jedną stronę dziennika użytkownika, od najnowszych posiłków.
+
+    Args:
+        limit: Liczba posiłków na stronie
+        cursor: Kursor z poprzedniej strony (next_cursor) lub None dla pierwszej
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Słownik {"meals": [MealRecord, ...], "next_cursor": kursor następnej strony lub None}
+
+    Raises:
+        ValueError: Gdy kursor jest nieprawidłowy
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    try:
+        # Jeden posiłek więcej mówi, czy istnieje następna strona
+        with use_storage(user_id) as storage:
+            meals = storage.get_meals_page(limit + 1, position)
+
+        next_cursor = None
+        if len(meals) > limit:
+            meals = meals[:limit]
+            next_cursor = encode_cursor(meals[-1])
+
+        return {"meals": meals, "next_cursor": next_cursor}
+
+    except Exception:
+        logger.exception("Błąd odczytu strony dziennika")
+        return {"meals": [], "next_cursor": None}
+
+
+def delete_meal(meal_id: int, user_id: str = DEFAULT_USER) -> bool:
+    """
+    Usuwa posiłek z dziennika użytkownika.
 
     Args:
         meal_id: ID posiłku do usunięcia
+        user_id: Identyfikator użytkownika (posiłki innych są poza jego partycją)
 
     Returns:
         True jeśli usunięcie się powiodło, False w przeciwnym razie
     """
     try:
-        _ensure_meals_file()
-
-        with open(MEALS_FILE, "r", encoding="utf-8") as f:
-            meals = json.load(f)
+        with nutrient_store.tracking_write(user_id):
+            with use_storage(user_id) as storage:
+                deleted = storage.delete_meal(meal_id)
+            if deleted:
+                nutrient_store.record_meal(deleted, -1, user_id=user_id)
 
-        # Znajdź i usuń posiłek
-        meals = [meal for meal in meals if meal.get("id") != meal_id]
+        if not deleted:
+            logger.warning("Nie znaleziono posiłku o ID: %s", meal_id)
+            return False
 
-        with open(MEALS_FILE, "w", encoding="utf-8") as f:
-            json.dump(meals, f, ensure_ascii=False, indent=4)
+        bump_diary_version(user_id)
 
-        print(f"Usunięto posiłek o ID: {meal_id}")
+        logger.info("Usunięto posiłek o ID: %s", meal_id)
         return True
 
-    except Exception as e:
-        print(f"Błąd usuwania posiłku: {e}")
+    except Exception:
+        logger.exception("Błąd usuwania posiłku")
         return False
 
 
-def get_meals_statistics() -> Dict:
+def get_daily_totals(start_date: str, end_date: str, user_id: str = DEFAULT_USER) -> List[Dict]:
     """
-    Zwraca podstawowe statystyki dziennika.
+    Pobiera sumy mikroskładników użytkownika dla kolejnych dni z zakresu.
+
+    Args:
+        start_date: Pierwszy dzień zakresu (YYYY-MM-DD)
+        end_date: Ostatni dzień zakresu (YYYY-MM-DD), włącznie
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Lista słowników {"date", "meal_count", "totals"} posortowana po dacie
+        (tylko dni, w których zapisano posiłki)
+    """
+    try:
+        with use_storage(user_id) as storage:
+            return storage.get_daily_totals(start_date, end_date)
+
+    except Exception:
+        logger.exception("Błąd odczytu sum dziennych")
+        return []
+
+
+def get_day_summary(date: str, user_id: str = DEFAULT_USER) -> Dict:
+    """
+    Zwraca sumy mikroskładników ze wszystkich posiłków użytkownika z danego dnia.
+
+    Args:
+        date: Data w formacie YYYY-MM-DD
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Słownik {"date", "meal_count", "totals"}; dla dnia bez posiłków
+        meal_count wynosi 0, a totals jest pusty
+    """
+    days = get_daily_totals(date, date, user_id)
+    if days:
+        return days[0]
+    return {"date": date, "meal_count": 0, "totals": {}}
+
+
+def get_nutrient_analytics(start_date: str, end_date: str, targets: Optional[Dict] = None,
+                           user_id: str = DEFAULT_USER) -> Dict:
+    """
+    Analiza spożycia mikroskładników w zakresie dat.
+
+    Liczona wektorowo na kolumnowym magazynie sum dziennych
+    (services.nutrient_store), bez wczytywania posiłków.
+
+    Args:
+        start_date: Pierwszy dzień (YYYY-MM-DD)
+        end_date: Ostatni dzień (YYYY-MM-DD), włącznie
+        targets: Dzienne normy mikroskładników (domyślnie DAILY_TARGETS)
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Słownik z kluczami:
+            statistics - sumy, średnie dzienne i percentyle,
+            rolling_7 / rolling_30 - kroczące średnie 7- i 30-dniowe,
+            below_target - dni poniżej normy
+    """
+    try:
+        store = nutrient_store.get_nutrient_store(user_id)
+        return {
+            "statistics": store.range_statistics(start_date, end_date),
+            "rolling_7": store.rolling_averages(start_date, end_date, 7),
+            "rolling_30": store.rolling_averages(start_date, end_date, 30),
+            "below_target": store.days_below_target(start_date, end_date, targets)
+        }
+
+    except Exception:
+        logger.exception("Błąd analizy mikroskładników")
+        return {}
+
+
+def get_meals_statistics(user_id: str = DEFAULT_USER) -> Dict:
+    """
+    Zwraca podstawowe statystyki dziennika użytkownika.
+
+    Statystyki pochodzą z sum dziennych utrzymywanych przez magazyn,
+    więc nie wymagają wczytania wszystkich posiłków.
+
+    Args:
+        user_id: Identyfikator użytkownika
 
     Returns:
         Słownik ze statystykami (liczba posiłków, unikalne dni, itp.)
     """
     try:
-        meals = get_all_meals()
+        with use_storage(user_id) as storage:
+            summary = storage.get_summary()
 
-        if not meals:
+        if not summary["total_meals"]:
             return {
                 "total_meals": 0,
                 "unique_days": 0,
                 "date_range": None
             }
 
-        dates = [meal.get("date") for meal in meals if meal.get("date")]
-        unique_dates = set(dates)
-
         return {
-            "total_meals": len(meals),
-            "unique_days": len(unique_dates),
+            "total_meals": summary["total_meals"],
+            "unique_days": summary["unique_days"],
             "date_range": {
-                "first": min(dates) if dates else None,
-                "last": max(dates) if dates else None
+                "first": summary["first_date"],
+                "last": summary["last_date"]
             }
         }
 
-    except Exception as e:
-        print(f"Błąd obliczania statystyk: {e}")
+    except Exception:
+        logger.exception("Błąd obliczania statystyk")
         return {"total_meals": 0, "unique_days": 0, "date_range": None}
\ No newline at end of file
@@ -0,0 +1,1182 @@
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date as date_type, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.data_service import atomic_write_json, atomic_write_lines, file_lock
+from services.meal_record import MealRecord
+from services.metrics import STORAGE_SECONDS
+from services.user_partition import DEFAULT_USER, user_data_dir
+
+logger = logging.getLogger(__name__)
+
+MEALS_FILE = os.path.join("data", "meals.json")
+MEALS_DB = os.path.join("data", "meals.db")
+MEALS_LOG = os.path.join("data", "meals.jsonl")
+
+# Wybór magazynu: "sqlite" (domyślnie), "json" lub "journal"
+STORAGE_BACKEND = os.getenv("MEAL_STORAGE", "sqlite").lower()
+
+# Tryb "journal": fsync co tyle zapisów lub co tyle sekund
+JOURNAL_FSYNC_BATCH = int(os.getenv("JOURNAL_FSYNC_BATCH", "32"))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv("JOURNAL_FSYNC_INTERVAL", "1.0"))
+
+# Tryb "journal": kompakcja w tle po przekroczeniu tylu wpisów w dzienniku
+JOURNAL_COMPACT_THRESHOLD = int(os.getenv("JOURNAL_COMPACT_THRESHOLD", "1000"))
+
+# Tryb "sqlite": ile wolnych połączeń magazyn trzyma między operacjami. Każde
+# połączenie to 3 otwarte pliki (baza, WAL, shm), więc otwarte magazyny trzymają
+# najwyżej 3 * SQLITE_POOL_SIZE * USER_STORAGE_CACHE deskryptorów; połączenia
+# ponad pulę (równoległe operacje) są zamykane po użyciu
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "1"))
+
+
+def _default_storage_cache() -> int:
+    """256 magazynów, ale ich połączenia zajmują najwyżej połowę limitu otwartych plików (ulimit -n)."""
+    try:
+        import resource
+        limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    except (ImportError, OSError, ValueError):
+        return 256
+    if limit == resource.RLIM_INFINITY:
+        return 256
+    return max(1, min(256, limit // 2 // (3 * max(SQLITE_POOL_SIZE, 1))))
+
+
+# Ile magazynów użytkowników trzymamy otwartych (najdawniej używane są zamykane)
+USER_STORAGE_CACHE = int(os.getenv("USER_STORAGE_CACHE") or _default_storage_cache())
+
+# Ile posiłków czytamy naraz przy przeglądaniu całego dziennika (eksport)
+ITER_BATCH_SIZE = int(os.getenv("MEAL_ITER_BATCH_SIZE", "500"))
+
+# Zakres dat bez ograniczeń (daty YYYY-MM-DD porównywane jako tekst)
+_FIRST_DATE, _LAST_DATE = "", "\uffff"
+
+
+class MealStorage:
+    """
+    Wspólny interfejs magazynów posiłków.
+
+    Do zapisu posiłek to słownik z kluczami: dish_name, amount, date,
+    nutrition_data, created_at. Magazyn nadaje id przy zapisie, a odczyty
+    zwracają posiłki jako MealRecord (zwarty rekord tylko do odczytu,
+    który zachowuje się jak słownik z tymi samymi kluczami i id).
+    """
+
+    def add_meal(self, meal: Dict) -> MealRecord:
+        """Zapisuje posiłek (bez id) i zwraca go z nadanym id."""
+        raise NotImplementedError
+
+    def delete_meal(self, meal_id: int) -> Optional[MealRecord]:
+        """Usuwa posiłek; zwraca usunięty posiłek albo None, jeśli nie istniał."""
+        raise NotImplementedError
+
+    def get_meals_by_date(self, date: str) -> List[MealRecord]:
+        """Zwraca posiłki z danego dnia."""
+        raise NotImplementedError
+
+    def get_all_meals(self) -> List[MealRecord]:
+        """Zwraca wszystkie posiłki, od najnowszych."""
+        raise NotImplementedError
+
+    def add_meals(self, meals: List[Dict]) -> List[MealRecord]:
+        """
+        Zapisuje paczkę posiłków (bez id) i zwraca je z nadanymi id.
+
+        Magazyny zapisują całą paczkę jedną transakcją (jednym przepisaniem
+        pliku, jednym dopisaniem do dziennika) zamiast osobno każdy posiłek.
+        """
+        return [self.add_meal(meal) for meal in meals]
+
+    def iter_meals(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[MealRecord]:
+        """
+        Przegląda posiłki z zakresu dat (włącznie), według (date, id).
+
+        Magazyny SQLite i dziennik zdarzeń czytają posiłki partiami, więc
+        pamięć nie zależy od długości historii.
+
+        Args:
+            start_date: Pierwszy dzień (YYYY-MM-DD) lub None - bez ograniczenia
+            end_date: Ostatni dzień (YYYY-MM-DD) lub None - bez ograniczenia
+        """
+        start, end = start_date or _FIRST_DATE, end_date or _LAST_DATE
+        meals = [meal for meal in self.get_all_meals() if start <= (meal.date or "") <= end]
+        meals.sort(key=_meal_date_key)
+        return iter(meals)
+
+    def get_daily_totals(self, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Zwraca sumy mikroskładników dla dni z zakresu (włącznie).
+
+        Sumy są utrzymywane przy każdym dodaniu i usunięciu posiłku, więc
+        koszt zależy od liczby dni w zakresie, a nie od długości historii.
+        Każdy element: {"date", "meal_count", "totals": {nazwa: suma}};
+        dni bez posiłków są pomijane.
+        """
+        raise NotImplementedError
+
+    def get_meals_page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> List[MealRecord]:
+        """
+        Zwraca do limit posiłków, od najnowszych, według (created_at, id).
+
+        Args:
+            limit: Maksymalna liczba posiłków
+            cursor: (created_at, id) ostatniego posiłku poprzedniej strony;
+                zwracane są tylko posiłki starsze od niego
+        """
+        raise NotImplementedError
+
+    def get_summary(self) -> Dict:
+        """
+        Zwraca podsumowanie dziennika liczone z sum dziennych.
+
+        Returns:
+            Słownik z kluczami total_meals, unique_days, first_date, last_date
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Zwalnia zasoby magazynu (połączenia, pliki, wątki w tle)."""
+
+
+def _apply_to_daily(daily: Dict, meal, sign: int):
+    """Dodaje (sign=1) lub odejmuje (sign=-1) posiłek (słownik albo MealRecord) od sum dnia."""
+    date = meal.get("date")
+    day = daily.setdefault(date, {"meal_count": 0, "totals": {}})
+    day["meal_count"] += sign
+
+    totals = day["totals"]
+    for key, value in _meal_nutrients(meal):
+        totals[key] = totals.get(key, 0.0) + sign * value
+
+    if day["meal_count"] <= 0:
+        del daily[date]
+
+
+def _numeric_nutrients(nutrition_data: Optional[Dict]):
+    """Zwraca pary (mikroskładnik, wartość liczbowa), pomijając wartości nieliczbowe."""
+    for key, value in (nutrition_data or {}).items():
+        try:
+            yield key, float(value)
+        except (TypeError, ValueError):
+            continue
+
+
+def _meal_nutrients(meal):
+    """Pary (mikroskładnik, wartość) posiłku; MealRecord bez budowania słownika."""
+    if isinstance(meal, MealRecord):
+        return meal.nutrient_items()
+    return _numeric_nutrients(meal.get("nutrition_data"))
+
+
+def _format_day(date: str, meal_count: int, totals: Dict) -> Dict:
+    return {
+        "date": date,
+        "meal_count": meal_count,
+        "totals": {key: round(value, 2) for key, value in totals.items()}
+    }
+
+
+def _meal_sort_key(meal: Dict) -> Tuple[str, int]:
+    """Klucz kolejności posiłków w dzienniku (i kursora stronicowania)."""
+    return meal.get("created_at") or "", meal["id"]
+
+
+def _meal_date_key(meal: Dict) -> Tuple[str, int]:
+    """Klucz kolejności posiłków w eksporcie (dzień, id)."""
+    return meal.get("date") or "", meal["id"]
+
+
+def _summarize_days(daily: Dict) -> Dict:
+    dates = [date for date in daily if date]
+    return {
+        "total_meals": sum(day["meal_count"] for day in daily.values()),
+        "unique_days": len(dates),
+        "first_date": min(dates) if dates else None,
+        "last_date": max(dates) if dates else None
+    }
+
+
+def _select_days(daily: Dict, start_date: str, end_date: str) -> List[Dict]:
+    """
+    Wybiera dni z zakresu ze słownika data -> sumy.
+
+    Dla krótkich zakresów sprawdzane są kolejne daty zakresu, dla długich
+    (dłuższych niż liczba zapisanych dni) - zapisane dni.
+    """
+    try:
+        start = date_type.fromisoformat(start_date)
+        end = date_type.fromisoformat(end_date)
+    except ValueError:
+        start = end = None
+
+    if start is not None and (end - start).days + 1 <= len(daily):
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    else:
+        dates = sorted(date for date in daily if date and start_date <= date <= end_date)
+
+    return [
+        _format_day(date, daily[date]["meal_count"], daily[date]["totals"])
+        for date in dates if date in daily
+    ]
+
+
+class JsonMealStorage(MealStorage):
+    """
+    Magazyn w jednym pliku JSON - każdy zapis nadpisuje cały plik.
+
+    Zapisy są wykonywane pod blokadą pliku (bezpieczne dla wielu wątków
+    i procesów), a nowa wersja pliku podmienia starą atomowo. Ostatnio
+    nadane id jest trzymane w pliku <path>.seq, więc id usuniętych
+    posiłków nigdy nie są używane ponownie.
+    """
+
+    def __init__(self, path: str = MEALS_FILE):
+        self.path = path
+        self.seq_path = path + ".seq"
+        self.daily_path = path + ".daily.json"
+
+    def _ensure_file(self):
+        """Tworzy plik meals.json, jeśli nie istnieje."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path):
+            with file_lock(self.path):
+                if not os.path.exists(self.path):
+                    atomic_write_json(self.path, [], indent=4)
+                    logger.info("Utworzono plik: %s", self.path)
+
+    def _load(self) -> List[Dict]:
+        self._ensure_file()
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _dump(self, meals: List[Dict]):
+        atomic_write_json(self.path, meals, indent=4)
+
+    def _read_daily(self) -> Optional[Dict]:
+        """
+        Wczytuje sumy dzienne z pliku <path>.daily.json.
+
+        Plik pamięta czas modyfikacji meals.json, z którego powstał; gdy
+        meals.json zmienił się bez niego (np. inny tryb zapisu), zwraca None.
+        """
+        try:
+            with open(self.daily_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("source_mtime_ns") == os.stat(self.path).st_mtime_ns:
+                return saved["days"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _load_daily(self, meals: List[Dict]) -> Dict:
+        """Zwraca sumy dzienne - z pliku albo policzone od nowa z posiłków."""
+        daily = self._read_daily()
+        if daily is None:
+            daily = {}
+            for meal in meals:
+                _apply_to_daily(daily, meal, 1)
+        return daily
+
+    def _dump_daily(self, daily: Dict):
+        atomic_write_json(self.daily_path, {
+            "source_mtime_ns": os.stat(self.path).st_mtime_ns,
+            "days": daily
+        })
+
+    def _next_id(self, meals: List[Dict], count: int = 1) -> int:
+        """Rezerwuje count kolejnych id i zwraca pierwsze (wywoływane pod blokadą pliku)."""
+        last_id = 0
+        if os.path.exists(self.seq_path):
+            with open(self.seq_path, "r", encoding="utf-8") as f:
+                last_id = int(f.read().strip() or 0)
+
+        # Plik .seq mógł nie istnieć (stare dane) - nie schodzimy poniżej max(id)
+        last_id = max([last_id] + [meal.get("id", 0) for meal in meals])
+        atomic_write_json(self.seq_path, last_id + count)
+        return last_id + 1
+
+    def add_meal(self, meal: Dict) -> MealRecord:
+        return self.add_meals([meal])[0]
+
+    def add_meals(self, meals: List[Dict]) -> List[MealRecord]:
+        self._ensure_file()
+        with file_lock(self.path):
+            stored = self._load()
+            daily = self._load_daily(stored)
+            first_id = self._next_id(stored, len(meals))
+            new_meals = [{"id": first_id + offset, **meal} for offset, meal in enumerate(meals)]
+            for new_meal in new_meals:
+                stored.append(new_meal)
+                _apply_to_daily(daily, new_meal, 1)
+            self._dump(stored)
+            self._dump_daily(daily)
+        return [MealRecord.from_dict(meal) for meal in new_meals]
+
+    def delete_meal(self, meal_id: int) -> Optional[MealRecord]:
+        self._ensure_file()
+        with file_lock(self.path):
+            meals = self._load()
+            deleted = next((meal for meal in meals if meal.get("id") == meal_id), None)
+            if deleted is None:
+                return None
+            daily = self._load_daily(meals)
+            _apply_to_daily(daily, deleted, -1)
+            self._dump([meal for meal in meals if meal.get("id") != meal_id])
+            self._dump_daily(daily)
+        return MealRecord.from_dict(deleted)
+
+    def get_meals_by_date(self, date: str) -> List[MealRecord]:
+        return [MealRecord.from_dict(meal) for meal in self._load() if meal.get("date") == date]
+
+    def get_all_meals(self) -> List[MealRecord]:
+        # Słowniki z pliku są zamieniane na rekordy od razu, jeden po drugim
+        meals = [MealRecord.from_dict(meal) for meal in self._load()]
+        meals.sort(key=lambda x: x.created_at or "", reverse=True)
+        return meals
+
+    def _current_daily(self) -> Dict:
+        """Sumy dzienne z pliku; gdy są nieaktualne - przeliczone i zapisane."""
+        self._ensure_file()
+        daily = self._read_daily()
+        if daily is None:
+            with file_lock(self.path):
+                daily = self._load_daily(self._load())
+                self._dump_daily(daily)
+        return daily
+
+    def get_daily_totals(self, start_date: str, end_date: str) -> List[Dict]:
+        return _select_days(self._current_daily(), start_date, end_date)
+
+    def get_meals_page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> List[MealRecord]:
+        meals = self._load()
+        if cursor is not None:
+            meals = [meal for meal in meals if _meal_sort_key(meal) < cursor]
+        meals.sort(key=_meal_sort_key, reverse=True)
+        return [MealRecord.from_dict(meal) for meal in meals[:limit]]
+
+    def get_summary(self) -> Dict:
+        return _summarize_days(self._current_daily())
+
+
+class SqliteMealStorage(MealStorage):
+    """
+    Magazyn SQLite z indeksami na date i created_at.
+
+    Zapis jednego posiłku to jeden INSERT, a odczyt dnia korzysta z indeksu,
+    więc koszt operacji nie rośnie z długością historii. Sumy dzienne
+    (daily_summary, daily_totals) są aktualizowane w tej samej transakcji
+    co zapis lub usunięcie posiłku.
+
+    Operacja wypożycza połączenie z małej puli magazynu (SQLITE_POOL_SIZE)
+    i oddaje je po zakończeniu, więc liczba otwartych plików nie zależy od
+    liczby wątków, które kiedykolwiek użyły magazynu.
+    """
+
+    def __init__(self, path: str = MEALS_DB):
+        self.path = path
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        self._init_schema()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Połączenie wraca do puli i może trafić do innego wątku (zawsze jednego naraz)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Wypożycza połączenie z puli na czas jednej operacji."""
+        with self._pool_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open_connection()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._pool_lock:
+                keep = not self._closed and len(self._idle) < SQLITE_POOL_SIZE
+                if keep:
+                    self._idle.append(conn)
+            if not keep:
+                conn.close()
+
+    def _init_schema(self):
+        with self._connection() as conn:
+            # Tryb WAL jest zapisywany w pliku bazy - wystarczy ustawić go raz
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS meals (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        dish_name TEXT NOT NULL,
+                        amount INTEGER NOT NULL,
+                        date TEXT NOT NULL,
+                        nutrition_data TEXT NOT NULL,
+                        created_at TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_meals_date ON meals(date);
+                    CREATE INDEX IF NOT EXISTS idx_meals_created_at ON meals(created_at, id);
+                    CREATE TABLE IF NOT EXISTS daily_summary (
+                        date TEXT PRIMARY KEY,
+                        meal_count INTEGER NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS daily_totals (
+                        date TEXT NOT NULL,
+                        nutrient TEXT NOT NULL,
+                        total REAL NOT NULL,
+                        PRIMARY KEY (date, nutrient)
+                    ) WITHOUT ROWID;
+                """)
+
+            # Baza sprzed wprowadzenia sum dziennych - liczymy je raz od nowa
+            has_meals = conn.execute("SELECT 1 FROM meals LIMIT 1").fetchone()
+            has_totals = conn.execute("SELECT 1 FROM daily_summary LIMIT 1").fetchone()
+        if has_meals and not has_totals:
+            self.rebuild_daily_totals()
+
+    @staticmethod
+    def _update_daily(conn: sqlite3.Connection, date: str, nutrition_data: Dict, sign: int):
+        """Dodaje lub odejmuje posiłek od sum dnia (w bieżącej transakcji)."""
+        conn.execute(
+            "INSERT INTO daily_summary (date, meal_count) VALUES (?, ?) "
+            "ON CONFLICT(date) DO UPDATE SET meal_count = meal_count + excluded.meal_count",
+            (date, sign)
+        )
+        conn.executemany(
+            "INSERT INTO daily_totals (date, nutrient, total) VALUES (?, ?, ?) "
+            "ON CONFLICT(date, nutrient) DO UPDATE SET total = total + excluded.total",
+            [(date, key, sign * value) for key, value in _numeric_nutrients(nutrition_data)]
+        )
+        if sign < 0:
+            cursor = conn.execute("DELETE FROM daily_summary WHERE date = ? AND meal_count <= 0", (date,))
+            if cursor.rowcount:
+                conn.execute("DELETE FROM daily_totals WHERE date = ?", (date,))
+
+    def rebuild_daily_totals(self):
+        """Przelicza sumy dzienne od nowa na podstawie tabeli meals."""
+        daily = {}
+        with self._connection() as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in conn.execute("SELECT date, nutrition_data FROM meals"):
+                _apply_to_daily(daily, {"date": row["date"], "nutrition_data": json.loads(row["nutrition_data"])}, 1)
+
+            conn.execute("DELETE FROM daily_summary")
+            conn.execute("DELETE FROM daily_totals")
+            conn.executemany(
+                "INSERT INTO daily_summary (date, meal_count) VALUES (?, ?)",
+                [(date, day["meal_count"]) for date, day in daily.items()]
+            )
+            conn.executemany(
+                "INSERT INTO daily_totals (date, nutrient, total) VALUES (?, ?, ?)",
+                [(date, key, value) for date, day in daily.items() for key, value in day["totals"].items()]
+            )
+
+    @staticmethod
+    def _row_to_meal(row: sqlite3.Row) -> MealRecord:
+        return MealRecord(row["id"], row["dish_name"], row["amount"], row["date"], row["created_at"],
+                          json.loads(row["nutrition_data"]))
+
+    def add_meal(self, meal: Dict) -> MealRecord:
+        with self._connection() as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO meals (dish_name, amount, date, nutrition_data, created_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    meal["dish_name"],
+                    meal["amount"],
+                    meal["date"],
+                    json.dumps(meal.get("nutrition_data") or {}, ensure_ascii=False),
+                    meal["created_at"]
+                )
+            )
+            self._update_daily(conn, meal["date"], meal.get("nutrition_data"), 1)
+        return MealRecord.from_dict({"id": cursor.lastrowid, **meal})
+
+    def add_meals(self, meals: List[Dict]) -> List[MealRecord]:
+        # Jedna transakcja na paczkę; sumy dzienne są najpierw sumowane w pamięci,
+        # więc każdy dzień paczki to jeden upsert zamiast jednego na posiłek
+        daily = {}
+        new_meals = []
+        with self._connection() as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for meal in meals:
+                cursor = conn.execute(
+                    "INSERT INTO meals (dish_name, amount, date, nutrition_data, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        meal["dish_name"],
+                        meal["amount"],
+                        meal["date"],
+                        json.dumps(meal.get("nutrition_data") or {}, ensure_ascii=False),
+                        meal["created_at"]
+                    )
+                )
+                new_meals.append(MealRecord.from_dict({"id": cursor.lastrowid, **meal}))
+                _apply_to_daily(daily, meal, 1)
+
+            conn.executemany(
+                "INSERT INTO daily_summary (date, meal_count) VALUES (?, ?) "
+                "ON CONFLICT(date) DO UPDATE SET meal_count = meal_count + excluded.meal_count",
+                [(date, day["meal_count"]) for date, day in daily.items()]
+            )
+            conn.executemany(
+                "INSERT INTO daily_totals (date, nutrient, total) VALUES (?, ?, ?) "
+                "ON CONFLICT(date, nutrient) DO UPDATE SET total = total + excluded.total",
+                [(date, key, value) for date, day in daily.items() for key, value in day["totals"].items()]
+            )
+        return new_meals
+
+    def delete_meal(self, meal_id: int) -> Optional[MealRecord]:
+        with self._connection() as conn, conn:
+            # Blokada zapisu od razu - odczyt i usunięcie muszą widzieć ten sam wiersz
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM meals WHERE id = ?", (meal_id,)).fetchone()
+            if row is None:
+                return None
+            deleted = self._row_to_meal(row)
+            conn.execute("DELETE FROM meals WHERE id = ?", (meal_id,))
+            self._update_daily(conn, deleted.date, deleted.nutrition_data, -1)
+        return deleted
+
+    def get_meals_by_date(self, date: str) -> List[MealRecord]:
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM meals WHERE date = ? ORDER BY id", (date,)
+            )
+            return [self._row_to_meal(row) for row in rows]
+
+    def get_all_meals(self) -> List[MealRecord]:
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM meals ORDER BY created_at DESC, id DESC"
+            )
+            return [self._row_to_meal(row) for row in rows]
+
+    def iter_meals(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[MealRecord]:
+        # Partie po ITER_BATCH_SIZE od ostatniego (date, id) - indeks idx_meals_date,
+        # bez otwartego kursora między partiami (zapisy w trakcie eksportu nie czekają)
+        end = end_date or _LAST_DATE
+        position = (start_date or _FIRST_DATE, 0)
+        while True:
+            # Połączenie wraca do puli przed oddaniem partii odbiorcy
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM meals WHERE date <= ? AND (date, id) > (?, ?) ORDER BY date, id LIMIT ?",
+                    (end, position[0], position[1], ITER_BATCH_SIZE)
+                ).fetchall()
+            for row in rows:
+                yield self._row_to_meal(row)
+            if len(rows) < ITER_BATCH_SIZE:
+                return
+            position = (rows[-1]["date"], rows[-1]["id"])
+
+    def get_daily_totals(self, start_date: str, end_date: str) -> List[Dict]:
+        with self._connection() as conn:
+            days = {
+                row["date"]: {"meal_count": row["meal_count"], "totals": {}}
+                for row in conn.execute(
+                    "SELECT date, meal_count FROM daily_summary WHERE date BETWEEN ? AND ? ORDER BY date",
+                    (start_date, end_date)
+                )
+            }
+            for row in conn.execute(
+                "SELECT date, nutrient, total FROM daily_totals WHERE date BETWEEN ? AND ?",
+                (start_date, end_date)
+            ):
+                if row["date"] in days:
+                    days[row["date"]]["totals"][row["nutrient"]] = row["total"]
+
+        return [_format_day(date, day["meal_count"], day["totals"]) for date, day in days.items()]
+
+    def get_meals_page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> List[MealRecord]:
+        # Oba warianty korzystają z indeksu idx_meals_created_at(created_at, id)
+        with self._connection() as conn:
+            if cursor is None:
+                rows = conn.execute(
+                    "SELECT * FROM meals ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM meals WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                    (cursor[0], cursor[1], limit)
+                )
+            return [self._row_to_meal(row) for row in rows]
+
+    def get_summary(self) -> Dict:
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(meal_count), 0), COUNT(*), MIN(date), MAX(date) FROM daily_summary"
+            ).fetchone()
+        return {
+            "total_meals": row[0],
+            "unique_days": row[1],
+            "first_date": row[2],
+            "last_date": row[3]
+        }
+
+    def count_meals(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM meals").fetchone()[0]
+
+    def close(self):
+        # Wypożyczone połączenia zamkną się przy zwrocie
+        with self._pool_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class JournalMealStorage(MealStorage):
+    """
+    Magazyn w trybie dziennika zdarzeń (JSON Lines).
+
+    Każdy zapis to dopisanie jednej linii do meals.jsonl:
+        {"op": "add", "meal": {...}}
+        {"op": "delete", "id": 5}
+    Kompakcja przepisuje bieżący stan do meals.json (jeden posiłek
+    w linii, nadal poprawny JSON) i zaczyna dziennik od nowa.
+
+    Stan jest trzymany w pamięci jako MealRecord (zwarte rekordy zamiast
+    słowników - ten magazyn trzyma w pamięci całą historię) razem z indeksem
+    po dacie, posortowaną listą kluczy (created_at, id) i sumami dziennymi
+    mikroskładników. Rekordy są tylko do odczytu, więc odczyty zwracają je
+    bez kopiowania. Przed każdą
+    operacją dociągane są tylko nowe linie dziennika (np. dopisane przez
+    inne procesy), więc odczyt nie parsuje całego pliku.
+    """
+
+    def __init__(self, path: str = MEALS_FILE, log_path: str = MEALS_LOG):
+        self.path = path
+        self.log_path = log_path
+        self._lock = threading.RLock()
+        self._log_file = None
+        self._unsynced = 0
+        self._closed = False
+        self._reset_state()
+
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with self._lock, file_lock(self.log_path):
+            if not os.path.exists(self.log_path):
+                open(self.log_path, "ab").close()
+            self._reload()
+
+        _register_journal(self)
+
+    def _reset_state(self):
+        self._meals = {}
+        self._by_date = {}
+        self._daily = {}
+        self._order = []
+        self._last_id = 0
+        self._log_identity = None
+        self._offset = 0
+        self._log_records = 0
+        self._partial_tail = False
+
+    # --- Odtwarzanie stanu -------------------------------------------------
+
+    def _reload(self):
+        """Odtwarza stan z migawki i całego dziennika."""
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+        self._reset_state()
+        self._load_snapshot()
+        self._read_log()
+
+    def _load_snapshot(self):
+        """Wczytuje meals.json strumieniowo (jeden posiłek w linii)."""
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if f.readline().strip() != "[":
+                    raise ValueError("Migawka nie jest w formacie linia-na-posiłek")
+                for line in f:
+                    line = line.strip().rstrip(",")
+                    if line and line != "]":
+                        self._apply({"op": "add", "meal": json.loads(line)})
+        except ValueError:
+            # Plik zapisany inaczej (np. przez JsonMealStorage z wcięciami)
+            self._meals, self._by_date, self._daily, self._order = {}, {}, {}, []
+            with open(self.path, "r", encoding="utf-8") as f:
+                for meal in json.load(f):
+                    self._apply({"op": "add", "meal": meal})
+
+    def _read_log(self):
+        """Dociąga nowe, kompletne linie dziennika."""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+
+        identity = (stat.st_dev, stat.st_ino)
+        if self._log_identity is None:
+            self._log_identity = identity
+        elif identity != self._log_identity or stat.st_size < self._offset:
+            # Inny proces wykonał kompakcję - migawka i dziennik są nowe
+            self._reload()
+            return
+
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        for raw in data[:end].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                self._apply(json.loads(raw))
+                self._log_records += 1
+            except ValueError:
+                logger.warning("Pomijam uszkodzony wpis dziennika: %r", raw[:80])
+
+        self._offset += end
+        self._partial_tail = end < len(data)
+
+    def _apply(self, record: Dict):
+        op = record.get("op")
+        if op == "add":
+            if record["meal"]["id"] in self._meals:
+                return
+            meal = MealRecord.from_dict(record["meal"])
+            self._meals[meal.id] = meal
+            self._by_date.setdefault(meal.date, {})[meal.id] = None
+            _apply_to_daily(self._daily, meal, 1)
+            # Posiłki przychodzą zwykle w kolejności created_at - wstawienie na koniec listy
+            bisect.insort(self._order, (meal.created_at or "", meal.id))
+            self._last_id = max(self._last_id, meal.id)
+        elif op == "delete":
+            meal = self._meals.pop(record["id"], None)
+            if meal is not None:
+                self._by_date.get(meal.date, {}).pop(meal.id, None)
+                _apply_to_daily(self._daily, meal, -1)
+                index = bisect.bisect_left(self._order, (meal.created_at or "", meal.id))
+                del self._order[index]
+        elif op == "meta":
+            self._last_id = max(self._last_id, record.get("last_id", 0))
+
+    # --- Zapis -------------------------------------------------------------
+
+    def _append(self, records: List[Dict]):
+        """Dopisuje rekordy do dziennika (wywoływane pod obiema blokadami)."""
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        if self._partial_tail:
+            # Niedokończona linia po awarii - zaczynamy od nowej linii
+            data = b"\n" + data
+            self._partial_tail = False
+
+        if self._log_file is None:
+            self._log_file = open(self.log_path, "ab")
+        self._log_file.write(data)
+        self._log_file.flush()
+
+        self._offset += len(data)
+        self._log_records += len(records)
+        for record in records:
+            self._apply(record)
+
+        self._unsynced += len(records)
+        if self._unsynced >= JOURNAL_FSYNC_BATCH:
+            self._sync()
+
+    def _sync(self):
+        """Wymusza zapis dziennika na dysk (fsync)."""
+        if self._log_file and self._unsynced:
+            os.fsync(self._log_file.fileno())
+            self._unsynced = 0
+
+    def _flush(self):
+        """fsync i w razie potrzeby kompakcja (wywoływane przez wspólny wątek _flush_journals)."""
+        try:
+            with self._lock:
+                if self._closed:
+                    return
+                self._sync()
+            if self._log_records >= JOURNAL_COMPACT_THRESHOLD:
+                self.compact()
+        except Exception:
+            logger.exception("Błąd synchronizacji dziennika")
+
+    def compact(self) -> int:
+        """
+        Zapisuje bieżący stan jako migawkę meals.json i czyści dziennik.
+
+        Returns:
+            Liczba posiłków w migawce
+        """
+        with self._lock, file_lock(self.log_path):
+            self._read_log()
+            self._sync()
+
+            meals = sorted(self._meals.values(), key=lambda meal: meal.id)
+            lines = ["[\n"]
+            lines += [json.dumps(meal.to_dict(), ensure_ascii=False) + (",\n" if i < len(meals) - 1 else "\n")
+                      for i, meal in enumerate(meals)]
+            lines.append("]\n")
+            atomic_write_lines(self.path, lines)
+
+            # Nowy dziennik pamięta ostatnie id, żeby nie używać ponownie id usuniętych posiłków
+            atomic_write_lines(self.log_path, [json.dumps({"op": "meta", "last_id": self._last_id}) + "\n"])
+
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
+            self._reload()
+
+        logger.info("Kompakcja dziennika: %d posiłków w %s", len(meals), self.path)
+        return len(meals)
+
+    # --- Interfejs MealStorage --------------------------------------------
+
+    def add_meal(self, meal: Dict) -> MealRecord:
+        return self.add_meals([meal])[0]
+
+    def delete_meal(self, meal_id: int) -> Optional[MealRecord]:
+        with self._lock, file_lock(self.log_path):
+            self._read_log()
+            deleted = self._meals.get(meal_id)
+            if deleted is None:
+                return None
+            self._append([{"op": "delete", "id": meal_id}])
+        return deleted
+
+    def get_meals_by_date(self, date: str) -> List[MealRecord]:
+        with self._lock:
+            self._read_log()
+            return [self._meals[meal_id] for meal_id in self._by_date.get(date, {})]
+
+    def get_all_meals(self) -> List[MealRecord]:
+        with self._lock:
+            self._read_log()
+            meals = list(self._meals.values())
+        meals.sort(key=lambda x: x.created_at or "", reverse=True)
+        return meals
+
+    def add_meals(self, meals: List[Dict]) -> List[MealRecord]:
+        with self._lock, file_lock(self.log_path):
+            self._read_log()
+            first_id = self._last_id + 1
+            self._append([{"op": "add", "meal": {"id": first_id + offset, **meal}}
+                          for offset, meal in enumerate(meals)])
+            return [self._meals[first_id + offset] for offset in range(len(meals))]
+
+    def iter_meals(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[MealRecord]:
+        # Posiłki są zbierane dzień po dniu pod blokadą, a zwracane już bez niej
+        start, end = start_date or _FIRST_DATE, end_date or _LAST_DATE
+        with self._lock:
+            self._read_log()
+            dates = sorted(date for date in self._by_date if date is not None and start <= date <= end)
+        for date in dates:
+            with self._lock:
+                meals = [self._meals[meal_id] for meal_id in self._by_date.get(date, {})]
+            meals.sort(key=lambda meal: meal.id)
+            yield from meals
+
+    def get_daily_totals(self, start_date: str, end_date: str) -> List[Dict]:
+        with self._lock:
+            self._read_log()
+            return _select_days(self._daily, start_date, end_date)
+
+    def get_meals_page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> List[MealRecord]:
+        with self._lock:
+            self._read_log()
+            end = len(self._order) if cursor is None else bisect.bisect_left(self._order, cursor)
+            keys = self._order[max(0, end - limit):end]
+            return [self._meals[meal_id] for _, meal_id in reversed(keys)]
+
+    def get_summary(self) -> Dict:
+        with self._lock:
+            self._read_log()
+            return _summarize_days(self._daily)
+
+    def close(self):
+        """Wypisuje magazyn z wątku synchronizacji i zapisuje dziennik na dysk."""
+        with _journals_lock:
+            _journals.discard(self)
+        with self._lock:
+            self._closed = True
+            self._sync()
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
+
+
+# Otwarte magazyny dziennika zdarzeń - jeden wspólny wątek robi fsync
+# i kompakcję wszystkich (zamiast osobnego wątku na każdego użytkownika)
+_journals: "weakref.WeakSet[JournalMealStorage]" = weakref.WeakSet()
+_journals_lock = threading.Lock()
+_journal_flusher = None
+
+
+def _register_journal(storage: JournalMealStorage):
+    """Dopisuje magazyn do wspólnego wątku synchronizacji (uruchamia go przy pierwszym)."""
+    global _journal_flusher
+
+    with _journals_lock:
+        _journals.add(storage)
+        if _journal_flusher is None:
+            _journal_flusher = threading.Thread(target=_flush_journals, name="meal-journal-sync", daemon=True)
+            _journal_flusher.start()
+
+
+def _flush_journals():
+    """Co JOURNAL_FSYNC_INTERVAL s robi fsync i w razie potrzeby kompakcję otwartych dzienników."""
+    while True:
+        time.sleep(JOURNAL_FSYNC_INTERVAL)
+        with _journals_lock:
+            journals = list(_journals)
+        for journal in journals:
+            journal._flush()
+
+
+def migrate_json_to_sqlite(json_path: str = MEALS_FILE, db_path: str = MEALS_DB) -> int:
+    """
+    Jednorazowo przenosi posiłki z meals.json do bazy SQLite.
+
+    Identyfikatory są zachowywane, a posiłki już obecne w bazie (o tym
+    samym id) są pomijane, więc ponowne uruchomienie niczego nie dubluje.
+
+    Args:
+        json_path: Ścieżka do pliku meals.json
+        db_path: Ścieżka do bazy SQLite
+
+    Returns:
+        Liczba przeniesionych posiłków
+    """
+    if not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        meals = json.load(f)
+
+    storage = SqliteMealStorage(db_path)
+    try:
+        with storage._connection() as conn, conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO meals (id, dish_name, amount, date, nutrition_data, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        meal.get("id"),
+                        meal.get("dish_name", ""),
+                        meal.get("amount", 0),
+                        meal.get("date", ""),
+                        json.dumps(meal.get("nutrition_data") or {}, ensure_ascii=False),
+                        meal.get("created_at", "")
+                    )
+                    for meal in meals
+                ]
+            )
+        storage.rebuild_daily_totals()
+    finally:
+        storage.close()
+
+    logger.info("Przeniesiono %d posiłków z %s do %s", cursor.rowcount, json_path, db_path)
+    return cursor.rowcount
+
+
+class TimedMealStorage(MealStorage):
+    """
+    Mierzy czas operacji magazynu (histogram smartdiet_storage_seconds
+    z etykietami backend i operation) i przekazuje je do właściwego magazynu.
+
+    Pozostałe atrybuty (np. compact, count_meals) są przekazywane bez pomiaru.
+    """
+
+    def __init__(self, storage: MealStorage, backend: str):
+        self.storage = storage
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def add_meal(self, meal: Dict) -> MealRecord:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="add_meal"):
+            return self.storage.add_meal(meal)
+
+    def delete_meal(self, meal_id: int) -> Optional[MealRecord]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="delete_meal"):
+            return self.storage.delete_meal(meal_id)
+
+    def get_meals_by_date(self, date: str) -> List[MealRecord]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="get_meals_by_date"):
+            return self.storage.get_meals_by_date(date)
+
+    def get_all_meals(self) -> List[MealRecord]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="get_all_meals"):
+            return self.storage.get_all_meals()
+
+    def add_meals(self, meals: List[Dict]) -> List[MealRecord]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="add_meals"):
+            return self.storage.add_meals(meals)
+
+    def iter_meals(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Iterator[MealRecord]:
+        # Bez pomiaru - czas przeglądania zależy od odbiorcy (np. klienta pobierającego eksport)
+        return self.storage.iter_meals(start_date, end_date)
+
+    def get_daily_totals(self, start_date: str, end_date: str) -> List[Dict]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="get_daily_totals"):
+            return self.storage.get_daily_totals(start_date, end_date)
+
+    def get_meals_page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> List[MealRecord]:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="get_meals_page"):
+            return self.storage.get_meals_page(limit, cursor)
+
+    def get_summary(self) -> Dict:
+        with STORAGE_SECONDS.time(backend=self.backend, operation="get_summary"):
+            return self.storage.get_summary()
+
+    def close(self):
+        self.storage.close()
+
+
+def _create_storage(directory: str) -> MealStorage:
+    """
+    Tworzy magazyn (wybrany zmienną MEAL_STORAGE) z plikami w katalogu.
+
+    Przy pierwszym uruchomieniu w trybie SQLite posiłki z meals.json
+    z tego katalogu są automatycznie przenoszone do nowej bazy.
+    """
+    if STORAGE_BACKEND == "json":
+        return TimedMealStorage(JsonMealStorage(os.path.join(directory, "meals.json")), "json")
+    if STORAGE_BACKEND == "journal":
+        return TimedMealStorage(JournalMealStorage(os.path.join(directory, "meals.json"),
+                                                   os.path.join(directory, "meals.jsonl")), "journal")
+
+    db_path = os.path.join(directory, "meals.db")
+    is_new_database = not os.path.exists(db_path)
+    storage = TimedMealStorage(SqliteMealStorage(db_path), "sqlite")
+    if is_new_database:
+        migrate_json_to_sqlite(os.path.join(directory, "meals.json"), db_path)
+    return storage
+
+
+class _OpenStorage:
+    """Otwarty magazyn użytkownika z licznikiem wątków, które go używają."""
+
+    __slots__ = ("storage", "users", "evicted")
+
+    def __init__(self, storage: MealStorage):
+        self.storage = storage
+        self.users = 0
+        self.evicted = False
+
+
+# Otwarte magazyny użytkowników, od najdawniej używanego
+_storages: "OrderedDict[str, _OpenStorage]" = OrderedDict()
+_storage_lock = threading.Lock()
+
+
+def _acquire_storage(user_id: str) -> _OpenStorage:
+    with _storage_lock:
+        entry = _storages.get(user_id)
+        if entry is not None:
+            _storages.move_to_end(user_id)
+            entry.users += 1
+            return entry
+
+    # Otwarcie (schemat, migracja) poza blokadą - nie wstrzymuje innych użytkowników
+    created = _create_storage(user_data_dir(user_id))
+
+    to_close = []
+    with _storage_lock:
+        entry = _storages.get(user_id)
+        if entry is None:
+            entry = _storages[user_id] = _OpenStorage(created)
+            created = None
+        entry.users += 1
+        while len(_storages) > max(USER_STORAGE_CACHE, 1):
+            evicted = _storages.popitem(last=False)[1]
+            evicted.evicted = True
+            # Magazyn w użyciu zamknie ostatni wątek, który go zwolni
+            if evicted.users == 0:
+                to_close.append(evicted.storage)
+
+    # Inny wątek otworzył ten sam magazyn w międzyczasie
+    if created is not None:
+        to_close.append(created)
+    for storage in to_close:
+        storage.close()
+    return entry
+
+
+def _release_storage(entry: _OpenStorage):
+    with _storage_lock:
+        entry.users -= 1
+        close = entry.evicted and entry.users == 0
+    if close:
+        entry.storage.close()
+
+
+@contextmanager
+def use_storage(user_id: str = DEFAULT_USER) -> Iterator[MealStorage]:
+    """
+    Udostępnia magazyn posiłków użytkownika na czas bloku with.
+
+    Każdy użytkownik ma własną partycję (katalog z services.user_partition),
+    więc zapytania czytają tylko jego posiłki, a zapisy różnych
+    użytkowników nie czekają na wspólną blokadę ani plik. Otwartych jest
+    najwyżej USER_STORAGE_CACHE magazynów - najdawniej używany jest
+    usuwany z puli, a zamykany dopiero, gdy zwolni go ostatni blok
+    with (zapis w innym wątku nie trafi na zamknięty magazyn). Czas
+    operacji jest mierzony przez TimedMealStorage.
+
+    Args:
+        user_id: Identyfikator użytkownika (sprawdzony przez normalize_user_id)
+
+    Yields:
+        MealStorage: Magazyn użytkownika
+    """
+    entry = _acquire_storage(user_id)
+    try:
+        yield entry.storage
+    finally:
+        _release_storage(entry)
+
+
+def close_storages():
+    """Zamyka wszystkie nieużywane magazyny (np. przy zamykaniu procesu lub w testach)."""
+    with _storage_lock:
+        entries = list(_storages.values())
+        _storages.clear()
+        to_close = []
+        for entry in entries:
+            entry.evicted = True
+            if entry.users == 0:
+                to_close.append(entry.storage)
+    for storage in to_close:
+        storage.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m services.meal_storage          - migracja meals.json -> meals.db
+    # python -m services.meal_storage compact  - kompakcja dziennika meals.jsonl
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        JournalMealStorage().compact()
+    else:
+        migrate_json_to_sqlite()
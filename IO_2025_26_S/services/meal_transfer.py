@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import math
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from services.meal_record import MealRecord
+from services.prompts import NUTRIENT_KEYS
+
+# Formaty eksportu i importu dziennika: nazwa -> typ MIME
+TRANSFER_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+# Kolumny CSV: pola posiłku i mikroskładniki z NUTRIENT_KEYS (pozostałe
+# mikroskładniki zachowuje tylko NDJSON)
+CSV_MEAL_FIELDS = ("id", "date", "created_at", "dish_name", "amount")
+CSV_COLUMNS = CSV_MEAL_FIELDS + NUTRIENT_KEYS
+
+# Eksport jest wysyłany fragmentami mniej więcej tej wielkości (w znakach)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))
+
+# Limity pól importowanego posiłku (jak w formularzu i /api/analyze)
+MAX_DISH_NAME_LENGTH = 200
+MAX_AMOUNT = 10000
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> Optional[str]:
+    """
+    Rozpoznaje format przesyłanego dziennika po nazwie pliku albo typie treści.
+
+    Args:
+        content_type: Nagłówek Content-Type (np. "text/csv; charset=utf-8")
+        filename: Nazwa przesłanego pliku (multipart/form-data)
+
+    Returns:
+        "ndjson", "csv" albo None, gdy format jest nieznany
+    """
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".csv":
+            return "csv"
+        if extension in (".ndjson", ".jsonl"):
+            return "ndjson"
+
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in ("text/csv", "application/csv"):
+        return "csv"
+    if mimetype in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "ndjson"
+    return None
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _format_lines(meals: Iterable[MealRecord], fmt: str) -> Iterator[str]:
+    if fmt == "csv":
+        yield _csv_line(CSV_COLUMNS)
+        for meal in meals:
+            nutrition_data = meal.nutrition_data
+            yield _csv_line([meal.get(field, "") for field in CSV_MEAL_FIELDS] +
+                            [nutrition_data.get(key, "") for key in NUTRIENT_KEYS])
+    else:
+        for meal in meals:
+            yield json.dumps(meal.to_dict(), ensure_ascii=False) + "\n"
+
+
+def export_chunks(meals: Iterable[MealRecord], fmt: str) -> Iterator[str]:
+    """
+    Zamienia strumień posiłków na fragmenty pliku eksportu.
+
+    Posiłki są formatowane po jednym i sklejane we fragmenty około
+    EXPORT_CHUNK_SIZE znaków - w pamięci jest najwyżej jeden fragment,
+    niezależnie od wielkości dziennika.
+
+    Args:
+        meals: Posiłki (np. z MealStorage.iter_meals)
+        fmt: "ndjson" (jeden posiłek JSON w linii) albo "csv"
+
+    Returns:
+        Generator kolejnych fragmentów tekstu
+    """
+    chunk, size = [], 0
+    for line in _format_lines(meals, fmt):
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """
+    Czyta przesłany dziennik wiersz po wierszu.
+
+    Args:
+        stream: Strumień tekstowy z treścią pliku
+        fmt: "ndjson" albo "csv"
+
+    Returns:
+        Generator par (numer linii, słownik pól posiłku); wiersz, którego
+        nie da się odczytać, daje None zamiast słownika
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            nutrition_data = {
+                key: value for key, value in row.items()
+                if key is not None and key not in CSV_MEAL_FIELDS and value not in (None, "")
+            }
+            yield reader.line_num, {**{field: row.get(field) for field in CSV_MEAL_FIELDS},
+                                    "nutrition_data": nutrition_data}
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def _parse_nutrients(nutrition_data) -> Dict:
+    if nutrition_data is None:
+        return {}
+    if not isinstance(nutrition_data, dict):
+        raise ValueError("Pole 'nutrition_data' musi być obiektem")
+
+    parsed = {}
+    for key, value in nutrition_data.items():
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Wartość '{key}' musi być liczbą") from None
+        if not math.isfinite(number) or number < 0:
+            raise ValueError(f"Wartość '{key}' musi być nieujemną liczbą")
+        parsed[str(key)] = round(number, 2)
+    return parsed
+
+
+def meal_from_record(record: Optional[Dict]) -> Dict:
+    """
+    Sprawdza wiersz importu i zamienia go na posiłek do zapisania.
+
+    Pole id jest pomijane (magazyn nadaje nowe). Bez created_at posiłek
+    dostaje początek swojego dnia, więc w dzienniku trafia na miejsce
+    według daty.
+
+    Args:
+        record: Słownik z read_records
+
+    Returns:
+        Posiłek (dish_name, amount, date, nutrition_data, created_at);
+        nutrition_data może być pusty
+
+    Raises:
+        ValueError: Gdy wiersz jest nieprawidłowy (komunikat dla użytkownika)
+    """
+    if record is None:
+        raise ValueError("Wiersz nie jest obiektem JSON")
+
+    dish_name = str(record.get("dish_name") or record.get("dish") or "").strip()
+    if not dish_name:
+        raise ValueError("Brak nazwy potrawy")
+    if len(dish_name) > MAX_DISH_NAME_LENGTH:
+        raise ValueError(f"Nazwa potrawy nie może przekraczać {MAX_DISH_NAME_LENGTH} znaków")
+
+    try:
+        amount = float(record.get("amount"))
+    except (TypeError, ValueError):
+        raise ValueError("Ilość musi być liczbą") from None
+    if not 0 < amount <= MAX_AMOUNT or amount != int(amount):
+        raise ValueError(f"Ilość musi być liczbą całkowitą od 1 do {MAX_AMOUNT}")
+
+    date = str(record.get("date") or "").strip()
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError("Data musi być w formacie YYYY-MM-DD") from None
+
+    created_at = str(record.get("created_at") or "").strip()
+    try:
+        datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        created_at = f"{date} 00:00:00"
+
+    return {
+        "dish_name": dish_name,
+        "amount": int(amount),
+        "date": date,
+        "nutrition_data": _parse_nutrients(record.get("nutrition_data")),
+        "created_at": created_at
+    }
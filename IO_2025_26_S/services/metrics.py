@@ -0,0 +1,270 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# METRICS=0 wyłącza zbieranie pomiarów (observe/inc nic nie robią)
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+
+# Granice przedziałów histogramów czasu (w sekundach)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Licznik zdarzeń (rośnie monotonicznie) z opcjonalnymi etykietami.
+
+    Wartości są trzymane w słowniku krotka etykiet -> liczba, więc
+    inkrementacja to jedno wyszukanie w słowniku pod blokadą.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """Zwiększa licznik dla podanych etykiet."""
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Bieżąca wartość licznika dla podanych etykiet."""
+        with self._lock:
+            return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Histogram czasów w formacie Prometheusa (_bucket, _sum, _count).
+
+    Dla każdej kombinacji etykiet trzymamy listę liczników przedziałów
+    (nieskumulowanych - kumulujemy dopiero przy eksporcie), sumę i liczbę
+    pomiarów; obserwacja to bisect po granicach i dwie inkrementacje.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Zapisuje pomiar (w sekundach) dla podanych etykiet."""
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mierzy czas wykonania bloku with i zapisuje go jako pomiar."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """Liczba pomiarów dla podanych etykiet."""
+        with self._lock:
+            series = self._series.get(tuple(labels[name] for name in self.labelnames))
+            return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class CollectedMetric:
+    """
+    Metryka odczytywana dopiero przy eksporcie z istniejących liczników
+    serwisów (np. get_cache_stats) - bez żadnego kosztu na ścieżce zapytań.
+
+    Funkcja collect zwraca słownik krotka etykiet -> wartość.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Iterable[str],
+                 collect: Callable[[], Dict[Tuple, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self.collect().items()]
+
+    def reset(self):
+        pass
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Tworzy (albo zwraca już zarejestrowany) licznik."""
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+    """Tworzy (albo zwraca już zarejestrowany) histogram."""
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def register_collector(name: str, documentation: str, kind: str, labelnames: Iterable[str],
+                       collect: Callable[[], Dict[Tuple, float]]):
+    """
+    Rejestruje metrykę czytaną z liczników serwisu przy każdym eksporcie.
+
+    Args:
+        name: Nazwa metryki
+        documentation: Opis (linia # HELP)
+        kind: "counter" albo "gauge"
+        labelnames: Nazwy etykiet
+        collect: Funkcja zwracająca słownik krotka etykiet -> wartość
+    """
+    return _register(CollectedMetric(name, documentation, kind, labelnames, collect))
+
+
+def render_metrics() -> str:
+    """
+    Eksportuje wszystkie metryki w formacie tekstowym Prometheusa (0.0.4).
+
+    Returns:
+        str: Treść odpowiedzi endpointu /metrics
+    """
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+
+    lines = []
+    for metric in metrics:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            samples = []
+            lines.append(f"# {metric.name}: błąd odczytu ({type(e).__name__})")
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    """Zeruje liczniki i histogramy (benchmarki)."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        metric.reset()
+
+
+# --- Metryki aplikacji ------------------------------------------------------
+
+REQUEST_SECONDS = histogram(
+    "smartdiet_http_request_seconds", "Czas obsługi zapytania HTTP (do wysłania nagłówków odpowiedzi)",
+    ("method", "endpoint", "status")
+)
+LLM_REQUEST_SECONDS = histogram(
+    "smartdiet_llm_request_seconds", "Czas zapytania do OpenAI API zakończonego odpowiedzią (strumień: do ostatniego fragmentu)",
+    ("kind",)
+)
+LLM_PARSE_SECONDS = histogram(
+    "smartdiet_llm_parse_seconds", "Czas parsowania (stage=parse) i walidacji (stage=validate) odpowiedzi modelu",
+    ("stage",)
+)
+CHART_RENDER_SECONDS = histogram(
+    "smartdiet_chart_render_seconds", "Czas przygotowania wykresu (rendered, cached, payload)",
+    ("result",)
+)
+STORAGE_SECONDS = histogram(
+    "smartdiet_storage_seconds", "Czas operacji magazynu posiłków",
+    ("backend", "operation")
+)
+LLM_RETRIES = counter(
+    "smartdiet_llm_retries_total", "Ponowione zapytania do OpenAI API według przyczyny",
+    ("label", "reason")
+)
+VALIDATION_FAILURES = counter(
+    "smartdiet_validation_failures_total", "Odpowiedzi modelu odrzucone przy parsowaniu lub walidacji",
+    ("reason",)
+)
+HTTP_CONDITIONAL = counter(
+    "smartdiet_http_conditional_total", "Odpowiedzi widoków dziennika: pełne (full) i 304 bez odczytu magazynu (not_modified)",
+    ("endpoint", "result")
+)
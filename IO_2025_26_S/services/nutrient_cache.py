@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.data_service import _ensure_data_directory, atomic_write_json, file_lock
+from services.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.path.join("data", "nutrient_cache.json")
+
+# Maksymalna liczba potraw w cache (po przekroczeniu usuwamy najdawniej używane)
+CACHE_MAX_ENTRIES = int(os.getenv("NUTRIENT_CACHE_MAX_ENTRIES", "1000"))
+
+# Czas życia wpisu w sekundach (domyślnie 30 dni)
+CACHE_TTL_SECONDS = int(os.getenv("NUTRIENT_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Jak długo przeterminowany wpis może jeszcze posłużyć jako wynik zastępczy,
+# gdy OpenAI API jest niedostępne (domyślnie 180 dni)
+CACHE_STALE_SECONDS = int(os.getenv("NUTRIENT_CACHE_STALE", str(180 * 24 * 3600)))
+
+_cache = OrderedDict()
+_lock = threading.RLock()
+_loaded = False
+# (st_mtime_ns, st_size) pliku cache przy ostatnim odczycie lub zapisie tego procesu
+_file_stamp = None
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "stale_served": 0}
+
+
+def normalize_dish_name(name: str) -> str:
+    """
+    Normalizuje nazwę potrawy do postaci klucza cache.
+
+    "  Jajecznica  z Szynką! " -> "jajecznica z szynką"
+
+    Args:
+        name: Nazwa potrawy wpisana przez użytkownika
+
+    Returns:
+        str: Znormalizowana nazwa
+    """
+    normalized = unicodedata.normalize("NFC", str(name)).casefold()
+    normalized = re.sub(r"[^\w\s-]", " ", normalized)
+    return " ".join(normalized.split())
+
+
+def _stat_stamp():
+    try:
+        stat = os.stat(CACHE_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _trim():
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def _merge_from_disk():
+    """
+    Dołącza do cache w pamięci wpisy z pliku (zapisane np. przez inne workery).
+
+    Z dwóch wersji tej samej potrawy wygrywa nowsza (stored_at). Wpisy
+    znane tylko z pliku trafiają przed wpisy z pamięci - kolejność
+    najdawniej używanych zna tylko ten proces.
+    """
+    global _file_stamp
+    stamp = _stat_stamp()
+    if stamp is None or stamp == _file_stamp:
+        return
+
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except Exception as e:
+        logger.warning("[CACHE] Nie udało się wczytać cache: %s", e)
+        return
+    _file_stamp = stamp
+
+    now = time.time()
+    merged = OrderedDict()
+    # Plik trzyma wpisy od najdawniej do najświeżej używanych
+    for key, entry in entries.items():
+        if key not in _cache and now - entry.get("stored_at", 0) <= CACHE_STALE_SECONDS:
+            merged[key] = entry
+    for key, entry in _cache.items():
+        on_disk = entries.get(key)
+        if on_disk is not None and on_disk.get("stored_at", 0) > entry["stored_at"]:
+            entry = on_disk
+        merged[key] = entry
+
+    _cache.clear()
+    _cache.update(merged)
+    _trim()
+
+
+def _load_cache():
+    """Wczytuje cache z dysku przy pierwszym użyciu."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+
+    _merge_from_disk()
+    if _cache:
+        logger.info("[CACHE] Wczytano %d potraw z %s", len(_cache), CACHE_FILE)
+
+
+def _save_cache():
+    """
+    Zapisuje cache na dysk (zapis do pliku tymczasowego + podmiana).
+
+    Pod blokadą pliku najpierw dołącza wpisy zapisane przez inne procesy,
+    więc worker nie nadpisuje potraw, których nauczyły się pozostałe.
+    """
+    global _file_stamp
+    try:
+        _ensure_data_directory()
+        with file_lock(CACHE_FILE):
+            _merge_from_disk()
+            atomic_write_json(CACHE_FILE, _cache)
+            _file_stamp = _stat_stamp()
+    except Exception as e:
+        logger.warning("[CACHE] Nie udało się zapisać cache: %s", e)
+
+
+def get_cached_nutrients(name: str) -> Optional[Dict]:
+    """
+    Zwraca zapamiętane wartości mikroskładników na 100g potrawy.
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g
+        None: Gdy potrawy nie ma w cache lub wpis wygasł
+    """
+    key = normalize_dish_name(name)
+
+    with _lock:
+        _load_cache()
+        entry = _cache.get(key)
+        if entry is None:
+            # Potrawę mógł już przeanalizować inny worker
+            _merge_from_disk()
+            entry = _cache.get(key)
+
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+        if time.time() - entry["stored_at"] > CACHE_TTL_SECONDS:
+            # Wpis zostaje - może jeszcze posłużyć w get_stale_nutrients
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return dict(entry["per_100g"])
+
+
+def store_nutrients(name: str, per_100g: Dict):
+    """
+    Zapisuje wartości mikroskładników na 100g potrawy.
+
+    Args:
+        name: Nazwa potrawy
+        per_100g: Słownik mikroskładników przeliczony na 100g
+    """
+    if not per_100g:
+        return
+
+    key = normalize_dish_name(name)
+
+    with _lock:
+        _load_cache()
+        _cache[key] = {"per_100g": dict(per_100g), "stored_at": time.time()}
+        _cache.move_to_end(key)
+        _trim()
+
+        _save_cache()
+
+
+def get_stale_nutrients(name: str) -> Optional[Dict]:
+    """
+    Zwraca wartości na 100g także z przeterminowanego wpisu.
+
+    Używane jako wynik zastępczy, gdy API jest niedostępne; wpisy starsze
+    niż CACHE_STALE_SECONDS nie są zwracane.
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g
+        None: Gdy potrawy nie ma w cache
+    """
+    key = normalize_dish_name(name)
+
+    with _lock:
+        _load_cache()
+        if key not in _cache:
+            _merge_from_disk()
+        entry = _cache.get(key)
+        if entry is None or time.time() - entry["stored_at"] > CACHE_STALE_SECONDS:
+            return None
+
+        _stats["stale_served"] += 1
+        return dict(entry["per_100g"])
+
+
+def get_cache_stats() -> Dict:
+    """
+    Zwraca liczniki trafień i chybień cache.
+
+    Returns:
+        Słownik ze statystykami (hits, misses, evictions, expired, size)
+    """
+    with _lock:
+        _load_cache()
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "size": len(_cache),
+            "hit_ratio": round(_stats["hits"] / total, 3) if total else 0.0
+        }
+
+
+def clear_cache():
+    """Czyści cache w pamięci i na dysku."""
+    global _file_stamp
+    with _lock:
+        _cache.clear()
+        _file_stamp = None
+        for key in _stats:
+            _stats[key] = 0
+        if os.path.exists(CACHE_FILE):
+            os.remove(CACHE_FILE)
+
+
+def _collect_cache_events():
+    with _lock:
+        return {(event,): count for event, count in _stats.items()}
+
+
+register_collector(
+    "smartdiet_nutrient_cache_events_total", "Trafienia, chybienia, usunięcia i wpisy przeterminowane cache analiz",
+    "counter", ("event",), _collect_cache_events
+)
+register_collector(
+    "smartdiet_nutrient_cache_entries", "Liczba potraw w cache analiz", "gauge", (), lambda: {(): len(_cache)}
+)
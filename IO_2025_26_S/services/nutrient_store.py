@@ -0,0 +1,460 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date as date_type, timedelta
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from services.meal_record import MealRecord
+from services.meal_storage import use_storage
+from services.user_partition import DEFAULT_USER
+
+# Co ile sekund magazyn kolumnowy jest odtwarzany z sum dziennych magazynu
+# posiłków (łapie zmiany zapisane przez inne procesy)
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+
+# Dla ilu użytkowników trzymamy magazyny kolumnowe w pamięci
+ANALYTICS_STORE_CACHE = int(os.getenv("ANALYTICS_STORE_CACHE", "256"))
+
+# Domyślne dzienne normy (osoba dorosła); można je nadpisać zmienną
+# NUTRIENT_TARGETS, np. '{"Magnez": 400, "Żelazo": 18}'
+DEFAULT_DAILY_TARGETS = {
+    "Magnez": 350.0,
+    "Żelazo": 14.0,
+    "Witamina D": 15.0,
+    "Wapń": 1000.0,
+    "Cynk": 10.0,
+    "Potas": 3500.0,
+    "Witamina C": 80.0
+}
+DAILY_TARGETS = {**DEFAULT_DAILY_TARGETS, **json.loads(os.getenv("NUTRIENT_TARGETS", "{}"))}
+
+# Percentyle sum dziennych zwracane przez range_statistics
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+class NutrientColumnStore:
+    """
+    Kolumnowy magazyn sum dziennych mikroskładników.
+
+    Mikroskładniki są kolumnami (słownik nazwa -> indeks), a dni z posiłkami
+    wierszami macierzy float64 w kolejności dat; numery dni (date.toordinal)
+    trzyma posortowana tablica obok (i słownik numer dnia -> wiersz), razem
+    z liczbą posiłków w każdym dniu.
+    Wiersz jest tylko dla dnia z zapisem, więc rozrzucone daty (np.
+    0001-01-01 i 9999-12-31) zajmują dwa wiersze, a nie cały kalendarz
+    między nimi. Dodanie posiłku zmienia jeden wiersz, a zapytania o zakresy
+    dat działają na wycinkach macierzy (NumPy, wyszukiwanie binarne po
+    numerach dni), bez iterowania po słownikach posiłków.
+    """
+
+    def __init__(self):
+        self._columns = {}
+        self._names = []
+        self._days = 0
+        self._ordinals = np.zeros(0, dtype=np.int64)
+        self._rows = {}
+        self._totals = np.zeros((0, 0))
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._lock = threading.RLock()
+
+    # --- Zapis -------------------------------------------------------------
+
+    def _grow(self, days_needed: int, columns_needed: int):
+        """Powiększa macierz (z zapasem)."""
+        rows, cols = self._totals.shape
+        if days_needed <= rows and columns_needed <= cols:
+            return
+
+        new_rows = max(days_needed, rows * 2 if days_needed > rows else rows, 64)
+        new_cols = max(columns_needed, cols * 2 if columns_needed > cols else cols, 8)
+
+        totals = np.zeros((new_rows, new_cols))
+        totals[:self._days, :cols] = self._totals[:self._days]
+        counts = np.zeros(new_rows, dtype=np.int64)
+        counts[:self._days] = self._counts[:self._days]
+        ordinals = np.zeros(new_rows, dtype=np.int64)
+        ordinals[:self._days] = self._ordinals[:self._days]
+        self._totals, self._counts, self._ordinals = totals, counts, ordinals
+
+    def _row(self, ordinal: int) -> int:
+        """Zwraca indeks wiersza dnia, w razie potrzeby wstawiając nowy wiersz w kolejności dat."""
+        index = self._rows.get(ordinal)
+        if index is not None:
+            return index
+
+        days = self._days
+        index = int(np.searchsorted(self._ordinals[:days], ordinal))
+        self._grow(days + 1, len(self._names))
+        # Dzień po końcu zakresu (zwykle dzisiejszy) to dopisanie; wcześniejszy przesuwa późniejsze wiersze
+        if index < days:
+            self._totals[index + 1:days + 1] = self._totals[index:days]
+            self._counts[index + 1:days + 1] = self._counts[index:days]
+            self._ordinals[index + 1:days + 1] = self._ordinals[index:days]
+        self._totals[index] = 0
+        self._counts[index] = 0
+        self._ordinals[index] = ordinal
+        self._days = days + 1
+
+        if index < days:
+            self._rows = dict(zip(self._ordinals[:self._days].tolist(), range(self._days)))
+        else:
+            self._rows[ordinal] = index
+        return index
+
+    def _column(self, name: str) -> int:
+        index = self._columns.get(name)
+        if index is None:
+            index = len(self._names)
+            self._grow(self._days, index + 1)
+            self._columns[name] = index
+            self._names.append(name)
+        return index
+
+    def add_day(self, date: str, meal_count: int, totals: Dict, sign: int = 1):
+        """
+        Dodaje (sign=1) lub odejmuje (sign=-1) sumy z danego dnia.
+
+        Args:
+            date: Data w formacie YYYY-MM-DD
+            meal_count: Liczba posiłków, których dotyczą sumy
+            totals: Słownik mikroskładnik -> wartość
+            sign: 1 przy dodawaniu, -1 przy usuwaniu
+        """
+        self._add(date, meal_count, totals.items(), sign)
+
+    def _add(self, date: str, meal_count: int, items, sign: int):
+        try:
+            ordinal = date_type.fromisoformat(date).toordinal()
+        except (TypeError, ValueError):
+            return
+
+        with self._lock:
+            row = self._row(ordinal)
+            self._counts[row] += sign * meal_count
+            for name, value in items:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                self._totals[row, self._column(name)] += sign * value
+
+    def record_meal(self, meal, sign: int = 1):
+        """Dodaje lub odejmuje jeden posiłek (MealRecord - bez budowania słownika - albo słownik)."""
+        if isinstance(meal, MealRecord):
+            self._add(meal.date, 1, meal.nutrient_items(), sign)
+        else:
+            self.add_day(meal.get("date"), 1, meal.get("nutrition_data") or {}, sign)
+
+    # --- Zapytania ---------------------------------------------------------
+
+    def _logged(self, start_date: str, end_date: str):
+        """
+        Zwraca kopię wierszy dni z posiłkami z zakresu dat.
+
+        Returns:
+            tuple: (numery dni, macierz sum, wektor liczby posiłków)
+        """
+        start = date_type.fromisoformat(start_date).toordinal()
+        end = date_type.fromisoformat(end_date).toordinal()
+
+        ordinals = self._ordinals[:self._days]
+        lo = int(np.searchsorted(ordinals, start))
+        hi = max(int(np.searchsorted(ordinals, end, side="right")), lo)
+        counts = self._counts[lo:hi]
+        logged = counts > 0
+        return (ordinals[lo:hi][logged], self._totals[lo:hi, :len(self._names)][logged],
+                counts[logged])
+
+    def _window(self, start_date: str, end_date: str):
+        """
+        Zwraca kopię wierszy dla kalendarzowego zakresu dat (dni bez
+        posiłków to zera).
+
+        Returns:
+            tuple: (pierwszy dzień jako date, macierz sum, wektor liczby posiłków)
+        """
+        start = date_type.fromisoformat(start_date)
+        end = date_type.fromisoformat(end_date)
+        length = max((end - start).days + 1, 0)
+
+        totals = np.zeros((length, len(self._names)))
+        counts = np.zeros(length, dtype=np.int64)
+
+        if length:
+            ordinals, logged_totals, logged_counts = self._logged(start_date, end_date)
+            rows = ordinals - start.toordinal()
+            totals[rows] = logged_totals
+            counts[rows] = logged_counts
+
+        return start, totals, counts
+
+    def range_statistics(self, start_date: str, end_date: str,
+                         percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict:
+        """
+        Statystyki sum dziennych w zakresie dat (tylko dni z posiłkami).
+
+        Args:
+            start_date: Pierwszy dzień (YYYY-MM-DD)
+            end_date: Ostatni dzień (YYYY-MM-DD), włącznie
+            percentiles: Percentyle sum dziennych do policzenia
+
+        Returns:
+            Słownik z liczbą dni i posiłków oraz, dla każdego mikroskładnika,
+            sumą, średnią dzienną, minimum, maksimum i percentylami
+        """
+        percentiles = list(percentiles)
+        with self._lock:
+            _, logged, counts = self._logged(start_date, end_date)
+            names = list(self._names)
+
+        result = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "logged_days": int(logged.shape[0]),
+            "meal_count": int(counts.sum()),
+            "nutrients": {}
+        }
+        if not logged.shape[0]:
+            return result
+
+        present = np.flatnonzero((logged != 0).any(axis=0))
+        logged = logged[:, present]
+
+        sums = logged.sum(axis=0)
+        means = logged.mean(axis=0)
+        minimums = logged.min(axis=0)
+        maximums = logged.max(axis=0)
+        quantiles = np.percentile(logged, percentiles, axis=0) if percentiles else np.zeros((0, len(present)))
+
+        for i, column in enumerate(present):
+            stats = {
+                "sum": round(float(sums[i]), 2),
+                "mean": round(float(means[i]), 2),
+                "min": round(float(minimums[i]), 2),
+                "max": round(float(maximums[i]), 2)
+            }
+            for p, values in zip(percentiles, quantiles):
+                stats[f"p{p:g}"] = round(float(values[i]), 2)
+            result["nutrients"][names[column]] = stats
+
+        return result
+
+    def rolling_averages(self, start_date: str, end_date: str, window: int = 7) -> Dict:
+        """
+        Kroczące średnie dzienne z ostatnich `window` dni dla każdego dnia zakresu.
+
+        Średnia dzieli sumę z okna przez liczbę dni z posiłkami w oknie
+        (dni bez wpisów to brak danych, a nie zerowe spożycie).
+
+        Returns:
+            Słownik {"window", "dates": [...], "nutrients": {nazwa: [średnia lub None, ...]}}
+        """
+        start = date_type.fromisoformat(start_date)
+        # Okno nie sięga przed 0001-01-01 - brakujące dni to dni bez posiłków
+        first = date_type.fromordinal(max(start.toordinal() - window + 1, 1))
+        with self._lock:
+            _, totals, counts = self._window(first.isoformat(), end_date)
+            names = list(self._names)
+        missing = window - 1 - (start - first).days
+        if missing:
+            totals = np.vstack([np.zeros((missing, totals.shape[1])), totals])
+            counts = np.concatenate([np.zeros(missing, dtype=np.int64), counts])
+
+        # Sumy w oknie z różnicy sum skumulowanych
+        cumulative = np.vstack([np.zeros((1, totals.shape[1])), np.cumsum(totals, axis=0)])
+        cumulative_counts = np.concatenate([[0], np.cumsum(counts > 0)])
+        window_sums = cumulative[window:] - cumulative[:-window]
+        window_days = cumulative_counts[window:] - cumulative_counts[:-window]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = np.round(window_sums / window_days[:, None], 2)
+        averages[window_days == 0] = np.nan
+
+        present = np.flatnonzero((totals != 0).any(axis=0))
+        return {
+            "window": window,
+            "dates": [(start + timedelta(days=i)).isoformat() for i in range(averages.shape[0])],
+            "nutrients": {
+                names[column]: [None if np.isnan(value) else float(value) for value in averages[:, column]]
+                for column in present
+            }
+        }
+
+    def days_below_target(self, start_date: str, end_date: str, targets: Optional[Dict] = None) -> Dict:
+        """
+        Dni z posiłkami, w których suma mikroskładnika była poniżej normy.
+
+        Args:
+            start_date: Pierwszy dzień (YYYY-MM-DD)
+            end_date: Ostatni dzień (YYYY-MM-DD), włącznie
+            targets: Słownik mikroskładnik -> dzienna norma (domyślnie DAILY_TARGETS)
+
+        Returns:
+            Słownik {nazwa: {"target", "logged_days", "days_below", "dates": [...]}}
+        """
+        targets = targets or DAILY_TARGETS
+        with self._lock:
+            ordinals, totals, _ = self._logged(start_date, end_date)
+            columns = dict(self._columns)
+
+        names = list(targets)
+        # Mikroskładnik, którego nigdy nie zapisano, ma zerowe sumy
+        matrix = np.zeros((len(ordinals), len(names)))
+        for i, name in enumerate(names):
+            if name in columns:
+                matrix[:, i] = totals[:, columns[name]]
+
+        below = matrix < np.array([float(targets[name]) for name in names])
+
+        result = {}
+        for i, name in enumerate(names):
+            days = ordinals[below[:, i]]
+            result[name] = {
+                "target": float(targets[name]),
+                "logged_days": int(len(ordinals)),
+                "days_below": int(len(days)),
+                "dates": [date_type.fromordinal(int(day)).isoformat() for day in days]
+            }
+        return result
+
+
+def build_store_from_storage(user_id: str = DEFAULT_USER) -> NutrientColumnStore:
+    """Tworzy magazyn kolumnowy z sum dziennych magazynu posiłków użytkownika."""
+    store = NutrientColumnStore()
+
+    with use_storage(user_id) as storage:
+        summary = storage.get_summary()
+        if summary["first_date"]:
+            for day in storage.get_daily_totals(summary["first_date"], summary["last_date"]):
+                store.add_day(day["date"], day["meal_count"], day["totals"])
+    return store
+
+
+class _WriteState:
+    """Zapisy posiłków użytkownika w toku i licznik zmian (wersja)."""
+
+    __slots__ = ("in_flight", "version", "builders")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.version = 0
+        self.builders = 0
+
+
+# Magazyny użytkowników: user_id -> (magazyn, czas zbudowania), od najdawniej używanego
+_stores: "OrderedDict[str, tuple]" = OrderedDict()
+# Stan zapisów użytkowników, dla których trwa zapis albo budowanie magazynu
+_write_states: Dict[str, _WriteState] = {}
+_store_lock = threading.Lock()
+
+
+def _write_state(user_id: str) -> _WriteState:
+    """Zwraca stan zapisów użytkownika (wywoływane pod _store_lock)."""
+    state = _write_states.get(user_id)
+    if state is None:
+        state = _write_states[user_id] = _WriteState()
+    return state
+
+
+def _release_write_state(user_id: str, state: _WriteState):
+    """Usuwa stan, którego nikt już nie używa (wywoływane pod _store_lock)."""
+    if state.in_flight == 0 and state.builders == 0:
+        _write_states.pop(user_id, None)
+
+
+@contextmanager
+def tracking_write(user_id: str = DEFAULT_USER):
+    """
+    Obejmuje zapis do magazynu posiłków razem z record_meal.
+
+    Magazyn kolumnowy budowany w tym samym czasie mógł już przeczytać
+    zapisany posiłek (wtedy record_meal policzyłby go drugi raz) albo
+    jeszcze nie - dlatego get_nutrient_store nie zachowuje magazynu,
+    którego budowanie nałożyło się na zapis.
+
+    Args:
+        user_id: Identyfikator użytkownika
+    """
+    with _store_lock:
+        state = _write_state(user_id)
+        state.in_flight += 1
+        state.version += 1
+    try:
+        yield
+    finally:
+        with _store_lock:
+            state.in_flight -= 1
+            state.version += 1
+            _release_write_state(user_id, state)
+
+
+def get_nutrient_store(user_id: str = DEFAULT_USER) -> NutrientColumnStore:
+    """
+    Zwraca magazyn kolumnowy użytkownika; przy pierwszym użyciu i co
+    ANALYTICS_REFRESH_SECONDS odtwarza go z magazynu posiłków.
+
+    Budowanie odbywa się poza blokadą (zapytania innych użytkowników nie
+    czekają). Nowy magazyn zastępuje zapamiętany tylko wtedy, gdy w trakcie
+    budowania nie było zapisów tego użytkownika (tracking_write) i nikt nie
+    zapamiętał w międzyczasie nowszego; w przeciwnym razie służy tylko
+    bieżącemu zapytaniu.
+    """
+    with _store_lock:
+        entry = _stores.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] <= ANALYTICS_REFRESH_SECONDS:
+            _stores.move_to_end(user_id)
+            return entry[0]
+        state = _write_state(user_id)
+        state.builders += 1
+        started_version = state.version
+        started_at = time.monotonic()
+
+    try:
+        store = build_store_from_storage(user_id)
+    finally:
+        with _store_lock:
+            state.builders -= 1
+            consistent = state.version == started_version and state.in_flight == 0
+            _release_write_state(user_id, state)
+
+    with _store_lock:
+        entry = _stores.get(user_id)
+        if not consistent:
+            return store
+        if entry is not None and entry[1] >= started_at:
+            _stores.move_to_end(user_id)
+            return entry[0]
+
+        _stores[user_id] = (store, started_at)
+        _stores.move_to_end(user_id)
+        while len(_stores) > max(ANALYTICS_STORE_CACHE, 1):
+            _stores.popitem(last=False)
+        return store
+
+
+def record_meal(meal: Dict, sign: int = 1, user_id: str = DEFAULT_USER):
+    """
+    Aktualizuje magazyn kolumnowy po zapisie (sign=1) lub usunięciu (sign=-1) posiłku.
+
+    Wywoływać wewnątrz tracking_write razem z zapisem do magazynu posiłków.
+    Jeśli magazyn użytkownika nie był jeszcze zbudowany, nic nie robi -
+    zbuduje się z aktualnych danych przy pierwszym zapytaniu.
+    """
+    with _store_lock:
+        entry = _stores.get(user_id)
+        if entry is not None:
+            entry[0].record_meal(meal, sign)
+
+
+def invalidate_nutrient_store(user_id: Optional[str] = None):
+    """Wymusza odtworzenie magazynu użytkownika (albo wszystkich) przy następnym zapytaniu."""
+    with _store_lock:
+        if user_id is None:
+            _stores.clear()
+        else:
+            _stores.pop(user_id, None)
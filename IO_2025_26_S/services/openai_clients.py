@@ -0,0 +1,74 @@
+import logging
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LazyOpenAIClient:
+    """
+    Klient OpenAI tworzony przy pierwszym użyciu.
+
+    Import SDK openai to ok. 0,7 s przy starcie workera - z tym obiektem
+    płaci go dopiero pierwsza analiza, a worker obsługujący tylko dziennik
+    nie ładuje SDK wcale. Dostęp do atrybutów (client.chat...) jest
+    przekazywany do prawdziwego klienta, więc serwisy nie widzą różnicy.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, use_async: bool = False):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.use_async = use_async
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """Czy prawdziwy klient (i SDK) został już utworzony."""
+        return self._client is not None
+
+    def get(self):
+        """Zwraca prawdziwy klient OpenAI/AsyncOpenAI, tworząc go przy pierwszym wywołaniu."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import AsyncOpenAI, OpenAI
+
+                    # Ponawianiem zapytań zajmuje się services.resilience (backoff,
+                    # budżet czasu, bezpiecznik), więc wbudowane ponawianie SDK jest wyłączone
+                    client_class = AsyncOpenAI if self.use_async else OpenAI
+                    self._client = client_class(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+                    logger.info("Utworzono klienta %s", client_class.__name__)
+        return self._client
+
+    def __getattr__(self, name):
+        # Wywoływane tylko dla atrybutów, których nie ma sam obiekt
+        return getattr(self.get(), name)
+
+
+def create_openai_clients(api_key: Optional[str], base_url: Optional[str] = None,
+                          use_async: bool = True, preload: bool = False) -> Tuple:
+    """
+    Tworzy klientów OpenAI dla aplikacji.
+
+    Args:
+        api_key: Klucz API (bez klucza analizy są wyłączone)
+        base_url: Adres API (domyślnie api.openai.com)
+        use_async: Czy tworzyć klienta asynchronicznego (wspólna pętla asyncio)
+        preload: Czy zaimportować SDK od razu - przy gunicorn --preload import
+            odbywa się raz w procesie głównym i workery dziedziczą go po forku
+
+    Returns:
+        Krotka (client, async_client); None, gdy danego klienta nie ma
+    """
+    if not api_key:
+        logger.warning("Brak OPENAI_API_KEY - analizy potraw przez API są wyłączone")
+        return None, None
+
+    if preload:
+        # Sam import modułu - połączenia HTTP powstają dopiero w workerach
+        import openai  # noqa: F401
+
+    client = LazyOpenAIClient(api_key, base_url)
+    async_client = LazyOpenAIClient(api_key, base_url, use_async=True) if use_async else None
+    return client, async_client
@@ -1,9 +1,61 @@
 import json
+import logging
+import re
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services.composite_dishes import (
+    DISH_DECOMPOSITION,
+    compose_dish,
+    compose_dishes,
+    learn_recipe,
+    looks_composite,
+    missing_ingredients,
+)
+from services.nutrient_cache import get_cached_nutrients, get_stale_nutrients, store_nutrients, normalize_dish_name
+from services.prompts import RECIPE_TEMPLATE, get_prompt_template
+from services.reference_foods import find_reference_food, promote_reference_food
+from services.resilience import (
+    OPENAI_MAX_ATTEMPTS,
+    Deadline,
+    backoff_delay,
+    breaker,
+    call_with_retries,
+    next_retry_delay,
+)
+from services.metrics import LLM_PARSE_SECONDS, LLM_RETRIES, VALIDATION_FAILURES, register_collector
+from services.token_usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Gramatura, dla której trzymamy wartości w cache i o którą pytamy model
+BASE_AMOUNT = 100
+
+# Ile potraw pakujemy do jednego zapytania i ile zapytań wysyłamy równolegle
+BATCH_CHUNK_SIZE = 10
+BATCH_MAX_WORKERS = 4
+
+# Para "klucz": liczba zakończona separatorem - do parsowania niepełnego JSON-a
+_PARTIAL_PAIR_PATTERN = re.compile(r'"([^"\\]+)"\s*:\s*"?(-?\d+(?:\.\d+)?)"?\s*[,}\n\r]')
+
+# Analizy tej samej potrawy w toku: znormalizowana nazwa -> Future z wartościami na 100g.
+# Współdzielone przez ścieżkę wątkową i asynchroniczną (async_openai_service).
+_inflight = {}
+_inflight_lock = threading.Lock()
+_coalesce_stats = {"leaders": 0, "coalesced": 0}
+
 
 def analyze_dish(client, name, amount=100):
     """
     Analiza potrawy za pomocą OpenAI API z uwzględnieniem gramatury.
+
+    Popularne potrawy są odczytywane z lokalnej tabeli referencyjnej,
+    potrawy złożone są liczone ze składu (services.composite_dishes),
+    a wartości na 100g z odpowiedzi modelu są zapamiętywane w cache, więc
+    ta sama potrawa w innej gramaturze nie wymaga ponownego zapytania do
+    API. Równoczesne analizy tej samej potrawy czekają na jedno wspólne
+    zapytanie.
     
     Args:
         client: Klient OpenAI API
@@ -14,95 +66,697 @@ def analyze_dish(client, name, amount=100):
         dict: Dane o mikroskładnikach przeliczone na podaną gramaturę
         None: W przypadku błędu
     """
+    cached = get_known_nutrients(name)
+    if cached:
+        logger.debug("[LOKALNIE] Znane wartości dla \"%s\" - przeliczam na %sg", name, amount)
+        return _calculate_proportional_values(cached, amount, BASE_AMOUNT)
+
     if not client:
-        print("❌ Brak połączenia z OpenAI API")
+        logger.error("Brak połączenia z OpenAI API")
         return None
 
-    max_retries = 3
-    retry_delay = 2
-
-    for attempt in range(max_retries):
+    key = normalize_dish_name(name)
+    flight, leader = join_flight(key)
+    if not leader:
+        # Ta sama potrawa jest właśnie analizowana - czekamy na tamtą odpowiedź
+        logger.debug("[COALESCE] Dołączam do trwającej analizy \"%s\"", name)
+        base_data = flight.result()
+    else:
+        base_data = None
         try:
-            # Prompt z uwzględnieniem gramatury
-            prompt = f"""Podaj wartości mikroskładników dla potrawy "{name}" o gramaturze {amount}g w formacie JSON.
-
-WAŻNE WYMAGANIA:
-1. Przelicz wszystkie wartości proporcjonalnie do podanej gramatury {amount}g
-2. Zwróć tylko 4-6 najważniejszych mikroskładników (np. Magnez, Żelazo, Witamina D, Wapń, Cynk, Potas)
-3. Wartości podaj w mg lub µg (odpowiednio do standardów żywieniowych)
-4. Weź pod uwagę rzeczywistą gramaturę potrawy - {amount}g
-
-Format odpowiedzi (tylko JSON, bez dodatkowego tekstu):
-{{
-    "Magnez": 120,
-    "Żelazo": 3,
-    "Witamina D": 5,
-    "Wapń": 250,
-    "Cynk": 2,
-    "Potas": 300
-}}
-
-Przykład: Jeśli standardowa porcja 100g zawiera 50mg magnezu, to dla {amount}g powinno być {amount/100 * 50}mg magnezu."""
-
-            print(f"\n{'='*60}")
-            print(f"🔍 [ANALIZA] Potrawa: {name}")
-            print(f"⚖️  [GRAMATURA] Ilość: {amount}g")
-            print(f"🔄 [PRÓBA] {attempt + 1}/{max_retries}")
-            print(f"{'='*60}")
-
-            # Wywołanie API
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Jesteś ekspertem od żywienia. Zwracasz tylko poprawny JSON bez dodatkowych komentarzy. Wszystkie wartości mikroskładników MUSZĄ być proporcjonalnie przeliczone na podaną gramaturę potrawy."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_completion_tokens=10000
-                 
-            )
-
-            content = response.choices[0].message.content.strip()
-            print(f"✅ [API] Otrzymano odpowiedź od ChatGPT")
-            print(f"📄 [RAW] Surowa odpowiedź:\n{content[:200]}...")
-
-            # Czyszczenie odpowiedzi z markdown
-            cleaned_content = _clean_json_response(content)
-            
-            # Walidacja i parsowanie JSON
-            data = _validate_and_parse_json(cleaned_content, name, amount)
-            
-            if data:
-                print(f"✅ [SUKCES] Dane sparsowane poprawnie")
-                print(f"📊 [WYNIK] Mikroskładniki dla {amount}g:")
-                for key, value in data.items():
-                    print(f"   • {key}: {value}")
-                print(f"{'='*60}\n")
-                return data
-            else:
-                print(f"⚠️  [OSTRZEŻENIE] Próba {attempt + 1} nieudana - ponawiam...")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    continue
+            # Wynik mógł trafić do cache tuż przed rozpoczęciem tej analizy
+            base_data = get_cached_nutrients(name)
+            if base_data is None and should_decompose(name):
+                base_data = _decompose_dish(client, name)
+            if base_data is None:
+                base_data = _fetch_nutrients(client, name, BASE_AMOUNT)
+                if base_data is not None:
+                    remember_nutrients(name, base_data)
+                else:
+                    base_data = serve_stale(name)
+        finally:
+            finish_flight(key, flight, base_data)
+
+    if base_data is None:
+        return None
+
+    return _calculate_proportional_values(base_data, amount, BASE_AMOUNT)
+
+
+def join_flight(key):
+    """
+    Dołącza do analizy potrawy w toku albo rozpoczyna nową.
+
+    Pierwsze wywołanie dla danego klucza zostaje "liderem" i musi
+    zakończyć lot przez finish_flight; kolejne dostają ten sam Future
+    i czekają na wartości na 100g pobrane przez lidera.
+
+    Args:
+        key: Znormalizowana nazwa potrawy
+
+    Returns:
+        tuple: (Future z wartościami na 100g lub None, czy wywołujący jest liderem)
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        if flight is not None:
+            _coalesce_stats["coalesced"] += 1
+            return flight, False
+
+        flight = Future()
+        # Uruchomiony Future nie może zostać anulowany przez żadnego z czekających
+        flight.set_running_or_notify_cancel()
+        _inflight[key] = flight
+        _coalesce_stats["leaders"] += 1
+        return flight, True
+
+
+def finish_flight(key, flight, base_data):
+    """Kończy analizę w toku i przekazuje wynik (lub None) wszystkim czekającym."""
+    with _inflight_lock:
+        if _inflight.get(key) is flight:
+            del _inflight[key]
+    flight.set_result(base_data)
+
+
+def get_coalescing_stats():
+    """
+    Zwraca liczniki łączenia identycznych analiz.
+
+    Returns:
+        Słownik: leaders (zapytania do API), coalesced (analizy obsłużone
+        cudzym zapytaniem), in_flight (analizy w toku)
+    """
+    with _inflight_lock:
+        return {**_coalesce_stats, "in_flight": len(_inflight)}
+
+
+def get_known_nutrients(name):
+    """
+    Zwraca wartości na 100g znane bez zapytania do API: z tabeli potraw
+    referencyjnych, ze składu potrawy złożonej, a w ostatniej kolejności
+    z cache odpowiedzi modelu.
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g
+        None: Gdy potrawę trzeba przeanalizować
+    """
+    return find_reference_food(name) or compose_dish(name) or get_cached_nutrients(name)
+
+
+def remember_nutrients(name, per_100g):
+    """Zapisuje odpowiedź modelu w cache (i opcjonalnie w tabeli potraw)."""
+    store_nutrients(name, per_100g)
+    promote_reference_food(name, per_100g)
+
+
+def serve_stale(name):
+    """
+    Zwraca przeterminowane wartości z cache, gdy API zawiodło.
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g
+        None: Gdy potrawy nie ma nawet w przeterminowanym cache
+    """
+    stale = get_stale_nutrients(name)
+    if stale:
+        logger.warning("[CACHE] API niedostępne - używam przeterminowanych danych dla \"%s\"", name)
+    return stale
+
+
+def should_decompose(name):
+    """Czy potrawę liczyć ze składników rozpisanych przez model (DISH_DECOMPOSITION=llm)."""
+    return DISH_DECOMPOSITION == "llm" and looks_composite(name)
+
+
+def decomposition_steps(name):
+    """
+    Rozkład potrawy złożonej na składniki - wspólny dla ścieżki synchronicznej,
+    asynchronicznej i strumieniowej (różnią się tylko klientem API).
+
+    Model rozpisuje potrawę na składniki (gdy nie ma jej w tabeli składów),
+    o nieznane składniki pytamy jedną paczką, a wynik to średnia ważona
+    wartości składników. Składy i składniki są zapamiętywane, więc kolejne
+    potrawy z tych samych składników nie wymagają zapytań do API.
+
+    Generator zgłasza potrzebne zapytania, a wywołujący odsyła odpowiedzi
+    przez decomposition_step:
+        ("recipe", nazwa potrawy)      -> skład {składnik: gramy} lub None
+        ("nutrients", [składniki])     -> {składnik: wartości na 100g}
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g (jako wynik generatora)
+        None: Gdy rozkład się nie udał (wtedy pytamy o całą potrawę)
+    """
+    missing = missing_ingredients(name)
+    if missing is None:
+        ingredients = yield "recipe", name
+        if not ingredients or not learn_recipe(name, ingredients):
+            return None
+        missing = missing_ingredients(name)
+
+    if missing:
+        fetched = yield "nutrients", missing
+        for ingredient, data in (fetched or {}).items():
+            remember_nutrients(ingredient, data)
+
+    return compose_dish(name)
+
+
+def decomposition_step(steps, answer=None):
+    """
+    Przekazuje odpowiedź do decomposition_steps i zwraca następny krok.
+
+    Returns:
+        tuple: (zapytanie, None) albo (None, wynik rozkładu) po ostatnim kroku
+    """
+    try:
+        return steps.send(answer), None
+    except StopIteration as done:
+        return None, done.value
+
+
+def _decompose_dish(client, name):
+    """
+    Liczy wartości potrawy złożonej z jej składników (zob. decomposition_steps).
+
+    Args:
+        client: Klient OpenAI API
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g
+        None: Gdy rozkład się nie udał
+    """
+    steps = decomposition_steps(name)
+    request, result = decomposition_step(steps)
+    while request:
+        kind, argument = request
+        if kind == "recipe":
+            answer = _fetch_recipe(client, argument)
+        else:
+            answer = _fetch_nutrients_batch(client, argument)
+        request, result = decomposition_step(steps, answer)
+    return result
+
+
+def _fetch_recipe(client, name):
+    """Prosi model o skład potrawy (z ponawianiem prób)."""
+    return call_with_retries(
+        lambda timeout: create_completion(client, RECIPE_TEMPLATE, "recipe",
+                                          RECIPE_TEMPLATE.messages(name), timeout),
+        lambda response: _parse_recipe_completion(response.choices[0].message.content),
+        label="SKŁAD"
+    )
+
+
+def _parse_recipe_completion(content):
+    """
+    Odczytuje skład potrawy z odpowiedzi {"ingredients": [{"name", "grams"}]}.
+
+    Returns:
+        dict: Składnik -> gramy w 100g potrawy
+        None: Gdy odpowiedź nie zawiera żadnego składnika
+    """
+    try:
+        ingredients = {
+            item["name"].strip().lower(): float(item["grams"])
+            for item in json.loads(content)["ingredients"]
+            if item["name"].strip() and float(item["grams"]) > 0
+        }
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError) as e:
+        VALIDATION_FAILURES.inc(reason="recipe")
+        logger.warning("[SKŁAD] Nieprawidłowy skład w odpowiedzi: %s", e)
+        return None
+    return ingredients or None
+
+
+def _fetch_nutrients(client, name, amount, deadline=None):
+    """
+    Pobiera mikroskładniki potrawy z OpenAI API.
+
+    Ponawianie, budżet czasu i bezpiecznik zapewnia services.resilience.
+
+    Args:
+        client: Klient OpenAI API
+        name: Nazwa potrawy
+        amount: Gramatura, dla której model ma podać wartości
+        deadline: Budżet czasu (domyślnie OPENAI_DEADLINE)
+
+    Returns:
+        dict: Zwalidowane dane o mikroskładnikach
+        None: W przypadku błędu
+    """
+    logger.info("[ANALIZA] Potrawa: %s, %sg", name, amount, extra={"dish": name, "amount": amount})
+
+    template = get_prompt_template()
+    data = call_with_retries(
+        lambda timeout: create_completion(client, template, "dish", template.messages(name, amount), timeout),
+        lambda response: _parse_completion(response.choices[0].message.content, name, amount, template),
+        deadline,
+        label="ANALIZA"
+    )
+
+    if data is None:
+        logger.error("[ANALIZA] Nie udało się przeanalizować potrawy \"%s\"", name, extra={"dish": name})
+    return data
+
+
+def create_completion(client, template, kind, messages, timeout, batch_size=None):
+    """
+    Wysyła zapytanie chat.completions i dolicza zużyte tokeny.
+
+    Args:
+        client: Klient OpenAI API
+        template: Szablon promptu (services.prompts.PromptTemplate)
+        kind: Rodzaj zapytania do statystyk ("dish", "batch" lub "recipe")
+        messages: Wiadomości zbudowane przez szablon
+        timeout: Limit czasu zapytania w sekundach
+        batch_size: Liczba potraw w paczce (None dla jednej potrawy)
+
+    Returns:
+        Odpowiedź API
+    """
+    start = time.perf_counter()
+    response = client.chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        timeout=timeout,
+        **template.request_options(batch_size)
+    )
+    record_usage(kind, template.version, response.usage, time.perf_counter() - start,
+                 response.choices[0].finish_reason if response.choices else None)
+    return response
+
+
+def _parse_completion(content, name, amount, template=None):
+    """
+    Czyści i waliduje treść odpowiedzi modelu dla jednej potrawy.
+
+    Odpowiedzi szablonów ze schematem JSON są czystym JSON-em, więc
+    usuwanie markdown dotyczy tylko dawnego szablonu.
+
+    Args:
+        content: Surowa treść odpowiedzi
+        name: Nazwa potrawy (do logowania)
+        amount: Gramatura potrawy
+        template: Szablon, którym wysłano zapytanie (domyślnie bieżący)
 
-        except Exception as e:
-            print(f"❌ [BŁĄD] Próba {attempt + 1}/{max_retries}: {str(e)}")
-            if attempt < max_retries - 1:
-                print(f"⏳ Czekam {retry_delay}s przed kolejną próbą...")
-                time.sleep(retry_delay)
-            else:
-                print(f"❌ [KRYTYCZNY] Wszystkie próby wyczerpane")
-                print(f"{'='*60}\n")
-                return None
+    Returns:
+        dict: Zwalidowane dane o mikroskładnikach
+        None: W przypadku błędu
+    """
+    content = (content or "").strip()
+    logger.debug("[API] Surowa odpowiedź: %.200s", content)
+
+    template = template or get_prompt_template()
+    if not template.structured:
+        # Czyszczenie odpowiedzi z markdown
+        content = _clean_json_response(content)
+
+    # Walidacja i parsowanie JSON
+    data = _validate_and_parse_json(content, name, amount)
+
+    if data:
+        logger.info("[WYNIK] Mikroskładniki \"%s\" dla %sg: %s", name, amount, data)
+
+    return data
+
+
+def analyze_dish_stream(client, name, amount=100):
+    """
+    Analiza potrawy z przesyłaniem wyników na bieżąco (streaming API).
+
+    Każdy mikroskładnik jest zwracany, gdy tylko da się go odczytać
+    z niepełnej odpowiedzi modelu. Ostateczne dane mają ten sam kształt
+    co wynik analyze_dish.
+
+    Args:
+        client: Klient OpenAI API
+        name: Nazwa potrawy
+        amount: Gramatura potrawy
+
+    Yields:
+        tuple: (nazwa zdarzenia, dane) - kolejno "progress", "nutrient"
+               (dla każdego składnika), a na końcu "done" albo "error".
+               Po przerwaniu strumienia, który wysłał już część składników,
+               zawsze przychodzi "error" (z "partial": true) - wynik
+               zastępczy z cache dublowałby wysłane wartości
+    """
+    cached = get_known_nutrients(name)
+    if cached:
+        logger.debug("[LOKALNIE] Znane wartości dla \"%s\" - przeliczam na %sg", name, amount)
+        yield "progress", {"stage": "cache"}
+        data = _calculate_proportional_values(cached, amount, BASE_AMOUNT)
+        for key, value in data.items():
+            yield "nutrient", {"name": key, "value": value}
+        yield "done", {"micronutrients": data}
+        return
+
+    if not client:
+        logger.error("Brak połączenia z OpenAI API")
+        yield "error", {"message": "Brak połączenia z OpenAI API"}
+        return
+
+    key = normalize_dish_name(name)
+    flight, leader = join_flight(key)
+    if not leader:
+        # Ta sama potrawa jest właśnie analizowana - wyniki przyjdą w całości
+        logger.debug("[COALESCE] Strumień dołącza do trwającej analizy \"%s\"", name)
+        yield "progress", {"stage": "coalesced"}
+        base_data = flight.result()
+        if base_data is None:
+            yield "error", {"message": "Nie udało się przeanalizować potrawy. Spróbuj ponownie."}
+            return
+        data = _calculate_proportional_values(base_data, amount, BASE_AMOUNT)
+        for nutrient, value in data.items():
+            yield "nutrient", {"name": nutrient, "value": value}
+        yield "done", {"micronutrients": data}
+        return
+
+    deadline = Deadline()
+    template = get_prompt_template()
+    emitted = {}
+    try:
+        if should_decompose(name):
+            yield "progress", {"stage": "decomposition"}
+            base_data = _decompose_dish(client, name)
+            if base_data:
+                finish_flight(key, flight, base_data)
+                data = _calculate_proportional_values(base_data, amount, BASE_AMOUNT)
+                for nutrient, value in data.items():
+                    yield "nutrient", {"name": nutrient, "value": value}
+                yield "done", {"micronutrients": data}
+                return
+
+        for attempt in range(OPENAI_MAX_ATTEMPTS):
+            if deadline.expired() or not breaker.allow():
+                logger.warning("[STREAM] Bezpiecznik otwarty lub brak czasu - pomijam zapytanie do API")
+                break
+
+            emitted = {}
+            content = ""
+            usage = finish_reason = None
+            try:
+                logger.info("[STREAM] Potrawa: %s, próba %d/%d", name, attempt + 1, OPENAI_MAX_ATTEMPTS,
+                            extra={"dish": name})
+                yield "progress", {"stage": "request", "attempt": attempt + 1}
+
+                started = time.perf_counter()
+                stream = client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=template.messages(name, BASE_AMOUNT),
+                    stream=True,
+                    # Ostatni fragment strumienia niesie zużycie tokenów
+                    stream_options={"include_usage": True},
+                    timeout=deadline.attempt_timeout(),
+                    **template.request_options()
+                )
+
+                for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    content += chunk.choices[0].delta.content or ""
+
+                    for nutrient, value in _parse_partial_nutrients(content, emitted):
+                        emitted[nutrient] = value
+                        scaled = _calculate_proportional_values({nutrient: value}, amount, BASE_AMOUNT)
+                        yield "nutrient", {"name": nutrient, "value": scaled[nutrient]}
+
+            except GeneratorExit:
+                # Klient się rozłączył - próba nie ma wyniku, bezpiecznik nie może na nią czekać
+                breaker.release()
+                raise
+            except Exception as e:
+                delay = next_retry_delay(e, attempt, deadline, label="STREAM")
+                # Po wysłaniu części wyników nie ponawiamy - klient dostałby duplikaty
+                if delay is None or emitted:
+                    break
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            record_usage("stream", template.version, usage, time.perf_counter() - started, finish_reason)
+            yield "progress", {"stage": "validation"}
+            base_data = _parse_completion(content, name, BASE_AMOUNT, template)
+
+            if base_data:
+                remember_nutrients(name, base_data)
+                # Czekający na tę potrawę nie muszą czekać na klienta tego strumienia
+                finish_flight(key, flight, base_data)
+                yield "done", {"micronutrients": _calculate_proportional_values(base_data, amount, BASE_AMOUNT)}
+                return
+
+            LLM_RETRIES.inc(label="STREAM", reason="invalid_response")
+            logger.warning("[STREAM] Próba %d - nieprawidłowa odpowiedź modelu", attempt + 1)
+            if emitted:
+                break
+            if attempt < OPENAI_MAX_ATTEMPTS - 1:
+                time.sleep(min(backoff_delay(attempt), deadline.remaining()))
+
+        if emitted:
+            # Klient ma już część wartości - niepełnego wyniku nie uzupełniamy ani nie zapisujemy
+            logger.warning("[STREAM] Strumień przerwany po %d składnikach \"%s\"", len(emitted), name)
+            yield "error", {"message": "Analiza została przerwana. Spróbuj ponownie.", "partial": True}
+            return
+
+        stale = serve_stale(name)
+        finish_flight(key, flight, stale)
+        if stale:
+            data = _calculate_proportional_values(stale, amount, BASE_AMOUNT)
+            for nutrient, value in data.items():
+                yield "nutrient", {"name": nutrient, "value": value}
+            yield "done", {"micronutrients": data, "stale": True}
+            return
+        yield "error", {"message": "Nie udało się przeanalizować potrawy. Spróbuj ponownie."}
+    finally:
+        # Błąd albo rozłączenie klienta - czekający dostają None
+        if not flight.done():
+            finish_flight(key, flight, None)
+
+
+def _parse_partial_nutrients(content, already_emitted):
+    """
+    Wyciąga kompletne pary "składnik": wartość z niepełnej odpowiedzi JSON.
+
+    Liczba jest uznana za kompletną dopiero, gdy po niej wystąpi przecinek,
+    nawias lub koniec linii - inaczej "120" mogłoby zostać odczytane jako "12".
+
+    Args:
+        content: Dotychczas otrzymana treść odpowiedzi
+        already_emitted: Składniki już przekazane dalej
+
+    Returns:
+        list: Nowe pary (nazwa, wartość)
+    """
+    found = []
+    for match in _PARTIAL_PAIR_PATTERN.finditer(content):
+        key, raw_value = match.group(1), match.group(2)
+        if key in already_emitted or any(key == k for k, _ in found):
+            continue
+        value = float(raw_value)
+        if value >= 0:
+            found.append((key, value))
+    return found
+
+
+def analyze_dishes(client, items):
+    """
+    Analiza wielu potraw naraz (np. całego planu dnia).
+
+    Potrawy z tabeli referencyjnej i z cache są przeliczane lokalnie, a pozostałe są
+    pakowane po BATCH_CHUNK_SIZE do jednego zapytania do API.
+    Paczki są wysyłane równolegle.
+
+    Args:
+        client: Klient OpenAI API
+        items: Lista słowników {"dish": nazwa, "amount": gramatura}
+
+    Returns:
+        list: Wyniki w kolejności wejścia - słowniki z kluczem
+              "micronutrients" (sukces) lub "error" (błąd)
+    """
+    base_values, missing = _split_cached(items)
+
+    if missing and client:
+        names = list(missing.values())
+        chunks = [names[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(names), BATCH_CHUNK_SIZE)]
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(chunks))) as executor:
+            for chunk_result in executor.map(lambda chunk: _fetch_nutrients_batch(client, chunk), chunks):
+                for name, data in chunk_result.items():
+                    remember_nutrients(name, data)
+                    base_values[normalize_dish_name(name)] = data
+    elif missing:
+        logger.error("Brak połączenia z OpenAI API")
+
+    _fill_from_stale(base_values, missing)
+    return _assemble_batch_results(items, base_values)
+
+
+def _fill_from_stale(base_values, missing):
+    """Uzupełnia potrawy, których API nie zwróciło, przeterminowanymi danymi z cache."""
+    for key, name in missing.items():
+        if key not in base_values:
+            stale = serve_stale(name)
+            if stale:
+                base_values[key] = stale
+
+
+def _split_cached(items):
+    """
+    Dzieli potrawy z paczki na znane lokalnie (tabela potraw, składy potraw
+    złożonych, cache) i brakujące. Potrawy złożone są liczone jednym
+    iloczynem macierzy dla całej paczki (compose_dishes).
 
-    print(f"❌ [BŁĄD] Nie udało się przeanalizować potrawy po {max_retries} próbach")
-    print(f"{'='*60}\n")
-    return None
+    Args:
+        items: Lista słowników {"dish": nazwa, "amount": gramatura}
+
+    Returns:
+        tuple: (znormalizowana nazwa -> wartości na 100g,
+                znormalizowana nazwa -> oryginalna nazwa brakującej potrawy)
+    """
+    base_values = {}
+    candidates = {}
+    missing = {}
+
+    for item in items:
+        key = normalize_dish_name(item["dish"])
+        if key in base_values or key in candidates:
+            continue
+
+        reference = find_reference_food(item["dish"])
+        if reference:
+            base_values[key] = reference
+        else:
+            candidates[key] = item["dish"]
+
+    composed = compose_dishes(candidates.values())
+    for key, name in candidates.items():
+        cached = composed.get(name) or get_cached_nutrients(name)
+        if cached:
+            base_values[key] = cached
+        else:
+            missing[key] = name
+
+    logger.info("[BATCH] Potraw: %d, znane lokalnie: %d, do API: %d", len(items), len(base_values), len(missing))
+
+    return base_values, missing
+
+
+def _assemble_batch_results(items, base_values):
+    """
+    Przelicza wartości na 100g na gramatury z paczki.
+
+    Args:
+        items: Lista słowników {"dish": nazwa, "amount": gramatura}
+        base_values: Znormalizowana nazwa -> wartości na 100g
+
+    Returns:
+        list: Wyniki w kolejności wejścia
+    """
+    results = []
+    for item in items:
+        data = base_values.get(normalize_dish_name(item["dish"]))
+        if data is None:
+            results.append({**item, "error": "Nie udało się przeanalizować potrawy"})
+        else:
+            results.append({
+                **item,
+                "micronutrients": _calculate_proportional_values(data, item["amount"], BASE_AMOUNT)
+            })
+
+    return results
+
+
+def _fetch_nutrients_batch(client, names):
+    """
+    Pobiera mikroskładniki kilku potraw jednym zapytaniem do API.
+
+    Args:
+        client: Klient OpenAI API
+        names: Lista nazw potraw
+
+    Returns:
+        dict: Nazwa potrawy -> zwalidowane wartości na BASE_AMOUNT gramów
+              (potrawy, których model nie zwrócił, są pominięte)
+    """
+    logger.info("[BATCH] Zapytanie o %d potraw", len(names))
+
+    template = get_prompt_template()
+    results = call_with_retries(
+        lambda timeout: create_completion(
+            client, template, "batch", template.batch_messages(names, BASE_AMOUNT), timeout, len(names)
+        ),
+        lambda response: _parse_batch_completion(response.choices[0].message.content, names, template),
+        label="BATCH"
+    )
+
+    if not results:
+        logger.error("[BATCH] Nie udało się przeanalizować paczki %d potraw", len(names))
+    return results or {}
+
+
+def _parse_batch_completion(content, names, template=None):
+    """
+    Parsuje odpowiedź modelu z wartościami dla kilku potraw.
+
+    Szablon ze schematem zwraca {"results": [...]} w kolejności listy,
+    dawny szablon - słownik numer potrawy -> wartości.
+
+    Args:
+        content: Surowa treść odpowiedzi
+        names: Lista nazw potraw w kolejności z promptu
+        template: Szablon, którym wysłano zapytanie (domyślnie bieżący)
+
+    Returns:
+        dict: Nazwa potrawy -> zwalidowane wartości (może być pusty)
+    """
+    template = template or get_prompt_template()
+    content = (content or "").strip()
+    if not template.structured:
+        content = _clean_json_response(content)
+
+    try:
+        with LLM_PARSE_SECONDS.time(stage="parse"):
+            data = json.loads(content)
+    except json.JSONDecodeError as e:
+        VALIDATION_FAILURES.inc(reason="json")
+        logger.warning("[BATCH] Błąd parsowania JSON: %s", e)
+        return {}
+
+    if not isinstance(data, dict):
+        VALIDATION_FAILURES.inc(reason="not_object")
+        logger.warning("[BATCH] Odpowiedź nie jest słownikiem")
+        return {}
+
+    if isinstance(data.get("results"), list):
+        data = {str(i): entry for i, entry in enumerate(data["results"], start=1)}
+
+    results = {}
+    for i, name in enumerate(names, start=1):
+        validated = _validate_nutrients(data.get(str(i)))
+        if validated:
+            results[name] = validated
+        else:
+            logger.warning("[BATCH] Brak poprawnych danych dla: %s", name)
+
+    if results:
+        logger.info("[BATCH] Sparsowano %d/%d potraw", len(results), len(names))
+
+    return results
 
 
 def _clean_json_response(content):
@@ -141,57 +795,85 @@ def _validate_and_parse_json(content, dish_name, amount):
         None: W przypadku błędu
     """
     try:
-        data = json.loads(content)
+        with LLM_PARSE_SECONDS.time(stage="parse"):
+            data = json.loads(content)
+        return _validate_nutrients(data)
         
+    except json.JSONDecodeError as e:
+        VALIDATION_FAILURES.inc(reason="json")
+        logger.warning("[JSON] Błąd parsowania JSON: %s; treść: %.200s", e, content)
+        return None
+
+
+def _validate_nutrients(data):
+    """
+    Waliduje słownik mikroskładników (klucze tekstowe, wartości liczbowe >= 0).
+
+    Args:
+        data: Sparsowany obiekt JSON z odpowiedzi LLM
+
+    Returns:
+        dict: Zwalidowane dane (pełna dokładność - zaokrągla dopiero
+            _calculate_proportional_values przy przeliczeniu na porcję)
+        None: W przypadku błędu
+    """
+    start = time.perf_counter()
+    try:
         # Walidacja struktury
         if not isinstance(data, dict):
-            print(f"❌ [WALIDACJA] Odpowiedź nie jest słownikiem")
+            VALIDATION_FAILURES.inc(reason="not_object")
+            logger.warning("[WALIDACJA] Odpowiedź nie jest słownikiem")
             return None
         
         if len(data) == 0:
-            print(f"❌ [WALIDACJA] Pusty słownik mikroskładników")
+            VALIDATION_FAILURES.inc(reason="empty")
+            logger.warning("[WALIDACJA] Pusty słownik mikroskładników")
             return None
         
         # Walidacja wartości
         validated_data = {}
         for key, value in data.items():
             if not isinstance(key, str):
-                print(f"⚠️  [WALIDACJA] Pomijam nieprawidłowy klucz: {key}")
+                logger.debug("[WALIDACJA] Pomijam nieprawidłowy klucz: %s", key)
                 continue
             
             # Konwersja wartości na float/int
             try:
                 numeric_value = float(value)
                 if numeric_value < 0:
-                    print(f"⚠️  [WALIDACJA] Wartość ujemna dla {key}: {numeric_value} - pomijam")
+                    logger.debug("[WALIDACJA] Wartość ujemna dla %s: %s - pomijam", key, numeric_value)
                     continue
                 
-                # Zaokrąglenie do 1 miejsca po przecinku
-                validated_data[key] = round(numeric_value, 1)
+                # Bez zaokrąglania - wartości na 100g trafiają do cache i są
+                # przeliczane na różne gramatury (np. 0.04 mg nie może stać się 0)
+                validated_data[key] = numeric_value
                 
             except (ValueError, TypeError):
-                print(f"⚠️  [WALIDACJA] Nieprawidłowa wartość dla {key}: {value} - pomijam")
+                logger.debug("[WALIDACJA] Nieprawidłowa wartość dla %s: %s - pomijam", key, value)
                 continue
         
         if len(validated_data) == 0:
-            print(f"❌ [WALIDACJA] Brak prawidłowych mikroskładników po walidacji")
+            VALIDATION_FAILURES.inc(reason="no_valid_values")
+            logger.warning("[WALIDACJA] Brak prawidłowych mikroskładników po walidacji")
             return None
         
-        print(f"✅ [WALIDACJA] Zwalidowano {len(validated_data)} mikroskładników")
+        logger.debug("[WALIDACJA] Zwalidowano %d mikroskładników", len(validated_data))
         return validated_data
         
-    except json.JSONDecodeError as e:
-        print(f"❌ [JSON] Błąd parsowania JSON: {e}")
-        print(f"📄 [JSON] Problematyczna treść: {content[:200]}")
-        return None
-    except Exception as e:
-        print(f"❌ [WALIDACJA] Nieoczekiwany błąd: {e}")
+    except Exception:
+        VALIDATION_FAILURES.inc(reason="error")
+        logger.exception("[WALIDACJA] Nieoczekiwany błąd")
         return None
+    finally:
+        LLM_PARSE_SECONDS.observe(time.perf_counter() - start, stage="validate")
 
 
 def _calculate_proportional_values(base_data, target_amount, base_amount=100):
     """
     Przelicza wartości mikroskładników proporcjonalnie do gramatury.
+
+    Wynik jest zaokrąglany do 0.1 - to wartości pokazywane użytkownikowi
+    i zapisywane w dzienniku; wartości bazowe (cache) mają pełną dokładność.
     
     Args:
         base_data: Słownik z wartościami bazowymi (zwykle dla 100g)
@@ -214,4 +896,10 @@ def _calculate_proportional_values(base_data, target_amount, base_amount=100):
         except (ValueError, TypeError):
             proportional_data[key] = value
     
-    return proportional_data
\ No newline at end of file
+    return proportional_data
+
+
+register_collector(
+    "smartdiet_coalesced_analyses_total", "Analizy wysłane do API (leaders) i obsłużone cudzym zapytaniem (coalesced)",
+    "counter", ("role",), lambda: {(role,): count for role, count in _coalesce_stats.items()}
+)
@@ -0,0 +1,210 @@
+import os
+from typing import Dict, List, Optional
+
+# Wersja szablonu używana przez serwis analiz ("v1" - dawny, rozbudowany
+# prompt z przykładem; "v2" - zwięzły prompt ze schematem JSON odpowiedzi)
+PROMPT_VERSION = os.getenv("OPENAI_PROMPT_VERSION", "v2")
+
+# Limit tokenów odpowiedzi dla jednej potrawy (6 par klucz-wartość to ok. 40 tokenów)
+MAX_COMPLETION_TOKENS = int(os.getenv("OPENAI_MAX_COMPLETION_TOKENS", "120"))
+
+# Limit tokenów odpowiedzi paczki: stała część + tyle na każdą potrawę
+BATCH_TOKENS_PER_DISH = int(os.getenv("OPENAI_BATCH_TOKENS_PER_DISH", "60"))
+BATCH_TOKENS_OVERHEAD = 20
+
+# Limit tokenów odpowiedzi z rozkładem potrawy na składniki (do 6 par nazwa-gramy)
+RECIPE_MAX_TOKENS = int(os.getenv("OPENAI_RECIPE_MAX_TOKENS", "200"))
+
+# Mikroskładniki, o które pytamy w szablonach ze schematem odpowiedzi
+NUTRIENT_KEYS = ("Magnez", "Żelazo", "Witamina D", "Wapń", "Cynk", "Potas")
+
+_NUTRIENTS_SCHEMA = {
+    "type": "object",
+    "properties": {key: {"type": "number"} for key in NUTRIENT_KEYS},
+    "required": list(NUTRIENT_KEYS),
+    "additionalProperties": False
+}
+
+_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {"results": {"type": "array", "items": _NUTRIENTS_SCHEMA}},
+    "required": ["results"],
+    "additionalProperties": False
+}
+
+_RECIPE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "ingredients": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "grams": {"type": "number"}},
+                "required": ["name", "grams"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["ingredients"],
+    "additionalProperties": False
+}
+
+
+class PromptTemplate:
+    """
+    Szablon zapytań o mikroskładniki - dla jednej potrawy i dla paczki.
+
+    Szablon ze schematem (structured=True) wysyła response_format typu
+    json_schema, więc odpowiedź jest czystym JSON-em o znanych kluczach
+    (bez bloków markdown) i mieści się w niskim limicie tokenów.
+    """
+
+    def __init__(self, version: str, system: str, dish: str, batch: str,
+                 structured: bool, max_tokens: int, batch_tokens_per_dish: Optional[int] = None):
+        self.version = version
+        self.system = system
+        self.dish = dish
+        self.batch = batch
+        self.structured = structured
+        self.max_tokens = max_tokens
+        self.batch_tokens_per_dish = batch_tokens_per_dish
+
+    def messages(self, name: str, amount: float) -> List[Dict]:
+        """Wiadomości (system + prompt) dla analizy jednej potrawy."""
+        prompt = self.dish.format(name=name, amount=amount, example=amount / 100 * 50)
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": prompt}
+        ]
+
+    def batch_messages(self, names: List[str], amount: float) -> List[Dict]:
+        """Wiadomości dla analizy kilku potraw w jednym zapytaniu."""
+        dish_list = "\n".join(f"{i}. {name}" for i, name in enumerate(names, start=1))
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.batch.format(dishes=dish_list, amount=amount)}
+        ]
+
+    def request_options(self, batch_size: Optional[int] = None) -> Dict:
+        """
+        Parametry chat.completions.create zależne od szablonu.
+
+        Args:
+            batch_size: Liczba potraw w paczce (None dla jednej potrawy)
+
+        Returns:
+            dict: max_completion_tokens i ewentualnie response_format
+        """
+        if batch_size is None or self.batch_tokens_per_dish is None:
+            options = {"max_completion_tokens": self.max_tokens}
+        else:
+            options = {"max_completion_tokens": BATCH_TOKENS_OVERHEAD + self.batch_tokens_per_dish * batch_size}
+
+        if self.structured:
+            schema = _NUTRIENTS_SCHEMA if batch_size is None else _BATCH_SCHEMA
+            options["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "nutrients" if batch_size is None else "nutrients_batch",
+                    "strict": True,
+                    "schema": schema
+                }
+            }
+        return options
+
+
+class RecipePromptTemplate:
+    """
+    Szablon zapytania o skład potrawy złożonej (services.composite_dishes).
+
+    Ma ten sam interfejs co PromptTemplate (version, request_options),
+    więc zapytanie wysyła i rozlicza openai_service.create_completion.
+    """
+
+    version = "recipe"
+    system = "Jesteś dietetykiem. Rozpisujesz potrawy na podstawowe składniki w mianowniku liczby pojedynczej."
+    prompt = 'Potrawa: "{name}". Podaj 2-6 głównych składników w 100g gotowej potrawy (gramy, suma 100).'
+
+    def messages(self, name: str) -> List[Dict]:
+        """Wiadomości (system + prompt) z prośbą o skład potrawy."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.prompt.format(name=name)}
+        ]
+
+    def request_options(self, batch_size: Optional[int] = None) -> Dict:
+        """Limit tokenów i schemat odpowiedzi {"ingredients": [{"name", "grams"}]}."""
+        return {
+            "max_completion_tokens": RECIPE_MAX_TOKENS,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "recipe", "strict": True, "schema": _RECIPE_SCHEMA}
+            }
+        }
+
+
+RECIPE_TEMPLATE = RecipePromptTemplate()
+
+TEMPLATES = {
+    "v1": PromptTemplate(
+        version="v1",
+        system=(
+            "Jesteś ekspertem od żywienia. Zwracasz tylko poprawny JSON bez dodatkowych komentarzy. "
+            "Wszystkie wartości mikroskładników MUSZĄ być proporcjonalnie przeliczone na podaną gramaturę potrawy."
+        ),
+        dish="""Podaj wartości mikroskładników dla potrawy "{name}" o gramaturze {amount}g w formacie JSON.
+
+WAŻNE WYMAGANIA:
+1. Przelicz wszystkie wartości proporcjonalnie do podanej gramatury {amount}g
+2. Zwróć tylko 4-6 najważniejszych mikroskładników (np. Magnez, Żelazo, Witamina D, Wapń, Cynk, Potas)
+3. Wartości podaj w mg lub µg (odpowiednio do standardów żywieniowych)
+4. Weź pod uwagę rzeczywistą gramaturę potrawy - {amount}g
+
+Format odpowiedzi (tylko JSON, bez dodatkowego tekstu):
+{{
+    "Magnez": 120,
+    "Żelazo": 3,
+    "Witamina D": 5,
+    "Wapń": 250,
+    "Cynk": 2,
+    "Potas": 300
+}}
+
+Przykład: Jeśli standardowa porcja 100g zawiera 50mg magnezu, to dla {amount}g powinno być {example}mg magnezu.""",
+        batch="""Podaj wartości mikroskładników dla każdej z poniższych potraw o gramaturze {amount}g w formacie JSON.
+
+Potrawy:
+{dishes}
+
+WAŻNE WYMAGANIA:
+1. Zwróć tylko 4-6 najważniejszych mikroskładników dla każdej potrawy (np. Magnez, Żelazo, Witamina D, Wapń, Cynk, Potas)
+2. Wartości podaj w mg lub µg (odpowiednio do standardów żywieniowych)
+3. Kluczem każdej potrawy jest jej numer z listy
+
+Format odpowiedzi (tylko JSON, bez dodatkowego tekstu):
+{{
+    "1": {{"Magnez": 120, "Żelazo": 3, "Wapń": 250}},
+    "2": {{"Magnez": 25, "Cynk": 1.2, "Potas": 300}}
+}}""",
+        structured=False,
+        max_tokens=10000
+    ),
+    "v2": PromptTemplate(
+        version="v2",
+        system="Jesteś dietetykiem. Podajesz typową zawartość mikroskładników w potrawach (Witamina D w µg, reszta w mg).",
+        dish='Potrawa: "{name}", porcja {amount}g.',
+        batch="Porcja {amount}g każdej potrawy, wyniki w kolejności listy:\n{dishes}",
+        structured=True,
+        max_tokens=MAX_COMPLETION_TOKENS,
+        batch_tokens_per_dish=BATCH_TOKENS_PER_DISH
+    ),
+}
+
+
+def get_prompt_template(version: Optional[str] = None) -> PromptTemplate:
+    """
+    Zwraca szablon zapytań (domyślnie OPENAI_PROMPT_VERSION).
+
+    Nieznana wersja oznacza szablon "v2".
+    """
+    return TEMPLATES.get(version or PROMPT_VERSION, TEMPLATES["v2"])
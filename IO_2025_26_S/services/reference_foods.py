@@ -0,0 +1,341 @@
+import difflib
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import unicodedata
+from array import array
+from typing import Dict, Iterable, Optional
+
+from services.data_service import _ensure_data_directory, atomic_write_json
+from services.metrics import register_collector
+from services.nutrient_cache import normalize_dish_name
+
+logger = logging.getLogger(__name__)
+
+# Tabela referencyjna (część aplikacji, niezależna od katalogu roboczego)
+# i potrawy dopisane z odpowiedzi modelu (dane, jak cache w data/)
+REFERENCE_FOODS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    "data", "reference_foods.json")
+LEARNED_FOODS_FILE = os.path.join("data", "reference_foods.learned.json")
+
+# REFERENCE_FOODS=0 wyłącza tabelę - każda analiza idzie wtedy do cache/API
+REFERENCE_FOODS_ENABLED = os.getenv("REFERENCE_FOODS", "1") != "0"
+
+# REFERENCE_FOODS_PROMOTE=1 dopisuje do tabeli potrawy przeanalizowane przez model
+REFERENCE_FOODS_PROMOTE = os.getenv("REFERENCE_FOODS_PROMOTE", "0") == "1"
+
+# Minimalne podobieństwo (difflib) kluczy przy dopasowaniu przybliżonym
+REFERENCE_FUZZY_CUTOFF = float(os.getenv("REFERENCE_FUZZY_CUTOFF", "0.88"))
+
+# Krótsze klucze dopasowujemy tylko dokładnie ("ryż" nie może stać się "ryba")
+_FUZZY_MIN_LENGTH = 5
+
+# Słowa pomijane przy budowie klucza ("pierś z kurczaka" = "kurczak pierś");
+# "bez" zostaje - "rosół bez makaronu" to nie "rosół z makaronem"
+_STOP_WORDS = {"z", "ze", "w", "we", "na", "i", "oraz", "do", "po"}
+
+# Końcówki fleksyjne (po usunięciu polskich znaków), od najdłuższych
+_SUFFIXES = ("ami", "ach", "owi", "iem", "ich", "ego", "ej", "ym", "im", "om", "ow", "em", "ie",
+             "y", "i", "e", "a", "o", "u")
+
+# Liter, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+_EXTRA_FOLDS = str.maketrans({"ł": "l"})
+
+
+def _fold(text: str) -> str:
+    """Usuwa polskie znaki: "żółć" -> "zolc"."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_EXTRA_FOLDS))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _stem(word: str) -> str:
+    """Obcina jedną końcówkę fleksyjną, zostawiając co najmniej 3 litery."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _is_typo(word: str, other: str) -> bool:
+    """
+    Czy wyrazy różnią się jedną literówką: zamienioną literą, przestawionymi
+    sąsiednimi literami albo brakującą/nadmiarową literą wewnątrz wyrazu.
+
+    Litera dopisana na końcu to inny wyraz, nie literówka ("owsian" -
+    owsiane, "owsiank" - owsianka).
+    """
+    if max(len(word), len(other)) < _FUZZY_MIN_LENGTH:
+        return False
+
+    if len(word) == len(other):
+        diff = [i for i, (a, b) in enumerate(zip(word, other)) if a != b]
+        if len(diff) == 1:
+            return True
+        return (len(diff) == 2 and diff[1] == diff[0] + 1
+                and word[diff[0]] == other[diff[1]] and word[diff[1]] == other[diff[0]])
+
+    short, long = sorted((word, other), key=len)
+    if len(long) - len(short) != 1:
+        return False
+    for i, char in enumerate(short):
+        if char != long[i]:
+            return short[i:] == long[i + 1:]
+    return False
+
+
+def _words_match(key: str, candidate: str) -> bool:
+    """
+    Czy każdy wyraz klucza ma w kandydacie własny odpowiednik (ten sam
+    albo z jedną literówką), a kandydat nie ma wyrazów ponad to.
+
+    "mlek owsian" nie pasuje do "owsiank" ani do "mlek owsiank";
+    "0 jogurt naturaln" nie pasuje do "jogurt naturaln".
+    """
+    words, remaining = key.split(), candidate.split()
+    if len(words) != len(remaining):
+        return False
+
+    typos = []
+    for word in words:
+        if word in remaining:
+            remaining.remove(word)
+        else:
+            typos.append(word)
+    for word in typos:
+        other = next((other for other in remaining if _is_typo(word, other)), None)
+        if other is None:
+            return False
+        remaining.remove(other)
+    return True
+
+
+@functools.lru_cache(maxsize=4096)
+def match_key(name: str) -> str:
+    """
+    Klucz dopasowania nazwy potrawy: bez wielkości liter, polskich znaków,
+    końcówek fleksyjnych i słów łączących, z wyrazami w kolejności alfabetycznej.
+
+    "Jajka", "jajko" -> "jajk"; "Pierś z kurczaka", "kurczak pierś" -> "kurczak piers"
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        str: Klucz (pusty dla nazwy bez liter)
+    """
+    words = _fold(normalize_dish_name(name)).replace("-", " ").split()
+    return " ".join(sorted(_stem(word) for word in words if word not in _STOP_WORDS))
+
+
+class ReferenceFoodTable:
+    """
+    Tabela wartości mikroskładników na 100g dla popularnych potraw.
+
+    Wartości wszystkich potraw leżą w jednej tablicy float32 (wiersz =
+    potrawa, kolumny w kolejności self.nutrients, NaN = brak danych),
+    a słownik klucz dopasowania -> numer wiersza obejmuje nazwy i aliasy.
+    Dokładne trafienie to jedno wyszukanie w słowniku; dopasowanie
+    przybliżone (literówki) przegląda klucze tylko przy braku trafienia
+    i przyjmuje klucz, w którym każdy wyraz ma swój odpowiednik
+    (_words_match), a całość jest podobna co najmniej w REFERENCE_FUZZY_CUTOFF.
+    """
+
+    def __init__(self, nutrients: Iterable[str]):
+        self.nutrients = tuple(nutrients)
+        self._values = array("f")
+        self._names = []
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name: str, values, aliases: Iterable[str] = ()) -> bool:
+        """
+        Dodaje potrawę do tabeli.
+
+        Args:
+            name: Nazwa potrawy
+            values: Lista wartości w kolejności self.nutrients albo słownik
+                mikroskładnik -> wartość (nieznane mikroskładniki są pomijane)
+            aliases: Inne nazwy tej samej potrawy
+
+        Returns:
+            bool: False, gdy potrawa (jej klucz) już jest w tabeli
+        """
+        if isinstance(values, dict):
+            row = [values.get(nutrient, math.nan) for nutrient in self.nutrients]
+        else:
+            row = list(values)
+        if len(row) != len(self.nutrients):
+            raise ValueError(f"Potrawa \"{name}\": oczekiwano {len(self.nutrients)} wartości, jest {len(row)}")
+
+        keys = [key for key in (match_key(alias) for alias in (name, *aliases)) if key]
+        with self._lock:
+            if not keys or keys[0] in self._index:
+                return False
+            number = len(self._names)
+            self._values.extend(float(value) for value in row)
+            self._names.append(name)
+            for key in keys:
+                self._index.setdefault(key, number)
+        return True
+
+    def _row(self, number: int) -> Dict:
+        width = len(self.nutrients)
+        start = number * width
+        return {
+            nutrient: round(value, 2)
+            for nutrient, value in zip(self.nutrients, self._values[start:start + width])
+            if not math.isnan(value)
+        }
+
+    def lookup(self, name: str, fuzzy: bool = True) -> Optional[Dict]:
+        """
+        Szuka potrawy w tabeli.
+
+        Args:
+            name: Nazwa potrawy wpisana przez użytkownika
+            fuzzy: Czy przy braku dokładnego trafienia szukać podobnych kluczy
+
+        Returns:
+            dict: {"name": nazwa z tabeli, "fuzzy": bool, "per_100g": wartości}
+            None: Gdy potrawy nie ma w tabeli
+        """
+        key = match_key(name)
+        with self._lock:
+            number = self._index.get(key)
+            matched_fuzzy = False
+
+            if number is None and fuzzy and len(key) >= _FUZZY_MIN_LENGTH:
+                candidates = [candidate for candidate in self._index if _words_match(key, candidate)]
+                close = difflib.get_close_matches(key, candidates, n=1, cutoff=REFERENCE_FUZZY_CUTOFF)
+                if close:
+                    number, matched_fuzzy = self._index[close[0]], True
+
+            if number is None:
+                return None
+            return {"name": self._names[number], "fuzzy": matched_fuzzy, "per_100g": self._row(number)}
+
+
+_table: Optional[ReferenceFoodTable] = None
+_table_lock = threading.Lock()
+_learned = {}
+_stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "promoted": 0}
+
+
+def load_reference_foods() -> ReferenceFoodTable:
+    """
+    Wczytuje tabelę referencyjną i potrawy dopisane z odpowiedzi modelu.
+
+    Wywoływane przy starcie aplikacji (i leniwie przy pierwszym wyszukaniu).
+
+    Returns:
+        ReferenceFoodTable: Wczytana tabela (pusta, gdy brak pliku)
+    """
+    global _table
+
+    with _table_lock:
+        table = ReferenceFoodTable(())
+        try:
+            with open(REFERENCE_FOODS_FILE, "r", encoding="utf-8") as f:
+                reference = json.load(f)
+            table = ReferenceFoodTable(reference["nutrients"])
+            for food in reference["foods"]:
+                table.add(food["name"], food["values"], food.get("aliases", ()))
+        except FileNotFoundError:
+            logger.warning("[BAZA] Brak pliku %s - tabela potraw jest pusta", REFERENCE_FOODS_FILE)
+        except Exception as e:
+            logger.warning("[BAZA] Nie udało się wczytać tabeli potraw: %s", e)
+
+        _learned.clear()
+        if os.path.exists(LEARNED_FOODS_FILE):
+            try:
+                with open(LEARNED_FOODS_FILE, "r", encoding="utf-8") as f:
+                    _learned.update(json.load(f))
+                for name, values in _learned.items():
+                    table.add(name, values)
+            except Exception as e:
+                logger.warning("[BAZA] Nie udało się wczytać %s: %s", LEARNED_FOODS_FILE, e)
+
+        _table = table
+        logger.info("[BAZA] Wczytano %d potraw referencyjnych", len(table))
+        return table
+
+
+def get_reference_table() -> ReferenceFoodTable:
+    """Zwraca tabelę potraw, wczytując ją przy pierwszym użyciu."""
+    return _table if _table is not None else load_reference_foods()
+
+
+def find_reference_food(name: str) -> Optional[Dict]:
+    """
+    Zwraca wartości na 100g potrawy z tabeli referencyjnej.
+
+    Args:
+        name: Nazwa potrawy
+
+    Returns:
+        dict: Wartości na 100g (ten sam kształt co wpis cache)
+        None: Gdy potrawy nie ma w tabeli albo tabela jest wyłączona
+    """
+    if not REFERENCE_FOODS_ENABLED:
+        return None
+
+    match = get_reference_table().lookup(name)
+    if match is None or not match["per_100g"]:
+        _stats["misses"] += 1
+        return None
+
+    _stats["fuzzy_hits" if match["fuzzy"] else "hits"] += 1
+    logger.debug("[BAZA] \"%s\" -> \"%s\"%s", name, match["name"], " (dopasowanie przybliżone)" if match["fuzzy"] else "")
+    return match["per_100g"]
+
+
+def promote_reference_food(name: str, per_100g: Dict):
+    """
+    Dopisuje odpowiedź modelu do tabeli (gdy REFERENCE_FOODS_PROMOTE=1).
+
+    Dopisane potrawy trafiają do LEARNED_FOODS_FILE, więc tabela
+    w repozytorium pozostaje bez zmian.
+
+    Args:
+        name: Nazwa potrawy
+        per_100g: Zwalidowane wartości na 100g
+    """
+    if not (REFERENCE_FOODS_ENABLED and REFERENCE_FOODS_PROMOTE and per_100g):
+        return
+
+    table = get_reference_table()
+    values = {nutrient: value for nutrient, value in per_100g.items() if nutrient in table.nutrients}
+    if not values or not table.add(name, values):
+        return
+
+    with _table_lock:
+        _learned[name] = values
+        _stats["promoted"] += 1
+        try:
+            _ensure_data_directory()
+            atomic_write_json(LEARNED_FOODS_FILE, _learned, indent=2)
+        except Exception as e:
+            logger.warning("[BAZA] Nie udało się zapisać %s: %s", LEARNED_FOODS_FILE, e)
+    logger.info("[BAZA] Dopisano \"%s\" do tabeli potraw", name)
+
+
+def get_reference_stats() -> Dict:
+    """
+    Zwraca liczniki trafień tabeli referencyjnej.
+
+    Returns:
+        Słownik z hits, fuzzy_hits, misses, promoted i size
+    """
+    return {**_stats, "size": len(_table) if _table is not None else 0, "enabled": REFERENCE_FOODS_ENABLED}
+
+
+register_collector(
+    "smartdiet_reference_lookups_total", "Wyszukiwania w tabeli potraw referencyjnych (hits, fuzzy_hits, misses, promoted)",
+    "counter", ("result",), lambda: {(result,): count for result, count in _stats.items()}
+)
@@ -0,0 +1,415 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, Optional
+
+from services.metrics import LLM_RETRIES, register_collector
+
+logger = logging.getLogger(__name__)
+
+# Maksymalna liczba prób jednego zapytania do OpenAI
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "3"))
+
+# Wykładnicze odstępy między próbami: losowo z [0, min(MAX, BASE * 2^próba)]
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+
+# Łączny budżet czasu jednej analizy (wszystkie próby i przerwy) w sekundach
+OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "25"))
+
+# Maksymalny czas jednej próby w sekundach (ograniczany przez pozostały budżet)
+OPENAI_ATTEMPT_TIMEOUT = float(os.getenv("OPENAI_ATTEMPT_TIMEOUT", "20"))
+
+# Bezpiecznik: po tylu kolejnych awariach API przestajemy do niego wysyłać
+# zapytania na BREAKER_RESET_TIMEOUT sekund, potem wpuszczamy jedną próbę
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+@lru_cache(maxsize=None)
+def _error_types():
+    """
+    Klasy błędów SDK openai: (moduł, błędy nieponawialne, błędy niedostępności API).
+
+    SDK jest importowane dopiero przy klasyfikacji pierwszego błędu - sam
+    import trwa ok. 0,7 s, a worker obsługujący tylko dziennik nigdy go
+    nie potrzebuje. Błąd z API oznacza, że klient już załadował SDK.
+    """
+    import openai
+
+    # Błędy, których ponawianie nic nie da (poprawne zapytanie jest wymagane)
+    non_retryable = (
+        openai.AuthenticationError,
+        openai.PermissionDeniedError,
+        openai.BadRequestError,
+        openai.NotFoundError,
+        openai.UnprocessableEntityError,
+    )
+
+    # Błędy świadczące o niedostępności API - liczone przez bezpiecznik
+    upstream = (
+        openai.APIConnectionError,  # obejmuje też APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+        openai.AuthenticationError,
+        openai.PermissionDeniedError,
+        TimeoutError,
+        ConnectionError,
+    )
+    return openai, non_retryable, upstream
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class Deadline:
+    """Budżet czasu dla wszystkich prób jednej operacji."""
+
+    def __init__(self, seconds: float = OPENAI_DEADLINE):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def attempt_timeout(self) -> float:
+        """Limit czasu kolejnej próby - nie dłuższy niż pozostały budżet."""
+        return min(OPENAI_ATTEMPT_TIMEOUT, self.remaining())
+
+
+class CircuitBreaker:
+    """
+    Bezpiecznik chroniący przed zasypywaniem niedziałającego API.
+
+    Stany: "closed" (zapytania przechodzą), "open" (zapytania są od razu
+    odrzucane), "half_open" (po BREAKER_RESET_TIMEOUT przechodzi jedna
+    próba; sukces zamyka bezpiecznik, porażka otwiera go ponownie).
+
+    Próba przerwana bez odpowiedzi API (anulowanie, rozłączenie klienta)
+    zwalnia miejsce przez release(); gdyby wywołujący tego nie zrobił,
+    miejsce zwalnia się samo po probe_timeout sekundach.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, probe_timeout: float = OPENAI_DEADLINE):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self):
+        now = time.monotonic()
+        if self._state == "open" and now - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._probe_in_flight = False
+        elif self._probe_in_flight and now - self._probe_started_at >= self.probe_timeout:
+            logger.warning("[BEZPIECZNIK] Próba bez wyniku od %ss - wpuszczam kolejną", self.probe_timeout)
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Czy można teraz wysłać zapytanie do API."""
+        with self._lock:
+            self._refresh_state()
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def release(self):
+        """Zwalnia próbę zakończoną bez odpowiedzi API - nie świadczy ona ani o awarii, ani o sukcesie."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                logger.info("[BEZPIECZNIK] API odpowiada - zamykam bezpiecznik")
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._stats["opened"] += 1
+                    logger.warning("[BEZPIECZNIK] Otwieram na %ss po %d błędach API", self.reset_timeout, self._failures)
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def get_stats(self):
+        with self._lock:
+            self._refresh_state()
+            return {**self._stats, "state": self._state, "consecutive_failures": self._failures}
+
+
+# Jeden bezpiecznik dla całego procesu - wszystkie ścieżki wołają to samo API
+breaker = CircuitBreaker()
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Czy błąd jest przejściowy i warto ponowić zapytanie.
+
+    Nie ponawiamy błędów autoryzacji, uprawnień, niepoprawnych zapytań
+    i wyczerpanego limitu konta.
+    Ponawiamy przekroczenie limitów (429), błędy serwera (5xx), 408/409,
+    przekroczenie czasu i problemy z połączeniem.
+    """
+    openai, non_retryable, _ = _error_types()
+    if isinstance(error, non_retryable):
+        return False
+    if isinstance(error, openai.RateLimitError) and getattr(error, "code", None) == "insufficient_quota":
+        # Wyczerpany limit konta, a nie chwilowe ograniczenie
+        return False
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return True
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    openai, _, upstream = _error_types()
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return True
+    return isinstance(error, upstream)
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Czas w formacie nagłówków OpenAI: "1s", "6m0s", "250ms", "0.5"."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Czas oczekiwania wskazany przez API w nagłówkach odpowiedzi.
+
+    Obsługuje retry-after-ms, retry-after (sekundy lub data HTTP)
+    oraz x-ratelimit-reset-requests / x-ratelimit-reset-tokens.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    if headers.get("retry-after"):
+        seconds = _parse_duration(headers["retry-after"])
+        if seconds is not None:
+            return seconds
+        try:
+            return max(parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            pass
+
+    resets = [
+        _parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [seconds for seconds in resets if seconds is not None]
+    return max(resets) if resets else None
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """
+    Przerwa przed kolejną próbą (attempt liczone od 0).
+
+    Wykładniczy odstęp z pełnym losowaniem (full jitter), a przy
+    przekroczeniu limitów - co najmniej tyle, ile wskazało API.
+    """
+    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt))
+    hinted = retry_after_seconds(error) if error is not None else None
+    if hinted is not None:
+        # Niewielki rozrzut, żeby czekający nie wrócili wszyscy w tej samej chwili
+        delay = max(delay, hinted * random.uniform(1.0, 1.1))
+    return delay
+
+
+def next_retry_delay(error, attempt, deadline, label="API"):
+    """
+    Rejestruje porażkę i decyduje o kolejnej próbie.
+
+    Returns:
+        float: Przerwa przed kolejną próbą
+        None: Gdy nie należy ponawiać
+    """
+    if _is_upstream_failure(error):
+        breaker.record_failure()
+    else:
+        # API odpowiedziało (np. 400) - działa, problem leży po stronie zapytania
+        breaker.record_success()
+
+    retryable = is_retryable(error)
+    logger.warning("[%s] Próba %d/%d: %s: %s%s", label, attempt + 1, OPENAI_MAX_ATTEMPTS,
+                   type(error).__name__, error, "" if retryable else " (nie ponawiam)")
+
+    if not retryable or attempt == OPENAI_MAX_ATTEMPTS - 1:
+        return None
+
+    delay = backoff_delay(attempt, error)
+    if delay >= deadline.remaining():
+        logger.warning("[%s] Brak czasu na kolejną próbę (zostało %.1fs)", label, deadline.remaining())
+        return None
+    LLM_RETRIES.inc(label=label, reason=type(error).__name__)
+    return delay
+
+
+def call_with_retries(request: Callable, parse: Callable, deadline: Optional[Deadline] = None,
+                      label: str = "API"):
+    """
+    Wywołuje API z ponawianiem, budżetem czasu i bezpiecznikiem.
+
+    Args:
+        request: Funkcja request(timeout) wysyłająca zapytanie i zwracająca odpowiedź
+        parse: Funkcja parse(odpowiedź) zwracająca wynik lub None (odpowiedź
+            nie nadaje się do użycia - ponawiamy, ale API działa)
+        deadline: Budżet czasu (domyślnie OPENAI_DEADLINE od teraz)
+        label: Etykieta w logach
+
+    Returns:
+        Wynik parse
+        None: Gdy wszystkie próby zawiodły, skończył się budżet czasu
+              albo bezpiecznik jest otwarty
+    """
+    deadline = deadline or Deadline()
+
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        if deadline.expired():
+            logger.warning("[%s] Przekroczono budżet czasu analizy", label)
+            return None
+        if not breaker.allow():
+            logger.warning("[%s] Bezpiecznik otwarty - pomijam zapytanie do API", label)
+            return None
+
+        try:
+            response = request(deadline.attempt_timeout())
+        except Exception as e:
+            delay = next_retry_delay(e, attempt, deadline, label)
+            if delay is None:
+                return None
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        result = parse(response)
+        if result:
+            return result
+
+        logger.warning("[%s] Próba %d - nieprawidłowa odpowiedź modelu", label, attempt + 1)
+        if attempt < OPENAI_MAX_ATTEMPTS - 1:
+            LLM_RETRIES.inc(label=label, reason="invalid_response")
+            time.sleep(min(backoff_delay(attempt), deadline.remaining()))
+
+    return None
+
+
+async def call_with_retries_async(request: Callable, parse: Callable, deadline: Optional[Deadline] = None,
+                                  label: str = "API"):
+    """
+    Asynchroniczny odpowiednik call_with_retries.
+
+    Args:
+        request: Funkcja request(timeout) zwracająca awaitable z odpowiedzią
+        parse: Jak w call_with_retries
+        deadline: Budżet czasu (domyślnie OPENAI_DEADLINE od teraz)
+        label: Etykieta w logach
+    """
+    deadline = deadline or Deadline()
+
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        if deadline.expired():
+            logger.warning("[%s] Przekroczono budżet czasu analizy", label)
+            return None
+        if not breaker.allow():
+            logger.warning("[%s] Bezpiecznik otwarty - pomijam zapytanie do API", label)
+            return None
+
+        try:
+            response = await request(deadline.attempt_timeout())
+        except asyncio.CancelledError:
+            # Przekroczony czas analizy (run_async) - próba nie ma wyniku
+            breaker.release()
+            raise
+        except Exception as e:
+            delay = next_retry_delay(e, attempt, deadline, label)
+            if delay is None:
+                return None
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        result = parse(response)
+        if result:
+            return result
+
+        logger.warning("[%s] Próba %d - nieprawidłowa odpowiedź modelu", label, attempt + 1)
+        if attempt < OPENAI_MAX_ATTEMPTS - 1:
+            LLM_RETRIES.inc(label=label, reason="invalid_response")
+            await asyncio.sleep(min(backoff_delay(attempt), deadline.remaining()))
+
+    return None
+
+
+def get_resilience_stats():
+    """
+    Zwraca stan bezpiecznika i ustawienia ponawiania.
+
+    Returns:
+        Słownik ze stanem bezpiecznika (state, opened, rejected,
+        consecutive_failures) i limitami prób
+    """
+    return {
+        "breaker": breaker.get_stats(),
+        "max_attempts": OPENAI_MAX_ATTEMPTS,
+        "deadline_seconds": OPENAI_DEADLINE
+    }
+
+
+register_collector(
+    "smartdiet_breaker_events_total", "Otwarcia bezpiecznika i odrzucone przez niego zapytania", "counter",
+    ("event",), lambda: {(event,): breaker.get_stats()[event] for event in ("opened", "rejected")}
+)
+register_collector(
+    "smartdiet_breaker_open", "Stan bezpiecznika OpenAI API (0 - zamknięty, 0.5 - próbny, 1 - otwarty)", "gauge",
+    (), lambda: {(): {"closed": 0, "half_open": 0.5, "open": 1}[breaker.get_stats()["state"]]}
+)
@@ -0,0 +1,103 @@
+import os
+import threading
+from typing import Dict
+
+from services.metrics import LLM_REQUEST_SECONDS, register_collector
+
+# Ceny modelu w USD za milion tokenów (domyślnie gpt-4o) - do szacowania kosztów
+PRICE_INPUT_PER_MILLION = float(os.getenv("OPENAI_PRICE_INPUT", "2.5"))
+PRICE_OUTPUT_PER_MILLION = float(os.getenv("OPENAI_PRICE_OUTPUT", "10.0"))
+
+_usage = {}
+_lock = threading.Lock()
+
+
+def _empty_entry():
+    return {
+        "requests": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "truncated": 0,
+        "latency_s": 0.0
+    }
+
+
+def record_usage(kind: str, version: str, usage, latency: float, finish_reason: str = None):
+    """
+    Dolicza zużycie tokenów jednego zapytania (z pola response.usage).
+
+    Args:
+        kind: Rodzaj zapytania ("dish", "batch", "stream", "recipe")
+        version: Wersja szablonu promptu
+        usage: Obiekt usage z odpowiedzi API (może być None)
+        latency: Czas zapytania w sekundach
+        finish_reason: Powód zakończenia odpowiedzi ("length" = ucięta limitem tokenów)
+    """
+    LLM_REQUEST_SECONDS.observe(latency, kind=kind)
+    with _lock:
+        entry = _usage.setdefault(f"{version}/{kind}", _empty_entry())
+        entry["requests"] += 1
+        entry["latency_s"] += latency
+        if usage is not None:
+            entry["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            entry["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        if finish_reason == "length":
+            entry["truncated"] += 1
+
+
+def _cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * PRICE_INPUT_PER_MILLION + completion_tokens * PRICE_OUTPUT_PER_MILLION) / 1e6
+
+
+def get_token_stats() -> Dict:
+    """
+    Zwraca zużycie tokenów łącznie i w podziale na szablon i rodzaj zapytania.
+
+    Returns:
+        Słownik z sumami (requests, prompt_tokens, completion_tokens,
+        cost_usd) i kluczem "by_prompt" ze średnimi na zapytanie
+    """
+    with _lock:
+        entries = {key: dict(entry) for key, entry in _usage.items()}
+
+    by_prompt = {}
+    for key, entry in sorted(entries.items()):
+        requests = entry["requests"]
+        by_prompt[key] = {
+            **{name: value for name, value in entry.items() if name != "latency_s"},
+            "avg_prompt_tokens": round(entry["prompt_tokens"] / requests, 1),
+            "avg_completion_tokens": round(entry["completion_tokens"] / requests, 1),
+            "avg_latency_s": round(entry["latency_s"] / requests, 3),
+            "cost_usd": round(_cost(entry["prompt_tokens"], entry["completion_tokens"]), 6)
+        }
+
+    prompt_tokens = sum(entry["prompt_tokens"] for entry in entries.values())
+    completion_tokens = sum(entry["completion_tokens"] for entry in entries.values())
+    return {
+        "requests": sum(entry["requests"] for entry in entries.values()),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": round(_cost(prompt_tokens, completion_tokens), 6),
+        "by_prompt": by_prompt
+    }
+
+
+def reset_token_stats():
+    """Zeruje liczniki (np. między przebiegami benchmarku)."""
+    with _lock:
+        _usage.clear()
+
+
+def _collect_tokens():
+    with _lock:
+        return {
+            (*key.split("/", 1), direction): entry[f"{direction}_tokens"]
+            for key, entry in _usage.items()
+            for direction in ("prompt", "completion")
+        }
+
+
+register_collector(
+    "smartdiet_llm_tokens_total", "Tokeny zużyte przez zapytania do OpenAI API", "counter",
+    ("prompt", "kind", "direction"), _collect_tokens
+)
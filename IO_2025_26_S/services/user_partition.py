@@ -0,0 +1,52 @@
+import hashlib
+import os
+import re
+
+# Użytkownik bez identyfikatora (aplikacja bez logowania) - jego dziennik
+# zostaje w dotychczasowych plikach data/meals.*
+DEFAULT_USER = os.getenv("DEFAULT_USER_ID", "default")
+
+# Katalog partycji pozostałych użytkowników
+USERS_DIR = os.path.join("data", "users")
+
+# Dozwolone identyfikatory: litery, cyfry i znaki _ . @ - (do 128 znaków)
+_USER_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.@-]{0,127}")
+
+
+def normalize_user_id(user_id) -> str:
+    """
+    Sprawdza identyfikator użytkownika.
+
+    Args:
+        user_id: Identyfikator z nagłówka, ciasteczka albo wywołania
+
+    Returns:
+        Identyfikator bez białych znaków na brzegach
+
+    Raises:
+        ValueError: Gdy identyfikator jest pusty lub zawiera niedozwolone znaki
+    """
+    user_id = str(user_id or "").strip()
+    if not _USER_ID_PATTERN.fullmatch(user_id):
+        raise ValueError("Nieprawidłowy identyfikator użytkownika")
+    return user_id
+
+
+def user_data_dir(user_id: str = DEFAULT_USER) -> str:
+    """
+    Katalog danych użytkownika.
+
+    Partycje są rozłożone po skrócie identyfikatora na dwa poziomy
+    podkatalogów (data/users/ab/cd/<skrót>), więc żaden katalog nie
+    rośnie z liczbą użytkowników, a nazwa nie zdradza identyfikatora.
+
+    Args:
+        user_id: Identyfikator użytkownika
+
+    Returns:
+        Ścieżka katalogu (dla DEFAULT_USER - "data")
+    """
+    if user_id == DEFAULT_USER:
+        return "data"
+    digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(USERS_DIR, digest[:2], digest[2:4], digest)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Testy importują moduły aplikacji tak jak app.py (z katalogu IO_2025_26_S)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+os.environ.setdefault("LOG_LEVEL", "OFF")
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Każdy test pracuje w osobnym katalogu - data/ (dziennik, cache) trafia do tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(data_dir):
+    """Stan modułów (otwarte magazyny, cache analiz) nie przechodzi między testami."""
+    from services import meal_storage, nutrient_cache
+
+    nutrient_cache.clear_cache()
+    nutrient_cache._loaded = False
+    yield
+    meal_storage.close_storages()
+    nutrient_cache.clear_cache()
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from services import analysis_jobs
+from services.analysis_jobs import IdempotencyConflictError, get_job, submit_analysis
+from services.meal_service import get_all_meals
+
+NUTRIENTS = {"Magnez": 24.0, "Żelazo": 1.3}
+
+
+@pytest.fixture(autouse=True)
+def client_charts(monkeypatch):
+    # Wykres jako dane dla przeglądarki - bez renderowania PNG w puli procesów
+    monkeypatch.setattr(analysis_jobs, "CHART_MODE", "client")
+
+
+class Analyzer:
+    """Atrapa analizy: liczy wywołania, opcjonalnie zawodzi albo czeka na sygnał."""
+
+    def __init__(self, fail=False, gate=None):
+        self.calls = 0
+        self.fail = fail
+        self.gate = gate
+
+    def __call__(self, dish_name, amount):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return None if self.fail else dict(NUTRIENTS)
+
+
+def _wait(job_id, states=("succeeded", "failed"), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job(job_id)
+        if job["state"] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Zadanie {job_id} nie zakończyło się w {timeout} s")
+
+
+def test_same_key_returns_the_same_job():
+    analyze = Analyzer()
+    job, created = submit_analysis(analyze, "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    assert created is True
+    assert _wait(job["id"])["state"] == "succeeded"
+
+    again, created = submit_analysis(analyze, "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    assert created is False
+    assert again["id"] == job["id"]
+    assert analyze.calls == 1
+    assert len(get_all_meals()) == 1
+
+
+def test_key_reused_for_other_request_is_rejected():
+    job, _ = submit_analysis(Analyzer(), "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    _wait(job["id"])
+
+    with pytest.raises(IdempotencyConflictError):
+        submit_analysis(Analyzer(), "owsianka", 300, "2026-01-01", idempotency_key="klucz-1")
+
+
+@pytest.mark.parametrize("key", ["", "x" * (analysis_jobs.IDEMPOTENCY_KEY_MAX_LENGTH + 1)])
+def test_invalid_key(key):
+    with pytest.raises(ValueError):
+        submit_analysis(Analyzer(), "owsianka", 200, "2026-01-01", idempotency_key=key)
+
+
+def test_failed_job_is_retried():
+    job, _ = submit_analysis(Analyzer(fail=True), "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    assert _wait(job["id"])["state"] == "failed"
+
+    retry, created = submit_analysis(Analyzer(), "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    assert created is True
+    assert retry["id"] != job["id"]
+    assert _wait(retry["id"])["state"] == "succeeded"
+    assert len(get_all_meals()) == 1
+
+
+def test_abandoned_job_does_not_save_after_retry(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(analysis_jobs, "JOB_STALE_AFTER", 0.2)
+    job, _ = submit_analysis(Analyzer(gate=gate), "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    _wait(job["id"], states=("running",))
+    time.sleep(0.3)
+
+    # Zadanie bez zmian dłużej niż JOB_STALE_AFTER jest trwale oznaczane jako przerwane
+    assert get_job(job["id"])["state"] == "failed"
+    monkeypatch.setattr(analysis_jobs, "JOB_STALE_AFTER", 600)
+
+    retry, created = submit_analysis(Analyzer(), "owsianka", 200, "2026-01-01", idempotency_key="klucz-1")
+    assert created is True
+    assert _wait(retry["id"])["state"] == "succeeded"
+
+    # Przerwany wątek kończy analizę, ale nie zapisuje posiłku drugi raz
+    gate.set()
+    deadline = time.monotonic() + 5
+    while analysis_jobs.get_job_stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert get_job(job["id"])["state"] == "failed"
+    assert len(get_all_meals()) == 1
+
+
+def test_thread_locks_are_dropped_after_use():
+    from services import data_service
+
+    jobs = [submit_analysis(Analyzer(), "owsianka", 200, "2026-01-01", idempotency_key=f"klucz-{i}")[0]
+            for i in range(5)]
+    for job in jobs:
+        _wait(job["id"])
+    deadline = time.monotonic() + 5
+    while analysis_jobs.get_job_stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Każdy plik zadania i klucza miał swoją blokadę - żadna nie zostaje w pamięci
+    assert data_service._thread_locks == {}
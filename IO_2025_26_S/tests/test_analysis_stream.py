@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from controllers.sse import format_sse
+from services import nutrient_cache, openai_service, resilience
+from services.nutrient_cache import get_cached_nutrients, store_nutrients
+from services.openai_service import analyze_dish_stream
+from services.resilience import CircuitBreaker
+
+PER_100G = {"Magnez": 24.0, "Żelazo": 1.2, "Witamina D": 0.1, "Wapń": 40.0, "Cynk": 1.0, "Potas": 200.0}
+
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(resilience, "breaker", breaker)
+    monkeypatch.setattr(openai_service, "breaker", breaker)
+    monkeypatch.setattr(resilience, "OPENAI_BACKOFF_BASE", 0)
+    return breaker
+
+
+def _chunk(content):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(finish_reason=None, delta=SimpleNamespace(content=content))])
+
+
+def _client(*streams):
+    """Atrapa klienta: kolejne wywołania zwracają kolejne strumienie fragmentów (albo zgłaszają wyjątek)."""
+    streams = list(streams)
+
+    def create(**kwargs):
+        stream = streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return iter(stream)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _broken(chunks):
+    yield from chunks
+    raise ConnectionError("zerwane połączenie")
+
+
+def test_nutrients_arrive_before_done():
+    content = json.dumps(PER_100G, ensure_ascii=False)
+    chunks = [_chunk(content[i:i + 7]) for i in range(0, len(content), 7)]
+
+    events = list(analyze_dish_stream(_client(chunks), "kwazimodo", 200))
+
+    names = [event for event, _ in events]
+    assert names[0] == "progress" and names[-1] == "done"
+    streamed = {data["name"]: data["value"] for event, data in events if event == "nutrient"}
+    assert streamed == {key: pytest.approx(value * 2) for key, value in PER_100G.items()}
+    assert events[-1][1]["micronutrients"] == streamed
+    assert get_cached_nutrients("kwazimodo") == PER_100G
+
+
+def test_interrupted_stream_reports_partial_error():
+    # Przeterminowany wpis cache - mógłby posłużyć jako wynik zastępczy
+    store_nutrients("kwazimodo", PER_100G)
+    nutrient_cache._cache["kwazimodo"]["stored_at"] -= nutrient_cache.CACHE_TTL_SECONDS + 1
+
+    stream = _broken([_chunk('{"Magnez": 24.0, "Żelazo": 1.2, ')])
+    events = list(analyze_dish_stream(_client(stream), "kwazimodo", 100))
+
+    assert [data["name"] for event, data in events if event == "nutrient"] == ["Magnez", "Żelazo"]
+    assert events[-1] == ("error", {"message": "Analiza została przerwana. Spróbuj ponownie.", "partial": True})
+
+
+def test_failure_before_any_nutrient_is_retried():
+    content = json.dumps(PER_100G, ensure_ascii=False)
+    client = _client(ConnectionError("brak połączenia"), [_chunk(content)])
+
+    events = list(analyze_dish_stream(client, "kwazimodo", 100))
+
+    attempts = [data["attempt"] for event, data in events if event == "progress" and data["stage"] == "request"]
+    assert attempts == [1, 2]
+    assert events[-1][0] == "done"
+
+
+def test_format_sse():
+    assert format_sse("nutrient", {"name": "Żelazo", "value": 1.5}) == \
+        'event: nutrient\ndata: {"name": "Żelazo", "value": 1.5}\n\n'
+
+
+def test_stream_endpoint():
+    store_nutrients("kwazimodo", PER_100G)
+    client = create_app(TestingConfig).test_client()
+
+    response = client.post("/api/analyze/stream", json={"dish": "kwazimodo", "amount": 50})
+
+    assert response.mimetype == "text/event-stream"
+    events = [block.split("\n") for block in response.get_data(as_text=True).strip().split("\n\n")]
+    assert [lines[0] for lines in events][-1] == "event: done"
+    done = json.loads(events[-1][1][len("data: "):])
+    assert done["status"] == "success"
+    assert done["micronutrients"]["Magnez"] == pytest.approx(12.0)
+    assert client.post("/api/analyze/stream", json={"amount": 50}).status_code == 400
@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import openai_service, resilience
+from services.openai_service import analyze_dish, finish_flight, get_coalescing_stats, join_flight
+from services.resilience import CircuitBreaker
+
+PER_100G = {"Magnez": 24.0, "Żelazo": 1.2, "Witamina D": 0.1, "Wapń": 40.0, "Cynk": 1.0, "Potas": 200.0}
+
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(resilience, "breaker", breaker)
+    monkeypatch.setattr(openai_service, "breaker", breaker)
+    return breaker
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Warunek nie został spełniony"
+        time.sleep(0.005)
+
+
+def test_followers_share_the_leaders_flight():
+    flight, leader = join_flight("bigos")
+    same, follower = join_flight("bigos")
+    assert leader and not follower
+    assert same is flight
+
+    finish_flight("bigos", flight, PER_100G)
+    assert same.result() == PER_100G
+
+    # Zakończony lot nie jest już współdzielony
+    flight, leader = join_flight("bigos")
+    assert leader
+    finish_flight("bigos", flight, None)
+
+
+def test_concurrent_analyses_make_one_request():
+    gate = threading.Event()
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        gate.wait(5)
+        message = SimpleNamespace(content=json.dumps(PER_100G, ensure_ascii=False))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    before = get_coalescing_stats()
+    results = {}
+
+    def analyze(amount):
+        results[amount] = analyze_dish(client, "Kwazimodo", amount)
+
+    threads = [threading.Thread(target=analyze, args=(100,))]
+    threads[0].start()
+    _wait_for(lambda: requests)
+    threads += [threading.Thread(target=analyze, args=(amount,)) for amount in (50, 200, 300)]
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for(lambda: get_coalescing_stats()["coalesced"] - before["coalesced"] == 3)
+
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(requests) == 1
+    assert results[100]["Magnez"] == pytest.approx(24.0)
+    assert results[300]["Magnez"] == pytest.approx(72.0)
+    assert get_coalescing_stats()["in_flight"] == 0
+
+
+def test_followers_get_none_when_leader_fails():
+    flight, _ = join_flight("bigos")
+    same, _ = join_flight("bigos")
+
+    finish_flight("bigos", flight, None)
+    assert same.result() is None
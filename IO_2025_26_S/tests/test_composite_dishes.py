@@ -0,0 +1,69 @@
+import pytest
+
+from services import composite_dishes
+from services.composite_dishes import RecipeBook, compose_dish, missing_ingredients
+from services.openai_service import decomposition_step, decomposition_steps
+from services.reference_foods import find_reference_food
+
+SAUCE = {"Magnez": 10.0, "Żelazo": 0.2, "Witamina D": 0.0, "Wapń": 80.0, "Cynk": 0.3, "Potas": 100.0}
+
+
+@pytest.fixture
+def book(monkeypatch):
+    book = RecipeBook()
+    book.add("ryż z makaronem", {"ryż": 1, "makaron": 1}, aliases=["makaron z ryżem"])
+    book.add("makaron z sosem testowym", {"makaron": 70, "sos testowy": 30})
+    monkeypatch.setattr(composite_dishes, "_book", book)
+    return book
+
+
+@pytest.mark.parametrize("name", ["ryż z makaronem", "Makaron z ryżem", "makaronem z ryż", "ryż z mkaronem"])
+def test_find(book, name):
+    recipe_name, ingredients, shares = book.find(name)
+    assert recipe_name == "ryż z makaronem"
+    assert ingredients == ("ryż", "makaron")
+    assert list(shares) == [0.5, 0.5]
+
+
+@pytest.mark.parametrize("name", ["makaron z serem testowym", "makaron z sosem", "ryż"])
+def test_find_rejects_other_dishes(book, name):
+    assert book.find(name) is None
+
+
+def test_add_rejects_empty_and_duplicate(book):
+    assert book.add("pusta potrawa", {"ryż": 0}) is False
+    assert book.add("Ryż z makaronem", {"ryż": 1}) is False
+    assert len(book) == 2
+
+
+def test_compose_weighted_average(book):
+    rice, pasta = find_reference_food("ryż"), find_reference_food("makaron")
+
+    composed = compose_dish("ryż z makaronem")
+    assert composed == {key: pytest.approx((rice[key] + pasta[key]) / 2, abs=0.06) for key in rice}
+
+
+def test_unknown_ingredient_blocks_composition(book):
+    assert missing_ingredients("makaron z sosem testowym") == ["sos testowy"]
+    assert compose_dish("makaron z sosem testowym") is None
+    assert missing_ingredients("kotlet schabowy") is None
+
+
+def test_decomposition_learns_recipe_and_ingredients(book):
+    pasta = find_reference_food("makaron")
+
+    steps = decomposition_steps("makaron z serem testowym")
+    request, _ = decomposition_step(steps)
+    assert request == ("recipe", "makaron z serem testowym")
+
+    request, _ = decomposition_step(steps, {"makaron": 70, "ser testowy": 30})
+    assert request == ("nutrients", ["ser testowy"])
+
+    request, result = decomposition_step(steps, {"ser testowy": SAUCE})
+    assert request is None
+    assert result == {key: pytest.approx(0.7 * pasta[key] + 0.3 * SAUCE[key], abs=0.06) for key in SAUCE}
+
+    # Skład i składnik są zapamiętane - kolejny rozkład nie pyta modelu
+    request, result = decomposition_step(decomposition_steps("makaron z serem testowym"))
+    assert request is None and result is not None
+    assert "makaron z serem testowym" in composite_dishes._learned
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from services.chart_service import create_chart
+from services.meal_service import add_meal
+
+
+class SharedDiaryConfig(TestingConfig):
+    # Bez klucza podpisu wszyscy odwiedzający dzielą dziennik DEFAULT_USER
+    SECRET_KEY = None
+
+
+@pytest.fixture
+def client():
+    add_meal("owsianka", 250, "2026-01-01", {"Magnez": 75.0})
+    return create_app(SharedDiaryConfig).test_client()
+
+
+@pytest.mark.parametrize("url", ["/diary", "/diary/2026-01-01", "/api/meals"])
+def test_unchanged_diary_is_not_modified(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert {"private", "no-cache"} <= set(response.headers["Cache-Control"].replace(" ", "").split(","))
+    assert "Cookie" in response.headers["Vary"]
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+
+def test_new_meal_changes_etag(client):
+    etag = client.get("/api/meals").headers["ETag"]
+    add_meal("bigos", 300, "2026-01-01", {"Magnez": 40.0})
+
+    response = client.get("/api/meals", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_other_users_diary_has_own_etag(client):
+    etag = client.get("/api/meals").headers["ETag"]
+    add_meal("bigos", 300, "2026-01-01", {"Magnez": 40.0}, user_id="jan")
+
+    assert client.get("/api/meals", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_error_response_has_no_validators(client):
+    response = client.get("/diary/2026-02-30")
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
+
+
+def test_chart_is_immutable(client):
+    chart_path = create_chart("owsianka", {"Magnez": 75.0, "Żelazo": 2.0}, 250)
+
+    response = client.get(f"/charts/{os.path.basename(chart_path)}")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "public" in response.headers["Cache-Control"]
+    assert client.get("/charts/brak.png").status_code == 404
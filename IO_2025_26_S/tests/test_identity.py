@@ -0,0 +1,85 @@
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from controllers.identity import USER_ID_COOKIE, USER_ID_HEADER, sign_user_id
+from services.meal_service import add_meal
+from services.user_partition import DEFAULT_USER
+
+
+class ProxyConfig(TestingConfig):
+    TRUSTED_PROXY = True
+
+
+class NoSecretConfig(TestingConfig):
+    SECRET_KEY = None
+
+
+def _client(config=TestingConfig):
+    app = create_app(config)
+    return app, app.test_client()
+
+
+def _dishes(response):
+    assert response.status_code == 200
+    return [meal["dish_name"] for meal in response.get_json()["meals"]]
+
+
+@pytest.fixture(autouse=True)
+def diaries():
+    add_meal("owsianka", 200, "2026-01-01", {"Magnez": 50.0}, user_id=DEFAULT_USER)
+    add_meal("bigos", 300, "2026-01-01", {"Magnez": 40.0}, user_id="anna")
+
+
+def test_new_visitor_gets_own_diary_and_cookie():
+    _, client = _client()
+
+    response = client.get("/api/meals")
+    assert _dishes(response) == []
+    cookie = client.get_cookie(USER_ID_COOKIE)
+    assert cookie is not None and cookie.http_only
+
+    # Ten sam odwiedzający (z ciasteczkiem) nie dostaje nowego identyfikatora
+    response = client.get("/api/meals")
+    assert _dishes(response) == []
+    assert "Set-Cookie" not in response.headers
+    assert client.get_cookie(USER_ID_COOKIE).value == cookie.value
+
+
+def test_signed_cookie_selects_the_user():
+    app, client = _client()
+    with app.app_context():
+        client.set_cookie(USER_ID_COOKIE, sign_user_id("anna"))
+
+    response = client.get("/api/meals")
+    assert _dishes(response) == ["bigos"]
+    assert "Set-Cookie" not in response.headers
+
+
+def test_bad_signature_is_rejected():
+    app, client = _client()
+    with app.app_context():
+        forged = sign_user_id("anna")[:-2] + "xx"
+    client.set_cookie(USER_ID_COOKIE, forged)
+
+    assert client.get("/api/meals").status_code == 400
+    assert client.get("/diary").status_code == 400
+
+
+def test_header_needs_trusted_proxy():
+    _, client = _client()
+    assert _dishes(client.get("/api/meals", headers={USER_ID_HEADER: "anna"})) == []
+
+    _, client = _client(ProxyConfig)
+    response = client.get("/api/meals", headers={USER_ID_HEADER: "anna"})
+    assert _dishes(response) == ["bigos"]
+    assert "Set-Cookie" not in response.headers
+    assert client.get("/api/meals", headers={USER_ID_HEADER: "anna/../x"}).status_code == 400
+
+
+def test_without_secret_key_everyone_shares_default_diary():
+    _, client = _client(NoSecretConfig)
+
+    response = client.get("/api/meals")
+    assert _dishes(response) == ["owsianka"]
+    assert "Set-Cookie" not in response.headers
@@ -0,0 +1,61 @@
+import logging
+import pickle
+
+import pytest
+
+from services.meal_record import NUTRIENT_REGISTRY, MealRecord
+from services.meal_service import add_meal, get_all_meals, get_meals_page, iter_meals
+
+MEAL = {
+    "id": 7,
+    "dish_name": "owsianka",
+    "amount": 250,
+    "date": "2026-01-01",
+    "nutrition_data": {"Magnez": 75.5, "Żelazo": 2.25},
+    "created_at": "2026-01-01 08:00:00"
+}
+
+
+def test_record_reads_like_a_dict():
+    record = MealRecord.from_dict(MEAL)
+
+    assert record["dish_name"] == "owsianka"
+    assert record.get("amount") == 250
+    assert dict(record) == MEAL
+    assert record.to_dict() == MEAL
+    assert dict(record.nutrient_items()) == MEAL["nutrition_data"]
+    with pytest.raises(KeyError):
+        record["_values"]
+    with pytest.raises(AttributeError):
+        record.amount_per_day = 1
+
+
+def test_records_with_same_nutrients_share_layout():
+    first = MealRecord.from_dict(MEAL)
+    second = MealRecord.from_dict(dict(MEAL, id=8, nutrition_data={"Magnez": 1.0, "Żelazo": 2.0}))
+
+    assert first._layout is second._layout
+    assert second.nutrition_data == {"Magnez": 1.0, "Żelazo": 2.0}
+
+
+def test_non_numeric_value_is_dropped_with_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="services.meal_record"):
+        layout, _ = NUTRIENT_REGISTRY.encode({"Magnez": 75.5, "Żelazo": "dużo"})
+
+    assert layout.names == ("Magnez",)
+    assert "Żelazo" in caplog.text
+
+
+def test_pickle_round_trip():
+    record = pickle.loads(pickle.dumps(MealRecord.from_dict(MEAL)))
+    assert record.to_dict() == MEAL
+
+
+def test_meal_service_returns_records():
+    add_meal("owsianka", 250, "2026-01-01", {"Magnez": 75.5})
+
+    assert all(isinstance(meal, MealRecord) for meal in get_all_meals())
+    assert all(isinstance(meal, MealRecord) for meal in iter_meals())
+    page = get_meals_page(limit=10)
+    assert isinstance(page["meals"][0], MealRecord)
+    assert page["meals"][0].nutrition_data == {"Magnez": 75.5}
@@ -0,0 +1,195 @@
+import json
+import threading
+
+import pytest
+
+from services import meal_storage
+from services.meal_storage import (
+    JournalMealStorage, JsonMealStorage, SqliteMealStorage, migrate_json_to_sqlite, use_storage
+)
+
+
+def _meal(date, created_at, dish="owsianka", magnez=10.0):
+    return {
+        "dish_name": dish,
+        "amount": 100,
+        "date": date,
+        "nutrition_data": {"Magnez": magnez, "Żelazo": 1.0},
+        "created_at": created_at
+    }
+
+
+def _open(backend, directory):
+    if backend == "json":
+        return JsonMealStorage(str(directory / "meals.json"))
+    if backend == "sqlite":
+        return SqliteMealStorage(str(directory / "meals.db"))
+    return JournalMealStorage(str(directory / "meals.json"), str(directory / "meals.jsonl"))
+
+
+@pytest.fixture(params=["json", "sqlite", "journal"])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def storage(backend, tmp_path):
+    storage = _open(backend, tmp_path)
+    yield storage
+    storage.close()
+
+
+def test_add_and_read(storage):
+    first = storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+    second = storage.add_meal(_meal("2026-01-02", "2026-01-02 08:00:00", dish="rosół"))
+
+    assert (first.id, second.id) == (1, 2)
+    assert [meal["id"] for meal in storage.get_all_meals()] == [2, 1]
+    assert [meal["dish_name"] for meal in storage.get_meals_by_date("2026-01-02")] == ["rosół"]
+    assert second.to_dict() == {"id": 2, **_meal("2026-01-02", "2026-01-02 08:00:00", dish="rosół")}
+
+
+def test_delete_does_not_reuse_ids(storage):
+    storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+    storage.add_meal(_meal("2026-01-01", "2026-01-01 09:00:00"))
+
+    assert storage.delete_meal(2)["id"] == 2
+    assert storage.delete_meal(2) is None
+    assert storage.add_meal(_meal("2026-01-01", "2026-01-01 10:00:00")).id == 3
+
+
+def test_daily_totals_follow_writes(storage):
+    storage.add_meals([
+        _meal("2026-01-01", "2026-01-01 08:00:00", magnez=10),
+        _meal("2026-01-01", "2026-01-01 12:00:00", magnez=5.5),
+        _meal("2026-01-03", "2026-01-03 08:00:00", magnez=2)
+    ])
+    storage.delete_meal(3)
+
+    days = storage.get_daily_totals("2026-01-01", "2026-01-31")
+    assert [(day["date"], day["meal_count"]) for day in days] == [("2026-01-01", 2)]
+    assert days[0]["totals"]["Magnez"] == pytest.approx(15.5)
+    assert storage.get_summary()["total_meals"] == 2
+
+
+def test_pages_and_iteration(storage):
+    storage.add_meals([_meal(f"2026-01-{day:02d}", f"2026-01-{day:02d} 08:00:00") for day in range(1, 6)])
+
+    first = storage.get_meals_page(2)
+    assert [meal["id"] for meal in first] == [5, 4]
+    cursor = (first[-1]["created_at"], first[-1]["id"])
+    assert [meal["id"] for meal in storage.get_meals_page(2, cursor)] == [3, 2]
+
+    assert [meal["date"] for meal in storage.iter_meals("2026-01-02", "2026-01-04")] == [
+        "2026-01-02", "2026-01-03", "2026-01-04"
+    ]
+
+
+def test_reopen_keeps_meals(backend, tmp_path):
+    storage = _open(backend, tmp_path)
+    storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+    storage.add_meal(_meal("2026-01-02", "2026-01-02 08:00:00"))
+    storage.delete_meal(1)
+    storage.close()
+
+    reopened = _open(backend, tmp_path)
+    try:
+        assert [meal["id"] for meal in reopened.get_all_meals()] == [2]
+        assert reopened.add_meal(_meal("2026-01-03", "2026-01-03 08:00:00")).id == 3
+    finally:
+        reopened.close()
+
+
+def test_journal_compaction(tmp_path):
+    storage = JournalMealStorage(str(tmp_path / "meals.json"), str(tmp_path / "meals.jsonl"))
+    storage.add_meals([_meal("2026-01-01", f"2026-01-01 0{hour}:00:00") for hour in range(1, 4)])
+    storage.delete_meal(2)
+
+    assert storage.compact() == 2
+    storage.close()
+    # W dzienniku zostaje tylko ostatnio nadane id
+    lines = (tmp_path / "meals.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["op"] for line in lines] == ["meta"]
+
+    reopened = JournalMealStorage(str(tmp_path / "meals.json"), str(tmp_path / "meals.jsonl"))
+    try:
+        assert sorted(meal["id"] for meal in reopened.get_all_meals()) == [1, 3]
+        assert reopened.get_summary()["total_meals"] == 2
+        assert reopened.add_meal(_meal("2026-01-02", "2026-01-02 08:00:00")).id == 4
+    finally:
+        reopened.close()
+
+
+def test_migrate_json_to_sqlite(tmp_path):
+    meals = [
+        {"id": 3, **_meal("2026-01-01", "2026-01-01 08:00:00", magnez=4)},
+        {"id": 7, **_meal("2026-01-01", "2026-01-01 12:00:00", magnez=6)}
+    ]
+    json_path, db_path = str(tmp_path / "meals.json"), str(tmp_path / "meals.db")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(meals, f, ensure_ascii=False)
+
+    assert migrate_json_to_sqlite(json_path, db_path) == 2
+    # Ponowne uruchomienie niczego nie dubluje
+    assert migrate_json_to_sqlite(json_path, db_path) == 0
+
+    storage = SqliteMealStorage(db_path)
+    try:
+        assert [meal["id"] for meal in storage.get_all_meals()] == [7, 3]
+        assert storage.get_daily_totals("2026-01-01", "2026-01-01")[0]["totals"]["Magnez"] == pytest.approx(10)
+        assert storage.add_meal(_meal("2026-01-02", "2026-01-02 08:00:00")).id == 8
+    finally:
+        storage.close()
+
+
+def test_use_storage_migrates_user_partition(monkeypatch):
+    monkeypatch.setattr(meal_storage, "STORAGE_BACKEND", "sqlite")
+    with use_storage("anna") as storage:
+        storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+    meal_storage.close_storages()
+
+    # Partycja zapisana w JSON jest przenoszona przy pierwszym otwarciu w SQLite
+    monkeypatch.setattr(meal_storage, "STORAGE_BACKEND", "json")
+    with use_storage("jan") as storage:
+        storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00", dish="rosół"))
+    meal_storage.close_storages()
+
+    monkeypatch.setattr(meal_storage, "STORAGE_BACKEND", "sqlite")
+    with use_storage("jan") as storage:
+        assert [meal["dish_name"] for meal in storage.get_all_meals()] == ["rosół"]
+    with use_storage("anna") as storage:
+        assert [meal["dish_name"] for meal in storage.get_all_meals()] == ["owsianka"]
+
+
+def test_evicted_storage_stays_open_while_in_use(backend, monkeypatch):
+    monkeypatch.setattr(meal_storage, "STORAGE_BACKEND", backend)
+    monkeypatch.setattr(meal_storage, "USER_STORAGE_CACHE", 1)
+
+    with use_storage("anna") as storage:
+        # Otwarcie magazynu innego użytkownika usuwa ten z puli
+        with use_storage("jan") as other:
+            other.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+        storage.add_meal(_meal("2026-01-01", "2026-01-01 09:00:00"))
+        assert len(storage.get_all_meals()) == 1
+
+    with use_storage("anna") as storage:
+        assert len(storage.get_all_meals()) == 1
+
+
+def test_sqlite_connections_are_pooled(tmp_path):
+    storage = SqliteMealStorage(str(tmp_path / "meals.db"))
+    storage.add_meal(_meal("2026-01-01", "2026-01-01 08:00:00"))
+
+    # Wątki, które użyły magazynu, nie zostawiają po sobie otwartych połączeń
+    threads = [threading.Thread(target=storage.get_all_meals) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(storage._idle) <= meal_storage.SQLITE_POOL_SIZE
+
+    storage.close()
+    assert storage._idle == []
+    # Magazyn usunięty z puli może jeszcze dokończyć operację
+    assert len(storage.get_all_meals()) == 1
+    assert storage._idle == []
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+from services.meal_service import add_meal, get_all_meals, import_meals, iter_meals
+from services.meal_transfer import detect_format, export_chunks, read_records
+
+MEALS = [
+    ("owsianka", 250, "2026-01-01", {"Magnez": 75.5, "Żelazo": 2.25, "Witamina D": 0.0}),
+    ("rosół, z makaronem", 400, "2026-01-02", {"Magnez": 16.0, "Potas": 320.0}),
+    ("pierś z kurczaka \"grill\"", 150, "2026-01-03", {"Cynk": 1.5})
+]
+
+
+def _without_id(meal):
+    return {key: value for key, value in meal.items() if key != "id"}
+
+
+@pytest.fixture
+def diary():
+    for dish_name, amount, date, nutrition_data in MEALS:
+        assert add_meal(dish_name, amount, date, nutrition_data, user_id="anna")
+    return sorted((_without_id(meal) for meal in get_all_meals("anna")), key=lambda meal: meal["date"])
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_import_round_trip(diary, fmt):
+    exported = "".join(export_chunks(iter_meals(user_id="anna"), fmt))
+
+    result = import_meals(read_records(io.StringIO(exported), fmt), user_id="jan")
+    assert result == {"imported": 3, "failed": 0, "errors": [], "completed": True}
+
+    imported = sorted((_without_id(meal) for meal in get_all_meals("jan")), key=lambda meal: meal["date"])
+    assert imported == diary
+
+
+def test_export_date_range(diary):
+    lines = "".join(export_chunks(iter_meals("2026-01-02", "2026-01-02", "anna"), "ndjson")).splitlines()
+    assert [json.loads(line)["dish_name"] for line in lines] == ["rosół, z makaronem"]
+
+
+def test_import_reports_bad_lines():
+    content = "\n".join([
+        json.dumps({"dish_name": "owsianka", "amount": 250, "date": "2026-01-01", "nutrition_data": {"Magnez": 75}}),
+        "nie json",
+        json.dumps({"dish_name": "owsianka", "amount": -5, "date": "2026-01-01", "nutrition_data": {"Magnez": 75}}),
+        json.dumps({"dish_name": "owsianka", "amount": 250, "date": "2026-01-01", "nutrition_data": {"Magnez": "dużo"}})
+    ])
+
+    result = import_meals(read_records(io.StringIO(content), "ndjson"), user_id="jan", batch_size=1)
+    assert result["imported"] == 1
+    assert result["failed"] == 3
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4]
+    assert len(get_all_meals("jan")) == 1
+
+
+@pytest.mark.parametrize("filename, content_type, expected", [
+    ("dziennik.csv", None, "csv"),
+    ("dziennik.jsonl", None, "ndjson"),
+    (None, "application/x-ndjson; charset=utf-8", "ndjson"),
+    ("dziennik.txt", "text/plain", None)
+])
+def test_detect_format(filename, content_type, expected):
+    assert detect_format(content_type, filename) == expected
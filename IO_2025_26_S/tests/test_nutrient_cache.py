@@ -0,0 +1,88 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import nutrient_cache
+from services.nutrient_cache import get_cached_nutrients, get_stale_nutrients, normalize_dish_name, store_nutrients
+from services.openai_service import _calculate_proportional_values, analyze_dish
+
+PER_100G = {"Magnez": 24.37, "Żelazo": 1.333, "Witamina D": 0.05, "Wapń": 48.0, "Cynk": 1.1, "Potas": 210.0}
+
+
+def _age(name, seconds):
+    """Postarza wpis cache o podaną liczbę sekund."""
+    nutrient_cache._cache[normalize_dish_name(name)]["stored_at"] -= seconds
+
+
+def test_normalized_name_hits():
+    store_nutrients("Zupa Pomidorowa", PER_100G)
+
+    assert get_cached_nutrients("  zupa   pomidorowa! ") == PER_100G
+    assert get_cached_nutrients("zupa ogórkowa") is None
+    assert nutrient_cache.get_cache_stats()["hits"] == 1
+
+
+def test_expired_entry_is_served_only_as_stale():
+    store_nutrients("bigos", PER_100G)
+    _age("bigos", nutrient_cache.CACHE_TTL_SECONDS + 1)
+
+    assert get_cached_nutrients("bigos") is None
+    assert get_stale_nutrients("bigos") == PER_100G
+    assert nutrient_cache.get_cache_stats()["expired"] == 1
+
+    _age("bigos", nutrient_cache.CACHE_STALE_SECONDS)
+    assert get_stale_nutrients("bigos") is None
+
+
+def test_least_recently_used_is_evicted(monkeypatch):
+    monkeypatch.setattr(nutrient_cache, "CACHE_MAX_ENTRIES", 2)
+    store_nutrients("bigos", PER_100G)
+    store_nutrients("pierogi", PER_100G)
+    get_cached_nutrients("bigos")
+    store_nutrients("gulasz", PER_100G)
+
+    assert get_cached_nutrients("pierogi") is None
+    assert get_cached_nutrients("bigos") == PER_100G
+    assert nutrient_cache.get_cache_stats()["evictions"] == 1
+
+
+def test_entries_saved_by_other_workers_are_merged():
+    store_nutrients("bigos", PER_100G)
+
+    # Inny worker dopisał potrawę do pliku cache
+    with open(nutrient_cache.CACHE_FILE, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    entries["pierogi"] = {"per_100g": {"Magnez": 12.0}, "stored_at": time.time()}
+    with open(nutrient_cache.CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+
+    assert get_cached_nutrients("pierogi") == {"Magnez": 12.0}
+
+    # Zapis tego workera nie gubi potraw z pliku
+    store_nutrients("gulasz", PER_100G)
+    with open(nutrient_cache.CACHE_FILE, "r", encoding="utf-8") as f:
+        assert set(json.load(f)) == {"bigos", "pierogi", "gulasz"}
+
+
+def test_proportional_values():
+    assert _calculate_proportional_values({"Magnez": 24.37, "Żelazo": 1.333}, 250) == {"Magnez": 60.9, "Żelazo": 3.3}
+    assert _calculate_proportional_values({"Magnez": 24.37}, 0) == {"Magnez": 24.37}
+
+
+def test_other_amount_is_rescaled_from_cache():
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content=json.dumps(PER_100G, ensure_ascii=False))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    assert analyze_dish(client, "kwazimodo", 200)["Magnez"] == pytest.approx(48.7)
+    assert analyze_dish(client, "Kwazimodo", 50)["Magnez"] == pytest.approx(12.2)
+    assert len(requests) == 1
+    # Cache trzyma wartości z pełną dokładnością - zaokrąglany jest tylko wynik
+    assert get_cached_nutrients("kwazimodo")["Żelazo"] == pytest.approx(1.333)
@@ -0,0 +1,56 @@
+import pytest
+
+from services.nutrient_store import NutrientColumnStore
+
+
+@pytest.fixture
+def store():
+    store = NutrientColumnStore()
+    # Dni dopisywane w dowolnej kolejności
+    store.add_day("2026-01-03", 1, {"Magnez": 300.0, "Żelazo": 20.0})
+    store.add_day("2026-01-01", 2, {"Magnez": 100.0, "Żelazo": 10.0})
+    store.add_day("2026-01-02", 1, {"Magnez": 200.0})
+    return store
+
+
+def test_range_statistics(store):
+    stats = store.range_statistics("2026-01-01", "2026-01-31")
+
+    assert stats["logged_days"] == 3
+    assert stats["meal_count"] == 4
+    assert stats["nutrients"]["Magnez"] == {"sum": 600.0, "mean": 200.0, "min": 100.0, "max": 300.0,
+                                           "p10": 120.0, "p50": 200.0, "p90": 280.0}
+    assert store.range_statistics("2026-01-02", "2026-01-02")["nutrients"]["Magnez"]["sum"] == 200.0
+
+
+def test_removed_meal_leaves_no_logged_day(store):
+    store.add_day("2026-01-02", 1, {"Magnez": 200.0}, sign=-1)
+
+    stats = store.range_statistics("2026-01-01", "2026-01-31")
+    assert stats["logged_days"] == 2
+    assert stats["nutrients"]["Magnez"]["sum"] == 400.0
+
+
+def test_rolling_averages_skip_days_without_meals(store):
+    rolling = store.rolling_averages("2026-01-01", "2026-01-05", window=2)
+
+    assert rolling["dates"] == ["2026-01-01", "2026-01-02", "2026-01-03", "2026-01-04", "2026-01-05"]
+    assert rolling["nutrients"]["Magnez"] == [100.0, 150.0, 250.0, 300.0, None]
+
+
+def test_days_below_target(store):
+    below = store.days_below_target("2026-01-01", "2026-01-31", {"Magnez": 250.0, "Cynk": 10.0})
+
+    assert below["Magnez"]["dates"] == ["2026-01-01", "2026-01-02"]
+    assert below["Cynk"]["days_below"] == 3
+
+
+def test_distant_dates_take_one_row_each():
+    store = NutrientColumnStore()
+    store.add_day("9999-12-31", 1, {"Magnez": 10.0})
+    store.add_day("0001-01-01", 1, {"Magnez": 20.0})
+
+    assert store._totals.shape[0] < 1000
+    assert store.range_statistics("0001-01-01", "9999-12-31")["nutrients"]["Magnez"]["sum"] == 30.0
+    assert store.days_below_target("0001-01-01", "9999-12-31", {"Magnez": 15.0})["Magnez"]["dates"] == ["9999-12-31"]
+    assert store.rolling_averages("0001-01-01", "0001-01-02", window=7)["nutrients"]["Magnez"] == [20.0, 20.0]
@@ -0,0 +1,81 @@
+import pytest
+
+from services import reference_foods
+from services.reference_foods import ReferenceFoodTable, get_reference_table, match_key
+
+
+@pytest.fixture
+def table():
+    table = ReferenceFoodTable(["Magnez", "Żelazo"])
+    table.add("jajecznica", [12, 1.5])
+    table.add("rosół", [4, 0.3], aliases=["rosół z makaronem"])
+    table.add("owsianka", [30, 0.8], aliases=["owsianka na mleku"])
+    table.add("jogurt naturalny", [12, 0.05], aliases=["jogurt"])
+    table.add("pierś z kurczaka", [28, 0.4])
+    return table
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Jajka", "jajk"),
+    ("jajko", "jajk"),
+    ("Pierś z kurczaka", "kurczak piers"),
+    ("kurczak pierś", "kurczak piers"),
+    ("rosół bez makaronu", "bez makaron rosol"),
+])
+def test_match_key(name, expected):
+    assert match_key(name) == expected
+
+
+@pytest.mark.parametrize("name", ["Pierś z kurczaka", "kurczak pierś", "ROSÓŁ Z MAKARONEM"])
+def test_exact_lookup(table, name):
+    match = table.lookup(name)
+    assert match is not None
+    assert match["fuzzy"] is False
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("jajecznika", "jajecznica"),   # zamieniona litera
+    ("jajecznca", "jajecznica"),    # brakująca litera
+    ("kurczka pierś", "pierś z kurczaka"),
+])
+def test_fuzzy_lookup_accepts_typos(table, name, expected):
+    match = table.lookup(name)
+    assert match == {"name": expected, "fuzzy": True, "per_100g": table.lookup(expected)["per_100g"]}
+
+
+@pytest.mark.parametrize("name", [
+    "rosół bez makaronu",     # "bez" nie jest słowem łączącym
+    "mleko owsiane",          # inna potrawa niż owsianka (na mleku)
+    "jogurt naturalny 0%",    # wyraz "0" nie ma odpowiednika
+    "ryż z kurczakiem",
+])
+def test_fuzzy_lookup_rejects_different_dishes(table, name):
+    assert table.lookup(name) is None
+
+
+def test_fuzzy_lookup_can_be_disabled(table):
+    assert table.lookup("jajecznika", fuzzy=False) is None
+
+
+def test_short_keys_match_only_exactly(table):
+    table.add("ryba", [30, 0.5])
+    assert table.lookup("ryż") is None
+
+
+@pytest.mark.parametrize("name", ["rosół bez makaronu", "mleko owsiane", "jogurt naturalny 0%"])
+def test_shipped_table_rejects_different_dishes(name):
+    assert get_reference_table().lookup(name) is None
+
+
+def test_add_rejects_duplicate_key(table):
+    assert table.add("Jajecznica", [1, 1]) is False
+
+
+def test_find_reference_food_counts_hits(monkeypatch):
+    monkeypatch.setattr(reference_foods, "_stats", {"hits": 0, "fuzzy_hits": 0, "misses": 0, "promoted": 0})
+
+    assert reference_foods.find_reference_food("jajka")
+    assert reference_foods.find_reference_food("mleko owsiane") is None
+
+    stats = reference_foods.get_reference_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import openai_service, resilience
+from services.resilience import CircuitBreaker, Deadline, call_with_retries, call_with_retries_async
+
+
+def _half_open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "half_open"
+    return breaker
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    # reset_timeout=0 - otwarty bezpiecznik od razu przechodzi w stan próbny
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0, probe_timeout=60)
+    monkeypatch.setattr(resilience, "breaker", breaker)
+    monkeypatch.setattr(openai_service, "breaker", breaker)
+    monkeypatch.setattr(resilience, "OPENAI_BACKOFF_BASE", 0)
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.get_stats()["rejected"] == 1
+
+
+def test_half_open_lets_one_probe_through(breaker):
+    _half_open(breaker)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_released_probe_frees_the_slot(breaker):
+    _half_open(breaker)
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_abandoned_probe_times_out():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, probe_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+
+
+def test_sync_retries_record_outcome(breaker):
+    calls = []
+
+    def request(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            raise ConnectionError("brak połączenia")
+        return "odpowiedź"
+
+    assert call_with_retries(request, lambda response: response, Deadline(5)) == "odpowiedź"
+    assert len(calls) == 2
+    assert breaker.get_stats()["consecutive_failures"] == 0
+
+
+def test_cancelled_async_probe_is_released(breaker):
+    _half_open(breaker)
+
+    async def request(timeout):
+        await asyncio.sleep(10)
+
+    async def cancelled_call():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call_with_retries_async(request, lambda response: response), 0.05)
+
+    asyncio.run(cancelled_call())
+    assert breaker.allow()
+
+
+def test_stream_disconnect_releases_probe(breaker):
+    _half_open(breaker)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=None)))
+
+    stream = openai_service.analyze_dish_stream(client, "kwazimodo", 100)
+    for event, data in stream:
+        if event == "progress" and data.get("stage") == "request":
+            break
+    # Klient rozłącza się przed wysłaniem zapytania do API
+    stream.close()
+
+    assert breaker.allow()
@@ -0,0 +1,33 @@
+import pytest
+
+from app import create_app
+from config import TestingConfig
+
+
+@pytest.fixture
+def client():
+    return create_app(TestingConfig).test_client()
+
+
+def test_diary_day_links_to_neighbours(client):
+    page = client.get("/diary/2026-03-01").get_data(as_text=True)
+
+    assert "/diary/2026-02-28" in page
+    assert "/diary/2026-03-02" in page
+
+
+@pytest.mark.parametrize("date, missing, present", [
+    ("0001-01-01", "←", "/diary/0001-01-02"),
+    ("9999-12-31", "→", "/diary/9999-12-30")
+])
+def test_diary_day_at_range_end(client, date, missing, present):
+    response = client.get(f"/diary/{date}")
+
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert present in page
+    assert missing not in page
+
+
+def test_diary_day_rejects_bad_date(client):
+    assert client.get("/diary/2026-02-30").status_code == 400
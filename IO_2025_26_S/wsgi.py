@@ -0,0 +1,12 @@
+"""
+Punkt wejścia serwera produkcyjnego (WSGI).
+
+Uruchomienie (z katalogu IO_2025_26_S):
+    gunicorn -c gunicorn.conf.py wsgi:app
+    uvicorn wsgi:app --interface wsgi --workers 4 --port 5000
+
+Konfiguracja wybierana jest przez SMARTDIET_ENV (domyślnie production).
+"""
+from app import create_app
+
+app = create_app()